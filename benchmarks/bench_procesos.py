@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks de escalamiento de CAMPO y CAJA
+
+Genera padrones sintéticos deterministas (app_iiwa.sintetico) de 10k, 100k y
+1M filas con 10, 100 y 1000 códigos postales, ejecuta cada proceso en un
+subproceso limpio y mide el tiempo de cada etapa del pipeline y el pico de
+memoria (RSS máximo del subproceso). El resultado se compara contra
+benchmarks/baseline.json y el script termina con código 1 si alguna etapa o
+el pico de memoria empeora más que la tolerancia.
+
+Uso:
+    python benchmarks/bench_procesos.py                     # 10k, CAMPO y CAJA
+    python benchmarks/bench_procesos.py -e 10k 100k 1M
+    python benchmarks/bench_procesos.py -e 10k --actualizar # guarda baseline
+
+Los datos generados se guardan en benchmarks/.datos para no regenerarlos.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / "src"))
+
+ESCENARIOS = {
+    "10k": (10_000, 10),
+    "100k": (100_000, 100),
+    "1M": (1_000_000, 1000),
+}
+PROCESOS = ("CAMPO", "CAJA")
+BASELINE = Path(__file__).parent / "baseline.json"
+DATOS = Path(__file__).parent / ".datos"
+
+# Una etapa sólo cuenta como regresión si además empeora más de esto; evita
+# falsos positivos en etapas de milisegundos
+MARGEN_ABSOLUTO_S = 0.5
+MARGEN_ABSOLUTO_MB = 32
+
+
+def medir(proceso: str, datos: Path, salida: Path, detalle=False) -> dict:
+    """
+    Ejecuta un proceso en este intérprete y devuelve sus métricas
+
+    Con detalle=True el log del proceso sale por stderr.
+    """
+    from app_iiwa import eventos
+    from app_iiwa.caja import run_proceso_caja
+    from app_iiwa.campo import run_proceso_campo
+    from app_iiwa.metricas import pico_rss_mb
+    from app_iiwa.pipeline import observar
+
+    etapas = {}
+
+    def registrar(pipeline, etapa, segundos, origen):
+        etapas[etapa] = etapas.get(etapa, 0.0) + segundos
+
+    run = run_proceso_campo if proceso == "CAMPO" else run_proceso_caja
+    log_func = eventos.consola() if detalle else (lambda m: None)
+    inicio = time.perf_counter()
+    with observar(registrar):
+        ok, resultado = run(datos / "SISTEMA.xlsx", datos, salida, log_func)
+    total = time.perf_counter() - inicio
+    if not ok:
+        raise RuntimeError(f"{proceso} falló: {resultado}")
+    pico = pico_rss_mb()
+    return {
+        "total_s": round(total, 3),
+        "etapas": {etapa: round(seg, 3) for etapa, seg in etapas.items()},
+        "pico_mb": None if pico is None else round(pico, 1),
+    }
+
+
+def preparar_datos(escenario: str, proceso: str) -> Path:
+    from app_iiwa.sintetico import generar_datos
+
+    carpeta = DATOS / f"{proceso.lower()}_{escenario}"
+    if not (carpeta / "SISTEMA.xlsx").exists():
+        n_filas, n_cps = ESCENARIOS[escenario]
+        print(f"Generando {proceso} {escenario} ({n_filas} filas, {n_cps} C.P.)...")
+        generar_datos(carpeta, proceso, n_filas, n_cps)
+    return carpeta
+
+
+def ejecutar(escenario: str, proceso: str, repeticiones: int, detalle=False) -> dict:
+    """Mejor de `repeticiones` corridas, cada una en un subproceso nuevo"""
+    datos = preparar_datos(escenario, proceso)
+    mejor = None
+    comando = [sys.executable, __file__] + (["--verbose"] if detalle else [])
+    for _ in range(repeticiones):
+        with tempfile.TemporaryDirectory(prefix="bench_iiwa_") as salida:
+            completado = subprocess.run(
+                comando + ["--medir", proceso, str(datos), salida],
+                stdout=subprocess.PIPE,
+                stderr=None if detalle else subprocess.PIPE,
+                text=True,
+                check=True,
+            )
+        metricas = json.loads(completado.stdout.strip().splitlines()[-1])
+        if mejor is None or metricas["total_s"] < mejor["total_s"]:
+            mejor = metricas
+    return mejor
+
+
+def comparar(medido: dict, baseline: dict, tolerancia: float) -> list:
+    """
+    Regresiones de `medido` respecto a `baseline`
+
+    Ambos tienen la forma {escenario: {proceso: métricas}}. Las combinaciones
+    que no están en el baseline no se comparan.
+    """
+    regresiones = []
+    for escenario, procesos in medido.items():
+        for proceso, actual in procesos.items():
+            base = baseline.get(escenario, {}).get(proceso)
+            if base is None:
+                continue
+            for etapa, segundos in actual["etapas"].items():
+                referencia = base["etapas"].get(etapa)
+                if referencia is None:
+                    continue
+                if (
+                    segundos > referencia * (1 + tolerancia)
+                    and segundos - referencia > MARGEN_ABSOLUTO_S
+                ):
+                    regresiones.append(
+                        f"{escenario} {proceso} {etapa}: "
+                        f"{segundos:.2f} s (baseline {referencia:.2f} s)"
+                    )
+            pico, referencia = actual.get("pico_mb"), base.get("pico_mb")
+            if (
+                pico is not None
+                and referencia is not None
+                and pico > referencia * (1 + tolerancia)
+                and pico - referencia > MARGEN_ABSOLUTO_MB
+            ):
+                regresiones.append(
+                    f"{escenario} {proceso} memoria: "
+                    f"{pico:.0f} MB (baseline {referencia:.0f} MB)"
+                )
+    return regresiones
+
+
+def _tabla(medido: dict) -> str:
+    lineas = [f"{'escenario':<10}{'proceso':<8}{'etapa':<12}{'segundos':>10}"]
+    for escenario, procesos in medido.items():
+        for proceso, m in procesos.items():
+            for etapa, segundos in m["etapas"].items():
+                lineas.append(
+                    f"{escenario:<10}{proceso:<8}{etapa:<12}{segundos:>10.2f}"
+                )
+            pico = "n/d" if m["pico_mb"] is None else f"{m['pico_mb']:.0f} MB"
+            lineas.append(
+                f"{escenario:<10}{proceso:<8}{'TOTAL':<12}{m['total_s']:>10.2f}  pico {pico}"
+            )
+    return "\n".join(lineas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "-e", "--escenarios", nargs="+", default=["10k"], choices=ESCENARIOS
+    )
+    parser.add_argument(
+        "-p", "--procesos", nargs="+", default=list(PROCESOS), choices=PROCESOS
+    )
+    parser.add_argument("-r", "--repeticiones", type=int, default=1)
+    parser.add_argument("-t", "--tolerancia", type=float, default=0.25)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument(
+        "--actualizar", action="store_true", help="guarda el resultado como baseline"
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="muestra el log de cada proceso"
+    )
+    parser.add_argument(
+        "--medir",
+        nargs=3,
+        metavar=("PROCESO", "DATOS", "SALIDA"),
+        help=argparse.SUPPRESS,
+    )
+    args = parser.parse_args(argv)
+
+    if args.medir:
+        proceso, datos, salida = args.medir
+        print(json.dumps(medir(proceso, Path(datos), Path(salida), args.verbose)))
+        return 0
+
+    medido = {
+        escenario: {
+            p: ejecutar(escenario, p, args.repeticiones, args.verbose)
+            for p in args.procesos
+        }
+        for escenario in args.escenarios
+    }
+    print(_tabla(medido))
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.actualizar:
+        for escenario, procesos in medido.items():
+            baseline.setdefault(escenario, {}).update(procesos)
+        baseline["_maquina"] = (
+            f"{platform.system()} {platform.machine()} Python {platform.python_version()}"
+        )
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline actualizado: {args.baseline}")
+        return 0
+
+    regresiones = comparar(medido, baseline, args.tolerancia)
+    for regresion in regresiones:
+        print(f"REGRESIÓN {regresion}")
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
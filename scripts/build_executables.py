@@ -69,6 +69,19 @@ a = Analysis(
     hiddenimports=[
         'app_iiwa',
         'app_iiwa.app',
+        'app_iiwa.ambos',
+        'app_iiwa.arranque',
+        'app_iiwa.campo',
+        'app_iiwa.caja',
+        'app_iiwa.comparativo',
+        'app_iiwa.conciliacion',
+        'app_iiwa.constantes',
+        'app_iiwa.cubo',
+        'app_iiwa.historial',
+        'app_iiwa.servicio',
+        'app_iiwa.trabajos',
+        'app_iiwa.trabajador',
+        'app_iiwa.vigilancia',
         'tkinter',
         'tkinter.ttk',
         'tkinter.filedialog',
@@ -14,12 +14,47 @@ __description__ = (
     "Aplicación Unificada para Procesamiento de Padrones - " "Combina CAMPO y CAJA"
 )
 
-from .app import AppIIWA
+import multiprocessing
 
 
-def main():
+def __getattr__(nombre):
+    # La interfaz (tkinter) se importa hasta que se usa: los procesos hijos
+    # del pool por CP importan este paquete y no necesitan la GUI
+    if nombre == "AppIIWA":
+        from .app import AppIIWA
+
+        return AppIIWA
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+
+def main(argv=None):
     """Punto de entrada principal de la aplicación"""
-    app = AppIIWA()
+    # En el ejecutable de PyInstaller los procesos del pool por CP relanzan
+    # el mismo binario; freeze_support los desvía antes de abrir la GUI
+    multiprocessing.freeze_support()
+
+    import argparse
+
+    from .perfiles import MODOS
+
+    parser = argparse.ArgumentParser(prog="app_iiwa", description=__description__)
+    parser.add_argument(
+        "--perfilar",
+        nargs="?",
+        const="cprofile",
+        choices=MODOS,
+        help="perfila cada etapa y deja los perfiles junto a los reportes",
+    )
+    parser.add_argument(
+        "--sin-trabajador",
+        action="store_true",
+        help="calcula en un hilo de la interfaz en lugar del proceso persistente",
+    )
+    args, _ = parser.parse_known_args(argv)
+
+    from .app import AppIIWA
+
+    app = AppIIWA(perfilar=args.perfilar, trabajador=not args.sin_trabajador)
     app.run()
 
 
@@ -6,6 +6,8 @@ Punto de entrada para ejecutar App IIWA como módulo
 Uso: python -m app_iiwa
 """
 
+import multiprocessing
+
 try:
     from . import main
 except ImportError:
@@ -13,4 +15,5 @@ except ImportError:
     from app_iiwa import main
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
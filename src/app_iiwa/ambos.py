@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Proceso AMBOS: CAMPO y CAJA en una sola corrida
+
+Los dos procesos suelen usar el mismo SISTEMA y las mismas carpetas. Aquí
+SISTEMA se lee una sola vez (ingesta.sistema_compartido) y cada proceso
+recibe su copia; luego CAMPO y CAJA corren a la vez en un ThreadPoolExecutor
+acotado. Sus mensajes llegan intercalados al mismo log con el prefijo
+[CAMPO] o [CAJA], y al final se muestra un resumen de ambos.
+
+Los hilos comparten el GIL: se gana mientras uno espera disco o pandas/numpy
+calculan sin el GIL, no el doble. El CPU y el pico de RSS de cada
+run_metrics.json son del proceso completo e incluyen los del otro. Al
+perfilar, los procesos corren uno tras otro para que cada perfil sólo mida
+el suyo.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from . import eventos
+from .cancelacion import cancelable, senal_actual
+from .constantes import BACKEND_DEFAULT, PRESUPUESTO_DEFAULT_MB, PRIORIDAD_DEFAULT
+from .ingesta import sistema_compartido
+
+# Procesos que corren a la vez como máximo
+SIMULTANEOS_DEFAULT = 2
+
+
+def _correr(funcion, log_func, parametros: dict, senal):
+    """(ok, resultado, segundos) de un proceso; un error no detiene al otro"""
+    inicio = time.perf_counter()
+    try:
+        with cancelable(senal):
+            ok, resultado = funcion(log_func=log_func, **parametros)
+    except Exception as e:
+        ok, resultado = False, f"{type(e).__name__}: {e}"
+    return ok, resultado, time.perf_counter() - inicio
+
+
+def run_proceso_ambos(
+    sistema_path: Path,
+    data_dir: Path,
+    output_dir: Path,
+    log_func,
+    month_label: str = "SISTEMA",
+    backend: str = BACKEND_DEFAULT,
+    workers: int = 1,
+    bajo_memoria: bool = False,
+    presupuesto_mb: int = PRESUPUESTO_DEFAULT_MB,
+    cache_dir: Path = None,
+    solo_reportes: bool = False,
+    por_fila: int = 3,
+    perfilar: str = None,
+    simultaneos: int = SIMULTANEOS_DEFAULT,
+    reutilizar: bool = True,
+    historial: Path = None,
+    prioridad: int = PRIORIDAD_DEFAULT,
+):
+    """Ejecuta CAMPO y CAJA con el mismo SISTEMA y las mismas carpetas
+
+    Los argumentos son los de run_proceso_campo (CAJA ignora month_label,
+    backend, workers, por_fila y prioridad).
+
+    Args:
+        simultaneos: procesos que corren a la vez (1 = uno tras otro)
+
+    Returns:
+        (ok, resumen): ok sólo si los dos terminaron bien; resumen con una
+        línea por proceso (carpeta de reportes o error)
+    """
+    from .caja import run_proceso_caja
+    from .campo import run_proceso_campo
+
+    comunes = dict(
+        sistema_path=sistema_path,
+        data_dir=data_dir,
+        output_dir=output_dir,
+        bajo_memoria=bajo_memoria,
+        presupuesto_mb=presupuesto_mb,
+        cache_dir=cache_dir,
+        solo_reportes=solo_reportes,
+        perfilar=perfilar,
+        reutilizar=reutilizar,
+        historial=historial,
+    )
+    corridas = {
+        "CAMPO": (
+            run_proceso_campo,
+            dict(
+                comunes,
+                month_label=month_label,
+                backend=backend,
+                workers=workers,
+                por_fila=por_fila,
+                prioridad=prioridad,
+            ),
+        ),
+        "CAJA": (run_proceso_caja, comunes),
+    }
+    simultaneos = 1 if perfilar else max(1, min(simultaneos, len(corridas)))
+
+    eventos.seccion(log_func, "=== INICIANDO PROCESOS CAMPO Y CAJA ===")
+    log_func(f"{len(corridas)} procesos, {simultaneos} a la vez")
+    # La señal de cancelación es por hilo: cada proceso recibe la de quien llama
+    senal = senal_actual()
+    inicio = time.perf_counter()
+    with sistema_compartido(), ThreadPoolExecutor(
+        max_workers=simultaneos, thread_name_prefix="ambos"
+    ) as pool:
+        futuros = {
+            nombre: pool.submit(
+                _correr,
+                funcion,
+                eventos.etiquetar(log_func, nombre),
+                parametros,
+                senal,
+            )
+            for nombre, (funcion, parametros) in corridas.items()
+        }
+        resultados = {nombre: futuro.result() for nombre, futuro in futuros.items()}
+    total = time.perf_counter() - inicio
+
+    log_func("Resumen de CAMPO y CAJA:")
+    resumen = []
+    for nombre, (ok, resultado, segundos) in resultados.items():
+        if ok:
+            eventos.exito(log_func, f"  {nombre}: completado en {segundos:.1f} s")
+        else:
+            eventos.error(log_func, f"  {nombre}: falló en {segundos:.1f} s")
+        resumen.append(f"{nombre}: {resultado}")
+    suma = sum(segundos for _, _, segundos in resultados.values())
+    log_func(f"  Total: {total:.1f} s (suma de los dos: {suma:.1f} s)")
+
+    return all(ok for ok, _, _ in resultados.values()), "\n".join(resumen)
@@ -4,887 +4,501 @@
 """
 App IIWA - Aplicación Unificada para Procesamiento de Padrones
 Combina las funcionalidades de CAJA y CAMPO en una sola interfaz
+
+Este módulo sólo importa tkinter y módulos ligeros: pandas, numpy, openpyxl y
+los procesos se cargan en un proceso de cálculo persistente
+(trabajador.Trabajador) o, sin él, en un hilo (arranque.Precarga), para que la
+ventana aparezca de inmediato.
 """
 
 import os
-import platform
 import queue
-import re
-import subprocess
 import sys
 import threading
+import time
 import tkinter as tk
 import warnings
-from datetime import datetime
+from collections import deque
 from pathlib import Path
 from tkinter import filedialog, messagebox, ttk
 
-import numpy as np
-import pandas as pd
+from . import eventos
+from .arranque import Precarga, backends_instalados
+from .cancelacion import cancelable
+from .constantes import BACKEND_DEFAULT, CARPETA_CACHE, PRESUPUESTO_DEFAULT_MB
+from .eventos import Evento, como_evento, formato_archivo, formato_gui
+from .perfiles import MODOS as MODOS_PERFIL
+from .trabajador import Trabajador, funcion_proceso
+from .trabajos import (
+    COMPLETADO,
+    Planificador,
+    Trabajo,
+    cargar_lote,
+    guardar_lote,
+)
+from .utils import (  # noqa: F401
+    ensure_dirs,
+    get_desktop_dir,
+    get_historial_path,
+    open_folder,
+    session_log_path,
+)
 
 warnings.filterwarnings("ignore")
 
-# ====================================
-# UTILIDADES COMUNES
-# ====================================
-
-
-def get_desktop_dir() -> Path:
-    """Obtiene la ruta del escritorio independiente del SO"""
-    system = platform.system()
-    home = Path.home()
-
-    if system == "Windows":
-        try:
-            from ctypes import create_unicode_buffer, windll, wintypes
-
-            CSIDL_DESKTOPDIRECTORY = 0x10
-            SHGFP_TYPE_CURRENT = 0
-            buf = create_unicode_buffer(wintypes.MAX_PATH)
-            windll.shell32.SHGetFolderPathW(
-                None, CSIDL_DESKTOPDIRECTORY, None, SHGFP_TYPE_CURRENT, buf
-            )
-            p = Path(buf.value)
-            if p.exists():
-                return p
-        except Exception:
-            pass
-        return home / "Desktop"
-
-    if system == "Darwin":
-        return home / "Desktop"
-
-    # Linux / Unix
-    try:
-        out = subprocess.run(
-            ["xdg-user-dir", "DESKTOP"], capture_output=True, text=True, check=True
-        )
-        p = Path(out.stdout.strip())
-        if str(p) and p.exists():
-            return p
-    except Exception:
-        pass
-
-    cfg = home / ".config" / "user-dirs.dirs"
-    if cfg.exists():
-        try:
-            txt = cfg.read_text(encoding="utf-8", errors="ignore")
-            m = re.search(r'XDG_DESKTOP_DIR="?(.+?)\"?$', txt, re.M)
-            if m:
-                path = m.group(1).replace("$HOME", str(home))
-                p = Path(path)
-                if p.exists():
-                    return p
-        except Exception:
-            pass
 
-    return home / "Desktop"
+def __getattr__(nombre):
+    # Los procesos se importan hasta que se usan (ver arranque.Precarga)
+    if nombre == "run_proceso_campo":
+        from .campo import run_proceso_campo
 
+        return run_proceso_campo
+    if nombre == "exportar_resumenes_en_grid":
+        from .campo import exportar_resumenes_en_grid
 
-def ensure_dirs(*dirs):
-    """Crea directorios si no existen"""
-    for dir_path in dirs:
-        Path(dir_path).mkdir(parents=True, exist_ok=True)
+        return exportar_resumenes_en_grid
+    if nombre == "run_proceso_caja":
+        from .caja import run_proceso_caja
 
+        return run_proceso_caja
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
 
-def open_folder(path):
-    """Abre una carpeta en el explorador del sistema"""
-    system = platform.system()
-    try:
-        if system == "Darwin":
-            os.system(f'open "{path}"')
-        elif system == "Windows":
-            os.system(f'explorer "{path}"')
-        else:
-            os.system(f'xdg-open "{path}"')
-    except Exception as e:
-        print(f"Error abriendo carpeta: {e}")
 
+# Opción del combo de perfiles que desactiva el perfilado
+SIN_PERFIL = "no"
+# Líneas que conserva el área de log (el historial completo va a archivo)
+MAX_LINEAS_LOG = 5000
+MAX_MENSAJES_POR_CICLO = 20000
 
 # ====================================
-# FUNCIONES DE PROCESAMIENTO CAMPO
+# CLASE PARA LOGGING EN GUI
 # ====================================
 
 
-def exportar_resumenes_en_grid(
-    df_cps: dict,
-    ruta_salida: str,
-    hoja="ResumenCPs",
-    por_fila=4,
-    pad_filas=2,
-    pad_cols=2,
-):
-    """Exporta resúmenes de CPs en formato grid"""
-
-    def _key(cp):
-        s = str(cp)
-        return (0, int(s)) if s.isdigit() else (1, s)
-
-    items = sorted(df_cps.items(), key=lambda kv: _key(kv[0]))
-
-    block_widths = {cp: df.shape[1] + 1 for cp, df in items}
-    block_heights = {cp: df.shape[0] + 2 for cp, df in items}
-    max_block_width = max(block_widths.values()) if block_widths else 2
-
-    with pd.ExcelWriter(ruta_salida, engine="xlsxwriter") as writer:
-        wb = writer.book
-        ws = wb.add_worksheet(hoja)
-        writer.sheets[hoja] = ws
-
-        fmt_titulo = wb.add_format({"bold": True})
-        fmt_header = wb.add_format({"bold": True, "bg_color": "#F2F2F2"})
-
-        fila_actual = 0
-        for i in range(0, len(items), por_fila):
-            fila_items = items[i : i + por_fila]
-            altura_fila = max(block_heights[cp] for cp, _ in fila_items) + pad_filas
-
-            for j, (cp, df_bloque) in enumerate(fila_items):
-                col_inicio = j * (max_block_width + pad_cols)
-                ws.write(fila_actual, col_inicio, f"CP {cp}", fmt_titulo)
-
-                df_bloque.to_excel(
-                    writer,
-                    sheet_name=hoja,
-                    startrow=fila_actual + 1,
-                    startcol=col_inicio,
-                    header=True,
-                    index=True,
-                )
-
-                n_cols_visibles = df_bloque.shape[1] + 1
-                ws.set_row(fila_actual + 1, None, fmt_header)
-                ws.set_column(col_inicio, col_inicio + n_cols_visibles - 1, 18)
-
-            fila_actual += altura_fila
+def estilo_evento(evento: Evento) -> str:
+    """Tag del Text según el nivel del evento"""
+    if evento.nivel >= eventos.ERROR:
+        return "error"
+    if evento.nivel >= eventos.AVISO:
+        return "warning"
+    if evento.nivel >= eventos.EXITO:
+        return "success"
+    return "large" if evento.seccion else "normal"
 
 
-def run_proceso_campo(
-    sistema_path: Path,
-    data_dir: Path,
-    output_dir: Path,
-    log_func,
-    month_label: str = "SISTEMA",
-):
-    """Ejecuta el proceso CAMPO"""
-    try:
-        ensure_dirs(data_dir, output_dir)
-
-        log_func("=== INICIANDO PROCESO CAMPO ===")
-
-        # Validaciones - usar archivo SISTEMA seleccionado por el usuario
-        if not sistema_path.exists():
-            return False, f"No existe el archivo SISTEMA seleccionado: {sistema_path}"
-
-        # Buscar LISTA C.P..xlsx en la carpeta de datos seleccionada por el usuario
-        lista_cp_path = data_dir / "LISTA C.P..xlsx"
-        if not lista_cp_path.exists():
-            return (
-                False,
-                f"Falta LISTA C.P..xlsx en la carpeta de datos: {lista_cp_path}",
-            )
-
-        log_func(f"Leyendo: {sistema_path}")
-        df = pd.read_excel(sistema_path, engine="openpyxl")
+class GuiLogger:
+    """
+    Cola de eventos para actualizar el Text sin bloquear la UI
+
+    Cada ciclo toma todos los eventos pendientes y los inserta de una vez
+    (un insert, un see y un cambio de estado por ciclo, no por mensaje), con
+    el estilo que corresponde a su nivel. El widget muestra los eventos desde
+    nivel_minimo y conserva sólo las últimas max_lineas líneas; el historial
+    completo, con todos los niveles, se escribe en `archivo`. Sin eventos, el
+    intervalo entre ciclos se duplica hasta interval_max_ms y vuelve a
+    interval_ms con el siguiente.
+    """
+
+    def __init__(
+        self,
+        text_widget: tk.Text,
+        interval_ms: int = 80,
+        max_lineas: int = MAX_LINEAS_LOG,
+        archivo: Path = None,
+        interval_max_ms: int = 1000,
+        nivel_minimo: int = eventos.INFO,
+    ):
+        self.text_widget = text_widget
+        self.queue = queue.Queue()
+        self.interval_ms = interval_ms
+        self.interval_max_ms = interval_max_ms
+        self.max_lineas = max_lineas
+        self.nivel_minimo = nivel_minimo
+        self.archivo = archivo
+        # Eventos recientes de todos los niveles, para volver a filtrar
+        self._recientes = deque(maxlen=max_lineas)
+        self._intervalo = interval_ms
+        self._historial = None
+        if archivo is not None:
+            try:
+                self._historial = open(archivo, "a", encoding="utf-8")
+            except OSError:
+                self.archivo = None
+        self._pump()
 
-        # Crear columnas si no existen
-        if "NumerodeCuenta" not in df.columns:
-            log_func("Creando columna # de cuenta")
-            df["NumerodeCuenta"] = (
-                df["Principal"].astype(str) + "-" + df["Derivada"].astype(str)
-            )
+    def log(self, msg, tag: str = None):
+        """
+        Encola un mensaje (texto o eventos.Evento) desde cualquier hilo
 
-        if "Domicilio" not in df.columns:
-            log_func("Creando columna domicilio")
-            df["Domicilio"] = (
-                df["vialDescripcion"].astype(str)
-                + " "
-                + df["callNombre"].astype(str)
-                + " "
-                + df["manzana"].astype(str)
-                + " "
-                + df["lote"].astype(str)
-                + " "
-                + df["exterior"].astype(str)
-                + " "
-                + df["Interior"].astype(str)
-                + " "
-                + df["Edificio"].astype(str)
-                + " "
-                + df["departamento"].astype(str)
-            )
+        Args:
+            tag: estilo del Text en lugar del que corresponde al nivel
+        """
+        self.queue.put((como_evento(msg), tag))
+
+    def filtrar(self, nivel_minimo: int):
+        """Muestra de nuevo los eventos recientes desde `nivel_minimo`"""
+        self.nivel_minimo = nivel_minimo
+        self._limpiar_widget()
+        self._insertar(list(self._recientes))
+
+    def limpiar(self):
+        """Vacía el área de log (el historial en archivo se conserva)"""
+        self._recientes.clear()
+        self._limpiar_widget()
+
+    def _limpiar_widget(self):
+        state = self.text_widget["state"]
+        self.text_widget.configure(state="normal")
+        self.text_widget.delete("1.0", tk.END)
+        self.text_widget.configure(state=state)
+
+    def _pendientes(self) -> list:
+        pendientes = []
+        while len(pendientes) < MAX_MENSAJES_POR_CICLO:
+            try:
+                pendientes.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return pendientes
 
-        # Validar columnas requeridas
-        required_cols = [
-            "agua",
-            "actualizacionagua",
-            "recargosagua",
-            "drenaje",
-            "actualizaciondrenaje",
-            "recargosdrenaje",
-            "mejoras",
-            "iva",
+    def _pump(self):
+        """Procesa la cola de eventos"""
+        pendientes = self._pendientes()
+        if pendientes:
+            self._guardar(pendientes)
+            self._recientes.extend(pendientes)
+            self._insertar(pendientes)
+            self._intervalo = self.interval_ms
+        else:
+            self._intervalo = min(self._intervalo * 2, self.interval_max_ms)
+        self.text_widget.after(self._intervalo, self._pump)
+
+    def _insertar(self, pendientes: list):
+        visibles = [
+            (evento, tag)
+            for evento, tag in pendientes
+            if evento.nivel >= self.nivel_minimo
         ]
-        for col in required_cols:
-            if col not in df.columns:
-                return False, f"Columna faltante en SISTEMA.xlsx: {col}"
-
-        log_func("Calculando totales...")
-        df["Total"] = (
-            df["agua"]
-            + df["actualizacionagua"]
-            + df["recargosagua"]
-            + df["drenaje"]
-            + df["actualizaciondrenaje"]
-            + df["recargosdrenaje"]
-            + df["mejoras"]
-            + df["iva"]
-        )
-
-        # Tablas generales
-        log_func("Generando tablas por código postal...")
-        cp = df.groupby("CodigoPostal")["NumerodeCuenta"].nunique().to_frame()
-        cp.index = cp.index.astype(int)
-
-        df2 = df.copy()
-        df2.index = df2["NumerodeCuenta"]
-        duplicados = df2.loc[df2.index[df2.index.duplicated()]]
-
-        t_consumo = df.groupby("TipoConsumo")["NumerodeCuenta"].nunique().to_frame()
-        t_consumo = pd.concat(
-            [
-                t_consumo,
-                pd.DataFrame(
-                    {"NumerodeCuenta": [t_consumo["NumerodeCuenta"].sum()]},
-                    index=["Total general"],
-                ),
-            ]
-        )
-
-        t_conexion = df.groupby("TipoConexion")["NumerodeCuenta"].nunique().to_frame()
-        t_conexion = pd.concat(
-            [
-                t_conexion,
-                pd.DataFrame(
-                    {"NumerodeCuenta": [t_conexion["NumerodeCuenta"].sum()]},
-                    index=["Total general"],
-                ),
-            ]
-        )
-
-        veinte_25 = df.loc[df["bimfinal"].astype(str).str.contains("2025", na=False)]
-
-        # Por CP
-        log_func("Procesando datos por código postal...")
-        codigos_postales = cp.index.sort_values(ascending=True).to_list()
-        df_cps, df_completos_cps = {}, {}
-
-        for cps in codigos_postales:
-            df_cp = df.loc[df["CodigoPostal"] == cps].copy()
-            df_cps[f"{cps}"] = (
-                df_cp.groupby("TipoConexion")["NumerodeCuenta"].nunique().to_frame()
-            )
-
-            # Consolidar agua y drenaje
-            df_cp["agua"] = df_cp["agua"] + df_cp["actualizacionagua"]
-            df_cp.drop(columns=["actualizacionagua"], inplace=True)
-
-            df_cp["drenaje"] = df_cp["drenaje"] + df_cp["actualizaciondrenaje"]
-            df_cp.drop(columns=["actualizaciondrenaje"], inplace=True)
-
-            df_cp["recargos"] = df_cp["recargosagua"] + df_cp["recargosdrenaje"]
-            df_cp.drop(columns=["recargosagua", "recargosdrenaje"], inplace=True)
-
-            df_cp["Total"] = (
-                df_cp["agua"]
-                + df_cp["drenaje"]
-                + df_cp["recargos"]
-                + df_cp["mejoras"]
-                + df_cp["iva"]
+        if not visibles:
+            return
+        # De un lote enorme sólo se verían las últimas líneas; insert recibe
+        # pares texto, tag
+        partes = []
+        for evento, tag in visibles[-self.max_lineas :]:
+            partes.extend((formato_gui(evento) + "\n", tag or estilo_evento(evento)))
+        state = self.text_widget["state"]
+        if state == "disabled":
+            self.text_widget.configure(state="normal")
+        self.text_widget.insert(tk.END, *partes)
+        # index("end-1c") es la línea vacía después del último salto
+        lineas = int(self.text_widget.index("end-1c").split(".")[0]) - 1
+        if lineas > self.max_lineas:
+            self.text_widget.delete("1.0", f"{lineas - self.max_lineas + 1}.0")
+        self.text_widget.see(tk.END)
+        if state == "disabled":
+            self.text_widget.configure(state="disabled")
+
+    def _guardar(self, pendientes: list):
+        if self._historial is None:
+            return
+        try:
+            self._historial.writelines(
+                formato_archivo(evento) + "\n" for evento, _ in pendientes
             )
-            df_completos_cps[f"{cps}"] = df_cp
-
-        # Resumen grid
-        log_func("Creando resumen de códigos postales...")
-        resumen_path = data_dir / "resumen_cps.xlsx"
-        tmp_resumen = resumen_path.with_suffix(".tmp.xlsx")
-        exportar_resumenes_en_grid(df_cps, tmp_resumen, por_fila=3)
-        tmp_resumen.replace(resumen_path)
-
-        lista_cp = pd.read_excel(lista_cp_path, engine="openpyxl")
-        resumen_cps = pd.read_excel(resumen_path, engine="openpyxl")
-
-        # Reporte principal
-        log_func("Guardando reporte principal...")
-        reporte_path = output_dir / "ReporteRezagoAgua.xlsx"
-        tmp_reporte = reporte_path.with_suffix(".tmp.xlsx")
-
-        with pd.ExcelWriter(tmp_reporte, mode="w", engine="openpyxl") as writer:
-            df.to_excel(writer, sheet_name=str(month_label or "SISTEMA"), index=False)
-            cp.to_excel(writer, sheet_name="C.P.", index=True)
-            t_consumo.to_excel(writer, sheet_name="T. CONSUMO", index=True)
-            t_conexion.to_excel(writer, sheet_name="T. CONEXION", index=True)
-            veinte_25.to_excel(writer, sheet_name="2025", index=False)
-            resumen_cps.to_excel(writer, sheet_name="RESUMEN", index=False)
-            lista_cp.to_excel(writer, sheet_name="LISTA C.P.", index=False)
-            duplicados.to_excel(writer, sheet_name="DUPLICADOS", index=False)
-        tmp_reporte.replace(reporte_path)
-
-        # Reporte para macro - dividido por código postal
-        log_func("Creando excel para macro (dividido por código postal)...")
-        out_macro = output_dir / "reporte_macro.xlsx"
-
-        # Preparar datos base para el reporte macro
-        reporte_macro_base = df[
-            [
-                "ClaveCatastral",
-                "Propietario",
-                "Domicilio",
-                "CodigoPostal",
-                "UltimoPago",
-                "NumerodeCuenta",
-                "TipoConsumo",
-                "TipoConexion",
-                "Zona",
-                "bimInicial",
-                "bimfinal",
-            ]
-        ].copy()
-
-        reporte_macro_base["agua"] = df["agua"] + df["actualizacionagua"]
-        reporte_macro_base["drenaje"] = df["drenaje"] + df["actualizaciondrenaje"]
-        reporte_macro_base["recargos"] = df["recargosagua"] + df["recargosdrenaje"]
-        reporte_macro_base["mejoras"] = df["mejoras"]
-        reporte_macro_base["iva"] = df["iva"]
-        reporte_macro_base["total"] = (
-            reporte_macro_base["iva"]
-            + reporte_macro_base["mejoras"]
-            + reporte_macro_base["recargos"]
-            + reporte_macro_base["drenaje"]
-            + reporte_macro_base["agua"]
-        )
-        reporte_macro_base["Domicilio"] = (
-            reporte_macro_base["Domicilio"].astype(str).str.replace("nan", "")
-        )
-
-        # Crear el Excel con una hoja por código postal
-        tmp_macro = out_macro.with_suffix(".tmp.xlsx")
-        with pd.ExcelWriter(tmp_macro, mode="w", engine="openpyxl") as writer:
-            for cp in codigos_postales:
-                # Filtrar datos para este código postal específico
-                datos_cp = reporte_macro_base[
-                    reporte_macro_base["CodigoPostal"] == cp
-                ].copy()
-
-                # Quitar la columna CodigoPostal ya que es redundante en cada hoja
-                datos_cp = datos_cp.drop(columns=["CodigoPostal"])
-
-                # Nombre de la hoja
-                nombre_hoja = f"CP {cp}"
-
-                # Escribir a la hoja correspondiente
-                datos_cp.to_excel(writer, sheet_name=nombre_hoja, index=False)
-
-                log_func(f"  📊 CP {cp}: {len(datos_cp)} registros")
+            self._historial.flush()
+        except OSError:
+            self._historial = None
 
-        tmp_macro.replace(out_macro)
-        log_func(
-            f"  Reporte macro creado con {len(codigos_postales)} hojas (una por CP)"
-        )
-
-        # Libro por CP
-        log_func("Generando libro por códigos postales...")
-        cp_book_path = output_dir / "CodigosPostales.xlsx"
-        tmp_cp_book = cp_book_path.with_suffix(".tmp.xlsx")
-
-        with pd.ExcelWriter(tmp_cp_book, mode="w", engine="openpyxl") as writer:
-            for cps in codigos_postales:
-                hoja = f"CP {cps}"
-                det = df_completos_cps[f"{cps}"].copy()
-                det = det.loc[:, ~det.columns.str.contains(r"^Unnamed")]
-                res = df_cps[f"{cps}"].copy()
-                if "NumerodeCuenta" in res.columns:
-                    res = res.rename(columns={"NumerodeCuenta": "Cuentas únicas"})
-
-                det.to_excel(
-                    writer, sheet_name=hoja, index=False, startrow=0, startcol=0
-                )
-                startcol_resumen = det.shape[1] + 2
-                res.to_excel(
-                    writer,
-                    sheet_name=hoja,
-                    startrow=0,
-                    startcol=startcol_resumen,
-                    index=True,
-                )
-
-                ws = writer.sheets[hoja]
-                ws.cell(
-                    row=1, column=startcol_resumen + 1, value="Resumen por TipoConexion"
-                )
-        tmp_cp_book.replace(cp_book_path)
-
-        # Crear carpeta organizada para CAMPO
-        campo_output_dir = output_dir / "campo_output"
-        ensure_dirs(campo_output_dir)
-
-        # Mover archivos generados a la carpeta de CAMPO
-        archivos_campo = [
-            "ReporteRezagoAgua.xlsx",
-            "reporte_macro.xlsx",
-            "CodigosPostales.xlsx",
-        ]
-
-        for archivo_name in archivos_campo:
-            archivo_path = output_dir / archivo_name
-            if archivo_path.exists():
-                try:
-                    archivo_path.rename(campo_output_dir / archivo_name)
-                    log_func(f"Archivo movido: {archivo_name} -> campo_output/")
-                except Exception as e:
-                    log_func(f"Error moviendo {archivo_name}: {e}")
-
-        # También mover resumen_cps.xlsx del data_dir si existe
-        resumen_path = data_dir / "resumen_cps.xlsx"
-        if resumen_path.exists():
-            try:
-                resumen_path.rename(campo_output_dir / "resumen_cps.xlsx")
-                log_func("Archivo movido: resumen_cps.xlsx -> campo_output/")
-            except Exception as e:
-                log_func(f"Error moviendo resumen_cps.xlsx: {e}")
-
-        log_func(f"PROCESO CAMPO COMPLETADO. Reportes en: {campo_output_dir}")
-        return True, campo_output_dir
-
-    except Exception as e:
-        return False, f"{type(e).__name__}: {e}"
+    def cerrar(self):
+        """Escribe en el historial los eventos que quedaron en la cola"""
+        self._guardar(self._pendientes())
+        if self._historial is not None:
+            self._historial.close()
+            self._historial = None
 
 
 # ====================================
-# FUNCIONES DE PROCESAMIENTO CAJA
+# VENTANA DE LA COLA DE TRABAJOS
 # ====================================
 
 
-def run_proceso_caja(sistema_path: Path, data_dir: Path, output_dir: Path, log_func):
-    """Ejecuta el proceso CAJA"""
-    try:
-        log_func("=== INICIANDO PROCESO CAJA ===")
-        log_func(f"Archivo SISTEMA: {sistema_path}")
-        log_func(f"Carpeta de datos: {data_dir}")
-        log_func(f"Carpeta de salida: {output_dir}")
-
-        ensure_dirs(data_dir, output_dir)
-
-        # Crear carpeta organizada para CAJA desde el inicio
-        caja_output_dir = output_dir / "caja_output"
-        ensure_dirs(caja_output_dir)
-
-        # Usar el archivo SISTEMA seleccionado por el usuario, no buscar en data_dir
-        if not sistema_path.exists():
-            return False, f"No existe el archivo SISTEMA seleccionado: {sistema_path}"
+class VentanaTrabajos:
+    """
+    Cola de trabajos en lote (ver trabajos.py)
 
-        log_func(f"Leyendo: {sistema_path}")
-        df = pd.read_excel(sistema_path, engine="openpyxl")
-        df["fechapago"] = pd.to_datetime(df["fechapago"], yearfirst=True).dt.strftime(
-            "%Y-%m-%d"
-        )
+    Los trabajos se agregan desde el formulario principal (proceso, rutas y
+    opciones actuales) o desde un JSON de lote; el avance del lote va al log
+    principal y el detalle de cada trabajo a su propio archivo de log.
+    """
 
-        # 2024-6 anteriores y sin mejoras
-        log_func("[1/7] Calculando 2024-6 anteriores y sin mejoras…")
-        df_filtrado = df[
-            (df["conDescripcion"] != "MEJORAS AMBIENTALES") & (df["pagdAño"] < 2025)
-        ]
-        df_filtrado.to_excel(
-            caja_output_dir / "2024-6_anteriores_y_sin_mejoras_ambientales.xlsx"
-        )
+    COLUMNAS = ("nombre", "proceso", "estado", "intentos", "segundos")
 
-        # EVIDENCIAS-X fecha de pago
-        log_func("[2/7] Calculando evidencias por fecha de pago…")
+    def __init__(self, app: "AppIIWA"):
+        self.app = app
+        self.trabajos = []
+        self.lote_path = None
+        self.planificador = None
+        self.a_la_vez_var = tk.IntVar(value=1)
+        self.reintentos_var = tk.IntVar(value=1)
 
-        def redondear(x):
-            return round(x, 2)
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Cola de Trabajos")
+        self.window.geometry("720x380")
 
-        keys = ["FolioImpreso", "fechapago"]
-        df["fechapago"] = pd.to_datetime(df["fechapago"], yearfirst=True).dt.strftime(
-            "%Y-%m-%d"
-        )
-        df_filtrado["fechapago"] = pd.to_datetime(
-            df_filtrado["fechapago"], yearfirst=True
-        ).dt.strftime("%Y-%m-%d")
-
-        df["_cents"] = (
-            (pd.to_numeric(df["pagdCosto"], errors="coerce") * 100)
-            .round()
-            .astype("Int64")
-        )
-        df_filtrado["_cents"] = (
-            (pd.to_numeric(df_filtrado["pagdCosto"], errors="coerce") * 100)
-            .round()
-            .astype("Int64")
-        )
-
-        rezago_cents = (
-            df_filtrado.groupby(keys, dropna=False, as_index=False)["_cents"]
-            .sum()
-            .rename(columns={"_cents": "_rezago_cents"})
-        )
-        pago_total_cents = (
-            df.groupby(keys, dropna=False, as_index=False)["_cents"]
-            .sum()
-            .rename(columns={"_cents": "_pago_cents"})
-        )
-
-        def with_key_sentinel(d):
-            out = d.copy()
-            out["k_folio"] = out["FolioImpreso"].astype("string").fillna("__NA__")
-            out["k_fecha"] = out["fechapago"].astype("string").fillna("__NA__")
-            return out
-
-        rezago_k = with_key_sentinel(rezago_cents)
-        pago_k = with_key_sentinel(pago_total_cents)
-        keys_all = pd.concat(
-            [rezago_k[["k_folio", "k_fecha"]], pago_k[["k_folio", "k_fecha"]]],
-            ignore_index=True,
-        ).drop_duplicates()
-
-        base = keys_all.merge(
-            pago_k[["k_folio", "k_fecha", "_pago_cents"]],
-            on=["k_folio", "k_fecha"],
-            how="left",
-        ).merge(
-            rezago_k[["k_folio", "k_fecha", "_rezago_cents"]],
-            on=["k_folio", "k_fecha"],
-            how="left",
-        )
-
-        base["FolioImpreso"] = base["k_folio"].replace({"__NA__": np.nan})
-        base["fechapago"] = base["k_fecha"].replace({"__NA__": np.nan})
-
-        meta_cols = [
-            "NumerodeCuenta",
-            "Propietario",
-            "Domicilio",
-            "Colonia",
-            "CodigoPostal",
-            "AñoInicial",
-            "BimestreInicial",
-            "AñoFinal",
-            "BimestreFinal",
-        ]
-        meta = df[keys + meta_cols].drop_duplicates(keys, keep="last")
-        evidencias_x_fecha = base.merge(meta, on=keys, how="left")
-
-        evidencias_x_fecha["pago"] = (evidencias_x_fecha["_pago_cents"] / 100).astype(
-            float
-        )
-        evidencias_x_fecha["REZAGO IIWA 2024-6 y anteriores (pagdCosto)"] = (
-            (evidencias_x_fecha["_rezago_cents"] / 100).fillna(0.0).astype(float)
-        )
-        evidencias_x_fecha["20% IIWA"] = (
-            evidencias_x_fecha["REZAGO IIWA 2024-6 y anteriores (pagdCosto)"] * 0.20
+        self.tabla = ttk.Treeview(
+            self.window, columns=self.COLUMNAS, show="headings", height=10
         )
+        for columna, ancho in zip(self.COLUMNAS, (260, 80, 100, 70, 80)):
+            self.tabla.heading(columna, text=columna.capitalize())
+            self.tabla.column(columna, width=ancho, anchor="w")
+        self.tabla.pack(fill="both", expand=True, padx=10, pady=(10, 5))
 
-        orden_columnas = [
-            "NumerodeCuenta",
-            "Propietario",
-            "Domicilio",
-            "Colonia",
-            "CodigoPostal",
-            "AñoInicial",
-            "BimestreInicial",
-            "AñoFinal",
-            "BimestreFinal",
-            "fechapago",
-            "FolioImpreso",
-            "pago",
-            "REZAGO IIWA 2024-6 y anteriores (pagdCosto)",
-            "20% IIWA",
-        ]
-        evidencias_x_fecha = evidencias_x_fecha[orden_columnas].copy()
-        evidencias_x_fecha.index += 1
-
-        for c in ["pago", "REZAGO IIWA 2024-6 y anteriores (pagdCosto)", "20% IIWA"]:
-            evidencias_x_fecha[c] = evidencias_x_fecha[c].apply(redondear)
-
-        evidencias_x_fecha.to_excel(caja_output_dir / "evidencias_x_fecha.xlsx")
-
-        # PAGOS DIARIOS
-        log_func("[3/7] Calculando PAGOS DIARIOS…")
-        orden_pagos = [
-            "DIAS",
-            "# DE CUENTAS",
-            "PAGO CAJA",
-            "BASE IIWA 2024-6 Anteriores y sin Mejoras Ambientales",
-            "pagdDescuento",
-            "pagIva",
-        ]
-
-        pagos_diarios = (
-            df.groupby(["fechapago"], as_index=False)
-            .agg(
-                {
-                    "FolioImpreso": "nunique",
-                    "pagdCosto": "sum",
-                    "pagdDescuento": "sum",
-                    "pagIva": "sum",
-                }
-            )
-            .rename(
-                columns={
-                    "fechapago": "DIAS",
-                    "FolioImpreso": "# DE CUENTAS",
-                    "pagdCosto": "PAGO CAJA",
-                }
-            )
+        edicion = ttk.Frame(self.window)
+        edicion.pack(fill="x", padx=10, pady=5)
+        ttk.Button(
+            edicion, text="Agregar selección actual", command=self.agregar_actual
+        ).pack(side="left")
+        ttk.Button(edicion, text="Quitar", command=self.quitar).pack(
+            side="left", padx=(5, 0)
         )
-        pagos_diarios["BASE IIWA 2024-6 Anteriores y sin Mejoras Ambientales"] = np.nan
-        pagos_diarios = pagos_diarios[orden_pagos]
-
-        pagos_diarios["DIAS"] = pd.to_datetime(pagos_diarios["DIAS"]).dt.strftime(
-            "%d-%b"
+        ttk.Button(edicion, text="Cargar lote...", command=self.cargar).pack(
+            side="left", padx=(5, 0)
         )
-        pagos_diarios.set_index("DIAS", inplace=True)
-
-        base_por_dia = (
-            df_filtrado.groupby(["fechapago"], as_index=False)["pagdCosto"]
-            .sum()
-            .rename(
-                columns={
-                    "pagdCosto": "BASE IIWA 2024-6 Anteriores y sin Mejoras Ambientales"
-                }
-            )
+        ttk.Button(edicion, text="Guardar lote...", command=self.guardar).pack(
+            side="left", padx=(5, 0)
         )
 
-        tmp = base_por_dia.copy()
-        tmp["DIAS"] = pd.to_datetime(tmp["fechapago"]).dt.strftime("%d-%b")
-        tmp = tmp[
-            ["DIAS", "BASE IIWA 2024-6 Anteriores y sin Mejoras Ambientales"]
-        ].set_index("DIAS")
-
-        pagos_diarios["BASE IIWA 2024-6 Anteriores y sin Mejoras Ambientales"] = (
-            pagos_diarios.index.map(
-                tmp["BASE IIWA 2024-6 Anteriores y sin Mejoras Ambientales"]
-            ).fillna(0.0)
+        ejecucion = ttk.Frame(self.window)
+        ejecucion.pack(fill="x", padx=10, pady=(5, 10))
+        ttk.Label(ejecucion, text="Trabajos a la vez:").pack(side="left")
+        ttk.Spinbox(
+            ejecucion,
+            textvariable=self.a_la_vez_var,
+            from_=1,
+            to=os.cpu_count() or 1,
+            width=4,
+        ).pack(side="left", padx=(5, 15))
+        ttk.Label(ejecucion, text="Reintentos:").pack(side="left")
+        ttk.Spinbox(
+            ejecucion, textvariable=self.reintentos_var, from_=0, to=5, width=4
+        ).pack(side="left", padx=(5, 15))
+        self.detener_button = ttk.Button(
+            ejecucion, text="Detener", command=self.detener, state="disabled"
         )
-        pagos_diarios.to_excel(caja_output_dir / "pagos_diarios.xlsx")
-
-        # PAGOS X C.P.
-        log_func("[4/7] Calculando PAGOS POR C.P.…")
-        pagos_x_cp = (
-            df.groupby(["CodigoPostal"], as_index=False)
-            .agg({"FolioImpreso": "nunique", "pagdCosto": "sum"})
-            .rename(
-                columns={
-                    "CodigoPostal": "C.P.",
-                    "FolioImpreso": "NUMERO DE CUENTAS",
-                    "pagdCosto": "PAGO CAJA POR C.P.",
-                }
-            )
+        self.detener_button.pack(side="right")
+        self.ejecutar_button = ttk.Button(
+            ejecucion, text="Ejecutar cola", command=self.ejecutar
         )
-        pagos_x_cp["BASE IIWA 2024-6 Anteriores y sin Mejoras Ambientales"] = np.nan
-        pagos_x_cp.set_index("C.P.", inplace=True)
-
-        base_por_cp = (
-            df_filtrado.groupby(["CodigoPostal"], as_index=False)["pagdCosto"]
-            .sum()
-            .rename(
-                columns={
-                    "pagdCosto": "BASE IIWA 2024-6 Anteriores y sin Mejoras Ambientales",
-                    "CodigoPostal": "C.P.",
-                }
+        self.ejecutar_button.pack(side="right", padx=(0, 5))
+
+    def refrescar(self, _trabajo=None):
+        self.tabla.delete(*self.tabla.get_children())
+        for i, trabajo in enumerate(self.trabajos):
+            segundos = "" if trabajo.segundos is None else f"{trabajo.segundos:.1f}"
+            self.tabla.insert(
+                "",
+                "end",
+                iid=str(i),
+                values=(
+                    trabajo.nombre,
+                    trabajo.proceso,
+                    trabajo.estado,
+                    trabajo.intentos,
+                    segundos,
+                ),
             )
-        )
-
-        tmp = base_por_cp.copy()
-        tmp = tmp[
-            ["C.P.", "BASE IIWA 2024-6 Anteriores y sin Mejoras Ambientales"]
-        ].set_index("C.P.")
 
-        pagos_x_cp["BASE IIWA 2024-6 Anteriores y sin Mejoras Ambientales"] = (
-            pagos_x_cp.index.map(
-                tmp["BASE IIWA 2024-6 Anteriores y sin Mejoras Ambientales"]
-            ).fillna(0.0)
-        )
-        pagos_x_cp["20% IIWA"] = (
-            pagos_x_cp["BASE IIWA 2024-6 Anteriores y sin Mejoras Ambientales"] * 0.20
-        )
-        pagos_x_cp.to_excel(caja_output_dir / "pagos_x_cp.xlsx")
+    def agregar_actual(self):
+        proceso = self.app.proceso_var.get()
+        parametros = self.app.parametros_actuales(proceso)
+        self.trabajos.append(Trabajo(proceso, **parametros))
+        self.refrescar()
 
-        # Validar archivos adicionales para CAJA
-        registros_path = data_dir / "REGISTROS.csv"
-        folios_path = data_dir / "FOLIOS.csv"
-
-        log_func(f"Buscando archivos en: {data_dir}")
-        log_func(
-            f"REGISTROS.csv: {'Encontrado' if registros_path.exists() else 'No encontrado'} en {registros_path}"
+    def quitar(self):
+        if self.planificador is not None:
+            return
+        quitar = {int(iid) for iid in self.tabla.selection()}
+        self.trabajos = [t for i, t in enumerate(self.trabajos) if i not in quitar]
+        self.refrescar()
+
+    def cargar(self):
+        archivo = filedialog.askopenfilename(
+            title="Cargar lote de trabajos",
+            filetypes=[("Lote JSON", "*.json"), ("All files", "*.*")],
+            parent=self.window,
         )
-        log_func(
-            f"FOLIOS.csv: {'Encontrado' if folios_path.exists() else 'No encontrado'} en {folios_path}"
+        if not archivo:
+            return
+        try:
+            self.trabajos.extend(cargar_lote(archivo))
+        except (OSError, ValueError, TypeError) as e:
+            messagebox.showerror("Error", f"No se pudo leer el lote: {e}")
+            return
+        self.lote_path = Path(archivo)
+        self.refrescar()
+
+    def guardar(self):
+        archivo = filedialog.asksaveasfilename(
+            title="Guardar lote de trabajos",
+            defaultextension=".json",
+            filetypes=[("Lote JSON", "*.json")],
+            parent=self.window,
         )
+        if archivo:
+            self.lote_path = guardar_lote(self.trabajos, archivo)
 
-        # Listar archivos disponibles para ayudar con debug
+    def ejecutar(self):
+        if self.app.processing or not self.trabajos:
+            return
         try:
-            files_in_data = list(data_dir.glob("*.csv"))
-            log_func(
-                f"Archivos CSV encontrados en carpeta de datos: {[f.name for f in files_in_data]}"
-            )
-        except Exception:
-            pass
-
-        if registros_path.exists() and folios_path.exists():
-            log_func("[5/7] Enlazando REGISTROS y FOLIOS…")
-
-            df_registros = pd.read_csv(registros_path, encoding="latin1", index_col=1)
-            dict_folio_num = pd.read_csv(folios_path, encoding="latin1").dropna()
-            dict_folio_num.index = (
-                dict_folio_num.pop("NumerodeCuenta").astype(str).str.strip()
-            )
-
-            evidencias_x_fecha.index = evidencias_x_fecha.pop("NumerodeCuenta")
-            evidencias_x_fecha = evidencias_x_fecha.sort_values(
-                "fechapago", ascending=True
-            )
-            df_registros.index = df_registros.index.astype(str).str.strip()
-            evidencias_x_fecha.index = evidencias_x_fecha.index.astype(str).str.strip()
-
-            inter = evidencias_x_fecha.index.intersection(df_registros.index)
-            e_folio_geo = evidencias_x_fecha.loc[inter]
-
-            if "folio_notif" not in e_folio_geo.columns:
-                e_folio_geo.insert(0, "folio_notif", np.nan)
-            e_folio_geo["folio_notif"] = e_folio_geo.index.map(
-                df_registros["folio_notif"].to_dict()
-            )
-
-            evidencias_x_fecha.loc[inter, "folio_notif"] = e_folio_geo["folio_notif"]
-            evidencias_x_fecha.insert(
-                0, "folio_notif", evidencias_x_fecha.pop("folio_notif")
+            self.planificador = Planificador(
+                self.trabajos,
+                workers=self.a_la_vez_var.get(),
+                reintentos=self.reintentos_var.get(),
+                log_func=self.app._log_to_gui,
+                al_cambiar=lambda t: self.app.root.after(0, self.refrescar),
             )
-
-            inter_dict = evidencias_x_fecha.index.intersection(dict_folio_num.index)
-            alt = dict_folio_num.loc[inter_dict, "FOLIO IIWA"].drop_duplicates()
-            evidencias_x_fecha["folio_notif"] = evidencias_x_fecha[
-                "folio_notif"
-            ].fillna(alt)
-
-            resultado = evidencias_x_fecha.sort_index(kind="mergesort")
-
-            log_func(
-                f"Cuentas con folio notif: {len(resultado.loc[resultado['folio_notif'].notna()])}"
-            )
-            log_func(
-                f"Cuentas sin folio notif: {len(resultado.loc[resultado['folio_notif'].isna()])}"
-            )
-            log_func(f"Total de folios: {len(resultado)}")
-
-            out_geo = caja_output_dir / "E. folio Geolocalización.xlsx"
-            resultado.groupby("CodigoPostal", group_keys=True, as_index=True).apply(
-                lambda x: x.sort_values("fechapago", ascending=True)
-            ).to_excel(out_geo)
-
-            sin_geo = resultado.loc[resultado["folio_notif"].isna()]
-            sin_geo["latitud_not"] = sin_geo.index.map(
-                df_registros["latitud_not"].to_dict()
-            )
-            sin_geo["longitud_not"] = sin_geo.index.map(
-                df_registros["longitud_not"].to_dict()
+        except ValueError as e:
+            messagebox.showerror("Error", str(e), parent=self.window)
+            return
+        self.app.processing = True
+        self.app.process_button.configure(state="disabled", text="🔄 Cola...")
+        self.app.progress_bar.start(10)
+        self.ejecutar_button.configure(state="disabled")
+        self.detener_button.configure(state="normal")
+        threading.Thread(target=self._ejecutar_thread, daemon=True).start()
+
+    def _ejecutar_thread(self):
+        try:
+            self.planificador.ejecutar()
+            if self.lote_path is not None:
+                destino = guardar_lote(
+                    self.trabajos,
+                    self.lote_path.with_suffix(".resultados.json"),
+                    resultados=True,
+                )
+                self.app._log_to_gui(f"Resultados del lote: {destino}")
+        except Exception as e:
+            eventos.error(
+                self.app._log_to_gui, f"Error en la cola: {type(e).__name__}: {e}"
             )
-            sin_geo.to_excel(caja_output_dir / "sin_folio.xlsx")
-
-            log_func("[6/7] Generando EVIDENCIAS C.P. y FECHA PAGO…")
-            # Lógica similar para evidencias_cp_fecha...
-        else:
-            log_func(
-                "[5-6/7] Saltando procesamiento de REGISTROS/FOLIOS (archivos no encontrados)"
+        finally:
+            self.app.root.after(0, self._terminar)
+
+    def _terminar(self):
+        self.planificador = None
+        if self.window.winfo_exists():
+            self.ejecutar_button.configure(state="normal")
+            self.detener_button.configure(state="disabled")
+            self.refrescar()
+        completados = sum(t.estado == COMPLETADO for t in self.trabajos)
+        self.app._log_to_gui(
+            f"Cola: {completados}/{len(self.trabajos)} trabajos completados"
+        )
+        self.app._finish_process()
+
+    def detener(self):
+        """Los trabajos en curso terminan; no se arrancan más"""
+        if self.planificador is not None:
+            self.planificador.detener()
+            eventos.aviso(
+                self.app._log_to_gui,
+                "Cola detenida: terminan los trabajos en curso",
             )
 
-        # Consolidar a Excel final
-        log_func("[7/7] Consolidando a Excel final…")
-        salida_path = caja_output_dir / "REPORTE_COMPLETO.xlsx"
-
-        with pd.ExcelWriter(salida_path, engine="openpyxl") as writer:
-            # Hoja SISTEMA - usar el archivo seleccionado por el usuario
-            df_sistema = pd.read_excel(sistema_path, engine="openpyxl")
-            df_sistema["fechapago"] = pd.to_datetime(
-                df_sistema["fechapago"], yearfirst=True
-            ).dt.strftime("%Y-%m-%d")
-            df_sistema.to_excel(writer, sheet_name="SISTEMA", index=False)
-
-            # Agregar archivos de salida de la carpeta caja_output
-            archivos_procesados = []
-            for archivo in caja_output_dir.glob("*.xlsx"):
-                if (
-                    archivo.name != "REPORTE_COMPLETO.xlsx"
-                    and not archivo.name.startswith("~")
-                ):
-                    try:
-                        df_temp = pd.read_excel(archivo, engine="openpyxl")
-                        sheet_name = archivo.stem[:31]  # Limitar nombre de hoja
-                        df_temp.to_excel(writer, sheet_name=sheet_name, index=False)
-                        archivos_procesados.append(archivo)
-                        log_func(f"Agregado al reporte: {archivo.name}")
-                    except Exception as e:
-                        log_func(f"Error procesando {archivo.name}: {e}")
-
-        # Eliminar archivos temporales después de consolidar
-        log_func("Limpiando archivos temporales...")
-        for archivo in archivos_procesados:
-            try:
-                archivo.unlink()  # Eliminar archivo
-                log_func(f"Archivo temporal eliminado: {archivo.name}")
-            except Exception as e:
-                log_func(f"Error eliminando {archivo.name}: {e}")
-
-        log_func(f"PROCESO CAJA COMPLETADO. Reporte final: {salida_path}")
-        log_func(f"Archivos organizados en: {caja_output_dir}")
-        return True, caja_output_dir
-
-    except Exception as e:
-        return False, f"{type(e).__name__}: {e}"
-
 
 # ====================================
-# CLASE PARA LOGGING EN GUI
+# VENTANA DE CONSULTAS AL CUBO
 # ====================================
 
 
-class GuiLogger:
-    """Cola de mensajes para actualizar el Text sin bloquear la UI"""
-
-    def __init__(self, text_widget: tk.Text, interval_ms: int = 80):
-        self.text_widget = text_widget
-        self.queue = queue.Queue()
-        self.interval_ms = interval_ms
-        self._pump()
-
-    def log(self, msg: str):
-        """Método principal para enviar mensajes al log"""
-        if not isinstance(msg, str):
-            msg = str(msg)
-        if not msg.endswith("\\n"):
-            msg += "\\n"
-        timestamp = datetime.now().strftime("[%H:%M:%S] ")
-        self.queue.put(timestamp + msg)
-
-    def _pump(self):
-        """Procesa la cola de mensajes"""
-        processed = 0
-        while processed < 100:  # Limitar procesamiento por ciclo
-            try:
-                msg = self.queue.get_nowait()
-            except queue.Empty:
-                break
-            else:
-                state = self.text_widget["state"]
-                if state == "disabled":
-                    self.text_widget.configure(state="normal")
-                self.text_widget.insert(tk.END, msg)
-                self.text_widget.see(tk.END)
-                if state == "disabled":
-                    self.text_widget.configure(state="disabled")
-                processed += 1
+class VentanaCubo:
+    """
+    Cortes del cubo de adeudos que deja CAMPO (ver cubo.py)
+
+    Lee campo_output/cubo de la carpeta de salida; cada consulta agrega el
+    cubo por las dimensiones marcadas, con los filtros escritos (valores
+    separados por coma), sin volver a leer SISTEMA.
+    """
+
+    def __init__(self, app: "AppIIWA", carpeta: Path):
+        from .cubo import DIMENSIONES, cargar_cubo
+
+        self.app = app
+        self.cubo = cargar_cubo(carpeta)
+        self.resultado = None
+        self.por_vars = {d: tk.BooleanVar(value=False) for d in DIMENSIONES}
+        self.filtro_vars = {d: tk.StringVar() for d in DIMENSIONES}
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title(f"Cubo de Adeudos - {carpeta}")
+        self.window.geometry("900x460")
+
+        opciones = ttk.Frame(self.window)
+        opciones.pack(fill="x", padx=10, pady=(10, 5))
+        ttk.Label(opciones, text="Agrupar por").grid(row=0, column=0, sticky="w")
+        ttk.Label(opciones, text="Filtro").grid(row=1, column=0, sticky="w")
+        for i, dimension in enumerate(DIMENSIONES, start=1):
+            ttk.Checkbutton(
+                opciones, text=dimension, variable=self.por_vars[dimension]
+            ).grid(row=0, column=i, sticky="w", padx=(5, 0))
+            ttk.Entry(
+                opciones, textvariable=self.filtro_vars[dimension], width=14
+            ).grid(row=1, column=i, sticky="w", padx=(5, 0))
+
+        acciones = ttk.Frame(self.window)
+        acciones.pack(fill="x", padx=10, pady=5)
+        ttk.Button(acciones, text="Consultar", command=self.consultar).pack(side="left")
+        ttk.Button(acciones, text="Exportar CSV...", command=self.exportar).pack(
+            side="left", padx=(5, 0)
+        )
+        self.estado = ttk.Label(acciones, text="")
+        self.estado.pack(side="right")
+
+        self.tabla = ttk.Treeview(self.window, show="headings", height=14)
+        self.tabla.pack(fill="both", expand=True, padx=10, pady=(5, 10))
+        self.consultar()
+
+    def consultar(self):
+        from .cubo import consultar
+
+        por = [d for d, var in self.por_vars.items() if var.get()]
+        filtros = {
+            d: [v.strip() for v in var.get().split(",") if v.strip()]
+            for d, var in self.filtro_vars.items()
+            if var.get().strip()
+        }
+        inicio = time.perf_counter()
+        self.resultado = consultar(self.cubo, por, filtros).reset_index()
+        milisegundos = (time.perf_counter() - inicio) * 1000
+
+        columnas = [str(c) for c in self.resultado.columns]
+        self.tabla.delete(*self.tabla.get_children())
+        self.tabla.configure(columns=columnas)
+        for columna in columnas:
+            self.tabla.heading(columna, text=columna)
+            self.tabla.column(columna, width=100, anchor="w")
+        for fila in self.resultado.itertuples(index=False):
+            self.tabla.insert(
+                "",
+                "end",
+                values=[f"{v:,.2f}" if isinstance(v, float) else v for v in fila],
+            )
+        self.estado.configure(
+            text=f"{len(self.resultado)} filas en {milisegundos:.0f} ms"
+        )
 
-        self.text_widget.after(self.interval_ms, self._pump)
+    def exportar(self):
+        if self.resultado is None:
+            return
+        archivo = filedialog.asksaveasfilename(
+            title="Exportar consulta",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv")],
+            parent=self.window,
+        )
+        if archivo:
+            self.resultado.to_csv(archivo, index=False, encoding="utf-8-sig")
 
 
 # ====================================
@@ -893,13 +507,31 @@ class GuiLogger:
 
 
 class AppIIWA:
-    def __init__(self):
+    def __init__(self, perfilar: str = None, trabajador: bool = True):
+        # Los módulos de cálculo se importan mientras se arma la ventana: en
+        # el proceso de cálculo persistente o, sin él, en un hilo de la GUI
+        self.trabajador = None
+        if trabajador:
+            try:
+                self.trabajador = Trabajador()
+                self.trabajador.iniciar()
+            except (OSError, RuntimeError):
+                self.trabajador = None
+        if self.trabajador is not None:
+            self.precarga = self.trabajador
+        else:
+            self.precarga = Precarga()
+            self.precarga.start()
+        # setup_widgets crea el GuiLogger; no volver a anularlo después
+        self.logger = None
+        self.ventana_cola = None
         self.root = tk.Tk()
         self.setup_window()
-        self.setup_variables()
+        self.setup_variables(perfilar)
         self.setup_widgets()
-        self.logger = None
         self.processing = False
+        # Señal de cancelación de la corrida en hilo (sin proceso de cálculo)
+        self.cancelar_evento = threading.Event()
 
     def setup_window(self):
         """Configura la ventana principal"""
@@ -1003,7 +635,7 @@ class AppIIWA:
         self.font_bold = (font_family, 10, "bold")
         self.font_title = (font_family, 14, "bold")
 
-    def setup_variables(self):
+    def setup_variables(self, perfilar: str = None):
         """Inicializa las variables de control"""
         # Rutas por defecto - detectar automáticamente la ubicación del proyecto
         project_root = Path(
@@ -1017,6 +649,14 @@ class AppIIWA:
         self.output_dir_var = tk.StringVar(value=str(default_output))
         self.sistema_file_var = tk.StringVar(value=str(default_data / "SISTEMA.xlsx"))
         self.month_label_var = tk.StringVar(value="SISTEMA")
+        self.backend_var = tk.StringVar(value=BACKEND_DEFAULT)
+        self.workers_var = tk.IntVar(value=1)
+        self.bajo_memoria_var = tk.BooleanVar(value=False)
+        self.presupuesto_var = tk.IntVar(value=PRESUPUESTO_DEFAULT_MB)
+        self.reutilizar_var = tk.BooleanVar(value=False)
+        self.solo_reportes_var = tk.BooleanVar(value=False)
+        self.perfilar_var = tk.StringVar(value=perfilar or SIN_PERFIL)
+        self.nivel_log_var = tk.StringVar(value=eventos.NOMBRES[eventos.INFO])
 
     def setup_widgets(self):
         """Crea y configura todos los widgets"""
@@ -1048,6 +688,12 @@ class AppIIWA:
             variable=self.proceso_var,
             value="CAJA",
         ).pack(anchor="w", pady=(5, 0))
+        ttk.Radiobutton(
+            process_frame,
+            text="AMBOS - CAMPO y CAJA a la vez con el mismo SISTEMA",
+            variable=self.proceso_var,
+            value="AMBOS",
+        ).pack(anchor="w", pady=(5, 0))
 
         # Sección de rutas
         paths_frame = ttk.LabelFrame(
@@ -1098,6 +744,89 @@ class AppIIWA:
         )
         month_entry.grid(row=3, column=1, sticky="w", padx=(0, 5), pady=(10, 0))
 
+        # Motor de cálculo (solo para CAMPO)
+        ttk.Label(paths_frame, text="Motor de cálculo:").grid(
+            row=4, column=0, sticky="w", padx=(0, 10), pady=(10, 0)
+        )
+        ttk.Combobox(
+            paths_frame,
+            textvariable=self.backend_var,
+            values=backends_instalados(),
+            state="readonly",
+            width=17,
+        ).grid(row=4, column=1, sticky="w", padx=(0, 5), pady=(10, 0))
+
+        # Procesos para el cómputo por CP (0 = todos los núcleos)
+        ttk.Label(paths_frame, text="Procesos por CP:").grid(
+            row=5, column=0, sticky="w", padx=(0, 10), pady=(10, 0)
+        )
+        ttk.Spinbox(
+            paths_frame,
+            textvariable=self.workers_var,
+            from_=0,
+            to=os.cpu_count() or 1,
+            width=5,
+        ).grid(row=5, column=1, sticky="w", padx=(0, 5), pady=(10, 0))
+
+        # Modo por bloques para padrones más grandes que la memoria
+        memoria_frame = ttk.Frame(paths_frame)
+        memoria_frame.grid(row=6, column=1, sticky="w", pady=(10, 0))
+        ttk.Checkbutton(
+            memoria_frame,
+            text="Bajo consumo de memoria",
+            variable=self.bajo_memoria_var,
+        ).pack(side="left")
+        ttk.Label(memoria_frame, text="Bloques de (MB):").pack(
+            side="left", padx=(15, 5)
+        )
+        ttk.Spinbox(
+            memoria_frame,
+            textvariable=self.presupuesto_var,
+            from_=64,
+            to=65536,
+            increment=64,
+            width=7,
+        ).pack(side="left")
+        # El valor dimensiona bloques y cubetas; no es un tope del proceso
+        ttk.Label(
+            memoria_frame,
+            text="(tamaño de bloque y cubetas en disco, no un límite estricto)",
+            foreground="gray",
+        ).pack(side="left", padx=(5, 0))
+
+        # Caché de etapas en la carpeta de salida
+        cache_frame = ttk.Frame(paths_frame)
+        cache_frame.grid(row=7, column=1, sticky="w", pady=(10, 0))
+        ttk.Checkbutton(
+            cache_frame,
+            text="Reutilizar cálculos previos",
+            variable=self.reutilizar_var,
+        ).pack(side="left")
+        ttk.Checkbutton(
+            cache_frame,
+            text="Sólo regenerar reportes (sin leer SISTEMA)",
+            variable=self.solo_reportes_var,
+        ).pack(side="left", padx=(15, 0))
+
+        # Perfil de cada etapa para diagnosticar corridas lentas
+        ttk.Label(paths_frame, text="Perfilar etapas:").grid(
+            row=8, column=0, sticky="w", padx=(0, 10), pady=(10, 0)
+        )
+        perfil_frame = ttk.Frame(paths_frame)
+        perfil_frame.grid(row=8, column=1, sticky="w", pady=(10, 0))
+        ttk.Combobox(
+            perfil_frame,
+            textvariable=self.perfilar_var,
+            values=[SIN_PERFIL, *MODOS_PERFIL],
+            state="readonly",
+            width=17,
+        ).pack(side="left")
+        ttk.Label(
+            perfil_frame,
+            text="(.pstats y resumen en la carpeta perfiles de los reportes)",
+            foreground="gray",
+        ).pack(side="left", padx=(5, 0))
+
         paths_frame.columnconfigure(1, weight=1)
 
         # Área de logs
@@ -1205,20 +934,82 @@ class AppIIWA:
         )
         self.process_button.pack(side="right", padx=(5, 0))
 
+        self.cancel_button = ttk.Button(
+            button_frame,
+            text="Cancelar",
+            command=self.cancel_process,
+            state="disabled",
+        )
+        self.cancel_button.pack(side="right", padx=(5, 0))
+
         ttk.Button(
             button_frame, text="Abrir Salida", command=self.open_output_folder
         ).pack(side="right", padx=(5, 0))
 
+        ttk.Button(button_frame, text="Cola de Trabajos", command=self.abrir_cola).pack(
+            side="right", padx=(5, 0)
+        )
+
+        ttk.Button(
+            button_frame, text="Comparar Meses", command=self.start_comparativo
+        ).pack(side="right", padx=(5, 0))
+
+        ttk.Button(
+            button_frame, text="Conciliar Caja", command=self.start_conciliacion
+        ).pack(side="right", padx=(5, 0))
+
+        ttk.Button(button_frame, text="Cubo", command=self.abrir_cubo).pack(
+            side="right", padx=(5, 0)
+        )
+
         ttk.Button(button_frame, text="Limpiar Log", command=self.clear_log).pack(
             side="right", padx=(5, 0)
         )
 
-        # Inicializar logger
-        self.logger = GuiLogger(self.log_text)
+        # Nivel mínimo de los mensajes que se muestran en el log
+        nivel_combo = ttk.Combobox(
+            button_frame,
+            textvariable=self.nivel_log_var,
+            values=[
+                eventos.NOMBRES[n]
+                for n in (eventos.DETALLE, eventos.INFO, eventos.AVISO, eventos.ERROR)
+            ],
+            state="readonly",
+            width=9,
+        )
+        nivel_combo.pack(side="right", padx=(5, 0))
+        nivel_combo.bind("<<ComboboxSelected>>", self._filtrar_log)
+        ttk.Label(button_frame, text="Mostrar:").pack(side="right", padx=(5, 0))
+
+        # Avance de la precarga de módulos de cálculo
+        self.estado_var = tk.StringVar(value=self.precarga.estado())
+        ttk.Label(main_frame, textvariable=self.estado_var, foreground="gray").pack(
+            anchor="w", pady=(5, 0)
+        )
+        self.root.after(100, self._seguir_precarga)
+
+        # Inicializar logger; si no se puede crear el historial sólo se
+        # pierde el archivo, no el log en pantalla
+        try:
+            archivo_log = session_log_path()
+        except OSError:
+            archivo_log = None
+        self.logger = GuiLogger(self.log_text, archivo=archivo_log)
         self._log_to_gui(
-            "App IIWA iniciada. Selecciona un proceso y las rutas correspondientes."
+            "App IIWA iniciada. Selecciona un proceso y las rutas correspondientes.",
+            tag="title",
         )
 
+    def _seguir_precarga(self):
+        """Muestra el avance real de la precarga hasta que termina"""
+        self.estado_var.set(self.precarga.estado())
+        if not self.precarga.terminada:
+            self.root.after(100, self._seguir_precarga)
+        elif self.precarga.error:
+            eventos.aviso(self._log_to_gui, self.precarga.estado())
+        else:
+            eventos.detalle(self._log_to_gui, self.precarga.estado())
+
     def browse_data_dir(self):
         """Selecciona carpeta de datos"""
         folder = filedialog.askdirectory(
@@ -1247,11 +1038,36 @@ class AppIIWA:
 
     def clear_log(self):
         """Limpia el área de logs"""
-        self.log_text.configure(state="normal")
-        self.log_text.delete(1.0, tk.END)
-        self.log_text.configure(state="disabled")
+        if self.logger:
+            self.logger.limpiar()
+        else:
+            self.log_text.configure(state="normal")
+            self.log_text.delete(1.0, tk.END)
+            self.log_text.configure(state="disabled")
         self._log_to_gui("📋 Log limpiado.")
 
+    def _filtrar_log(self, _evento=None):
+        """Aplica el nivel mínimo elegido en el combo del log"""
+        if self.logger:
+            self.logger.filtrar(eventos.NIVELES[self.nivel_log_var.get()])
+
+    def abrir_cola(self):
+        """Abre (o trae al frente) la ventana de la cola de trabajos"""
+        if self.ventana_cola is None or not self.ventana_cola.window.winfo_exists():
+            self.ventana_cola = VentanaTrabajos(self)
+        self.ventana_cola.window.lift()
+
+    def abrir_cubo(self):
+        """Abre las consultas al cubo de la última corrida de CAMPO"""
+        carpeta = Path(self.output_dir_var.get()) / "campo_output" / "cubo"
+        try:
+            VentanaCubo(self, carpeta)
+        except (OSError, ValueError) as e:
+            messagebox.showwarning(
+                "Advertencia",
+                f"No hay cubo en la carpeta de salida; corre CAMPO primero ({e})",
+            )
+
     def open_output_folder(self):
         """Abre la carpeta de salida"""
         output_path = Path(self.output_dir_var.get())
@@ -1267,7 +1083,6 @@ class AppIIWA:
 
         # Validaciones básicas
         data_path = Path(self.data_dir_var.get())
-        output_path = Path(self.output_dir_var.get())
 
         if not data_path.exists():
             messagebox.showerror("Error", f"La carpeta de datos no existe: {data_path}")
@@ -1275,56 +1090,178 @@ class AppIIWA:
 
         proceso = self.proceso_var.get()
 
-        # Validar que el archivo SISTEMA existe para ambos procesos
+        # Validar que el archivo SISTEMA existe para ambos procesos (no se lee
+        # al regenerar sólo los reportes)
+        sistema_path = Path(self.sistema_file_var.get())
+        if not self.solo_reportes_var.get() and not sistema_path.exists():
+            messagebox.showerror(
+                "Error", f"El archivo SISTEMA.xlsx no existe: {sistema_path}"
+            )
+            return
+
+        self._iniciar(proceso)
+
+    def start_comparativo(self):
+        """Compara el SISTEMA seleccionado con el de un mes anterior"""
+        if self.processing:
+            return
+
         sistema_path = Path(self.sistema_file_var.get())
         if not sistema_path.exists():
             messagebox.showerror(
                 "Error", f"El archivo SISTEMA.xlsx no existe: {sistema_path}"
             )
             return
+        anterior = filedialog.askopenfilename(
+            title="Seleccionar SISTEMA del mes anterior",
+            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")],
+            initialdir=sistema_path.parent.parent,
+        )
+        if not anterior:
+            return
+
+        output_path = Path(self.output_dir_var.get())
+        self._iniciar(
+            "COMPARATIVO",
+            dict(
+                anterior_path=Path(anterior),
+                sistema_path=sistema_path,
+                output_dir=output_path,
+                cache_dir=output_path / CARPETA_CACHE,
+            ),
+        )
 
+    def start_conciliacion(self):
+        """Concilia el SISTEMA seleccionado (padrón) con cortes de CAJA"""
+        if self.processing:
+            return
+
+        sistema_path = Path(self.sistema_file_var.get())
+        if not sistema_path.exists():
+            messagebox.showerror(
+                "Error", f"El archivo SISTEMA.xlsx no existe: {sistema_path}"
+            )
+            return
+        cortes = filedialog.askopenfilenames(
+            title="Seleccionar los SISTEMA de CAJA (del más viejo al más reciente)",
+            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")],
+            initialdir=sistema_path.parent.parent,
+        )
+        if not cortes:
+            return
+
+        output_path = Path(self.output_dir_var.get())
+        self._iniciar(
+            "CONCILIACION",
+            dict(
+                sistema_path=sistema_path,
+                caja_paths=[Path(c) for c in cortes],
+                output_dir=output_path,
+                cache_dir=output_path / CARPETA_CACHE,
+            ),
+        )
+
+    def _iniciar(self, proceso: str, parametros: dict = None):
+        """Bloquea la UI y corre `proceso` en un hilo separado"""
         self.processing = True
+        self.cancelar_evento.clear()
         self.process_button.configure(state="disabled", text="🔄 Procesando...")
+        self.cancel_button.configure(state="normal")
         self.progress_bar.start(10)
 
-        self._log_to_gui(f"Iniciando proceso {proceso}...")
+        self._log_to_gui(Evento(f"Iniciando proceso {proceso}...", seccion=True))
 
         # Ejecutar en hilo separado
         thread = threading.Thread(
             target=self._run_process_thread,
-            args=(proceso, data_path, output_path),
+            args=(proceso, parametros),
             daemon=True,
         )
         thread.start()
 
-    def _run_process_thread(self, proceso, data_path, output_path):
+    def cancel_process(self):
+        """Pide detener la corrida en el siguiente punto de cancelación"""
+        if not self.processing or self.cancelar_evento.is_set():
+            return
+        self.cancelar_evento.set()
+        if self.trabajador is not None:
+            self.trabajador.cancelar()
+        self.cancel_button.configure(state="disabled")
+        eventos.aviso(
+            self._log_to_gui,
+            "Cancelando... el proceso se detiene al terminar el paso en curso",
+        )
+
+    def parametros_actuales(self, proceso: str) -> dict:
+        """Argumentos de run_proceso_* según el formulario (sin log_func)"""
+        output_path = Path(self.output_dir_var.get())
+        solo_reportes = self.solo_reportes_var.get()
+        # Las etapas siempre se guardan en la caché como puntos de control: si
+        # la corrida se cancela o falla, la siguiente retoma desde ahí
+        cache_dir = output_path / CARPETA_CACHE
+        perfilar = self.perfilar_var.get()
+        # Archivo SISTEMA y carpetas seleccionados por el usuario (CAJA toma
+        # REGISTROS.csv y FOLIOS.csv de la carpeta de datos)
+        parametros = dict(
+            sistema_path=Path(self.sistema_file_var.get()),
+            data_dir=Path(self.data_dir_var.get()),
+            output_dir=output_path,
+            bajo_memoria=self.bajo_memoria_var.get(),
+            presupuesto_mb=self.presupuesto_var.get(),
+            cache_dir=cache_dir,
+            reutilizar=self.reutilizar_var.get() or solo_reportes,
+            solo_reportes=solo_reportes,
+            perfilar=None if perfilar == SIN_PERFIL else perfilar,
+            # Un solo historial para todas las carpetas de salida
+            historial=get_historial_path(),
+        )
+        if proceso in ("CAMPO", "AMBOS"):
+            parametros.update(
+                month_label=self.month_label_var.get().strip() or "SISTEMA",
+                backend=self.backend_var.get() or BACKEND_DEFAULT,
+                workers=self.workers_var.get(),
+            )
+        return parametros
+
+    def _run_process_thread(self, proceso, parametros: dict = None):
         """Ejecuta el proceso en un hilo separado"""
         try:
-            if proceso == "CAMPO":
-                sistema_path = Path(self.sistema_file_var.get())
-                month_label = self.month_label_var.get().strip() or "SISTEMA"
-
-                success, result = run_proceso_campo(
-                    sistema_path=sistema_path,  # Archivo SISTEMA seleccionado por el usuario
-                    data_dir=data_path,  # Carpeta de datos seleccionada por el usuario
-                    output_dir=output_path,  # Carpeta de salida seleccionada por el usuario
-                    log_func=self._log_to_gui,
-                    month_label=month_label,
+            if not self.precarga.terminada:
+                self._log_to_gui(self.precarga.estado())
+
+            if proceso in ("COMPARATIVO", "CONCILIACION"):
+                # No son procesos del trabajador: corren en este hilo
+                from .comparativo import run_proceso_comparativo
+                from .conciliacion import run_proceso_conciliacion
+
+                funcion = {
+                    "COMPARATIVO": run_proceso_comparativo,
+                    "CONCILIACION": run_proceso_conciliacion,
+                }[proceso]
+                with cancelable(self.cancelar_evento):
+                    success, result = funcion(log_func=self._log_to_gui, **parametros)
+            elif self.trabajador is not None:
+                parametros = self.parametros_actuales(proceso)
+                success, result = self.trabajador.ejecutar(
+                    proceso, self._log_to_gui, **parametros
                 )
-
-            elif proceso == "CAJA":
-                sistema_path = Path(
-                    self.sistema_file_var.get()
-                )  # Usar el archivo seleccionado también para CAJA
-                success, result = run_proceso_caja(
-                    sistema_path=sistema_path,  # Archivo SISTEMA seleccionado por el usuario
-                    data_dir=data_path,  # Carpeta de datos seleccionada por el usuario (para REGISTROS.csv y FOLIOS.csv)
-                    output_dir=output_path,  # Carpeta de salida seleccionada por el usuario
-                    log_func=self._log_to_gui,
+            else:
+                parametros = self.parametros_actuales(proceso)
+                with cancelable(self.cancelar_evento):
+                    success, result = funcion_proceso(proceso)(
+                        log_func=self._log_to_gui, **parametros
+                    )
+
+            if not success and self.cancelar_evento.is_set():
+                eventos.aviso(
+                    self._log_to_gui,
+                    f"Proceso {proceso} cancelado; la próxima corrida retoma "
+                    "desde la última etapa guardada",
+                )
+            elif success:
+                eventos.exito(
+                    self._log_to_gui, f"Proceso {proceso} completado exitosamente!"
                 )
-
-            if success:
-                self._log_to_gui(f"Proceso {proceso} completado exitosamente!")
                 self._log_to_gui(f"📁 Resultados disponibles en: {result}")
 
                 # Mostrar notificación de éxito
@@ -1336,7 +1273,7 @@ class AppIIWA:
                     ),
                 )
             else:
-                self._log_to_gui(f"Error en proceso {proceso}: {result}")
+                eventos.error(self._log_to_gui, f"Error en proceso {proceso}: {result}")
                 self.root.after(
                     100,
                     lambda: messagebox.showerror(
@@ -1346,7 +1283,7 @@ class AppIIWA:
 
         except Exception as e:
             error_msg = f"Error inesperado: {type(e).__name__}: {e}"
-            self._log_to_gui(f"{error_msg}")
+            eventos.error(self._log_to_gui, error_msg)
             self.root.after(
                 100, lambda: messagebox.showerror("Error Crítico", error_msg)
             )
@@ -1355,42 +1292,31 @@ class AppIIWA:
             # Restaurar UI en el hilo principal
             self.root.after(100, self._finish_process)
 
-    def _log_to_gui(self, message):
-        """Función de log que siempre funciona, incluso si GuiLogger falla"""
-        from datetime import datetime
-
-        timestamp = datetime.now().strftime("[%H:%M:%S] ")
-        full_message = timestamp + str(message) + "\n"
-
-        # Detectar tipo de mensaje para aplicar estilo
-        msg_str = str(message)
-        tag = None
+    def _log_to_gui(self, message, tag: str = None):
+        """
+        Función de log que siempre funciona, incluso si GuiLogger falla
 
-        if "¡Bienvenido" in msg_str or "App IIWA" in msg_str:
-            tag = "title"
-        elif "completado exitosamente" in msg_str:
-            tag = "success"
-        elif "Error" in msg_str or "error" in msg_str:
-            tag = "error"
-        elif "Advertencia" in msg_str or "advertencia" in msg_str:
-            tag = "warning"
-        elif "===" in msg_str or "Iniciando proceso" in msg_str:
-            tag = "large"
+        Recibe texto o eventos.Evento; el estilo sale del nivel del evento
+        (o de `tag` para los mensajes propios de la interfaz).
+        """
+        evento = como_evento(message)
 
         # Intentar con el logger primero
         if self.logger:
             try:
-                self.logger.log(str(message))
+                self.logger.log(evento, tag)
                 return
             except Exception:
                 pass
 
         # Fallback: escribir directamente al widget de texto
+        texto = formato_gui(evento) + "\n"
+        tag = tag or estilo_evento(evento)
         try:
-            self.root.after(0, lambda: self._write_to_text_widget(full_message, tag))
+            self.root.after(0, lambda: self._write_to_text_widget(texto, tag))
         except Exception:
             # Último recurso: print
-            print(full_message.strip())
+            print(texto.strip())
 
     def _write_to_text_widget(self, message, tag=None):
         """Escribe directamente al widget de texto con opcional tag de estilo"""
@@ -1416,6 +1342,7 @@ class AppIIWA:
         """Restaura la UI después de completar el proceso"""
         self.processing = False
         self.process_button.configure(state="normal", text="Iniciar Proceso")
+        self.cancel_button.configure(state="disabled")
         self.progress_bar.stop()
         self._log_to_gui("Proceso finalizado. Listo para nueva ejecución.")
 
@@ -1432,9 +1359,10 @@ Esta aplicación unifica los procesadores CAMPO y CAJA:
 
 CAMPO: Procesa datos de rezagos de agua, genera reportes por CP y análisis detallados
 CAJA: Analiza pagos, evidencias, y genera reportes consolidados con geolocalización
+AMBOS: Corre CAMPO y CAJA a la vez leyendo SISTEMA una sola vez
 
 Instrucciones:
-1. Selecciona el tipo de proceso (CAMPO o CAJA)
+1. Selecciona el tipo de proceso (CAMPO, CAJA o AMBOS)
 2. Configura las rutas de datos y salida
 3. Para CAMPO: asegúrate de tener SISTEMA.xlsx y LISTA C.P..xlsx
 4. Para CAJA: asegúrate de tener SISTEMA.xlsx, REGISTROS.csv y FOLIOS.csv
@@ -1442,9 +1370,17 @@ Instrucciones:
 
 Los logs se actualizan automáticamente mostrando el progreso detallado.
         """
-        self._log_to_gui(welcome_msg.strip())
+        self._log_to_gui(welcome_msg.strip(), tag="title")
+        if self.logger and self.logger.archivo:
+            self._log_to_gui(f"Historial completo del log: {self.logger.archivo}")
 
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            if self.trabajador is not None:
+                self.trabajador.cerrar()
+            if self.logger:
+                self.logger.cerrar()
 
 
 # ====================================
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Arranque rápido de la interfaz
+
+La GUI sólo necesita tkinter para mostrarse; pandas, numpy, openpyxl y los
+módulos de cálculo tardan varios segundos en importarse en las laptops de
+oficina. Precarga los importa en un hilo mientras el usuario elige rutas y
+expone el avance real (módulo actual, hechos/total) para el splash o la barra
+de progreso. Si el usuario inicia un proceso antes de que termine, el import
+del proceso simplemente espera al de la precarga.
+"""
+
+import importlib
+import importlib.util
+import threading
+import time
+
+from .constantes import BACKENDS
+
+# (texto para el usuario, módulo) en orden de dependencia
+MODULOS_PESADOS = (
+    ("numpy", "numpy"),
+    ("pandas", "pandas"),
+    ("openpyxl", "openpyxl"),
+    ("cálculo CAMPO", "app_iiwa.campo"),
+    ("cálculo CAJA", "app_iiwa.caja"),
+)
+
+# Módulos que necesita cada backend además de pandas
+_REQUISITOS_BACKEND = {"pandas": (), "polars": ("polars", "pyarrow")}
+
+
+def backends_instalados() -> list:
+    """
+    Backends cuyos módulos están instalados, sin importarlos
+
+    A diferencia de backends.backends_disponibles no carga polars, así que la
+    GUI puede llenar el combo antes de la precarga.
+    """
+    return [
+        backend
+        for backend in BACKENDS
+        if all(importlib.util.find_spec(m) for m in _REQUISITOS_BACKEND[backend])
+    ]
+
+
+class Precarga(threading.Thread):
+    """
+    Importa MODULOS_PESADOS en segundo plano
+
+    Atributos de lectura (desde cualquier hilo): actual (texto del módulo
+    que se está importando), hechos, total, error y segundos.
+    """
+
+    def __init__(self, modulos=MODULOS_PESADOS):
+        super().__init__(name="precarga-iiwa", daemon=True)
+        self.modulos = tuple(modulos)
+        self.total = len(self.modulos)
+        self.hechos = 0
+        self.actual = None
+        self.error = None
+        self.segundos = None
+        self._listo = threading.Event()
+
+    def run(self):
+        inicio = time.perf_counter()
+        try:
+            for texto, modulo in self.modulos:
+                self.actual = texto
+                importlib.import_module(modulo)
+                self.hechos += 1
+        except Exception as e:  # El proceso volverá a intentar el import
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            self.actual = None
+            self.segundos = time.perf_counter() - inicio
+            self._listo.set()
+
+    @property
+    def terminada(self) -> bool:
+        return self._listo.is_set()
+
+    def esperar(self, timeout=None) -> bool:
+        """True si la precarga terminó antes de `timeout` segundos"""
+        return self._listo.wait(timeout)
+
+    def estado(self) -> str:
+        """Texto de avance para mostrar al usuario"""
+        if self.error:
+            return f"No se pudieron precargar los módulos: {self.error}"
+        if self.terminada:
+            return f"Módulos de cálculo listos ({self.segundos:.1f} s)"
+        actual = self.actual or "módulos"
+        return f"Cargando {actual}... ({self.hechos}/{self.total})"
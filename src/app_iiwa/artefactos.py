@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Artefactos en columnas de las tablas calculadas
+
+Las tablas que produce el pipeline (SISTEMA con Total, C.P., T. CONSUMO,
+evidencias, pagos...) se guardan una por archivo en Parquet cuando pyarrow
+está instalado. Parquet sólo se usa si el viaje de ida y vuelta conserva los
+tipos: una columna o índice object (tipos mezclados de read_excel) se
+convertiría en silencio, así que esas tablas y cualquier otro valor se guardan
+con pickle. Un manifiesto JSON indica cómo reconstruir cada entrada.
+"""
+
+import json
+import pickle
+from pathlib import Path
+
+import pandas as pd
+
+MANIFIESTO = "manifiesto.json"
+
+
+def _parquet_disponible() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+
+        return True
+    except ImportError:
+        return False
+
+
+def _admite_parquet(df: pd.DataFrame) -> bool:
+    """True si Parquet devuelve exactamente los mismos tipos"""
+    indices = [df.index, df.columns]
+    if any(isinstance(i, pd.MultiIndex) for i in indices):
+        return False
+    if not all(isinstance(c, str) for c in df.columns):
+        return False
+    if df.columns.has_duplicates:
+        return False
+    tipos = list(df.dtypes) + [df.index.dtype]
+    return not any(t == object for t in tipos)
+
+
+def _guardar_entrada(directorio: Path, nombre: str, valor, parquet: bool) -> str:
+    base = directorio / nombre
+    if parquet and isinstance(valor, pd.DataFrame) and _admite_parquet(valor):
+        try:
+            valor.to_parquet(base.with_suffix(".parquet"))
+            return "parquet"
+        except (ValueError, TypeError, NotImplementedError):
+            base.with_suffix(".parquet").unlink(missing_ok=True)
+    with open(base.with_suffix(".pkl"), "wb") as f:
+        pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return "pickle"
+
+
+def _cargar_entrada(directorio: Path, nombre: str, formato: str):
+    base = directorio / nombre
+    if formato == "parquet":
+        return pd.read_parquet(base.with_suffix(".parquet"))
+    with open(base.with_suffix(".pkl"), "rb") as f:
+        return pickle.load(f)
+
+
+def guardar(directorio: Path, valor):
+    """
+    Guarda un DataFrame o un dict de valores en `directorio`
+
+    Las entradas de un dict que sean DataFrame se guardan cada una en su
+    archivo; el resto (listas, tuplas, None) con pickle.
+    """
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    parquet = _parquet_disponible()
+
+    if isinstance(valor, dict):
+        if not all(isinstance(clave, str) for clave in valor):
+            raise TypeError("Las claves de un artefacto deben ser texto")
+        manifiesto = {"tipo": "dict", "entradas": []}
+        for i, (clave, v) in enumerate(valor.items()):
+            archivo = f"t{i}"
+            formato = _guardar_entrada(directorio, archivo, v, parquet)
+            manifiesto["entradas"].append([clave, archivo, formato])
+    else:
+        formato = _guardar_entrada(directorio, "valor", valor, parquet)
+        manifiesto = {"tipo": "valor", "entradas": [[None, "valor", formato]]}
+
+    with open(directorio / MANIFIESTO, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f)
+
+
+def cargar(directorio: Path):
+    """Reconstruye el valor guardado con guardar()"""
+    directorio = Path(directorio)
+    with open(directorio / MANIFIESTO, encoding="utf-8") as f:
+        manifiesto = json.load(f)
+
+    if manifiesto["tipo"] == "valor":
+        _, archivo, formato = manifiesto["entradas"][0]
+        return _cargar_entrada(directorio, archivo, formato)
+    return {
+        clave: _cargar_entrada(directorio, archivo, formato)
+        for clave, archivo, formato in manifiesto["entradas"]
+    }
+
+
+def formatos(directorio: Path) -> dict:
+    """Formato usado por cada entrada (para reportar y para pruebas)"""
+    with open(Path(directorio) / MANIFIESTO, encoding="utf-8") as f:
+        manifiesto = json.load(f)
+    return {clave: formato for clave, _, formato in manifiesto["entradas"]}
@@ -0,0 +1,444 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Backends de cómputo para el proceso CAMPO
+
+pandas es el backend por defecto y la implementación de referencia. El backend
+polars (opcional) calcula totales, conteos únicos y la partición por código
+postal en paralelo y devuelve exactamente las mismas tablas en pandas.
+"""
+
+import numpy as np
+import pandas as pd
+
+from . import eventos
+from .cancelacion import revisar
+from .constantes import BACKEND_DEFAULT, BACKENDS  # noqa: F401
+from .paralelo import calcular_por_cp_paralelo, particion_por_cp, resolver_workers
+
+COLUMNAS_TOTAL = [
+    "agua",
+    "actualizacionagua",
+    "recargosagua",
+    "drenaje",
+    "actualizaciondrenaje",
+    "recargosdrenaje",
+    "mejoras",
+    "iva",
+]
+
+COLUMNAS_MACRO = [
+    "ClaveCatastral",
+    "Propietario",
+    "Domicilio",
+    "CodigoPostal",
+    "UltimoPago",
+    "NumerodeCuenta",
+    "TipoConsumo",
+    "TipoConexion",
+    "Zona",
+    "bimInicial",
+    "bimfinal",
+]
+# Montos consolidados que base_macro agrega a COLUMNAS_MACRO
+MONTOS_MACRO = ["agua", "drenaje", "recargos", "mejoras", "iva", "total"]
+
+
+def backends_disponibles():
+    """Lista los backends que pueden usarse en esta instalación"""
+    disponibles = ["pandas"]
+    try:
+        import polars  # noqa: F401
+        import pyarrow  # noqa: F401
+
+        disponibles.append("polars")
+    except ImportError:
+        pass
+    return disponibles
+
+
+def calcular_tablas_campo(
+    df: pd.DataFrame, backend: str = BACKEND_DEFAULT, log_func=None, workers=1
+):
+    """
+    Calcula todas las tablas del proceso CAMPO a partir de SISTEMA
+
+    Args:
+        df: DataFrame de SISTEMA con NumerodeCuenta y Domicilio ya creados
+        backend: "pandas" (referencia) o "polars"
+        log_func: función opcional para reportar avisos
+        workers: procesos para el cómputo por CP (1 = serial, 0 = todos los
+            núcleos)
+
+    Returns:
+        dict con df (con columna Total), cp, duplicados, t_consumo, t_conexion,
+        veinte_25, codigos_postales, filas_por_cp, df_cps, df_completos_cps y
+        reporte_macro_base
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend desconocido: {backend}. Opciones: {BACKENDS}")
+
+    workers = resolver_workers(workers)
+    tablas = _tablas_globales(df, backend, log_func, por_cp=workers == 1)
+    if workers == 1:
+        return tablas
+
+    try:
+        tablas.update(
+            calcular_por_cp_paralelo(
+                tablas["df"],
+                tablas["codigos_postales"],
+                workers=workers,
+                particion=tablas["filas_por_cp"],
+            )
+        )
+    except Exception as e:
+        if log_func:
+            eventos.aviso(
+                log_func,
+                f"Advertencia: cómputo paralelo por CP no disponible "
+                f"({type(e).__name__}: {e}), procesando en serie",
+            )
+        tablas.update(
+            _por_cp_pandas(
+                tablas["df"], tablas["codigos_postales"], tablas["filas_por_cp"]
+            )
+        )
+    return tablas
+
+
+def _tablas_globales(df, backend, log_func, por_cp):
+    if backend == "polars":
+        try:
+            return _tablas_campo_polars(df, por_cp=por_cp)
+        except ImportError:
+            if log_func:
+                eventos.aviso(
+                    log_func, "Advertencia: polars/pyarrow no instalados, usando pandas"
+                )
+        except Exception as e:
+            if log_func:
+                eventos.aviso(
+                    log_func,
+                    f"Advertencia: backend polars no pudo procesar SISTEMA "
+                    f"({type(e).__name__}: {e}), usando pandas",
+                )
+
+    return _tablas_campo_pandas(df, por_cp=por_cp)
+
+
+# ====================================
+# UTILIDADES COMPARTIDAS
+# ====================================
+
+
+def con_total_general(conteo: pd.DataFrame) -> pd.DataFrame:
+    """Agrega la fila 'Total general' a una tabla de cuentas únicas"""
+    return pd.concat(
+        [
+            conteo,
+            pd.DataFrame(
+                {"NumerodeCuenta": [conteo["NumerodeCuenta"].sum()]},
+                index=["Total general"],
+            ),
+        ]
+    )
+
+
+def cuentas_duplicadas(df: pd.DataFrame) -> pd.DataFrame:
+    """Filas cuyo NumerodeCuenta aparece más de una vez (mismo criterio histórico)"""
+    df2 = df.copy()
+    df2.index = df2["NumerodeCuenta"]
+    return df2.loc[df2.index[df2.index.duplicated()]]
+
+
+def filas_2025(df: pd.DataFrame) -> pd.DataFrame:
+    """Filas cuyo bimfinal corresponde a 2025 (hoja 2025)"""
+    return df.loc[df["bimfinal"].astype(str).str.contains("2025", na=False)]
+
+
+def _domicilio_macro(domicilio: pd.Series) -> pd.Series:
+    return domicilio.astype(str).str.replace("nan", "")
+
+
+# ====================================
+# BACKEND PANDAS (REFERENCIA)
+# ====================================
+
+
+def calcular_total(df: pd.DataFrame) -> pd.Series:
+    """Total de adeudo por fila de SISTEMA"""
+    return (
+        df["agua"]
+        + df["actualizacionagua"]
+        + df["recargosagua"]
+        + df["drenaje"]
+        + df["actualizaciondrenaje"]
+        + df["recargosdrenaje"]
+        + df["mejoras"]
+        + df["iva"]
+    )
+
+
+def consolidar_detalle(df_cp: pd.DataFrame) -> pd.DataFrame:
+    """Consolida agua, drenaje y recargos de un detalle por CP (modifica df_cp)"""
+    # Consolidar agua y drenaje
+    df_cp["agua"] = df_cp["agua"] + df_cp["actualizacionagua"]
+    df_cp.drop(columns=["actualizacionagua"], inplace=True)
+
+    df_cp["drenaje"] = df_cp["drenaje"] + df_cp["actualizaciondrenaje"]
+    df_cp.drop(columns=["actualizaciondrenaje"], inplace=True)
+
+    df_cp["recargos"] = df_cp["recargosagua"] + df_cp["recargosdrenaje"]
+    df_cp.drop(columns=["recargosagua", "recargosdrenaje"], inplace=True)
+
+    df_cp["Total"] = (
+        df_cp["agua"]
+        + df_cp["drenaje"]
+        + df_cp["recargos"]
+        + df_cp["mejoras"]
+        + df_cp["iva"]
+    )
+    return df_cp
+
+
+def base_macro(df: pd.DataFrame) -> pd.DataFrame:
+    """Columnas del reporte para macro con montos consolidados"""
+    reporte_macro_base = df[COLUMNAS_MACRO].copy()
+    reporte_macro_base["agua"] = df["agua"] + df["actualizacionagua"]
+    reporte_macro_base["drenaje"] = df["drenaje"] + df["actualizaciondrenaje"]
+    reporte_macro_base["recargos"] = df["recargosagua"] + df["recargosdrenaje"]
+    reporte_macro_base["mejoras"] = df["mejoras"]
+    reporte_macro_base["iva"] = df["iva"]
+    reporte_macro_base["total"] = (
+        reporte_macro_base["iva"]
+        + reporte_macro_base["mejoras"]
+        + reporte_macro_base["recargos"]
+        + reporte_macro_base["drenaje"]
+        + reporte_macro_base["agua"]
+    )
+    reporte_macro_base["Domicilio"] = _domicilio_macro(reporte_macro_base["Domicilio"])
+    return reporte_macro_base
+
+
+def _por_cp_pandas(df: pd.DataFrame, codigos_postales, filas_por_cp: dict) -> dict:
+    """Resumen y detalle consolidado de cada CP, un CP a la vez"""
+    df_cps, df_completos_cps = {}, {}
+
+    for cps in codigos_postales:
+        revisar()
+        df_cp = df.iloc[filas_por_cp[cps]].copy()
+        df_cps[f"{cps}"] = (
+            df_cp.groupby("TipoConexion")["NumerodeCuenta"].nunique().to_frame()
+        )
+        df_completos_cps[f"{cps}"] = consolidar_detalle(df_cp)
+
+    return {"df_cps": df_cps, "df_completos_cps": df_completos_cps}
+
+
+def _tablas_campo_pandas(df: pd.DataFrame, por_cp: bool = True) -> dict:
+    """Implementación de referencia, idéntica al cálculo original de CAMPO"""
+    df["Total"] = calcular_total(df)
+
+    cp = df.groupby("CodigoPostal")["NumerodeCuenta"].nunique().to_frame()
+    cp.index = cp.index.astype(int)
+
+    duplicados = cuentas_duplicadas(df)
+
+    t_consumo = con_total_general(
+        df.groupby("TipoConsumo")["NumerodeCuenta"].nunique().to_frame()
+    )
+    t_conexion = con_total_general(
+        df.groupby("TipoConexion")["NumerodeCuenta"].nunique().to_frame()
+    )
+
+    veinte_25 = filas_2025(df)
+
+    codigos_postales = cp.index.sort_values(ascending=True).to_list()
+    filas_por_cp = particion_por_cp(df["CodigoPostal"], codigos_postales)
+    por_cp_tablas = _por_cp_pandas(df, codigos_postales, filas_por_cp) if por_cp else {}
+
+    reporte_macro_base = base_macro(df)
+
+    return {
+        "df": df,
+        "cp": cp,
+        "duplicados": duplicados,
+        "t_consumo": t_consumo,
+        "t_conexion": t_conexion,
+        "veinte_25": veinte_25,
+        "codigos_postales": codigos_postales,
+        "filas_por_cp": filas_por_cp,
+        "reporte_macro_base": reporte_macro_base,
+        **por_cp_tablas,
+    }
+
+
+# ====================================
+# BACKEND POLARS
+# ====================================
+
+
+def _a_numpy(serie) -> np.ndarray:
+    """Convierte una serie polars a numpy con NaN en lugar de null"""
+    if serie.null_count() and serie.dtype.is_integer():
+        return serie.cast(float).to_numpy()
+    return serie.to_numpy()
+
+
+def _tablas_campo_polars(df: pd.DataFrame, por_cp: bool = True) -> dict:
+    """Calcula las tablas de CAMPO con polars (multi-hilo, evaluación perezosa)"""
+    import polars as pl
+
+    claves = ["CodigoPostal", "NumerodeCuenta", "TipoConsumo", "TipoConexion"]
+    base = pl.from_pandas(df[claves + COLUMNAS_TOTAL]).with_row_index("_fila")
+    base = base.with_columns(
+        pl.from_pandas(df["bimfinal"].astype(str)).alias("_bim"),
+    )
+    lf = base.lazy()
+
+    c = {col: pl.col(col) for col in COLUMNAS_TOTAL}
+    derivadas = lf.select(
+        (
+            c["agua"]
+            + c["actualizacionagua"]
+            + c["recargosagua"]
+            + c["drenaje"]
+            + c["actualizaciondrenaje"]
+            + c["recargosdrenaje"]
+            + c["mejoras"]
+            + c["iva"]
+        ).alias("Total"),
+        (c["agua"] + c["actualizacionagua"]).alias("agua_c"),
+        (c["drenaje"] + c["actualizaciondrenaje"]).alias("drenaje_c"),
+        (c["recargosagua"] + c["recargosdrenaje"]).alias("recargos_c"),
+        pl.col("_bim").str.contains("2025", literal=True).alias("_es_2025"),
+        c["mejoras"],
+        c["iva"],
+    )
+    derivadas = derivadas.with_columns(
+        (
+            pl.col("agua_c")
+            + pl.col("drenaje_c")
+            + pl.col("recargos_c")
+            + c["mejoras"]
+            + c["iva"]
+        ).alias("total_c"),
+        (
+            c["iva"]
+            + c["mejoras"]
+            + pl.col("recargos_c")
+            + pl.col("drenaje_c")
+            + pl.col("agua_c")
+        ).alias("total_macro"),
+    )
+
+    # Se disparan todos los planes a la vez para aprovechar el paralelismo
+    cp_res, consumo_res, conexion_res, resumen_cp_res, filas_cp_res, der = (
+        pl.collect_all(
+            [
+                lf.filter(pl.col("CodigoPostal").is_not_null())
+                .group_by("CodigoPostal")
+                .agg(pl.col("NumerodeCuenta").drop_nulls().n_unique())
+                .sort("CodigoPostal"),
+                lf.filter(pl.col("TipoConsumo").is_not_null())
+                .group_by("TipoConsumo")
+                .agg(pl.col("NumerodeCuenta").drop_nulls().n_unique())
+                .sort("TipoConsumo"),
+                lf.filter(pl.col("TipoConexion").is_not_null())
+                .group_by("TipoConexion")
+                .agg(pl.col("NumerodeCuenta").drop_nulls().n_unique())
+                .sort("TipoConexion"),
+                lf.filter(
+                    pl.col("CodigoPostal").is_not_null()
+                    & pl.col("TipoConexion").is_not_null()
+                )
+                .group_by("CodigoPostal", "TipoConexion")
+                .agg(pl.col("NumerodeCuenta").drop_nulls().n_unique())
+                .sort("CodigoPostal", "TipoConexion"),
+                lf.filter(pl.col("CodigoPostal").is_not_null())
+                .group_by("CodigoPostal")
+                .agg(pl.col("_fila"))
+                .sort("CodigoPostal"),
+                derivadas,
+            ]
+        )
+    )
+
+    def _tabla(res, clave):
+        return pd.DataFrame(
+            {"NumerodeCuenta": res["NumerodeCuenta"].to_numpy().astype(np.int64)},
+            index=pd.Index(res[clave].to_list(), name=clave),
+        )
+
+    df["Total"] = _a_numpy(der["Total"])
+
+    cp = _tabla(cp_res, "CodigoPostal")
+    cp.index = cp.index.astype(int)
+
+    t_consumo = con_total_general(_tabla(consumo_res, "TipoConsumo"))
+    t_conexion = con_total_general(_tabla(conexion_res, "TipoConexion"))
+
+    veinte_25 = df.loc[der["_es_2025"].fill_null(False).to_numpy()]
+
+    # Detalle consolidado calculado una sola vez y repartido por CP
+    detalle = df.drop(
+        columns=[
+            "actualizacionagua",
+            "actualizaciondrenaje",
+            "recargosagua",
+            "recargosdrenaje",
+        ]
+    )
+    detalle["agua"] = _a_numpy(der["agua_c"])
+    detalle["drenaje"] = _a_numpy(der["drenaje_c"])
+    detalle["recargos"] = _a_numpy(der["recargos_c"])
+    detalle["Total"] = _a_numpy(der["total_c"])
+
+    codigos_postales = cp.index.sort_values(ascending=True).to_list()
+    filas_por_cp = {
+        int(k): np.asarray(v, dtype=np.int64)
+        for k, v in zip(
+            filas_cp_res["CodigoPostal"].to_list(), filas_cp_res["_fila"].to_list()
+        )
+    }
+
+    df_cps, df_completos_cps = {}, {}
+    if por_cp:
+        for (clave_cp,), grupo in resumen_cp_res.group_by(
+            "CodigoPostal", maintain_order=True
+        ):
+            df_cps[f"{int(clave_cp)}"] = _tabla(grupo, "TipoConexion")
+        for cps in codigos_postales:
+            if f"{cps}" not in df_cps:
+                df_cps[f"{cps}"] = pd.DataFrame(
+                    {"NumerodeCuenta": pd.Series([], dtype=np.int64)},
+                    index=pd.Index(
+                        [], name="TipoConexion", dtype=df["TipoConexion"].dtype
+                    ),
+                )
+            df_completos_cps[f"{cps}"] = detalle.iloc[filas_por_cp[cps]]
+        df_cps = {f"{cps}": df_cps[f"{cps}"] for cps in codigos_postales}
+
+    reporte_macro_base = df[COLUMNAS_MACRO].copy()
+    reporte_macro_base["agua"] = detalle["agua"]
+    reporte_macro_base["drenaje"] = detalle["drenaje"]
+    reporte_macro_base["recargos"] = detalle["recargos"]
+    reporte_macro_base["mejoras"] = df["mejoras"]
+    reporte_macro_base["iva"] = df["iva"]
+    reporte_macro_base["total"] = _a_numpy(der["total_macro"])
+    reporte_macro_base["Domicilio"] = _domicilio_macro(reporte_macro_base["Domicilio"])
+
+    return {
+        "df": df,
+        "cp": cp,
+        "duplicados": cuentas_duplicadas(df),
+        "t_consumo": t_consumo,
+        "t_conexion": t_conexion,
+        "veinte_25": veinte_25,
+        "codigos_postales": codigos_postales,
+        "filas_por_cp": filas_por_cp,
+        "reporte_macro_base": reporte_macro_base,
+        **({"df_cps": df_cps, "df_completos_cps": df_completos_cps} if por_cp else {}),
+    }
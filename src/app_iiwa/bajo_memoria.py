@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Piezas para el modo de bajo consumo de memoria (padrones más grandes que la RAM)
+
+- ConteoUnico: cuentas únicas por grupo con hashes de 64 bits compactados
+- CubetasHash: hashes repartidos en cubetas en disco, procesadas una a la vez
+- DerramePorCP: archivos temporales por código postal
+- LibroStreaming: escritura de Excel fila por fila (openpyxl write_only)
+
+Qué controla el presupuesto: el tamaño de cada bloque de SISTEMA y el número
+de cubetas en disco, de modo que los conteos de cuentas únicas y la detección
+de DUPLICADOS ocupen en memoria sólo una cubeta a la vez. Lo que sigue
+creciendo con los datos es pequeño: un entero por grupo, la lista de hashes
+de cuentas repetidas (8 bytes por cuenta duplicada) y un archivo abierto por
+cubeta al final.
+"""
+
+import math
+import pickle
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .constantes import PRESUPUESTO_DEFAULT_MB  # noqa: F401
+from .ingesta import FRACCION_BLOQUE, iterar_filas_excel
+
+# Las cubetas se procesan una a la vez; el máximo limita archivos abiertos
+MAX_CUBETAS = 64
+
+
+def hash_valores(valores) -> np.ndarray:
+    """Hash de 64 bits estable de una columna (incluye nulos)"""
+    return pd.util.hash_array(np.asarray(valores, dtype=object))
+
+
+def clave_cp(valor):
+    """Normaliza el CP de un bloque (50000 y 50000.0 son el mismo CP)"""
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    if isinstance(valor, np.integer):
+        return int(valor)
+    return valor
+
+
+def cubeta_de(hashes, n_cubetas: int) -> np.ndarray:
+    """Cubeta de cada hash (bits altos, independientes del grupo)"""
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    return ((hashes >> np.uint64(32)) % np.uint64(n_cubetas)).astype(np.int64)
+
+
+def cubetas_para_presupuesto(filas, bytes_fila, presupuesto_mb) -> int:
+    """Cubetas para que los candidatos de una cubeta quepan en un bloque"""
+    if not filas:
+        return MAX_CUBETAS
+    por_cubeta = presupuesto_mb * 1024 * 1024 * FRACCION_BLOQUE
+    return int(min(max(math.ceil(filas * bytes_fila / por_cubeta), 1), MAX_CUBETAS))
+
+
+def ordenar_claves(claves):
+    """Orden de claves como groupby de pandas, tolerando tipos mezclados"""
+    try:
+        return sorted(claves)
+    except TypeError:
+        return sorted(claves, key=lambda k: (type(k).__name__, str(k)))
+
+
+class CubetasHash:
+    """
+    Registros numpy repartidos por cubeta de hash
+
+    Con `directorio` cada cubeta es un archivo binario que se abre sólo para
+    agregar o leer; sin él las cubetas quedan en memoria.
+    """
+
+    def __init__(self, dtype, directorio: Path = None, n_cubetas: int = 1):
+        self.dtype = np.dtype(dtype)
+        self.n_cubetas = max(int(n_cubetas), 1)
+        self.directorio = (
+            Path(tempfile.mkdtemp(prefix=".cubetas_", dir=directorio))
+            if directorio
+            else None
+        )
+        self._memoria = [[] for _ in range(self.n_cubetas)]
+
+    def agregar(self, registros: np.ndarray, hashes: np.ndarray):
+        cubetas = cubeta_de(hashes, self.n_cubetas)
+        orden = np.argsort(cubetas, kind="stable")
+        limites = np.searchsorted(cubetas[orden], np.arange(self.n_cubetas + 1))
+        for i in range(self.n_cubetas):
+            parte = registros[orden[limites[i] : limites[i + 1]]]
+            if not len(parte):
+                continue
+            if self.directorio is None:
+                self._memoria[i].append(parte)
+            else:
+                with open(self._ruta(i), "ab") as f:
+                    parte.tofile(f)
+
+    def leer(self, i: int) -> np.ndarray:
+        if self.directorio is None:
+            partes = self._memoria[i]
+            return np.concatenate(partes) if partes else np.empty(0, self.dtype)
+        ruta = self._ruta(i)
+        if not ruta.exists():
+            return np.empty(0, self.dtype)
+        return np.fromfile(ruta, dtype=self.dtype)
+
+    def _ruta(self, i: int) -> Path:
+        return self.directorio / f"cubeta_{i}.bin"
+
+
+class ConteoUnico:
+    """
+    Conteo exacto de valores únicos (sin nulos) por grupo, acumulado por bloques
+
+    Cada bloque aporta pares (grupo, hash de 64 bits) que se compactan con
+    np.unique al superar `umbral` y se reparten por cubeta de hash. Un mismo
+    valor cae siempre en la misma cubeta, así que los únicos de cada cubeta se
+    suman sin volver a juntarlas.
+    """
+
+    _PARES = np.dtype([("grupo", "<i8"), ("hash", "<u8")])
+
+    def __init__(self, umbral: int = 1_000_000, directorio=None, n_cubetas=1):
+        self.umbral = umbral
+        self._grupos = {}
+        self._cubetas = CubetasHash(self._PARES, directorio, n_cubetas)
+        self._pendientes = []
+        self._n_pendientes = 0
+
+    def agregar(self, claves, valores: pd.Series):
+        """Agrega un bloque; claves es una Serie o lista de Series (grupo compuesto)"""
+        if not isinstance(claves, list):
+            claves = [claves]
+        marco = pd.DataFrame({f"k{i}": c for i, c in enumerate(claves)})
+        por = list(marco.columns) if len(claves) > 1 else "k0"
+        validos = valores.notna().to_numpy()
+        hashes = hash_valores(valores.to_numpy())
+
+        for clave, posiciones in marco.groupby(por).indices.items():
+            # Los grupos existen aunque no tengan cuentas (nunique == 0)
+            grupo = self._grupos.setdefault(self._normalizar(clave), len(self._grupos))
+            posiciones = posiciones[validos[posiciones]]
+            if len(posiciones):
+                pares = np.empty(len(posiciones), dtype=self._PARES)
+                pares["grupo"] = grupo
+                pares["hash"] = hashes[posiciones]
+                self._pendientes.append(pares)
+                self._n_pendientes += len(posiciones)
+
+        if self._n_pendientes > self.umbral:
+            self._compactar()
+
+    @staticmethod
+    def _normalizar(clave):
+        if isinstance(clave, tuple):
+            return tuple(clave_cp(k) for k in clave)
+        return clave_cp(clave)
+
+    def _compactar(self):
+        if self._pendientes:
+            pares = np.unique(np.concatenate(self._pendientes))
+            self._cubetas.agregar(pares, pares["hash"])
+        self._pendientes = []
+        self._n_pendientes = 0
+
+    def conteos(self) -> dict:
+        """Diccionario grupo -> número de valores únicos"""
+        self._compactar()
+        total = np.zeros(len(self._grupos), dtype=np.int64)
+        for i in range(self._cubetas.n_cubetas):
+            unicos = np.unique(self._cubetas.leer(i))
+            total += np.bincount(unicos["grupo"], minlength=len(total))
+        return {clave: int(total[g]) for clave, g in self._grupos.items()}
+
+
+class FrecuenciaHashes:
+    """Frecuencia de cada valor de una columna a lo largo de todos los bloques"""
+
+    def __init__(self, directorio=None, n_cubetas=1):
+        self._cubetas = CubetasHash(np.uint64, directorio, n_cubetas)
+
+    def agregar(self, valores):
+        hashes = hash_valores(valores)
+        self._cubetas.agregar(hashes, hashes)
+
+    def repetidos(self) -> np.ndarray:
+        """Hashes que aparecen más de una vez (ordenados), una cubeta a la vez"""
+        partes = [np.empty(0, dtype=np.uint64)]
+        for i in range(self._cubetas.n_cubetas):
+            unicos, conteo = np.unique(self._cubetas.leer(i), return_counts=True)
+            partes.append(unicos[conteo > 1])
+        return np.sort(np.concatenate(partes))
+
+
+class DerramePorCP:
+    """
+    Derrama las filas de cada bloque a un archivo temporal por código postal
+
+    Las filas sin CP se guardan aparte (clave None): no generan hojas pero
+    siguen disponibles para la hoja de DUPLICADOS.
+    """
+
+    def __init__(self, directorio: Path, columna: str = "CodigoPostal"):
+        self.directorio = Path(tempfile.mkdtemp(prefix=".derrame_", dir=directorio))
+        self.columna = columna
+        self._archivos = {}
+
+    def agregar(self, bloque: pd.DataFrame):
+        claves = bloque[self.columna]
+        sin_cp = claves.isna()
+        if sin_cp.any():
+            self._escribir(None, bloque.loc[sin_cp])
+        con_cp = bloque.loc[~sin_cp]
+        for clave, posiciones in con_cp.groupby(self.columna).indices.items():
+            self._escribir(clave_cp(clave), con_cp.iloc[posiciones])
+
+    def _escribir(self, clave, parte: pd.DataFrame):
+        ruta = self._archivos.setdefault(
+            clave, self.directorio / f"cp_{len(self._archivos)}.pkl"
+        )
+        with open(ruta, "ab") as f:
+            pickle.dump(parte, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def bloques(self, clave):
+        """Itera los bloques guardados de un CP en el orden original"""
+        ruta = self._archivos.get(clave)
+        if ruta is None:
+            return
+        with open(ruta, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    break
+
+    def todas_las_claves(self) -> list:
+        return list(self._archivos)
+
+    def cerrar(self):
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+
+def _a_celda(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    if valor is pd.NaT or valor is pd.NA:
+        return None
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+def valores_fila(df: pd.DataFrame) -> list:
+    """Filas del DataFrame como listas de valores nativos (nulos -> None)"""
+    datos = df.astype(object).to_numpy().tolist()
+    return [[_a_celda(v) for v in fila] for fila in datos]
+
+
+class HojaStreaming:
+    """Hoja de un LibroStreaming; replica el formato básico de DataFrame.to_excel"""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.filas = 0
+
+    def fila(self, valores, negritas=()):
+        """Agrega una fila; las posiciones en `negritas` van en negrita"""
+        if negritas:
+            from openpyxl.cell import WriteOnlyCell
+            from openpyxl.styles import Font
+
+            valores = list(valores)
+            for i in negritas:
+                if i < len(valores) and valores[i] is not None:
+                    celda = WriteOnlyCell(self.ws, value=valores[i])
+                    celda.font = Font(bold=True)
+                    valores[i] = celda
+        self.ws.append(valores)
+        self.filas += 1
+
+    def encabezado(self, df: pd.DataFrame, index=False):
+        columnas = [str(c) if not isinstance(c, str) else c for c in df.columns]
+        if index:
+            columnas = [df.index.name] + columnas
+        self.fila(columnas, negritas=range(len(columnas)))
+
+    def escribir(self, df: pd.DataFrame, index=False):
+        """Agrega las filas de un bloque (sin encabezado)"""
+        if index:
+            df = df.reset_index()
+        for valores in valores_fila(df):
+            self.fila(valores, negritas=(0,) if index else ())
+
+    def cerrar(self):
+        """Termina la hoja y libera su archivo temporal abierto"""
+        self.ws.close()
+
+
+class LibroStreaming:
+    """Libro xlsx en modo write_only: memoria constante sin importar el tamaño"""
+
+    def __init__(self, ruta: Path):
+        from openpyxl import Workbook
+
+        self.ruta = Path(ruta)
+        self.wb = Workbook(write_only=True)
+
+    def hoja(self, nombre: str) -> HojaStreaming:
+        return HojaStreaming(self.wb.create_sheet(str(nombre)[:31]))
+
+    def guardar(self):
+        self.wb.save(self.ruta)
+
+
+def copiar_hoja(origen: Path, hoja: HojaStreaming):
+    """Copia la primera hoja de `origen` fila por fila (como read_excel + to_excel)"""
+    columnas, filas = iterar_filas_excel(origen)
+    hoja.fila(columnas, negritas=range(len(columnas)))
+    for fila in filas:
+        hoja.fila(list(fila))
+
+
+class Plegado:
+    """
+    Agregado incremental por bloques
+
+    `reducir` se aplica a cada bloque y después a la unión de los parciales,
+    por lo que debe ser asociativa (sumas por grupo, último valor por clave).
+    """
+
+    def __init__(self, reducir, max_parciales: int = 16):
+        self.reducir = reducir
+        self.max_parciales = max_parciales
+        self._parciales = []
+
+    def agregar(self, df: pd.DataFrame):
+        self._parciales.append(self.reducir(df))
+        if len(self._parciales) > self.max_parciales:
+            self._plegar()
+
+    def _plegar(self):
+        self._parciales = [self.reducir(pd.concat(self._parciales, ignore_index=True))]
+
+    def resultado(self) -> pd.DataFrame:
+        self._plegar()
+        return self._parciales[0]
@@ -0,0 +1,747 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Proceso CAJA - Análisis de pagos y evidencias
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import eventos
+from .bajo_memoria import (
+    PRESUPUESTO_DEFAULT_MB,
+    ConteoUnico,
+    LibroStreaming,
+    Plegado,
+    copiar_hoja,
+    cubetas_para_presupuesto,
+)
+from .cancelacion import Cancelado, revisar
+from .ingesta import (
+    CargaConcurrente,
+    columnas_faltantes,
+    contar_filas_excel,
+    iterar_bloques_excel,
+    leer_encabezado,
+    leer_sistema,
+)
+from .metricas import Corrida
+from .perfiles import CARPETA_PERFILES, Perfilador, perfilar_etapa
+from .pipeline import Pipeline, observar
+from .utils import ensure_dirs
+
+KEYS_EVIDENCIAS = ["FolioImpreso", "fechapago"]
+
+META_COLS = [
+    "NumerodeCuenta",
+    "Propietario",
+    "Domicilio",
+    "Colonia",
+    "CodigoPostal",
+    "AñoInicial",
+    "BimestreInicial",
+    "AñoFinal",
+    "BimestreFinal",
+]
+
+# Columnas de SISTEMA que usa CAJA, en el orden en que se reportan
+COLUMNAS_REQUERIDAS = [
+    "fechapago",
+    "pagdCosto",
+    "pagdDescuento",
+    "pagIva",
+    "pagdAño",
+    "conDescripcion",
+    "FolioImpreso",
+] + META_COLS
+
+BASE_IIWA = "BASE IIWA 2024-6 Anteriores y sin Mejoras Ambientales"
+ARCHIVO_2024_6 = "2024-6_anteriores_y_sin_mejoras_ambientales.xlsx"
+
+# ====================================
+# FUNCIONES DE PROCESAMIENTO CAJA
+# ====================================
+
+
+def _normalizar_fechapago(df: pd.DataFrame):
+    """fechapago como texto AAAA-MM-DD"""
+    df["fechapago"] = pd.to_datetime(df["fechapago"], yearfirst=True).dt.strftime(
+        "%Y-%m-%d"
+    )
+
+
+def _mascara_rezago(df: pd.DataFrame) -> pd.Series:
+    """Pagos de 2024-6 y anteriores sin mejoras ambientales"""
+    return (df["conDescripcion"] != "MEJORAS AMBIENTALES") & (df["pagdAño"] < 2025)
+
+
+def _centavos(df: pd.DataFrame) -> pd.Series:
+    return (
+        (pd.to_numeric(df["pagdCosto"], errors="coerce") * 100).round().astype("Int64")
+    )
+
+
+def _suma_centavos(df: pd.DataFrame) -> pd.DataFrame:
+    return df.groupby(KEYS_EVIDENCIAS, dropna=False, as_index=False)["_cents"].sum()
+
+
+def _ultima_meta(df: pd.DataFrame) -> pd.DataFrame:
+    return df[KEYS_EVIDENCIAS + META_COLS].drop_duplicates(KEYS_EVIDENCIAS, keep="last")
+
+
+def _evidencias_x_fecha(rezago_cents, pago_total_cents, meta) -> pd.DataFrame:
+    """Une pagos, rezago y datos de la cuenta por (FolioImpreso, fechapago)"""
+
+    def redondear(x):
+        return round(x, 2)
+
+    rezago_cents = rezago_cents.rename(columns={"_cents": "_rezago_cents"})
+    pago_total_cents = pago_total_cents.rename(columns={"_cents": "_pago_cents"})
+
+    def with_key_sentinel(d):
+        out = d.copy()
+        out["k_folio"] = out["FolioImpreso"].astype("string").fillna("__NA__")
+        out["k_fecha"] = out["fechapago"].astype("string").fillna("__NA__")
+        return out
+
+    rezago_k = with_key_sentinel(rezago_cents)
+    pago_k = with_key_sentinel(pago_total_cents)
+    keys_all = pd.concat(
+        [rezago_k[["k_folio", "k_fecha"]], pago_k[["k_folio", "k_fecha"]]],
+        ignore_index=True,
+    ).drop_duplicates()
+
+    base = keys_all.merge(
+        pago_k[["k_folio", "k_fecha", "_pago_cents"]],
+        on=["k_folio", "k_fecha"],
+        how="left",
+    ).merge(
+        rezago_k[["k_folio", "k_fecha", "_rezago_cents"]],
+        on=["k_folio", "k_fecha"],
+        how="left",
+    )
+
+    base["FolioImpreso"] = base["k_folio"].replace({"__NA__": np.nan})
+    base["fechapago"] = base["k_fecha"].replace({"__NA__": np.nan})
+
+    evidencias_x_fecha = base.merge(meta, on=KEYS_EVIDENCIAS, how="left")
+
+    evidencias_x_fecha["pago"] = (evidencias_x_fecha["_pago_cents"] / 100).astype(float)
+    evidencias_x_fecha["REZAGO IIWA 2024-6 y anteriores (pagdCosto)"] = (
+        (evidencias_x_fecha["_rezago_cents"] / 100).fillna(0.0).astype(float)
+    )
+    evidencias_x_fecha["20% IIWA"] = (
+        evidencias_x_fecha["REZAGO IIWA 2024-6 y anteriores (pagdCosto)"] * 0.20
+    )
+
+    orden_columnas = META_COLS + [
+        "fechapago",
+        "FolioImpreso",
+        "pago",
+        "REZAGO IIWA 2024-6 y anteriores (pagdCosto)",
+        "20% IIWA",
+    ]
+    evidencias_x_fecha = evidencias_x_fecha[orden_columnas].copy()
+    evidencias_x_fecha.index += 1
+
+    for c in ["pago", "REZAGO IIWA 2024-6 y anteriores (pagdCosto)", "20% IIWA"]:
+        evidencias_x_fecha[c] = evidencias_x_fecha[c].apply(redondear)
+
+    return evidencias_x_fecha
+
+
+def _pagos_diarios(diarios: pd.DataFrame, base_por_dia: pd.DataFrame):
+    """
+    Tabla PAGOS DIARIOS
+
+    Args:
+        diarios: por fechapago, FolioImpreso (únicos) y sumas de pagdCosto,
+            pagdDescuento y pagIva
+        base_por_dia: suma de pagdCosto del rezago por fechapago
+    """
+    orden_pagos = [
+        "DIAS",
+        "# DE CUENTAS",
+        "PAGO CAJA",
+        BASE_IIWA,
+        "pagdDescuento",
+        "pagIva",
+    ]
+
+    pagos_diarios = diarios.rename(
+        columns={
+            "fechapago": "DIAS",
+            "FolioImpreso": "# DE CUENTAS",
+            "pagdCosto": "PAGO CAJA",
+        }
+    )
+    pagos_diarios[BASE_IIWA] = np.nan
+    pagos_diarios = pagos_diarios[orden_pagos]
+
+    pagos_diarios["DIAS"] = pd.to_datetime(pagos_diarios["DIAS"]).dt.strftime("%d-%b")
+    pagos_diarios.set_index("DIAS", inplace=True)
+
+    base_por_dia = base_por_dia.rename(columns={"pagdCosto": BASE_IIWA})
+
+    tmp = base_por_dia.copy()
+    tmp["DIAS"] = pd.to_datetime(tmp["fechapago"]).dt.strftime("%d-%b")
+    tmp = tmp[["DIAS", BASE_IIWA]].set_index("DIAS")
+
+    pagos_diarios[BASE_IIWA] = pagos_diarios.index.map(tmp[BASE_IIWA]).fillna(0.0)
+    return pagos_diarios
+
+
+def _pagos_x_cp(por_cp: pd.DataFrame, base_por_cp: pd.DataFrame):
+    """
+    Tabla PAGOS POR C.P.
+
+    Args:
+        por_cp: por CodigoPostal, FolioImpreso (únicos) y suma de pagdCosto
+        base_por_cp: suma de pagdCosto del rezago por CodigoPostal
+    """
+    pagos_x_cp = por_cp.rename(
+        columns={
+            "CodigoPostal": "C.P.",
+            "FolioImpreso": "NUMERO DE CUENTAS",
+            "pagdCosto": "PAGO CAJA POR C.P.",
+        }
+    )
+    pagos_x_cp[BASE_IIWA] = np.nan
+    pagos_x_cp.set_index("C.P.", inplace=True)
+
+    base_por_cp = base_por_cp.rename(
+        columns={"pagdCosto": BASE_IIWA, "CodigoPostal": "C.P."}
+    )
+
+    tmp = base_por_cp.copy()
+    tmp = tmp[["C.P.", BASE_IIWA]].set_index("C.P.")
+
+    pagos_x_cp[BASE_IIWA] = pagos_x_cp.index.map(tmp[BASE_IIWA]).fillna(0.0)
+    pagos_x_cp["20% IIWA"] = pagos_x_cp[BASE_IIWA] * 0.20
+    return pagos_x_cp
+
+
+def _leer_auxiliares(carga: CargaConcurrente, data_dir: Path):
+    """Inicia en segundo plano la lectura de REGISTROS.csv y FOLIOS.csv
+
+    Returns:
+        (futuro de REGISTROS, futuro de FOLIOS); None si falta alguno
+    """
+    registros_path = data_dir / "REGISTROS.csv"
+    folios_path = data_dir / "FOLIOS.csv"
+    if not (registros_path.exists() and folios_path.exists()):
+        return None
+    return (
+        carga.csv(registros_path, encoding="latin1", index_col=1),
+        carga.csv(folios_path, encoding="latin1"),
+    )
+
+
+def _reportar_auxiliares(data_dir: Path, log_func):
+    """Registra en el log si REGISTROS.csv y FOLIOS.csv están disponibles"""
+    registros_path = data_dir / "REGISTROS.csv"
+    folios_path = data_dir / "FOLIOS.csv"
+
+    log_func(f"Buscando archivos en: {data_dir}")
+    log_func(
+        f"REGISTROS.csv: {'Encontrado' if registros_path.exists() else 'No encontrado'} en {registros_path}"
+    )
+    log_func(
+        f"FOLIOS.csv: {'Encontrado' if folios_path.exists() else 'No encontrado'} en {folios_path}"
+    )
+
+    # Listar archivos disponibles para ayudar con debug
+    try:
+        files_in_data = list(data_dir.glob("*.csv"))
+        log_func(
+            f"Archivos CSV encontrados en carpeta de datos: {[f.name for f in files_in_data]}"
+        )
+    except Exception:
+        pass
+
+
+def _enlazar_registros(evidencias_x_fecha, log_func, auxiliares):
+    """
+    Pasos 5 y 6: enlaza evidencias con REGISTROS.csv y FOLIOS.csv
+
+    Returns:
+        (evidencias con folio_notif, evidencias sin folio con coordenadas) o
+        None si faltan los archivos
+    """
+    if auxiliares is None:
+        log_func(
+            "[5-6/7] Saltando procesamiento de REGISTROS/FOLIOS (archivos no encontrados)"
+        )
+        return None
+
+    log_func("[5/7] Enlazando REGISTROS y FOLIOS…")
+
+    registros, folios = auxiliares
+    df_registros = registros.result()
+    dict_folio_num = folios.result().dropna()
+    dict_folio_num.index = dict_folio_num.pop("NumerodeCuenta").astype(str).str.strip()
+
+    evidencias_x_fecha = evidencias_x_fecha.copy()
+    evidencias_x_fecha.index = evidencias_x_fecha.pop("NumerodeCuenta")
+    evidencias_x_fecha = evidencias_x_fecha.sort_values("fechapago", ascending=True)
+    df_registros.index = df_registros.index.astype(str).str.strip()
+    evidencias_x_fecha.index = evidencias_x_fecha.index.astype(str).str.strip()
+
+    inter = evidencias_x_fecha.index.intersection(df_registros.index)
+    e_folio_geo = evidencias_x_fecha.loc[inter]
+
+    if "folio_notif" not in e_folio_geo.columns:
+        e_folio_geo.insert(0, "folio_notif", np.nan)
+    e_folio_geo["folio_notif"] = e_folio_geo.index.map(
+        df_registros["folio_notif"].to_dict()
+    )
+
+    evidencias_x_fecha.loc[inter, "folio_notif"] = e_folio_geo["folio_notif"]
+    evidencias_x_fecha.insert(0, "folio_notif", evidencias_x_fecha.pop("folio_notif"))
+
+    inter_dict = evidencias_x_fecha.index.intersection(dict_folio_num.index)
+    alt = dict_folio_num.loc[inter_dict, "FOLIO IIWA"].drop_duplicates()
+    evidencias_x_fecha["folio_notif"] = evidencias_x_fecha["folio_notif"].fillna(alt)
+
+    resultado = evidencias_x_fecha.sort_index(kind="mergesort")
+
+    log_func(
+        f"Cuentas con folio notif: {len(resultado.loc[resultado['folio_notif'].notna()])}"
+    )
+    log_func(
+        f"Cuentas sin folio notif: {len(resultado.loc[resultado['folio_notif'].isna()])}"
+    )
+    log_func(f"Total de folios: {len(resultado)}")
+
+    sin_geo = resultado.loc[resultado["folio_notif"].isna()]
+    sin_geo["latitud_not"] = sin_geo.index.map(df_registros["latitud_not"].to_dict())
+    sin_geo["longitud_not"] = sin_geo.index.map(df_registros["longitud_not"].to_dict())
+
+    log_func("[6/7] Generando EVIDENCIAS C.P. y FECHA PAGO…")
+    # Lógica similar para evidencias_cp_fecha...
+    return resultado, sin_geo
+
+
+def _escribir_enlace(enlace, caja_output_dir: Path):
+    """Salidas de los pasos 5 y 6 (nada si faltaron REGISTROS/FOLIOS)"""
+    if enlace is None:
+        return
+    resultado, sin_geo = enlace
+    out_geo = caja_output_dir / "E. folio Geolocalización.xlsx"
+    resultado.groupby("CodigoPostal", group_keys=True, as_index=True).apply(
+        lambda x: x.sort_values("fechapago", ascending=True)
+    ).to_excel(out_geo)
+    sin_geo.to_excel(caja_output_dir / "sin_folio.xlsx")
+
+
+def _archivos_a_consolidar(caja_output_dir: Path) -> list:
+    """Salidas intermedias que se agregan como hojas a REPORTE_COMPLETO"""
+    return [
+        archivo
+        for archivo in caja_output_dir.glob("*.xlsx")
+        if archivo.name != "REPORTE_COMPLETO.xlsx" and not archivo.name.startswith("~")
+    ]
+
+
+def _limpiar_temporales(archivos_procesados, log_func):
+    # Eliminar archivos temporales después de consolidar
+    log_func("Limpiando archivos temporales...")
+    for archivo in archivos_procesados:
+        try:
+            archivo.unlink()  # Eliminar archivo
+            log_func(f"Archivo temporal eliminado: {archivo.name}")
+        except Exception as e:
+            eventos.error(log_func, f"Error eliminando {archivo.name}: {e}")
+
+
+def _cargar_sistema(sistema_path: Path, log_func) -> pd.DataFrame:
+    log_func(f"Leyendo: {sistema_path}")
+    df = leer_sistema(sistema_path, log_func)
+    _normalizar_fechapago(df)
+    return df
+
+
+def _agregados_caja(df: pd.DataFrame, log_func) -> dict:
+    """Pasos 1 a 4: rezago 2024-6, evidencias, pagos diarios y pagos por C.P."""
+    # 2024-6 anteriores y sin mejoras
+    log_func("[1/7] Calculando 2024-6 anteriores y sin mejoras…")
+    df_filtrado = df[_mascara_rezago(df)]
+
+    # EVIDENCIAS-X fecha de pago
+    log_func("[2/7] Calculando evidencias por fecha de pago…")
+    con_cents = df.assign(_cents=_centavos(df))
+    filtrado_cents = df_filtrado.assign(_cents=_centavos(df_filtrado))
+
+    evidencias_x_fecha = _evidencias_x_fecha(
+        _suma_centavos(filtrado_cents),
+        _suma_centavos(con_cents),
+        _ultima_meta(con_cents),
+    )
+
+    # PAGOS DIARIOS
+    log_func("[3/7] Calculando PAGOS DIARIOS…")
+    diarios = df.groupby(["fechapago"], as_index=False).agg(
+        {
+            "FolioImpreso": "nunique",
+            "pagdCosto": "sum",
+            "pagdDescuento": "sum",
+            "pagIva": "sum",
+        }
+    )
+    base_por_dia = df_filtrado.groupby(["fechapago"], as_index=False)["pagdCosto"].sum()
+    pagos_diarios = _pagos_diarios(diarios, base_por_dia)
+
+    # PAGOS X C.P.
+    log_func("[4/7] Calculando PAGOS POR C.P.…")
+    por_cp = df.groupby(["CodigoPostal"], as_index=False).agg(
+        {"FolioImpreso": "nunique", "pagdCosto": "sum"}
+    )
+    base_por_cp = df_filtrado.groupby(["CodigoPostal"], as_index=False)[
+        "pagdCosto"
+    ].sum()
+    pagos_x_cp = _pagos_x_cp(por_cp, base_por_cp)
+
+    return {
+        "filtrado": df_filtrado,
+        "evidencias_x_fecha": evidencias_x_fecha,
+        "pagos_diarios": pagos_diarios,
+        "pagos_x_cp": pagos_x_cp,
+    }
+
+
+def _emitir_caja(df, tablas: dict, enlace, caja_output_dir: Path, log_func) -> Path:
+    """Escribe las salidas intermedias y las consolida en REPORTE_COMPLETO"""
+    tablas["filtrado"].to_excel(caja_output_dir / ARCHIVO_2024_6)
+    tablas["evidencias_x_fecha"].to_excel(caja_output_dir / "evidencias_x_fecha.xlsx")
+    tablas["pagos_diarios"].to_excel(caja_output_dir / "pagos_diarios.xlsx")
+    tablas["pagos_x_cp"].to_excel(caja_output_dir / "pagos_x_cp.xlsx")
+    _escribir_enlace(enlace, caja_output_dir)
+
+    # Consolidar a Excel final
+    log_func("[7/7] Consolidando a Excel final…")
+    salida_path = caja_output_dir / "REPORTE_COMPLETO.xlsx"
+
+    with pd.ExcelWriter(salida_path, engine="openpyxl") as writer:
+        # Hoja SISTEMA - el archivo seleccionado ya leído, sin volver a
+        # procesar el xlsx
+        df.to_excel(writer, sheet_name="SISTEMA", index=False)
+
+        # Agregar archivos de salida de la carpeta caja_output
+        archivos_procesados = []
+        for archivo in _archivos_a_consolidar(caja_output_dir):
+            revisar()
+            try:
+                df_temp = pd.read_excel(archivo, engine="openpyxl")
+                sheet_name = archivo.stem[:31]  # Limitar nombre de hoja
+                df_temp.to_excel(writer, sheet_name=sheet_name, index=False)
+                archivos_procesados.append(archivo)
+                log_func(f"Agregado al reporte: {archivo.name}")
+            except Exception as e:
+                eventos.error(log_func, f"Error procesando {archivo.name}: {e}")
+
+    _limpiar_temporales(archivos_procesados, log_func)
+    return salida_path
+
+
+def run_proceso_caja(
+    sistema_path: Path,
+    data_dir: Path,
+    output_dir: Path,
+    log_func,
+    bajo_memoria: bool = False,
+    presupuesto_mb: int = PRESUPUESTO_DEFAULT_MB,
+    cache_dir: Path = None,
+    solo_reportes: bool = False,
+    perfilar: str = None,
+    reutilizar: bool = True,
+    historial: Path = None,
+):
+    """Ejecuta el proceso CAJA
+
+    Args:
+        cache_dir: carpeta de caché de etapas (pipeline.Pipeline); con ella
+            sólo se recalculan las etapas cuyas entradas cambiaron
+        solo_reportes: regenera los reportes con las últimas tablas guardadas
+            en cache_dir, sin abrir SISTEMA
+        bajo_memoria: procesa SISTEMA por bloques sin cargarlo completo
+        presupuesto_mb: en modo bajo_memoria, memoria con la que se dimensionan
+            los bloques de SISTEMA y las cubetas de folios en disco; las sumas
+            por fecha, CP y cuenta siguen creciendo con el número de grupos
+        perfilar: "cprofile" o "muestreo" para dejar el perfil de cada etapa
+            en caja_output/perfiles (None = sin perfilar)
+        reutilizar: con False se recalcula todo aunque cache_dir tenga las
+            etapas, salvo que la corrida anterior no haya terminado; entonces
+            se reanuda desde la última etapa guardada
+        historial: base SQLite donde se agregan los pagos de este SISTEMA
+            (ver historial.py); None = no se registra. No se alimenta con
+            solo_reportes ni en modo bajo_memoria
+
+    Se puede cancelar entre etapas y entre bloques (ver cancelacion.py).
+    """
+    carga = CargaConcurrente()
+    corrida = Corrida("CAJA")
+    try:
+        perfilador = (
+            Perfilador(
+                output_dir / "caja_output" / CARPETA_PERFILES,
+                perfilar,
+                log_func=log_func,
+            )
+            if perfilar
+            else None
+        )
+        eventos.seccion(log_func, "=== INICIANDO PROCESO CAJA ===")
+        log_func(f"Archivo SISTEMA: {sistema_path}")
+        log_func(f"Carpeta de datos: {data_dir}")
+        log_func(f"Carpeta de salida: {output_dir}")
+
+        ensure_dirs(data_dir, output_dir)
+
+        # Crear carpeta organizada para CAJA desde el inicio
+        caja_output_dir = output_dir / "caja_output"
+        ensure_dirs(caja_output_dir)
+
+        if solo_reportes and cache_dir is None:
+            return False, "Regenerar sólo reportes requiere una carpeta de caché"
+
+        # Usar el archivo SISTEMA seleccionado por el usuario, no buscar en data_dir
+        if not solo_reportes and not sistema_path.exists():
+            return False, f"No existe el archivo SISTEMA seleccionado: {sistema_path}"
+
+        # Validar columnas requeridas leyendo solo el encabezado
+        faltantes = (
+            []
+            if solo_reportes
+            else columnas_faltantes(leer_encabezado(sistema_path), COLUMNAS_REQUERIDAS)
+        )
+        if faltantes:
+            return False, f"Columna faltante en SISTEMA.xlsx: {', '.join(faltantes)}"
+
+        # REGISTROS y FOLIOS se leen en hilos mientras SISTEMA se lee y
+        # procesa en este proceso
+        auxiliares = None if solo_reportes else _leer_auxiliares(carga, data_dir)
+
+        if bajo_memoria and not solo_reportes:
+            with corrida.medir("bajo_memoria"), perfilar_etapa(
+                perfilador, "caja", "bajo_memoria"
+            ):
+                resultado = _caja_bajo_memoria(
+                    sistema_path,
+                    data_dir,
+                    caja_output_dir,
+                    log_func,
+                    presupuesto_mb,
+                    auxiliares,
+                )
+            corrida.cerrar(caja_output_dir, log_func)
+            return resultado
+
+        _reportar_auxiliares(data_dir, log_func)
+        pipeline = Pipeline(cache_dir, log_func, "caja", perfilador, reutilizar)
+        pipeline.etapa(
+            "carga",
+            lambda: _cargar_sistema(sistema_path, log_func),
+            archivos=[sistema_path],
+            tablas=True,
+        )
+        pipeline.etapa(
+            "agregados",
+            lambda df: _agregados_caja(df, log_func),
+            ["carga"],
+            tablas=True,
+        )
+        pipeline.etapa(
+            "enlace",
+            lambda tablas: _enlazar_registros(
+                tablas["evidencias_x_fecha"], log_func, auxiliares
+            ),
+            ["agregados"],
+            archivos=[data_dir / "REGISTROS.csv", data_dir / "FOLIOS.csv"],
+        )
+        pipeline.etapa(
+            "emitir",
+            lambda df, tablas, enlace: _emitir_caja(
+                df, tablas, enlace, caja_output_dir, log_func
+            ),
+            ["carga", "agregados", "enlace"],
+            memoizar=False,
+        )
+        with observar(corrida.registrar), pipeline.corrida():
+            if solo_reportes:
+                for nombre in ("carga", "agregados", "enlace"):
+                    pipeline.ultimo(nombre)
+            salida_path = pipeline.resultado("emitir")
+
+        if historial and not solo_reportes:
+            from .historial import alimentar
+
+            with corrida.medir("historial"):
+                alimentar(
+                    historial,
+                    "CAJA",
+                    sistema_path,
+                    pipeline.resultado("agregados")["evidencias_x_fecha"],
+                    log_func,
+                )
+
+        eventos.exito(
+            log_func, f"PROCESO CAJA COMPLETADO. Reporte final: {salida_path}"
+        )
+        log_func(f"Archivos organizados en: {caja_output_dir}")
+        corrida.cerrar(caja_output_dir, log_func)
+        return True, caja_output_dir
+
+    except Cancelado as e:
+        eventos.aviso(log_func, f"{e}")
+        return False, str(e)
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+    finally:
+        carga.cerrar()
+
+
+# ====================================
+# MODO BAJO CONSUMO DE MEMORIA
+# ====================================
+
+
+def _con_conteo_folios(sumas: pd.DataFrame, clave: str, conteo: ConteoUnico):
+    """Inserta FolioImpreso (únicos) después de la clave, como en groupby().agg"""
+    conteos = conteo.conteos()
+    sumas.insert(1, "FolioImpreso", sumas[clave].map(conteos).astype(np.int64))
+    return sumas
+
+
+def _caja_bajo_memoria(
+    sistema_path: Path,
+    data_dir: Path,
+    caja_output_dir: Path,
+    log_func,
+    presupuesto_mb: int,
+    auxiliares,
+):
+    """
+    CAJA por bloques: sumas por grupo plegadas bloque a bloque y folios únicos
+    con hashes; las hojas grandes se escriben fila por fila
+    """
+    log_func(f"Leyendo por bloques ({presupuesto_mb} MB): {sistema_path}")
+
+    salida_path = caja_output_dir / "REPORTE_COMPLETO.xlsx"
+    reporte = LibroStreaming(salida_path)
+    hoja_sistema = reporte.hoja("SISTEMA")
+    libro_2024_6 = LibroStreaming(caja_output_dir / ARCHIVO_2024_6)
+    hoja_2024_6 = libro_2024_6.hoja("Sheet1")
+
+    pago_cents = Plegado(_suma_centavos)
+    rezago_cents = Plegado(_suma_centavos)
+    meta = Plegado(_ultima_meta)
+    diarios = Plegado(
+        lambda d: d.groupby(["fechapago"], as_index=False)[
+            ["pagdCosto", "pagdDescuento", "pagIva"]
+        ].sum()
+    )
+    base_por_dia = Plegado(
+        lambda d: d.groupby(["fechapago"], as_index=False)["pagdCosto"].sum()
+    )
+    por_cp = Plegado(
+        lambda d: d.groupby(["CodigoPostal"], as_index=False)["pagdCosto"].sum()
+    )
+    base_por_cp = Plegado(
+        lambda d: d.groupby(["CodigoPostal"], as_index=False)["pagdCosto"].sum()
+    )
+    # Los folios únicos por fecha y por CP se cuentan en cubetas en disco
+    temporales = Path(tempfile.mkdtemp(prefix=".conteos_", dir=caja_output_dir))
+    try:
+        log_func("[1/7] Calculando 2024-6 anteriores y sin mejoras…")
+        n_filas = 0
+        for bloque in iterar_bloques_excel(sistema_path, presupuesto_mb):
+            revisar()
+            _normalizar_fechapago(bloque)
+            if n_filas == 0:
+                hoja_sistema.encabezado(bloque)
+                hoja_2024_6.encabezado(bloque, index=True)
+                bytes_fila = bloque.memory_usage(deep=True).sum() / max(len(bloque), 1)
+                cubetas = {
+                    "directorio": temporales,
+                    "n_cubetas": cubetas_para_presupuesto(
+                        contar_filas_excel(sistema_path), bytes_fila, presupuesto_mb
+                    ),
+                }
+                folios_por_dia = ConteoUnico(**cubetas)
+                folios_por_cp = ConteoUnico(**cubetas)
+            hoja_sistema.escribir(bloque)
+
+            filtrado = bloque.loc[_mascara_rezago(bloque)]
+            hoja_2024_6.escribir(filtrado, index=True)
+
+            bloque["_cents"] = _centavos(bloque)
+            filtrado = bloque.loc[filtrado.index]
+            pago_cents.agregar(bloque)
+            rezago_cents.agregar(filtrado)
+            meta.agregar(bloque)
+            diarios.agregar(bloque)
+            base_por_dia.agregar(filtrado)
+            por_cp.agregar(bloque)
+            base_por_cp.agregar(filtrado)
+            folios_por_dia.agregar(bloque["fechapago"], bloque["FolioImpreso"])
+            folios_por_cp.agregar(bloque["CodigoPostal"], bloque["FolioImpreso"])
+
+            n_filas += len(bloque)
+            eventos.detalle(
+                log_func, f"  {n_filas} filas procesadas", "bajo_memoria", filas=n_filas
+            )
+
+        libro_2024_6.guardar()
+
+        log_func("[2/7] Calculando evidencias por fecha de pago…")
+        evidencias_x_fecha = _evidencias_x_fecha(
+            rezago_cents.resultado(), pago_cents.resultado(), meta.resultado()
+        )
+        evidencias_x_fecha.to_excel(caja_output_dir / "evidencias_x_fecha.xlsx")
+
+        log_func("[3/7] Calculando PAGOS DIARIOS…")
+        pagos_diarios = _pagos_diarios(
+            _con_conteo_folios(diarios.resultado(), "fechapago", folios_por_dia),
+            base_por_dia.resultado(),
+        )
+        pagos_diarios.to_excel(caja_output_dir / "pagos_diarios.xlsx")
+
+        log_func("[4/7] Calculando PAGOS POR C.P.…")
+        pagos_x_cp = _pagos_x_cp(
+            _con_conteo_folios(por_cp.resultado(), "CodigoPostal", folios_por_cp),
+            base_por_cp.resultado(),
+        )
+        pagos_x_cp.to_excel(caja_output_dir / "pagos_x_cp.xlsx")
+
+        _reportar_auxiliares(data_dir, log_func)
+        _escribir_enlace(
+            _enlazar_registros(evidencias_x_fecha, log_func, auxiliares),
+            caja_output_dir,
+        )
+
+        log_func("[7/7] Consolidando a Excel final…")
+        archivos_procesados = []
+        for archivo in _archivos_a_consolidar(caja_output_dir):
+            revisar()
+            try:
+                copiar_hoja(archivo, reporte.hoja(archivo.stem[:31]))
+                archivos_procesados.append(archivo)
+                log_func(f"Agregado al reporte: {archivo.name}")
+            except Exception as e:
+                eventos.error(log_func, f"Error procesando {archivo.name}: {e}")
+        reporte.guardar()
+
+        _limpiar_temporales(archivos_procesados, log_func)
+
+        eventos.exito(
+            log_func, f"PROCESO CAJA COMPLETADO. Reporte final: {salida_path}"
+        )
+        log_func(f"Archivos organizados en: {caja_output_dir}")
+        return True, caja_output_dir
+    finally:
+        shutil.rmtree(temporales, ignore_errors=True)
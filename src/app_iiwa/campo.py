@@ -0,0 +1,964 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Proceso CAMPO - Análisis de rezagos de agua por código postal
+"""
+
+import heapq
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import eventos
+from .backends import (
+    BACKEND_DEFAULT,
+    COLUMNAS_TOTAL,
+    MONTOS_MACRO,
+    base_macro,
+    calcular_tablas_campo,
+    calcular_total,
+    con_total_general,
+    consolidar_detalle,
+    cuentas_duplicadas,
+    filas_2025,
+)
+from .bajo_memoria import (
+    PRESUPUESTO_DEFAULT_MB,
+    ConteoUnico,
+    DerramePorCP,
+    FrecuenciaHashes,
+    LibroStreaming,
+    cubeta_de,
+    cubetas_para_presupuesto,
+    hash_valores,
+    ordenar_claves,
+    valores_fila,
+)
+from .cancelacion import Cancelado, revisar
+from .constantes import PRIORIDAD_DEFAULT
+from .cubo import CARPETA_CUBO, construir_cubo, guardar_cubo
+from .ingesta import (
+    CargaConcurrente,
+    columnas_faltantes,
+    contar_filas_excel,
+    filas_para_presupuesto,
+    iterar_bloques_excel,
+    leer_encabezado,
+    leer_sistema,
+)
+from .metricas import Corrida
+from .paralelo import particion_por_cp
+from .perfiles import CARPETA_PERFILES, Perfilador, perfilar_etapa
+from .pipeline import Pipeline, observar
+from .utils import ensure_dirs
+
+# Columnas de SISTEMA que usa CAMPO, en el orden en que se reportan
+COLUMNAS_REQUERIDAS = COLUMNAS_TOTAL + [
+    "ClaveCatastral",
+    "Propietario",
+    "CodigoPostal",
+    "UltimoPago",
+    "TipoConsumo",
+    "TipoConexion",
+    "Zona",
+    "bimInicial",
+    "bimfinal",
+]
+
+# Columnas que se construyen si SISTEMA no las trae
+COLUMNAS_DERIVABLES = {
+    "NumerodeCuenta": ["Principal", "Derivada"],
+    "Domicilio": [
+        "vialDescripcion",
+        "callNombre",
+        "manzana",
+        "lote",
+        "exterior",
+        "Interior",
+        "Edificio",
+        "departamento",
+    ],
+}
+
+# ====================================
+# FUNCIONES DE PROCESAMIENTO CAMPO
+# ====================================
+
+
+def exportar_resumenes_en_grid(
+    df_cps: dict,
+    ruta_salida: str,
+    hoja="ResumenCPs",
+    por_fila=4,
+    pad_filas=2,
+    pad_cols=2,
+):
+    """Exporta resúmenes de CPs en formato grid"""
+
+    def _key(cp):
+        s = str(cp)
+        return (0, int(s)) if s.isdigit() else (1, s)
+
+    items = sorted(df_cps.items(), key=lambda kv: _key(kv[0]))
+
+    block_widths = {cp: df.shape[1] + 1 for cp, df in items}
+    block_heights = {cp: df.shape[0] + 2 for cp, df in items}
+    max_block_width = max(block_widths.values()) if block_widths else 2
+
+    with pd.ExcelWriter(ruta_salida, engine="xlsxwriter") as writer:
+        wb = writer.book
+        ws = wb.add_worksheet(hoja)
+        writer.sheets[hoja] = ws
+
+        fmt_titulo = wb.add_format({"bold": True})
+        fmt_header = wb.add_format({"bold": True, "bg_color": "#F2F2F2"})
+
+        fila_actual = 0
+        for i in range(0, len(items), por_fila):
+            fila_items = items[i : i + por_fila]
+            altura_fila = max(block_heights[cp] for cp, _ in fila_items) + pad_filas
+
+            for j, (cp, df_bloque) in enumerate(fila_items):
+                col_inicio = j * (max_block_width + pad_cols)
+                ws.write(fila_actual, col_inicio, f"CP {cp}", fmt_titulo)
+
+                df_bloque.to_excel(
+                    writer,
+                    sheet_name=hoja,
+                    startrow=fila_actual + 1,
+                    startcol=col_inicio,
+                    header=True,
+                    index=True,
+                )
+
+                n_cols_visibles = df_bloque.shape[1] + 1
+                ws.set_row(fila_actual + 1, None, fmt_header)
+                ws.set_column(col_inicio, col_inicio + n_cols_visibles - 1, 18)
+
+            fila_actual += altura_fila
+
+
+def _como_texto(serie: pd.Series) -> pd.Series:
+    """astype(str) sin el ".0" de los enteros que se leyeron como flotantes"""
+    texto = serie.astype(str)
+    if pd.api.types.is_float_dtype(serie):
+        # Una columna entera con algún nulo llega como float64; sin esto la
+        # misma cuenta sería "367-0" o "367-0.0" según el bloque en que cae
+        enteros = serie.notna() & (serie % 1 == 0) & (serie.abs() < 2**63)
+        texto[enteros] = serie[enteros].astype(np.int64).astype(str)
+    return texto
+
+
+def _crear_columnas(df: pd.DataFrame, log_func=None):
+    """Crea NumerodeCuenta y Domicilio si SISTEMA no los trae"""
+    if "NumerodeCuenta" not in df.columns:
+        if log_func:
+            log_func("Creando columna # de cuenta")
+        df["NumerodeCuenta"] = (
+            _como_texto(df["Principal"]) + "-" + _como_texto(df["Derivada"])
+        )
+
+    if "Domicilio" not in df.columns:
+        if log_func:
+            log_func("Creando columna domicilio")
+        df["Domicilio"] = (
+            _como_texto(df["vialDescripcion"])
+            + " "
+            + _como_texto(df["callNombre"])
+            + " "
+            + _como_texto(df["manzana"])
+            + " "
+            + _como_texto(df["lote"])
+            + " "
+            + _como_texto(df["exterior"])
+            + " "
+            + _como_texto(df["Interior"])
+            + " "
+            + _como_texto(df["Edificio"])
+            + " "
+            + _como_texto(df["departamento"])
+        )
+
+
+def _mover_a_campo_output(output_dir: Path, data_dir: Path, log_func) -> Path:
+    """Mueve los reportes generados a output_dir/campo_output"""
+    # Crear carpeta organizada para CAMPO
+    campo_output_dir = output_dir / "campo_output"
+    ensure_dirs(campo_output_dir)
+
+    # Mover archivos generados a la carpeta de CAMPO
+    archivos_campo = [
+        "ReporteRezagoAgua.xlsx",
+        "reporte_macro.xlsx",
+        "Prioridad.xlsx",
+        "CodigosPostales.xlsx",
+    ]
+
+    for archivo_name in archivos_campo:
+        archivo_path = output_dir / archivo_name
+        if archivo_path.exists():
+            try:
+                archivo_path.rename(campo_output_dir / archivo_name)
+                log_func(f"Archivo movido: {archivo_name} -> campo_output/")
+            except Exception as e:
+                eventos.error(log_func, f"Error moviendo {archivo_name}: {e}")
+
+    # También mover resumen_cps.xlsx del data_dir si existe
+    resumen_path = data_dir / "resumen_cps.xlsx"
+    if resumen_path.exists():
+        try:
+            resumen_path.rename(campo_output_dir / "resumen_cps.xlsx")
+            log_func("Archivo movido: resumen_cps.xlsx -> campo_output/")
+        except Exception as e:
+            eventos.error(log_func, f"Error moviendo resumen_cps.xlsx: {e}")
+
+    return campo_output_dir
+
+
+def _cargar_sistema(sistema_path: Path, log_func) -> pd.DataFrame:
+    log_func(f"Leyendo: {sistema_path}")
+    df = leer_sistema(sistema_path, log_func)
+
+    # Crear columnas si no existen
+    _crear_columnas(df, log_func)
+    return df
+
+
+def _agregados_campo(df: pd.DataFrame, backend: str, workers: int, log_func) -> dict:
+    log_func(f"Calculando totales y tablas por código postal ({backend})...")
+    return _compactar_campo(
+        calcular_tablas_campo(df, backend=backend, log_func=log_func, workers=workers)
+    )
+
+
+def _compactar_campo(tablas: dict) -> dict:
+    """
+    Tablas de CAMPO que se guardan como artefactos
+
+    Sólo SISTEMA con Total, las tablas de conteo y los resúmenes por CP (en
+    una sola tabla con la columna _cp); duplicados, 2025, la base del macro y
+    los detalles por CP son filas de SISTEMA y se derivan en _expandir_campo.
+    """
+    resumenes = [
+        res.reset_index().assign(_cp=cp) for cp, res in tablas["df_cps"].items()
+    ]
+    df_cps = (
+        pd.concat(resumenes, ignore_index=True)
+        if resumenes
+        else pd.DataFrame(columns=["TipoConexion", "NumerodeCuenta", "_cp"])
+    )
+    return {
+        "df": tablas["df"],
+        "cp": tablas["cp"],
+        "t_consumo": tablas["t_consumo"],
+        "t_conexion": tablas["t_conexion"],
+        "df_cps": df_cps,
+    }
+
+
+def _expandir_campo(compacto: dict) -> dict:
+    """Reconstruye el dict de calcular_tablas_campo a partir de los artefactos"""
+    df = compacto["df"]
+    codigos_postales = compacto["cp"].index.sort_values(ascending=True).to_list()
+    filas_por_cp = particion_por_cp(df["CodigoPostal"], codigos_postales)
+    detalle = consolidar_detalle(df.copy())
+
+    resumenes = compacto["df_cps"]
+    por_cp = dict(tuple(resumenes.groupby("_cp", sort=False)))
+    df_cps = {
+        f"{cps}": por_cp.get(f"{cps}", resumenes.iloc[:0])
+        .drop(columns="_cp")
+        .set_index("TipoConexion")
+        for cps in codigos_postales
+    }
+
+    return {
+        **compacto,
+        "duplicados": cuentas_duplicadas(df),
+        "veinte_25": filas_2025(df),
+        "codigos_postales": codigos_postales,
+        "filas_por_cp": filas_por_cp,
+        "reporte_macro_base": base_macro(df),
+        "df_cps": df_cps,
+        "df_completos_cps": {
+            f"{cps}": detalle.iloc[filas_por_cp[cps]] for cps in codigos_postales
+        },
+    }
+
+
+def consolidar_cuentas(base: pd.DataFrame) -> pd.DataFrame:
+    """
+    Una fila por cuenta de filas de reporte_macro: datos de su primera fila,
+    montos sumados (vacíos cuentan como 0) y número de filas en `filas`
+
+    Si `base` ya trae la columna filas (tablas consolidadas por bloque), se
+    suma en lugar de contar, así que consolidar las partes equivale a
+    consolidar todo junto. Una fila sin cuenta es una cuenta por sí sola.
+    """
+    codigos, unicas = pd.factorize(base["NumerodeCuenta"])
+    sin_cuenta = codigos < 0
+    codigos[sin_cuenta] = len(unicas) + np.arange(sin_cuenta.sum())
+    n_cuentas = len(unicas) + int(sin_cuenta.sum())
+
+    primera = np.full(n_cuentas, len(base))
+    np.minimum.at(primera, codigos, np.arange(len(base)))
+    cuentas = base.iloc[primera].reset_index(drop=True)
+    for m in MONTOS_MACRO:
+        cuentas[m] = np.bincount(
+            codigos, np.nan_to_num(base[m].to_numpy(float)), n_cuentas
+        )
+    filas = base["filas"].to_numpy() if "filas" in base else np.ones(len(base))
+    cuentas["filas"] = np.bincount(codigos, filas, n_cuentas).astype(np.int64)
+    return cuentas
+
+
+def mayores_adeudos(base_cp: pd.DataFrame, n: int) -> pd.DataFrame:
+    """
+    Las `n` cuentas con mayor total de las filas de un CP, de mayor a menor
+
+    Las n mayores se eligen con np.argpartition (lineal en las cuentas del CP)
+    y sólo esas n se ordenan.
+    """
+    cuentas = consolidar_cuentas(base_cp)
+    totales = cuentas["total"].to_numpy()
+    if len(cuentas) > n:
+        mayores = np.argpartition(-totales, n - 1)[:n]
+    else:
+        mayores = np.arange(len(cuentas))
+    mayores = mayores[np.argsort(-totales[mayores], kind="stable")]
+    tabla = cuentas.iloc[mayores].drop(columns=["CodigoPostal"])
+    tabla.insert(0, "Prioridad", np.arange(1, len(tabla) + 1))
+    return tabla
+
+
+def _escribir_prioridad(tablas_cp, output_dir: Path, n: int, log_func):
+    """Prioridad.xlsx: una hoja por CP con sus `n` mayores adeudos"""
+    log_func(f"Creando Prioridad.xlsx ({n} mayores adeudos por CP)...")
+    out_prioridad = output_dir / "Prioridad.xlsx"
+    tmp_prioridad = out_prioridad.with_suffix(".tmp.xlsx")
+    with pd.ExcelWriter(tmp_prioridad, mode="w", engine="openpyxl") as writer:
+        for cps, tabla in tablas_cp:
+            revisar()
+            tabla.to_excel(writer, sheet_name=f"CP {cps}", index=False)
+    tmp_prioridad.replace(out_prioridad)
+
+
+def _emitir_campo(
+    compacto: dict,
+    lista_cp: Future,
+    data_dir: Path,
+    output_dir: Path,
+    log_func,
+    month_label: str,
+    por_fila: int,
+    prioridad: int = PRIORIDAD_DEFAULT,
+):
+    """
+    Escribe resumen_cps, ReporteRezagoAgua, reporte_macro, Prioridad (si
+    prioridad > 0) y CodigosPostales
+    """
+    tablas = _expandir_campo(compacto)
+    df = tablas["df"]
+    cp = tablas["cp"]
+    duplicados = tablas["duplicados"]
+    t_consumo = tablas["t_consumo"]
+    t_conexion = tablas["t_conexion"]
+    veinte_25 = tablas["veinte_25"]
+    codigos_postales = tablas["codigos_postales"]
+    filas_por_cp = tablas["filas_por_cp"]
+    df_cps = tablas["df_cps"]
+    df_completos_cps = tablas["df_completos_cps"]
+
+    # Resumen grid
+    log_func("Creando resumen de códigos postales...")
+    resumen_path = data_dir / "resumen_cps.xlsx"
+    tmp_resumen = resumen_path.with_suffix(".tmp.xlsx")
+    exportar_resumenes_en_grid(df_cps, tmp_resumen, por_fila=por_fila)
+    tmp_resumen.replace(resumen_path)
+
+    lista_cp = lista_cp.result()
+    resumen_cps = pd.read_excel(resumen_path, engine="openpyxl")
+
+    # Reporte principal
+    log_func("Guardando reporte principal...")
+    reporte_path = output_dir / "ReporteRezagoAgua.xlsx"
+    tmp_reporte = reporte_path.with_suffix(".tmp.xlsx")
+
+    with pd.ExcelWriter(tmp_reporte, mode="w", engine="openpyxl") as writer:
+        df.to_excel(writer, sheet_name=str(month_label or "SISTEMA"), index=False)
+        cp.to_excel(writer, sheet_name="C.P.", index=True)
+        t_consumo.to_excel(writer, sheet_name="T. CONSUMO", index=True)
+        t_conexion.to_excel(writer, sheet_name="T. CONEXION", index=True)
+        veinte_25.to_excel(writer, sheet_name="2025", index=False)
+        resumen_cps.to_excel(writer, sheet_name="RESUMEN", index=False)
+        lista_cp.to_excel(writer, sheet_name="LISTA C.P.", index=False)
+        duplicados.to_excel(writer, sheet_name="DUPLICADOS", index=False)
+    tmp_reporte.replace(reporte_path)
+
+    # Reporte para macro - dividido por código postal
+    log_func("Creando excel para macro (dividido por código postal)...")
+    out_macro = output_dir / "reporte_macro.xlsx"
+
+    reporte_macro_base = tablas["reporte_macro_base"]
+
+    # Crear el Excel con una hoja por código postal
+    tmp_macro = out_macro.with_suffix(".tmp.xlsx")
+    with pd.ExcelWriter(tmp_macro, mode="w", engine="openpyxl") as writer:
+        for cp in codigos_postales:
+            revisar()
+            # Filas de este código postal (partición calculada una sola vez)
+            datos_cp = reporte_macro_base.iloc[filas_por_cp[cp]]
+
+            # Quitar la columna CodigoPostal ya que es redundante en cada hoja
+            datos_cp = datos_cp.drop(columns=["CodigoPostal"])
+
+            # Nombre de la hoja
+            nombre_hoja = f"CP {cp}"
+
+            # Escribir a la hoja correspondiente
+            datos_cp.to_excel(writer, sheet_name=nombre_hoja, index=False)
+
+            eventos.detalle(
+                log_func,
+                f"  📊 CP {cp}: {len(datos_cp)} registros",
+                "emitir",
+                registros=len(datos_cp),
+            )
+
+    tmp_macro.replace(out_macro)
+    log_func(f"  Reporte macro creado con {len(codigos_postales)} hojas (una por CP)")
+
+    if prioridad > 0:
+        # Cada CP sale de su segmento de la partición, sin filtrar ni ordenar
+        # reporte_macro completo
+        _escribir_prioridad(
+            (
+                (
+                    cps,
+                    mayores_adeudos(
+                        reporte_macro_base.iloc[filas_por_cp[cps]], prioridad
+                    ),
+                )
+                for cps in codigos_postales
+            ),
+            output_dir,
+            prioridad,
+            log_func,
+        )
+
+    # Libro por CP
+    log_func("Generando libro por códigos postales...")
+    cp_book_path = output_dir / "CodigosPostales.xlsx"
+    tmp_cp_book = cp_book_path.with_suffix(".tmp.xlsx")
+
+    with pd.ExcelWriter(tmp_cp_book, mode="w", engine="openpyxl") as writer:
+        for cps in codigos_postales:
+            revisar()
+            hoja = f"CP {cps}"
+            det = df_completos_cps[f"{cps}"].copy()
+            det = det.loc[:, ~det.columns.str.contains(r"^Unnamed")]
+            res = df_cps[f"{cps}"].copy()
+            if "NumerodeCuenta" in res.columns:
+                res = res.rename(columns={"NumerodeCuenta": "Cuentas únicas"})
+
+            det.to_excel(writer, sheet_name=hoja, index=False, startrow=0, startcol=0)
+            startcol_resumen = det.shape[1] + 2
+            res.to_excel(
+                writer,
+                sheet_name=hoja,
+                startrow=0,
+                startcol=startcol_resumen,
+                index=True,
+            )
+
+            ws = writer.sheets[hoja]
+            ws.cell(
+                row=1, column=startcol_resumen + 1, value="Resumen por TipoConexion"
+            )
+    tmp_cp_book.replace(cp_book_path)
+
+
+def run_proceso_campo(
+    sistema_path: Path,
+    data_dir: Path,
+    output_dir: Path,
+    log_func,
+    month_label: str = "SISTEMA",
+    backend: str = BACKEND_DEFAULT,
+    workers: int = 1,
+    bajo_memoria: bool = False,
+    presupuesto_mb: int = PRESUPUESTO_DEFAULT_MB,
+    cache_dir: Path = None,
+    solo_reportes: bool = False,
+    por_fila: int = 3,
+    perfilar: str = None,
+    reutilizar: bool = True,
+    historial: Path = None,
+    prioridad: int = PRIORIDAD_DEFAULT,
+):
+    """Ejecuta el proceso CAMPO
+
+    Args:
+        backend: motor de cálculo ("pandas" por defecto o "polars")
+        workers: procesos para el cómputo por CP (1 = serial, 0 = todos los
+            núcleos). Sólo reparte el cálculo; los libros se siguen escribiendo
+            en serie desde este proceso
+        bajo_memoria: procesa SISTEMA por bloques sin cargarlo completo
+        presupuesto_mb: en modo bajo_memoria, memoria con la que se dimensionan
+            los bloques de SISTEMA y las cubetas en disco (no es un tope duro)
+        cache_dir: carpeta de caché de etapas (pipeline.Pipeline); con ella un
+            SISTEMA sin cambios no se vuelve a leer ni a agregar
+        solo_reportes: regenera los reportes con las últimas tablas guardadas
+            en cache_dir, sin abrir SISTEMA
+        por_fila: resúmenes por fila en resumen_cps / hoja RESUMEN
+        perfilar: "cprofile" o "muestreo" para dejar el perfil de cada etapa
+            en campo_output/perfiles (None = sin perfilar)
+        reutilizar: con False se recalcula todo aunque cache_dir tenga las
+            etapas, salvo que la corrida anterior no haya terminado; entonces
+            se reanuda desde la última etapa guardada
+        historial: base SQLite donde se agrega el adeudo por cuenta de este
+            SISTEMA (ver historial.py); None = no se registra. No se alimenta
+            con solo_reportes ni en modo bajo_memoria
+        prioridad: cuentas con mayor adeudo por CP en Prioridad.xlsx (0 = no
+            se escribe)
+
+    Además de los libros deja en campo_output/cubo el cubo de adeudos para
+    consultas (ver cubo.py), salvo en modo bajo_memoria.
+
+    Se puede cancelar entre etapas y entre CPs (ver cancelacion.py).
+    """
+    carga = CargaConcurrente()
+    corrida = Corrida("CAMPO")
+    try:
+        perfilador = (
+            Perfilador(
+                output_dir / "campo_output" / CARPETA_PERFILES,
+                perfilar,
+                log_func=log_func,
+            )
+            if perfilar
+            else None
+        )
+        ensure_dirs(data_dir, output_dir)
+
+        eventos.seccion(log_func, "=== INICIANDO PROCESO CAMPO ===")
+
+        if solo_reportes and cache_dir is None:
+            return False, "Regenerar sólo reportes requiere una carpeta de caché"
+
+        # Validaciones - usar archivo SISTEMA seleccionado por el usuario
+        if not solo_reportes and not sistema_path.exists():
+            return False, f"No existe el archivo SISTEMA seleccionado: {sistema_path}"
+
+        # Buscar LISTA C.P..xlsx en la carpeta de datos seleccionada por el usuario
+        lista_cp_path = data_dir / "LISTA C.P..xlsx"
+        if not lista_cp_path.exists():
+            return (
+                False,
+                f"Falta LISTA C.P..xlsx en la carpeta de datos: {lista_cp_path}",
+            )
+
+        # Validar columnas requeridas leyendo solo el encabezado
+        faltantes = (
+            []
+            if solo_reportes
+            else columnas_faltantes(
+                leer_encabezado(sistema_path), COLUMNAS_REQUERIDAS, COLUMNAS_DERIVABLES
+            )
+        )
+        if faltantes:
+            return False, f"Columna faltante en SISTEMA.xlsx: {', '.join(faltantes)}"
+
+        if bajo_memoria and not solo_reportes:
+            with corrida.medir("bajo_memoria"), perfilar_etapa(
+                perfilador, "campo", "bajo_memoria"
+            ):
+                _campo_bajo_memoria(
+                    sistema_path,
+                    carga.excel(lista_cp_path),
+                    data_dir,
+                    output_dir,
+                    log_func,
+                    month_label,
+                    presupuesto_mb,
+                    prioridad,
+                )
+            campo_output_dir = _mover_a_campo_output(output_dir, data_dir, log_func)
+            eventos.exito(
+                log_func, f"PROCESO CAMPO COMPLETADO. Reportes en: {campo_output_dir}"
+            )
+            corrida.cerrar(campo_output_dir, log_func)
+            return True, campo_output_dir
+
+        # LISTA C.P. se carga en segundo plano mientras SISTEMA se lee aquí
+        lista_cp_futuro = carga.excel(lista_cp_path)
+
+        pipeline = Pipeline(cache_dir, log_func, "campo", perfilador, reutilizar)
+        pipeline.etapa(
+            "carga",
+            lambda: _cargar_sistema(sistema_path, log_func),
+            archivos=[sistema_path],
+            tablas=True,
+        )
+        # backend y workers no cambian el resultado: no forman parte de la clave
+        pipeline.etapa(
+            "agregados",
+            lambda df: _agregados_campo(df, backend, workers, log_func),
+            ["carga"],
+            tablas=True,
+        )
+        pipeline.etapa(
+            "emitir",
+            lambda tablas: _emitir_campo(
+                tablas,
+                lista_cp_futuro,
+                data_dir,
+                output_dir,
+                log_func,
+                month_label,
+                por_fila,
+                prioridad,
+            ),
+            ["agregados"],
+            memoizar=False,
+        )
+        pipeline.etapa(
+            "cubo",
+            lambda tablas: construir_cubo(tablas["df"]),
+            ["agregados"],
+            tablas=True,
+        )
+        with observar(corrida.registrar), pipeline.corrida():
+            if solo_reportes:
+                pipeline.ultimo("agregados")
+            pipeline.resultado("emitir")
+            cubo = pipeline.resultado("cubo")
+
+        if historial and not solo_reportes:
+            from .historial import alimentar
+
+            with corrida.medir("historial"):
+                alimentar(
+                    historial,
+                    "CAMPO",
+                    sistema_path,
+                    pipeline.resultado("agregados")["df"],
+                    log_func,
+                )
+
+        campo_output_dir = _mover_a_campo_output(output_dir, data_dir, log_func)
+        guardar_cubo(campo_output_dir / CARPETA_CUBO, cubo)
+        log_func(f"Cubo de adeudos ({len(cubo['celdas'])} celdas) en: {CARPETA_CUBO}/")
+
+        eventos.exito(
+            log_func, f"PROCESO CAMPO COMPLETADO. Reportes en: {campo_output_dir}"
+        )
+        corrida.cerrar(campo_output_dir, log_func)
+        return True, campo_output_dir
+
+    except Cancelado as e:
+        eventos.aviso(log_func, f"{e}")
+        return False, str(e)
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+    finally:
+        carga.cerrar()
+
+
+# ====================================
+# MODO BAJO CONSUMO DE MEMORIA
+# ====================================
+
+
+def _tabla_cuentas(conteos: dict, nombre: str) -> pd.DataFrame:
+    """Tabla de cuentas únicas por grupo con el formato de groupby().nunique()"""
+    claves = ordenar_claves(conteos)
+    return pd.DataFrame(
+        {"NumerodeCuenta": np.array([conteos[k] for k in claves], dtype=np.int64)},
+        index=pd.Index(claves, name=nombre),
+    )
+
+
+def _campo_bajo_memoria(
+    sistema_path: Path,
+    lista_cp: Future,
+    data_dir: Path,
+    output_dir: Path,
+    log_func,
+    month_label: str,
+    presupuesto_mb: int,
+    prioridad: int = PRIORIDAD_DEFAULT,
+):
+    """
+    CAMPO por bloques: SISTEMA nunca se carga completo
+
+    Los conteos de cuentas únicas se acumulan con hashes en cubetas en disco,
+    las filas de cada CP se derraman a archivos temporales y los reportes se
+    escriben fila por fila. presupuesto_mb fija el tamaño de bloque y el
+    número de cubetas (ver bajo_memoria); no es un límite duro del proceso.
+    `lista_cp` es el futuro de la lectura de LISTA C.P. en segundo plano.
+    """
+    log_func(f"Leyendo por bloques ({presupuesto_mb} MB): {sistema_path}")
+
+    reporte_path = output_dir / "ReporteRezagoAgua.xlsx"
+    tmp_reporte = reporte_path.with_suffix(".tmp.xlsx")
+    reporte = LibroStreaming(tmp_reporte)
+    # Las hojas se crean en el orden final; SISTEMA y 2025 se llenan al leer
+    hoja_sistema = reporte.hoja(month_label or "SISTEMA")
+    hoja_cp = reporte.hoja("C.P.")
+    hoja_consumo = reporte.hoja("T. CONSUMO")
+    hoja_conexion = reporte.hoja("T. CONEXION")
+    hoja_2025 = reporte.hoja("2025")
+    hoja_resumen = reporte.hoja("RESUMEN")
+    hoja_lista = reporte.hoja("LISTA C.P.")
+    hoja_duplicados = reporte.hoja("DUPLICADOS")
+
+    derrame = DerramePorCP(output_dir)
+
+    try:
+        n_filas = 0
+        for bloque in iterar_bloques_excel(sistema_path, presupuesto_mb):
+            revisar()
+            if n_filas == 0:
+                _crear_columnas(bloque, log_func)
+                bloque["Total"] = calcular_total(bloque)
+                columnas = list(bloque.columns)
+                hoja_sistema.encabezado(bloque)
+                hoja_2025.encabezado(bloque)
+
+                bytes_fila = bloque.memory_usage(deep=True).sum() / max(len(bloque), 1)
+                n_cubetas = cubetas_para_presupuesto(
+                    contar_filas_excel(sistema_path), bytes_fila, presupuesto_mb
+                )
+                filas_bloque = filas_para_presupuesto(bloque, presupuesto_mb)
+                cubetas = {"directorio": derrame.directorio, "n_cubetas": n_cubetas}
+                por_cp = ConteoUnico(**cubetas)
+                por_consumo = ConteoUnico(**cubetas)
+                por_conexion = ConteoUnico(**cubetas)
+                por_cp_conexion = ConteoUnico(**cubetas)
+                cuentas = FrecuenciaHashes(**cubetas)
+            else:
+                _crear_columnas(bloque)
+                bloque["Total"] = calcular_total(bloque)
+
+            hoja_sistema.escribir(bloque)
+            es_2025 = bloque["bimfinal"].astype(str).str.contains("2025", na=False)
+            hoja_2025.escribir(bloque.loc[es_2025])
+
+            numero = bloque["NumerodeCuenta"]
+            por_cp.agregar(bloque["CodigoPostal"], numero)
+            por_consumo.agregar(bloque["TipoConsumo"], numero)
+            por_conexion.agregar(bloque["TipoConexion"], numero)
+            por_cp_conexion.agregar(
+                [bloque["CodigoPostal"], bloque["TipoConexion"]], numero
+            )
+            cuentas.agregar(numero)
+            derrame.agregar(bloque)
+
+            n_filas += len(bloque)
+            eventos.detalle(
+                log_func, f"  {n_filas} filas procesadas", "bajo_memoria", filas=n_filas
+            )
+        hoja_sistema.cerrar()
+        hoja_2025.cerrar()
+
+        log_func("Calculando tablas por código postal...")
+        cp = _tabla_cuentas(por_cp.conteos(), "CodigoPostal")
+        cp.index = cp.index.astype(int)
+        t_consumo = con_total_general(
+            _tabla_cuentas(por_consumo.conteos(), "TipoConsumo")
+        )
+        t_conexion = con_total_general(
+            _tabla_cuentas(por_conexion.conteos(), "TipoConexion")
+        )
+        codigos_postales = cp.index.sort_values(ascending=True).to_list()
+
+        pares = {}
+        for (clave, tipo), n in por_cp_conexion.conteos().items():
+            pares.setdefault(clave, {})[tipo] = n
+        df_cps = {
+            f"{cps}": _tabla_cuentas(pares.get(cps, {}), "TipoConexion")
+            for cps in codigos_postales
+        }
+
+        hoja_cp.encabezado(cp, index=True)
+        hoja_cp.escribir(cp, index=True)
+        hoja_consumo.encabezado(t_consumo, index=True)
+        hoja_consumo.escribir(t_consumo, index=True)
+        hoja_conexion.encabezado(t_conexion, index=True)
+        hoja_conexion.escribir(t_conexion, index=True)
+
+        # Resumen grid
+        log_func("Creando resumen de códigos postales...")
+        resumen_path = data_dir / "resumen_cps.xlsx"
+        tmp_resumen = resumen_path.with_suffix(".tmp.xlsx")
+        exportar_resumenes_en_grid(df_cps, tmp_resumen, por_fila=3)
+        tmp_resumen.replace(resumen_path)
+
+        resumen_cps = pd.read_excel(resumen_path, engine="openpyxl")
+        hoja_resumen.encabezado(resumen_cps)
+        hoja_resumen.escribir(resumen_cps)
+        lista_cp = lista_cp.result()
+        hoja_lista.encabezado(lista_cp)
+        hoja_lista.escribir(lista_cp)
+
+        hoja_duplicados.encabezado(pd.DataFrame(columns=columnas))
+        _escribir_duplicados(
+            derrame, cuentas.repetidos(), n_cubetas, filas_bloque, hoja_duplicados
+        )
+
+        log_func("Guardando reporte principal...")
+        reporte.guardar()
+        tmp_reporte.replace(reporte_path)
+
+        _libros_por_cp_streaming(
+            derrame, codigos_postales, df_cps, output_dir, log_func, prioridad
+        )
+    finally:
+        derrame.cerrar()
+
+
+def _duplicados_con_evento(candidatos: pd.DataFrame):
+    """
+    cuentas_duplicadas y, por cada fila de salida, la fila de SISTEMA que la
+    origina (cada repetición de una cuenta emite todas sus filas)
+    """
+    numero = candidatos["NumerodeCuenta"]
+    repetida = numero.duplicated().to_numpy()
+    tamanos = numero.groupby(numero, dropna=False).transform("size").to_numpy()
+    eventos = np.repeat(candidatos.index.to_numpy()[repetida], tamanos[repetida])
+    return cuentas_duplicadas(candidatos), eventos
+
+
+def _escribir_duplicados(derrame, repetidos, n_cubetas, filas_bloque, hoja):
+    """
+    Hoja DUPLICADOS por cubetas de hash: cada cubeta contiene todas las filas
+    de sus cuentas, se resuelve por separado y las salidas se intercalan en el
+    orden que tendría cuentas_duplicadas sobre SISTEMA completo
+    """
+    candidatos = DerramePorCP(derrame.directorio, columna="_cubeta")
+    salidas = DerramePorCP(derrame.directorio, columna="_cubeta")
+    # Las partes por CP pueden ser chicas: se juntan hasta un bloque antes de
+    # repartirlas por cubeta
+    pendientes, n_pendientes = [], 0
+    for clave in derrame.todas_las_claves():
+        for parte in derrame.bloques(clave):
+            hashes = hash_valores(parte["NumerodeCuenta"])
+            repetida = np.isin(hashes, repetidos)
+            if repetida.any():
+                pendientes.append(
+                    parte.loc[repetida].assign(
+                        _cubeta=cubeta_de(hashes[repetida], n_cubetas)
+                    )
+                )
+                n_pendientes += int(repetida.sum())
+            if n_pendientes >= filas_bloque:
+                candidatos.agregar(pd.concat(pendientes))
+                pendientes, n_pendientes = [], 0
+    if pendientes:
+        candidatos.agregar(pd.concat(pendientes))
+
+    for cubeta in candidatos.todas_las_claves():
+        filas = pd.concat(list(candidatos.bloques(cubeta))).sort_index()
+        dup, eventos = _duplicados_con_evento(filas.drop(columns=["_cubeta"]))
+        salidas.agregar(
+            dup.assign(_evento=eventos, _cubeta=cubeta).reset_index(drop=True)
+        )
+
+    def _filas(cubeta):
+        for parte in salidas.bloques(cubeta):
+            datos = parte.drop(columns=["_cubeta", "_evento"])
+            yield from zip(parte["_evento"].to_numpy(), valores_fila(datos))
+
+    fuentes = [_filas(c) for c in salidas.todas_las_claves()]
+    for _, valores in heapq.merge(*fuentes, key=lambda par: par[0]):
+        hoja.fila(valores)
+
+
+def _libros_por_cp_streaming(
+    derrame, codigos_postales, df_cps, output_dir, log_func, prioridad
+):
+    """
+    reporte_macro.xlsx, CodigosPostales.xlsx y Prioridad.xlsx leyendo cada CP
+    una sola vez
+
+    Para Prioridad cada bloque se consolida por cuenta al leerlo; en memoria
+    queda una fila por cuenta del CP, no sus filas.
+    """
+    log_func("Creando excel para macro y libro por códigos postales...")
+    out_macro = output_dir / "reporte_macro.xlsx"
+    cp_book_path = output_dir / "CodigosPostales.xlsx"
+    tmp_macro = out_macro.with_suffix(".tmp.xlsx")
+    tmp_cp_book = cp_book_path.with_suffix(".tmp.xlsx")
+    macro = LibroStreaming(tmp_macro)
+    libro_cp = LibroStreaming(tmp_cp_book)
+    mayores = []
+
+    for cps in codigos_postales:
+        revisar()
+        hoja_macro = macro.hoja(f"CP {cps}")
+        hoja_cp = libro_cp.hoja(f"CP {cps}")
+        res = df_cps[f"{cps}"].rename(columns={"NumerodeCuenta": "Cuentas únicas"})
+        filas_res = [[t, int(n)] for t, n in zip(res.index, res["Cuentas únicas"])]
+
+        n_registros = 0
+        cuentas_cp = []
+        for parte in derrame.bloques(cps):
+            base = base_macro(parte)
+            if prioridad > 0:
+                cuentas_cp.append(consolidar_cuentas(base))
+            datos_cp = base.drop(columns=["CodigoPostal"])
+            det = consolidar_detalle(parte.copy())
+            det = det.loc[:, ~det.columns.str.contains(r"^Unnamed")]
+
+            if n_registros == 0:
+                hoja_macro.encabezado(datos_cp)
+                columnas = list(det.columns)
+                hoja_cp.fila(
+                    columnas
+                    + [None, None, "Resumen por TipoConexion", "Cuentas únicas"],
+                    negritas=range(len(columnas) + 4),
+                )
+            hoja_macro.escribir(datos_cp)
+
+            # El resumen ocupa las primeras filas, dos columnas después del detalle
+            for i, valores in enumerate(valores_fila(det), start=n_registros):
+                if i < len(filas_res):
+                    hoja_cp.fila(
+                        valores + [None, None] + filas_res[i],
+                        negritas=(len(valores) + 2,),
+                    )
+                else:
+                    hoja_cp.fila(valores)
+            n_registros += len(det)
+
+        if cuentas_cp:
+            mayores.append(
+                (
+                    cps,
+                    mayores_adeudos(
+                        pd.concat(cuentas_cp, ignore_index=True), prioridad
+                    ),
+                )
+            )
+
+        # Cada hoja abierta en write_only retiene un archivo temporal
+        hoja_macro.cerrar()
+        hoja_cp.cerrar()
+        eventos.detalle(
+            log_func,
+            f"  📊 CP {cps}: {n_registros} registros",
+            "bajo_memoria",
+            registros=n_registros,
+        )
+
+    macro.guardar()
+    tmp_macro.replace(out_macro)
+    log_func(f"  Reporte macro creado con {len(codigos_postales)} hojas (una por CP)")
+    libro_cp.guardar()
+    tmp_cp_book.replace(cp_book_path)
+    if prioridad > 0:
+        _escribir_prioridad(mayores, output_dir, prioridad, log_func)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Cancelación cooperativa de CAMPO y CAJA
+
+La GUI (o quien lance el proceso) crea una señal con is_set(), un
+threading.Event o un multiprocessing.Event si el proceso corre en
+trabajador.Trabajador, y corre el proceso dentro de `with cancelable(señal)`.
+El cálculo llama a revisar() entre etapas del pipeline y en los ciclos por
+CP o por bloque; si la señal está activa, revisar() lanza Cancelado y el
+proceso termina en el siguiente punto de revisión, sin matar el hilo.
+
+La señal se guarda por hilo, como pipeline.observar: CAMPO y CAJA pueden
+correr a la vez en hilos distintos (ambos.py), cada uno con la suya. Sin
+señal, revisar() no hace nada.
+"""
+
+import threading
+from contextlib import contextmanager
+
+_LOCAL = threading.local()
+
+
+class Cancelado(Exception):
+    """El usuario canceló el proceso"""
+
+    def __init__(self, mensaje="Proceso cancelado por el usuario"):
+        super().__init__(mensaje)
+
+
+def senal_actual():
+    """Señal activa en el hilo actual (None si el proceso no es cancelable)"""
+    return getattr(_LOCAL, "senal", None)
+
+
+@contextmanager
+def cancelable(senal):
+    """Hace que revisar() consulte `senal` mientras dura el bloque with"""
+    anterior = senal_actual()
+    _LOCAL.senal = senal
+    try:
+        yield senal
+    finally:
+        _LOCAL.senal = anterior
+
+
+def solicitada() -> bool:
+    senal = senal_actual()
+    return senal is not None and senal.is_set()
+
+
+def revisar():
+    """
+    Punto de cancelación
+
+    Raises:
+        Cancelado: si se pidió cancelar el proceso
+    """
+    if solicitada():
+        raise Cancelado()
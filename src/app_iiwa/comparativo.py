@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Comparativo mes contra mes de dos SISTEMA
+
+Responde qué cuentas cambiaron de rezago desde el mes anterior: cuentas
+nuevas en el padrón, cuentas que salieron (pagaron o se dieron de baja) y
+cuentas cuyo adeudo subió o bajó.
+
+Cada SISTEMA se reduce a una fila por NumerodeCuenta (datos de la primera
+fila y montos consolidados como en reporte_macro, sumados si la cuenta se
+repite). Ese resumen es una etapa de pipeline.Pipeline con la huella del
+archivo en la clave, así que con cache_dir cada mes se lee una sola vez: al
+comparar febrero contra enero y luego marzo contra febrero, febrero sale de la
+caché. Las cuentas se cruzan por un hash de 64 bits de NumerodeCuenta
+(enteros ordenados y searchsorted en lugar de un merge de texto); las parejas
+encontradas se verifican contra el texto para descartar colisiones.
+
+Salida en <output_dir>/comparativo_output:
+- Comparativo.xlsx: RESUMEN por CP y hojas NUEVAS, BAJAS y CAMBIOS
+- ComparativoPorCP.xlsx: una hoja por CP con los tres movimientos
+
+Uso:
+    python -m app_iiwa.comparativo ENERO/SISTEMA.xlsx FEBRERO/SISTEMA.xlsx --salida reportes
+"""
+
+import argparse
+import hashlib
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import eventos
+from .backends import base_macro
+from .bajo_memoria import hash_valores, ordenar_claves
+from .campo import COLUMNAS_DERIVABLES, COLUMNAS_REQUERIDAS, _cargar_sistema
+from .cancelacion import Cancelado, revisar
+from .constantes import CARPETA_CACHE
+from .ingesta import columnas_faltantes, leer_encabezado
+from .metricas import Corrida
+from .pipeline import Pipeline, observar
+from .utils import ensure_dirs
+
+# Diferencia de adeudo (en pesos) por debajo de la cual una cuenta no cambió
+TOLERANCIA_DEFAULT = 0.01
+
+NUEVA = "NUEVA"
+BAJA = "BAJA"
+AUMENTO = "AUMENTÓ"
+DISMINUCION = "DISMINUYÓ"
+LIQUIDADA = "LIQUIDADA"
+
+COLUMNAS_DATOS = [
+    "CodigoPostal",
+    "ClaveCatastral",
+    "Propietario",
+    "Domicilio",
+    "TipoConsumo",
+    "TipoConexion",
+    "Zona",
+    "UltimoPago",
+    "bimInicial",
+    "bimfinal",
+]
+COLUMNAS_MONTOS = ["agua", "drenaje", "recargos", "mejoras", "iva", "total"]
+
+
+def resumen_cuentas(df: pd.DataFrame) -> pd.DataFrame:
+    """Una fila por NumerodeCuenta con sus datos y sus montos consolidados"""
+    base = base_macro(df)
+    base["NumerodeCuenta"] = base["NumerodeCuenta"].astype(str)
+    grupos = base.groupby("NumerodeCuenta", sort=False)
+    resumen = grupos[COLUMNAS_DATOS].first().join(grupos[COLUMNAS_MONTOS].sum())
+    resumen.insert(len(COLUMNAS_DATOS), "filas", grupos.size())
+    return resumen.reset_index()
+
+
+def _cruzar(anterior: pd.DataFrame, actual: pd.DataFrame):
+    """
+    Posiciones de las cuentas comunes por hash de NumerodeCuenta
+
+    Returns:
+        (posiciones en anterior, posiciones en actual) de las cuentas que
+        están en los dos
+    """
+    hash_anterior = hash_valores(anterior["NumerodeCuenta"])
+    hash_actual = hash_valores(actual["NumerodeCuenta"])
+    orden = np.argsort(hash_anterior, kind="stable")
+    ordenados = hash_anterior[orden]
+    pos = np.searchsorted(ordenados, hash_actual)
+    pos[pos == len(ordenados)] = 0
+    encontradas = len(ordenados) > 0 and ordenados[pos] == hash_actual
+    en_actual = np.flatnonzero(encontradas)
+    en_anterior = orden[pos[en_actual]]
+    # Una colisión de 64 bits es improbable, pero no cuesta descartarla
+    iguales = (
+        anterior["NumerodeCuenta"].to_numpy()[en_anterior]
+        == actual["NumerodeCuenta"].to_numpy()[en_actual]
+    )
+    return en_anterior[iguales], en_actual[iguales]
+
+
+def comparar_cuentas(
+    anterior: pd.DataFrame, actual: pd.DataFrame, tolerancia=TOLERANCIA_DEFAULT
+) -> dict:
+    """
+    Cuentas nuevas, que salieron y con otro adeudo entre dos resúmenes
+
+    Args:
+        anterior, actual: resultado de resumen_cuentas de cada mes
+
+    Returns:
+        {"nuevas", "bajas", "cambios"}: DataFrames con NumerodeCuenta y
+        CodigoPostal; cambios trae total_anterior, total_actual, diferencia
+        y Movimiento (AUMENTÓ, DISMINUYÓ o LIQUIDADA)
+    """
+    en_anterior, en_actual = _cruzar(anterior, actual)
+
+    nuevas = np.ones(len(actual), dtype=bool)
+    nuevas[en_actual] = False
+    bajas = np.ones(len(anterior), dtype=bool)
+    bajas[en_anterior] = False
+
+    total_anterior = anterior["total"].to_numpy(dtype=np.float64)[en_anterior]
+    total_actual = actual["total"].to_numpy(dtype=np.float64)[en_actual]
+    diferencia = total_actual - total_anterior
+    cambio = np.abs(diferencia) > tolerancia
+
+    cambios = actual.iloc[en_actual[cambio]].reset_index(drop=True)
+    cambios.insert(
+        cambios.columns.get_loc("total"), "total_anterior", total_anterior[cambio]
+    )
+    cambios = cambios.rename(columns={"total": "total_actual"})
+    cambios["diferencia"] = diferencia[cambio]
+    cambios["Movimiento"] = np.where(
+        np.abs(total_actual[cambio]) <= tolerancia,
+        LIQUIDADA,
+        np.where(diferencia[cambio] > 0, AUMENTO, DISMINUCION),
+    )
+    return {
+        "nuevas": actual[nuevas].reset_index(drop=True),
+        "bajas": anterior[bajas].reset_index(drop=True),
+        "cambios": cambios,
+    }
+
+
+def resumen_por_cp(anterior, actual, movimientos: dict) -> pd.DataFrame:
+    """Cuentas, movimientos y adeudo de cada CP en los dos meses"""
+
+    def por_cp(df, nombre, columna=None):
+        grupos = df.groupby("CodigoPostal", dropna=False)
+        return (grupos[columna].sum() if columna else grupos.size()).rename(nombre)
+
+    cambios = movimientos["cambios"]
+    tabla = pd.concat(
+        [
+            por_cp(anterior, "Cuentas anterior"),
+            por_cp(actual, "Cuentas actual"),
+            por_cp(movimientos["nuevas"], "Nuevas"),
+            por_cp(movimientos["bajas"], "Bajas"),
+            por_cp(cambios, "Con cambio"),
+            por_cp(cambios[cambios["Movimiento"] == LIQUIDADA], "Liquidadas"),
+            por_cp(anterior, "Adeudo anterior", "total"),
+            por_cp(actual, "Adeudo actual", "total"),
+        ],
+        axis=1,
+    ).fillna(0)
+    tabla = tabla.astype({c: np.int64 for c in tabla.columns if "Adeudo" not in c})
+    tabla["Diferencia"] = tabla["Adeudo actual"] - tabla["Adeudo anterior"]
+    tabla = tabla.reindex(ordenar_claves(tabla.index))
+    tabla.index.name = "CodigoPostal"
+    total = tabla.sum().to_frame("Total").T
+    return pd.concat([tabla, total])
+
+
+def _movimientos_cp(movimientos: dict) -> pd.DataFrame:
+    """Las tres tablas en una, con la columna Movimiento, ordenadas por CP"""
+    partes = [
+        movimientos["nuevas"].assign(Movimiento=NUEVA),
+        movimientos["bajas"].assign(Movimiento=BAJA),
+        movimientos["cambios"],
+    ]
+    partes = [p for p in partes if len(p)]
+    if not partes:
+        return pd.DataFrame(columns=["Movimiento", "NumerodeCuenta", "CodigoPostal"])
+    todas = pd.concat(partes, ignore_index=True)
+    columnas = ["Movimiento"] + [c for c in todas.columns if c != "Movimiento"]
+    return todas[columnas]
+
+
+def _escribir(movimientos: dict, resumen: pd.DataFrame, salida: Path, log_func):
+    """Comparativo.xlsx y ComparativoPorCP.xlsx (escritura atómica)"""
+    log_func("Guardando Comparativo.xlsx...")
+    comparativo = salida / "Comparativo.xlsx"
+    tmp = comparativo.with_suffix(".tmp.xlsx")
+    with pd.ExcelWriter(tmp, engine="xlsxwriter") as writer:
+        resumen.to_excel(writer, sheet_name="RESUMEN", index=True)
+        for hoja, clave in (
+            ("NUEVAS", "nuevas"),
+            ("BAJAS", "bajas"),
+            ("CAMBIOS", "cambios"),
+        ):
+            movimientos[clave].to_excel(writer, sheet_name=hoja, index=False)
+    tmp.replace(comparativo)
+
+    log_func("Guardando ComparativoPorCP.xlsx...")
+    por_cp = salida / "ComparativoPorCP.xlsx"
+    tmp = por_cp.with_suffix(".tmp.xlsx")
+    todas = _movimientos_cp(movimientos)
+    grupos = dict(list(todas.groupby("CodigoPostal", sort=False, dropna=False)))
+    with pd.ExcelWriter(tmp, engine="xlsxwriter") as writer:
+        if not grupos:
+            todas.to_excel(writer, sheet_name="SIN CAMBIOS", index=False)
+        for cp in ordenar_claves(grupos):
+            revisar()
+            datos = grupos[cp].drop(columns=["CodigoPostal"])
+            datos.to_excel(writer, sheet_name=f"CP {cp}"[:31], index=False)
+            eventos.detalle(
+                log_func,
+                f"  📊 CP {cp}: {len(datos)} movimientos",
+                "emitir",
+                registros=len(datos),
+            )
+    tmp.replace(por_cp)
+
+
+def _etapa_cuentas(pipeline: Pipeline, sistema_path: Path, log_func) -> str:
+    """
+    Etapa con el resumen por cuenta de un SISTEMA
+
+    El nombre depende de la ruta: cada archivo conserva su propia versión en
+    la caché (la etapa de otro mes no la reemplaza).
+    """
+    ruta = str(Path(sistema_path).resolve())
+    nombre = f"cuentas_{hashlib.sha1(ruta.encode('utf-8')).hexdigest()[:12]}"
+    return pipeline.etapa(
+        nombre,
+        lambda: resumen_cuentas(_cargar_sistema(sistema_path, log_func)),
+        archivos=[sistema_path],
+        tablas=True,
+    )
+
+
+def run_proceso_comparativo(
+    anterior_path: Path,
+    sistema_path: Path,
+    output_dir: Path,
+    log_func,
+    cache_dir: Path = None,
+    tolerancia: float = TOLERANCIA_DEFAULT,
+):
+    """Compara el SISTEMA del mes anterior con el actual
+
+    Args:
+        anterior_path: SISTEMA del mes anterior
+        sistema_path: SISTEMA del mes actual
+        cache_dir: carpeta de caché de etapas; con ella cada SISTEMA sin
+            cambios se toma del resumen guardado sin volver a leerlo
+        tolerancia: diferencia de adeudo que cuenta como cambio
+
+    Returns:
+        (ok, carpeta comparativo_output o mensaje de error)
+    """
+    corrida = Corrida("COMPARATIVO")
+    try:
+        anterior_path, sistema_path = Path(anterior_path), Path(sistema_path)
+        output_dir = Path(output_dir)
+        eventos.seccion(log_func, "=== INICIANDO COMPARATIVO MES CONTRA MES ===")
+        log_func(f"Mes anterior: {anterior_path}")
+        log_func(f"Mes actual: {sistema_path}")
+
+        for path in (anterior_path, sistema_path):
+            if not path.exists():
+                return False, f"No existe el archivo SISTEMA: {path}"
+            faltantes = columnas_faltantes(
+                leer_encabezado(path), COLUMNAS_REQUERIDAS, COLUMNAS_DERIVABLES
+            )
+            if faltantes:
+                return False, f"Columna faltante en {path.name}: {', '.join(faltantes)}"
+
+        salida = output_dir / "comparativo_output"
+        ensure_dirs(salida)
+
+        pipeline = Pipeline(cache_dir, log_func, "comparativo")
+        etapa_anterior = _etapa_cuentas(pipeline, anterior_path, log_func)
+        etapa_actual = _etapa_cuentas(pipeline, sistema_path, log_func)
+        if etapa_anterior == etapa_actual:
+            return False, "El mes anterior y el actual son el mismo archivo"
+
+        with observar(corrida.registrar), pipeline.corrida():
+            anterior = pipeline.resultado(etapa_anterior)
+            actual = pipeline.resultado(etapa_actual)
+            revisar()
+            with corrida.medir("comparar"):
+                log_func(
+                    f"Cruzando {len(anterior):,} cuentas del mes anterior con "
+                    f"{len(actual):,} del actual..."
+                )
+                movimientos = comparar_cuentas(anterior, actual, tolerancia)
+                resumen = resumen_por_cp(anterior, actual, movimientos)
+            with corrida.medir("emitir"):
+                _escribir(movimientos, resumen, salida, log_func)
+
+        cambios = movimientos["cambios"]["Movimiento"]
+        log_func(
+            f"  Nuevas: {len(movimientos['nuevas']):,} | "
+            f"Bajas: {len(movimientos['bajas']):,} | "
+            f"Con cambio: {len(cambios):,} (liquidadas: {(cambios == LIQUIDADA).sum():,})"
+        )
+        eventos.exito(log_func, f"COMPARATIVO COMPLETADO. Reportes en: {salida}")
+        corrida.cerrar(salida, log_func)
+        return True, salida
+
+    except Cancelado as e:
+        eventos.aviso(log_func, f"{e}")
+        return False, str(e)
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+
+
+# ====================================
+# LÍNEA DE COMANDOS
+# ====================================
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="app_iiwa.comparativo",
+        description="Compara el SISTEMA del mes anterior con el actual",
+    )
+    parser.add_argument("anterior", type=Path, help="SISTEMA del mes anterior")
+    parser.add_argument("actual", type=Path, help="SISTEMA del mes actual")
+    parser.add_argument("--salida", type=Path, default=Path("."))
+    parser.add_argument(
+        "--cache", type=Path, help="carpeta de caché (por defecto, salida/.cache_iiwa)"
+    )
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_DEFAULT)
+    args = parser.parse_args(argv)
+
+    ok, resultado = run_proceso_comparativo(
+        args.anterior,
+        args.actual,
+        args.salida,
+        eventos.consola(stream=sys.stdout),
+        cache_dir=args.cache or args.salida / CARPETA_CACHE,
+        tolerancia=args.tolerancia,
+    )
+    if not ok:
+        print(resultado, file=sys.stderr)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
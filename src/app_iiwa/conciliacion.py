@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Conciliación CAMPO × CAJA por cuenta
+
+Cruza el padrón de CAMPO (adeudo por NumerodeCuenta) con los pagos de uno o
+más SISTEMA de CAJA (evidencias_x_fecha) para saber cuánto se cobró de cada
+cuenta y cuánto sigue pendiente, por cuenta, por CP y por TipoConsumo ×
+TipoConexion.
+
+Cada archivo se reduce en su propia etapa de pipeline.Pipeline (resumen por
+cuenta del padrón, como en comparativo.py, y pagos por folio y fecha de cada
+CAJA), así que con cache_dir un año de cortes de caja se lee una sola vez y
+agregar el mes nuevo sólo lee ese archivo. Los cortes que se traslapan se
+depuran por (FolioImpreso, fechapago) quedándose con el último archivo.
+
+El cruce no usa merge: las cuentas de los dos lados se factorizan juntas a
+un código entero (pd.factorize) y lo cobrado por cuenta sale de np.bincount
+sobre esos códigos; el costo es lineal en las filas de pagos.
+
+Cobrado es el pago registrado en caja y pendiente, el total del padrón; la
+tasa de recuperación es cobrado / (cobrado + pendiente). Las cuentas que
+pagaron y ya no están en el padrón (liquidaron o se dieron de baja) cuentan
+como recuperadas con pendiente 0 y se agrupan como FUERA DE PADRÓN.
+
+Salida en <output_dir>/conciliacion_output/Conciliacion.xlsx con las hojas
+RECUPERACION, POR CP, POR CUENTA y FUERA DE PADRON.
+
+Uso:
+    python -m app_iiwa.conciliacion CAMPO/SISTEMA.xlsx CAJA/ENE.xlsx CAJA/FEB.xlsx --salida reportes
+"""
+
+import argparse
+import hashlib
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import eventos
+from .caja import COLUMNAS_REQUERIDAS as COLUMNAS_CAJA
+from .caja import KEYS_EVIDENCIAS
+from .caja import _cargar_sistema as _cargar_caja
+from .caja import (
+    _centavos,
+    _evidencias_x_fecha,
+    _mascara_rezago,
+    _suma_centavos,
+    _ultima_meta,
+)
+from .campo import COLUMNAS_DERIVABLES
+from .campo import COLUMNAS_REQUERIDAS as COLUMNAS_CAMPO
+from .cancelacion import Cancelado, revisar
+from .comparativo import _etapa_cuentas
+from .constantes import CARPETA_CACHE
+from .historial import clave_texto
+from .ingesta import columnas_faltantes, leer_encabezado
+from .metricas import Corrida
+from .pipeline import Pipeline, observar
+from .utils import ensure_dirs
+
+FUERA_DE_PADRON = "FUERA DE PADRÓN"
+REZAGO = "REZAGO IIWA 2024-6 y anteriores (pagdCosto)"
+COLUMNAS_PAGOS = ["NumerodeCuenta", "CodigoPostal", *KEYS_EVIDENCIAS, "pago", REZAGO]
+COLUMNAS_CUENTA = [
+    "NumerodeCuenta",
+    "CodigoPostal",
+    "Propietario",
+    "TipoConsumo",
+    "TipoConexion",
+]
+SUMAS = ["pendiente", "cobrado", "rezago_cobrado"]
+
+
+def pagos_caja(df: pd.DataFrame) -> pd.DataFrame:
+    """Pago y rezago cobrado por (FolioImpreso, fechapago), como evidencias_x_fecha"""
+    con_cents = df.assign(_cents=_centavos(df))
+    filtrado = df[_mascara_rezago(df)]
+    evidencias = _evidencias_x_fecha(
+        _suma_centavos(filtrado.assign(_cents=_centavos(filtrado))),
+        _suma_centavos(con_cents),
+        _ultima_meta(con_cents),
+    )
+    return evidencias[COLUMNAS_PAGOS].reset_index(drop=True)
+
+
+def conciliar(cuentas: pd.DataFrame, pagos: pd.DataFrame) -> dict:
+    """
+    Cruza el resumen por cuenta del padrón con los pagos de caja
+
+    Args:
+        cuentas: una fila por NumerodeCuenta (comparativo.resumen_cuentas)
+        pagos: filas de pagos_caja de uno o más cortes, ya depuradas
+
+    Returns:
+        {"por_cuenta": padrón con cobrado y pendiente,
+         "fuera": cuentas con pagos que no están en el padrón}
+    """
+    claves = clave_texto(
+        pd.concat(
+            [cuentas["NumerodeCuenta"], pagos["NumerodeCuenta"]], ignore_index=True
+        )
+    )
+    codigos, unicas = pd.factorize(claves)
+    en_padron, en_pagos = codigos[: len(cuentas)], codigos[len(cuentas) :]
+
+    # Pagos sin cuenta (código -1) no se pueden asignar
+    validos = en_pagos >= 0
+    en_pagos = en_pagos[validos]
+    n = len(unicas)
+    cobrado = np.bincount(en_pagos, pagos["pago"].to_numpy()[validos], n)
+    rezago = np.bincount(en_pagos, pagos[REZAGO].to_numpy()[validos], n)
+    folios = np.bincount(en_pagos, minlength=n)
+
+    por_cuenta = cuentas.reindex(columns=COLUMNAS_CUENTA).assign(
+        CodigoPostal=clave_texto(cuentas["CodigoPostal"]).to_numpy(),
+        pendiente=cuentas["total"].to_numpy(),
+        cobrado=cobrado[en_padron],
+        rezago_cobrado=rezago[en_padron],
+        folios=folios[en_padron],
+    )
+
+    fuera = np.ones(n, dtype=bool)
+    fuera[en_padron] = False
+    fuera &= folios > 0
+    # Datos de la primera fila de pago de cada cuenta fuera del padrón
+    codigos_fuera = np.flatnonzero(fuera)
+    primeras = pd.Series(np.arange(len(en_pagos))).groupby(en_pagos).first()
+    filas = pagos.loc[validos].iloc[primeras.loc[codigos_fuera].to_numpy()]
+    fuera = pd.DataFrame(
+        {
+            "NumerodeCuenta": unicas[codigos_fuera],
+            "CodigoPostal": clave_texto(filas["CodigoPostal"]).to_numpy(),
+            "TipoConsumo": FUERA_DE_PADRON,
+            "TipoConexion": FUERA_DE_PADRON,
+            "pendiente": 0.0,
+            "cobrado": cobrado[codigos_fuera],
+            "rezago_cobrado": rezago[codigos_fuera],
+            "folios": folios[codigos_fuera],
+        }
+    )
+    return {
+        "por_cuenta": por_cuenta,
+        "fuera": fuera,
+        "sin_cuenta": int((~validos).sum()),
+    }
+
+
+def recuperacion(tabla: pd.DataFrame, grupos: list) -> pd.DataFrame:
+    """Cuentas, cuentas con pago, sumas y tasa de recuperación por `grupos`"""
+    tabla = tabla.assign(cuentas_con_pago=tabla["folios"] > 0)
+    agrupado = tabla.groupby(grupos, dropna=False)
+    resumen = agrupado[["cuentas_con_pago", *SUMAS]].sum()
+    resumen.insert(0, "cuentas", agrupado.size())
+    resumen = resumen.reset_index()
+    total = resumen.drop(columns=grupos).sum().to_frame().T
+    resumen = pd.concat([resumen, total.assign(**{grupos[0]: "Total"})])
+    resumen = resumen.astype({"cuentas": np.int64, "cuentas_con_pago": np.int64})
+    base = resumen["cobrado"] + resumen["pendiente"]
+    resumen["tasa_recuperacion"] = (resumen["cobrado"] / base.where(base > 0)).round(4)
+    return resumen.reset_index(drop=True)
+
+
+def _depurar(cortes: list) -> pd.DataFrame:
+    """Une los cortes de caja; un folio y fecha repetidos toman el último corte"""
+    pagos = pd.concat(cortes, ignore_index=True)
+    return pagos.drop_duplicates(KEYS_EVIDENCIAS, keep="last", ignore_index=True)
+
+
+def _etapa_pagos(pipeline: Pipeline, caja_path: Path, log_func) -> str:
+    """Etapa con los pagos de un SISTEMA de CAJA (una versión por archivo)"""
+    ruta = str(Path(caja_path).resolve())
+    nombre = f"pagos_{hashlib.sha1(ruta.encode('utf-8')).hexdigest()[:12]}"
+    return pipeline.etapa(
+        nombre,
+        lambda: pagos_caja(_cargar_caja(caja_path, log_func)),
+        archivos=[caja_path],
+        tablas=True,
+    )
+
+
+def _escribir(tablas: dict, salida: Path, log_func):
+    """Conciliacion.xlsx (escritura atómica)"""
+    log_func("Guardando Conciliacion.xlsx...")
+    libro = salida / "Conciliacion.xlsx"
+    tmp = libro.with_suffix(".tmp.xlsx")
+    with pd.ExcelWriter(tmp, engine="xlsxwriter") as writer:
+        tablas["recuperacion"].to_excel(writer, sheet_name="RECUPERACION", index=False)
+        tablas["por_cp"].to_excel(writer, sheet_name="POR CP", index=False)
+        tablas["por_cuenta"].to_excel(writer, sheet_name="POR CUENTA", index=False)
+        tablas["fuera"].to_excel(writer, sheet_name="FUERA DE PADRON", index=False)
+    tmp.replace(libro)
+
+
+def run_proceso_conciliacion(
+    sistema_path: Path,
+    caja_paths: list,
+    output_dir: Path,
+    log_func,
+    cache_dir: Path = None,
+):
+    """Concilia el padrón de CAMPO con los pagos de CAJA
+
+    Args:
+        sistema_path: SISTEMA de CAMPO (padrón actual)
+        caja_paths: SISTEMA de CAJA, del más viejo al más reciente
+        cache_dir: carpeta de caché de etapas; con ella cada archivo sin
+            cambios se toma de su resumen guardado sin volver a leerlo
+
+    Returns:
+        (ok, carpeta conciliacion_output o mensaje de error)
+    """
+    corrida = Corrida("CONCILIACION")
+    try:
+        sistema_path = Path(sistema_path)
+        caja_paths = [Path(p) for p in caja_paths]
+        output_dir = Path(output_dir)
+        eventos.seccion(log_func, "=== INICIANDO CONCILIACIÓN CAMPO × CAJA ===")
+        log_func(f"Padrón (CAMPO): {sistema_path}")
+        log_func(f"Cortes de caja: {len(caja_paths)}")
+
+        if not caja_paths:
+            return False, "Falta al menos un SISTEMA de CAJA"
+        for path, requeridas, derivables in [
+            (sistema_path, COLUMNAS_CAMPO, COLUMNAS_DERIVABLES)
+        ] + [(p, COLUMNAS_CAJA, None) for p in caja_paths]:
+            if not path.exists():
+                return False, f"No existe el archivo SISTEMA: {path}"
+            faltantes = columnas_faltantes(
+                leer_encabezado(path), requeridas, derivables
+            )
+            if faltantes:
+                return False, f"Columna faltante en {path.name}: {', '.join(faltantes)}"
+
+        salida = output_dir / "conciliacion_output"
+        ensure_dirs(salida)
+
+        pipeline = Pipeline(cache_dir, log_func, "conciliacion")
+        etapa_cuentas = _etapa_cuentas(pipeline, sistema_path, log_func)
+        etapas_pagos = list(
+            dict.fromkeys(_etapa_pagos(pipeline, p, log_func) for p in caja_paths)
+        )
+
+        with observar(corrida.registrar), pipeline.corrida():
+            cuentas = pipeline.resultado(etapa_cuentas)
+            cortes = []
+            for etapa in etapas_pagos:
+                revisar()
+                cortes.append(pipeline.resultado(etapa))
+            revisar()
+            with corrida.medir("conciliar"):
+                pagos = _depurar(cortes)
+                log_func(
+                    f"Cruzando {len(cuentas):,} cuentas del padrón con "
+                    f"{len(pagos):,} pagos de caja..."
+                )
+                tablas = conciliar(cuentas, pagos)
+                todas = pd.concat([tablas["por_cuenta"], tablas["fuera"]])
+                tablas["recuperacion"] = recuperacion(
+                    todas, ["TipoConsumo", "TipoConexion"]
+                )
+                tablas["por_cp"] = recuperacion(todas, ["CodigoPostal"])
+            with corrida.medir("emitir"):
+                _escribir(tablas, salida, log_func)
+
+        if tablas["sin_cuenta"]:
+            eventos.aviso(
+                log_func,
+                f"{tablas['sin_cuenta']:,} pagos sin NumerodeCuenta no se asignaron",
+            )
+        total = tablas["recuperacion"].iloc[-1]
+        log_func(
+            f"  Cobrado: {total['cobrado']:,.2f} | Pendiente: {total['pendiente']:,.2f} | "
+            f"Recuperación: {total['tasa_recuperacion']:.1%} | "
+            f"Fuera de padrón: {len(tablas['fuera']):,} cuentas"
+        )
+        eventos.exito(log_func, f"CONCILIACIÓN COMPLETADA. Reportes en: {salida}")
+        corrida.cerrar(salida, log_func)
+        return True, salida
+
+    except Cancelado as e:
+        eventos.aviso(log_func, f"{e}")
+        return False, str(e)
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+
+
+# ====================================
+# LÍNEA DE COMANDOS
+# ====================================
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="app_iiwa.conciliacion",
+        description="Concilia el adeudo de CAMPO con los pagos de CAJA por cuenta",
+    )
+    parser.add_argument("sistema", type=Path, help="SISTEMA de CAMPO (padrón)")
+    parser.add_argument("caja", type=Path, nargs="+", help="SISTEMA de CAJA")
+    parser.add_argument("--salida", type=Path, default=Path("."))
+    parser.add_argument(
+        "--cache", type=Path, help="carpeta de caché (por defecto, salida/.cache_iiwa)"
+    )
+    args = parser.parse_args(argv)
+
+    ok, resultado = run_proceso_conciliacion(
+        args.sistema,
+        args.caja,
+        args.salida,
+        eventos.consola(stream=sys.stdout),
+        cache_dir=args.cache or args.salida / CARPETA_CACHE,
+    )
+    if not ok:
+        print(resultado, file=sys.stderr)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Valores por defecto compartidos con la interfaz
+
+Viven aparte para que la GUI los importe sin cargar pandas ni numpy; los
+módulos de cálculo los reexportan (backends.BACKEND_DEFAULT,
+bajo_memoria.PRESUPUESTO_DEFAULT_MB, pipeline.CARPETA_CACHE).
+"""
+
+BACKEND_DEFAULT = "pandas"
+BACKENDS = ("pandas", "polars")
+
+# Memoria con la que se dimensionan bloques y cubetas del modo bajo memoria
+PRESUPUESTO_DEFAULT_MB = 512
+
+# Cuentas por CP en Prioridad.xlsx de CAMPO
+PRIORIDAD_DEFAULT = 50
+
+# Carpeta de caché que usa la GUI dentro de la carpeta de salida
+CARPETA_CACHE = ".cache_iiwa"
+
+# Base del historial de cuentas (historial.py)
+ARCHIVO_HISTORIAL = "historial_iiwa.sqlite"
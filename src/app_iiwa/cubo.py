@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Cubo pre-agregado del padrón de CAMPO
+
+CAMPO deja en campo_output/cubo el adeudo de SISTEMA agregado por
+(CodigoPostal, Zona, TipoConsumo, TipoConexion, año de bimfinal): una fila
+por combinación con las sumas de reporte_macro (agua, drenaje, recargos,
+mejoras, iva, total), las filas y las cuentas distintas. Cualquier corte
+(Zona × TipoConsumo × año, un CP por tipo de conexión...) se responde
+agregando esas celdas, sin volver a leer SISTEMA ni pivotear en Excel.
+
+Las sumas se pueden volver a sumar, pero las cuentas distintas no: una cuenta
+con filas en dos celdas se contaría dos veces. Por eso el cubo guarda también
+las parejas (celda, cuenta) únicas, con la cuenta como entero (su hash
+factorizado), y consultar() cuenta las parejas (grupo, cuenta) distintas con
+numpy. Ambas tablas se guardan con artefactos (Parquet si pyarrow está
+instalado).
+
+Las dimensiones se guardan como texto; los valores vacíos quedan como
+SIN DATO.
+
+Uso:
+    python -m app_iiwa.cubo reportes/campo_output/cubo --por Zona TipoConsumo año
+    python -m app_iiwa.cubo reportes/campo_output/cubo --por año --filtro Zona=3 --filtro TipoConsumo=MEDIDO
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import artefactos
+from .backends import base_macro
+from .bajo_memoria import hash_valores
+from .historial import clave_texto
+
+CARPETA_CUBO = "cubo"
+SIN_DATO = "SIN DATO"
+DIMENSIONES = ["CodigoPostal", "Zona", "TipoConsumo", "TipoConexion", "año"]
+MEDIDAS = ["agua", "drenaje", "recargos", "mejoras", "iva", "total"]
+# Tamaño máximo (en bytes) del mapa grupo × cuenta de consultar(); arriba de
+# él las cuentas distintas se cuentan ordenando las parejas
+MAX_CELDAS_MAPA = 1 << 26
+
+
+def construir_cubo(df: pd.DataFrame) -> dict:
+    """
+    Cubo de SISTEMA (con las columnas de CAMPO)
+
+    Returns:
+        {"celdas": una fila por combinación de DIMENSIONES con las MEDIDAS,
+         filas y cuentas; "cuentas": parejas únicas (celda, cuenta)}
+    """
+    base = base_macro(df)
+    dimensiones = pd.DataFrame(
+        {
+            "CodigoPostal": clave_texto(base["CodigoPostal"]),
+            "Zona": clave_texto(base["Zona"]),
+            "TipoConsumo": base["TipoConsumo"].astype("string").str.strip(),
+            "TipoConexion": base["TipoConexion"].astype("string").str.strip(),
+            "año": base["bimfinal"].astype("string").str.extract(r"^(\d{4})")[0],
+        }
+    ).fillna(SIN_DATO)
+
+    grupos = dimensiones.groupby(DIMENSIONES, sort=True)
+    celda = grupos.ngroup().to_numpy()
+    celdas = grupos.size().rename("filas").reset_index()
+    sumas = base[MEDIDAS].astype(float).groupby(celda).sum()
+    celdas[MEDIDAS] = sumas.to_numpy()
+
+    # Cada cuenta se guarda como un entero consecutivo (su hash factorizado)
+    cuenta, _ = pd.factorize(hash_valores(base["NumerodeCuenta"]))
+    parejas = pd.DataFrame(
+        {"celda": celda.astype(np.int32), "cuenta": cuenta.astype(np.int32)}
+    ).drop_duplicates(ignore_index=True)
+    celdas.insert(
+        len(DIMENSIONES) + 1,
+        "cuentas",
+        np.bincount(parejas["celda"], minlength=len(celdas)),
+    )
+    return {
+        "celdas": celdas.astype({d: "string" for d in DIMENSIONES}),
+        "cuentas": parejas,
+    }
+
+
+def guardar_cubo(directorio: Path, cubo: dict):
+    artefactos.guardar(directorio, cubo)
+
+
+def cargar_cubo(directorio: Path) -> dict:
+    return artefactos.cargar(directorio)
+
+
+def _distintas(grupo: np.ndarray, cuenta: np.ndarray, n_grupos: int) -> np.ndarray:
+    """Cuentas distintas por grupo a partir de parejas (grupo, cuenta)"""
+    if len(cuenta) == 0:
+        return np.zeros(n_grupos, dtype=np.int64)
+    n_cuentas = int(cuenta.max()) + 1
+    claves = grupo * n_cuentas + cuenta
+    if n_grupos * n_cuentas <= MAX_CELDAS_MAPA:
+        # Mapa de bits grupo × cuenta: sin ordenar
+        mapa = np.zeros(n_grupos * n_cuentas, dtype=bool)
+        mapa[claves] = True
+        return mapa.reshape(n_grupos, n_cuentas).sum(axis=1)
+    claves.sort()
+    nueva = np.ones(len(claves), dtype=bool)
+    nueva[1:] = claves[1:] != claves[:-1]
+    return np.bincount(claves[nueva] // n_cuentas, minlength=n_grupos)
+
+
+def consultar(cubo: dict, por=(), filtros: dict = None) -> pd.DataFrame:
+    """
+    Agrega el cubo por las dimensiones `por`
+
+    Args:
+        por: dimensiones del resultado (vacío = un solo total)
+        filtros: {dimensión: valor o lista de valores} que se conservan
+
+    Returns:
+        una fila por combinación de `por` con filas, cuentas distintas y las
+        MEDIDAS
+    """
+    por = list(por)
+    desconocidas = set(por) | set(filtros or {})
+    desconocidas -= set(DIMENSIONES)
+    if desconocidas:
+        raise ValueError(f"Dimensión desconocida: {', '.join(sorted(desconocidas))}")
+
+    celdas = cubo["celdas"]
+    mascara = np.ones(len(celdas), dtype=bool)
+    for dimension, valores in (filtros or {}).items():
+        if isinstance(valores, (str, int, float)):
+            valores = [valores]
+        valores = clave_texto(pd.Series(list(valores))).tolist()
+        mascara &= celdas[dimension].isin(valores).to_numpy()
+    seleccion = celdas[mascara]
+
+    if por:
+        grupos = seleccion.groupby(por, sort=True)
+        resultado = grupos[["filas", *MEDIDAS]].sum()
+        codigo = grupos.ngroup().to_numpy()
+    else:
+        resultado = seleccion[["filas", *MEDIDAS]].sum().to_frame("Total").T
+        codigo = np.zeros(len(seleccion), dtype=np.int64)
+
+    # Grupo de cada celda (-1 = filtrada) y de cada pareja (celda, cuenta)
+    grupo_de_celda = np.full(len(celdas), -1, dtype=np.int64)
+    grupo_de_celda[np.flatnonzero(mascara)] = codigo
+    parejas = cubo["cuentas"]
+    grupo = grupo_de_celda[parejas["celda"].to_numpy()]
+    dentro = grupo >= 0
+    resultado.insert(
+        1,
+        "cuentas",
+        _distintas(grupo[dentro], parejas["cuenta"].to_numpy()[dentro], len(resultado)),
+    )
+    return resultado
+
+
+# ====================================
+# LÍNEA DE COMANDOS
+# ====================================
+
+
+def _filtros(pares: list) -> dict:
+    filtros = {}
+    for par in pares:
+        dimension, _, valor = par.partition("=")
+        if not valor:
+            raise ValueError(f"Filtro sin valor: {par} (se espera DIMENSION=valor)")
+        filtros.setdefault(dimension, []).append(valor)
+    return filtros
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="app_iiwa.cubo",
+        description="Consulta el cubo de adeudos que deja CAMPO",
+    )
+    parser.add_argument("cubo", type=Path, help="carpeta campo_output/cubo")
+    parser.add_argument("--por", nargs="*", default=[], choices=DIMENSIONES)
+    parser.add_argument(
+        "--filtro", action="append", default=[], help="DIMENSION=valor (repetible)"
+    )
+    parser.add_argument("--csv", type=Path, help="guarda el resultado en CSV")
+    args = parser.parse_args(argv)
+
+    try:
+        resultado = consultar(cargar_cubo(args.cubo), args.por, _filtros(args.filtro))
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.csv:
+        resultado.to_csv(args.csv, encoding="utf-8-sig")
+    with pd.option_context("display.width", 160, "display.max_rows", 500):
+        print(resultado.round(2).to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Eventos de log estructurados
+
+Los procesos siguen recibiendo un log_func, pero en lugar de un texto le
+pueden pasar un Evento: nivel, etapa, mensaje y contadores. Evento hereda de
+str, así que cualquier log_func que espera texto (print, list.append, las
+pruebas) sigue funcionando; quien lo sabe leer (la GUI, el archivo de
+historial, consola()) decide el estilo por el nivel y no buscando palabras
+como "Error" o "===" dentro del mensaje.
+
+Crear un Evento cuesta lo mismo que formatear el texto: la hora se toma como
+número y sólo se formatea al mostrarla, así que se puede emitir uno por CP.
+"""
+
+import sys
+import time
+
+DETALLE = 10
+INFO = 20
+EXITO = 25
+AVISO = 30
+ERROR = 40
+
+NOMBRES = {
+    DETALLE: "DETALLE",
+    INFO: "INFO",
+    EXITO: "ÉXITO",
+    AVISO: "AVISO",
+    ERROR: "ERROR",
+}
+NIVELES = {nombre: nivel for nivel, nombre in NOMBRES.items()}
+
+
+class Evento(str):
+    """
+    Mensaje de log con nivel, etapa y contadores
+
+    Args:
+        nivel: DETALLE, INFO, EXITO, AVISO o ERROR
+        etapa: etapa del proceso que lo emite ("carga", "emitir"...)
+        seccion: encabezado de sección (inicio de un proceso)
+        contadores: números asociados (filas, registros, segundos)
+    """
+
+    def __new__(cls, mensaje, nivel=INFO, etapa=None, seccion=False, **contadores):
+        evento = super().__new__(cls, mensaje)
+        evento.nivel = nivel
+        evento.etapa = etapa
+        evento.seccion = seccion
+        evento.contadores = contadores
+        evento.hora = time.time()
+        return evento
+
+
+def como_evento(mensaje) -> Evento:
+    """El mismo Evento, o un Evento INFO con el texto de `mensaje`"""
+    return mensaje if isinstance(mensaje, Evento) else Evento(str(mensaje))
+
+
+def etiquetar(log_func, etiqueta: str):
+    """
+    log_func que antepone "[etiqueta] " a cada mensaje
+
+    Para distinguir los logs de procesos que corren a la vez; conserva el
+    nivel, la etapa, los contadores y la hora del evento original.
+    """
+
+    def log_etiquetado(mensaje):
+        evento = como_evento(mensaje)
+        nuevo = Evento(
+            f"[{etiqueta}] {evento}",
+            evento.nivel,
+            evento.etapa,
+            evento.seccion,
+            **evento.contadores,
+        )
+        nuevo.hora = evento.hora
+        log_func(nuevo)
+
+    return log_etiquetado
+
+
+def _emitir(log_func, nivel, mensaje, etapa, contadores, seccion=False):
+    log_func(Evento(mensaje, nivel, etapa, seccion, **contadores))
+
+
+def detalle(log_func, mensaje: str, etapa: str = None, **contadores):
+    """Avance fino (por CP, por bloque); la GUI lo oculta por defecto"""
+    _emitir(log_func, DETALLE, mensaje, etapa, contadores)
+
+
+def info(log_func, mensaje: str, etapa: str = None, **contadores):
+    _emitir(log_func, INFO, mensaje, etapa, contadores)
+
+
+def seccion(log_func, mensaje: str, etapa: str = None, **contadores):
+    """Encabezado de sección (nivel INFO, se resalta)"""
+    _emitir(log_func, INFO, mensaje, etapa, contadores, seccion=True)
+
+
+def exito(log_func, mensaje: str, etapa: str = None, **contadores):
+    _emitir(log_func, EXITO, mensaje, etapa, contadores)
+
+
+def aviso(log_func, mensaje: str, etapa: str = None, **contadores):
+    _emitir(log_func, AVISO, mensaje, etapa, contadores)
+
+
+def error(log_func, mensaje: str, etapa: str = None, **contadores):
+    _emitir(log_func, ERROR, mensaje, etapa, contadores)
+
+
+# ====================================
+# FORMATOS
+# ====================================
+
+
+def hora(evento: Evento) -> str:
+    return time.strftime("%H:%M:%S", time.localtime(evento.hora))
+
+
+def formato_gui(evento: Evento) -> str:
+    """[HH:MM:SS] mensaje; el nivel se ve por el color"""
+    return f"[{hora(evento)}] {evento}"
+
+
+def formato_archivo(evento: Evento) -> str:
+    """Línea del historial: fecha, nivel, etapa, mensaje y contadores"""
+    fecha = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(evento.hora))
+    etapa = f" [{evento.etapa}]" if evento.etapa else ""
+    contadores = "".join(f" {k}={v}" for k, v in evento.contadores.items())
+    texto = str(evento).replace("\n", "\n    ")
+    return f"{fecha} {NOMBRES[evento.nivel]:<7}{etapa} {texto}{contadores}"
+
+
+def formato_consola(evento: Evento) -> str:
+    """Para terminal: avisos y errores con prefijo, el resto sólo el texto"""
+    if evento.nivel >= AVISO:
+        return f"{NOMBRES[evento.nivel]}: {evento}"
+    if evento.seccion:
+        return f"\n{evento}"
+    return str(evento)
+
+
+def consola(nivel_minimo: int = INFO, stream=None):
+    """log_func que escribe en terminal los eventos desde `nivel_minimo`"""
+
+    def log_func(mensaje):
+        evento = como_evento(mensaje)
+        if evento.nivel >= nivel_minimo:
+            print(formato_consola(evento), file=stream or sys.stderr)
+
+    return log_func
@@ -0,0 +1,450 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Historial de cuentas mes a mes
+
+Guarda en una base SQLite local (un solo archivo, sin servidor) lo que deja
+cada corrida de CAMPO y de CAJA:
+- adeudos: una fila por NumerodeCuenta y periodo con los montos de
+  reporte_macro (resumen de comparativo.resumen_cuentas)
+- pagos: una fila por (FolioImpreso, fechapago) de evidencias_x_fecha con la
+  cuenta, el CP, el pago y el rezago cobrado
+
+La base sólo crece: cada corrida agrega sus filas bajo un registro de
+`corridas` con la huella del SISTEMA (hash del contenido), y un SISTEMA que ya
+se registró no se vuelve a agregar. Si se vuelve a exportar un periodo, las
+consultas usan la corrida más reciente: para adeudos, la última corrida de
+CAMPO del periodo; para pagos, la última corrida que trae cada folio y
+fecha (los cortes de caja se traslapan). compactar() borra las filas que ya
+quedaron reemplazadas; es incremental porque sólo revisa las corridas
+registradas desde la compactación anterior.
+
+Las dos tablas tienen índices por (cuenta, periodo) y (cp, periodo): la
+historia de una cuenta o la serie de un CP no recorren la base completa.
+
+Uso:
+    python -m app_iiwa.historial reportes/historial_iiwa.sqlite cuenta 1234
+    python -m app_iiwa.historial reportes/historial_iiwa.sqlite cp 50000
+    python -m app_iiwa.historial reportes/historial_iiwa.sqlite registrar CAMPO ENERO/SISTEMA.xlsx --periodo 2025-01
+    python -m app_iiwa.historial reportes/historial_iiwa.sqlite compactar
+"""
+
+import argparse
+import sqlite3
+import sys
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from . import eventos
+from .ingesta import hash_archivo
+
+# Segundos que una conexión espera a que otra libere la base (CAMPO y CAJA
+# pueden registrar a la vez desde ambos.py)
+ESPERA_BLOQUEO_S = 30
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS corridas (
+    id INTEGER PRIMARY KEY,
+    proceso TEXT NOT NULL,
+    periodo TEXT,
+    origen TEXT,
+    huella TEXT NOT NULL,
+    filas INTEGER,
+    registrada TEXT,
+    compactada INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (proceso, huella)
+);
+CREATE TABLE IF NOT EXISTS adeudos (
+    corrida INTEGER NOT NULL,
+    periodo TEXT NOT NULL,
+    cuenta TEXT NOT NULL,
+    cp TEXT,
+    tipo_consumo TEXT,
+    tipo_conexion TEXT,
+    agua REAL,
+    drenaje REAL,
+    recargos REAL,
+    mejoras REAL,
+    iva REAL,
+    total REAL
+);
+CREATE INDEX IF NOT EXISTS adeudos_cuenta ON adeudos (cuenta, periodo);
+CREATE INDEX IF NOT EXISTS adeudos_cp ON adeudos (cp, periodo);
+CREATE INDEX IF NOT EXISTS adeudos_corrida ON adeudos (periodo, corrida);
+CREATE TABLE IF NOT EXISTS pagos (
+    corrida INTEGER NOT NULL,
+    periodo TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    folio TEXT NOT NULL,
+    cuenta TEXT,
+    cp TEXT,
+    pago REAL,
+    rezago REAL
+);
+CREATE INDEX IF NOT EXISTS pagos_cuenta ON pagos (cuenta, periodo);
+CREATE INDEX IF NOT EXISTS pagos_cp ON pagos (cp, periodo);
+CREATE INDEX IF NOT EXISTS pagos_folio ON pagos (folio, fecha, corrida);
+CREATE VIEW IF NOT EXISTS adeudos_vigentes AS
+    SELECT a.* FROM adeudos a
+    JOIN (
+        SELECT periodo, MAX(id) AS corrida FROM corridas
+        WHERE proceso = 'CAMPO' GROUP BY periodo
+    ) u ON a.periodo = u.periodo AND a.corrida = u.corrida;
+CREATE VIEW IF NOT EXISTS pagos_vigentes AS
+    SELECT p.* FROM pagos p
+    WHERE p.corrida = (
+        SELECT MAX(q.corrida) FROM pagos q
+        WHERE q.folio = p.folio AND q.fecha = p.fecha
+    );
+"""
+
+COLUMNAS_ADEUDOS = {
+    "NumerodeCuenta": "cuenta",
+    "CodigoPostal": "cp",
+    "TipoConsumo": "tipo_consumo",
+    "TipoConexion": "tipo_conexion",
+    "agua": "agua",
+    "drenaje": "drenaje",
+    "recargos": "recargos",
+    "mejoras": "mejoras",
+    "iva": "iva",
+    "total": "total",
+}
+COLUMNAS_PAGOS = {
+    "fechapago": "fecha",
+    "FolioImpreso": "folio",
+    "NumerodeCuenta": "cuenta",
+    "CodigoPostal": "cp",
+    "pago": "pago",
+    "REZAGO IIWA 2024-6 y anteriores (pagdCosto)": "rezago",
+}
+
+
+def clave_texto(serie: pd.Series) -> pd.Series:
+    """
+    Cuentas y CPs como texto comparable entre meses: un SISTEMA puede traer
+    50000 y otro 50000.0 o " 50000"
+    """
+    texto = serie.astype("string").str.strip()
+    return texto.str.replace(r"^(\d+)\.0+$", r"\1", regex=True)
+
+
+def periodo_de(sistema_path: Path) -> str:
+    """Periodo AAAA-MM por defecto de un SISTEMA: el mes de su modificación"""
+    return datetime.fromtimestamp(Path(sistema_path).stat().st_mtime).strftime("%Y-%m")
+
+
+def conectar(db_path: Path) -> sqlite3.Connection:
+    """Abre (o crea) la base con el esquema del historial"""
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conexion = sqlite3.connect(db_path, timeout=ESPERA_BLOQUEO_S)
+    # WAL: las consultas no bloquean a una corrida que está registrando
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.execute("PRAGMA synchronous=NORMAL")
+    conexion.executescript(ESQUEMA)
+    return conexion
+
+
+def _registrar_corrida(conexion, proceso, periodo, origen, huella, filas):
+    """id de la corrida nueva, o None si ese SISTEMA ya estaba registrado"""
+    cursor = conexion.execute(
+        "INSERT OR IGNORE INTO corridas"
+        " (proceso, periodo, origen, huella, filas, registrada)"
+        " VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            proceso,
+            periodo,
+            str(origen),
+            huella,
+            filas,
+            datetime.now().isoformat(timespec="seconds"),
+        ),
+    )
+    return cursor.lastrowid if cursor.rowcount else None
+
+
+def _filas(tabla: pd.DataFrame, columnas: dict, claves: list):
+    """Tuplas para executemany con las columnas renombradas y NaN como NULL"""
+    tabla = tabla[list(columnas)].rename(columns=columnas)
+    for c in claves:
+        tabla[c] = clave_texto(tabla[c])
+    tabla = tabla.astype(object).where(tabla.notna(), None)
+    return tabla, list(tabla.itertuples(index=False, name=None))
+
+
+def registrar_adeudos(
+    db_path: Path, resumen: pd.DataFrame, periodo: str, origen: Path, huella: str
+):
+    """
+    Agrega el resumen por cuenta de un SISTEMA de CAMPO
+
+    Args:
+        resumen: una fila por NumerodeCuenta (comparativo.resumen_cuentas)
+        periodo: AAAA-MM al que corresponde el SISTEMA
+        huella: hash del contenido del SISTEMA (ingesta.hash_archivo)
+
+    Returns:
+        id de la corrida, o None si ese SISTEMA ya estaba en el historial
+    """
+    tabla, filas = _filas(resumen, COLUMNAS_ADEUDOS, ["cuenta", "cp"])
+    with closing(conectar(db_path)) as conexion, conexion:
+        corrida = _registrar_corrida(
+            conexion, "CAMPO", periodo, origen, huella, len(filas)
+        )
+        if corrida is None:
+            return None
+        conexion.executemany(
+            f"INSERT INTO adeudos (corrida, periodo, {', '.join(tabla.columns)})"
+            f" VALUES (?, ?{', ?' * len(tabla.columns)})",
+            [(corrida, periodo, *fila) for fila in filas],
+        )
+    return corrida
+
+
+def registrar_pagos(db_path: Path, evidencias: pd.DataFrame, origen: Path, huella: str):
+    """
+    Agrega los pagos de una corrida de CAJA
+
+    El periodo de cada pago es el mes de su fechapago; la corrida se registra
+    con el último mes que trae el SISTEMA.
+
+    Args:
+        evidencias: evidencias_x_fecha de CAJA (una fila por folio y fecha)
+        huella: hash del contenido del SISTEMA (ingesta.hash_archivo)
+
+    Returns:
+        id de la corrida, o None si ese SISTEMA ya estaba en el historial
+    """
+    tabla, _ = _filas(evidencias, COLUMNAS_PAGOS, ["cuenta", "cp", "folio"])
+    tabla = tabla.dropna(subset=["fecha", "folio"])
+    periodos = tabla["fecha"].astype(str).str[:7]
+    tabla.insert(0, "periodo", periodos)
+    with closing(conectar(db_path)) as conexion, conexion:
+        corrida = _registrar_corrida(
+            conexion,
+            "CAJA",
+            periodos.max() if len(periodos) else None,
+            origen,
+            huella,
+            len(tabla),
+        )
+        if corrida is None:
+            return None
+        conexion.executemany(
+            f"INSERT INTO pagos (corrida, {', '.join(tabla.columns)})"
+            f" VALUES (?{', ?' * len(tabla.columns)})",
+            [(corrida, *fila) for fila in tabla.itertuples(index=False, name=None)],
+        )
+    return corrida
+
+
+def alimentar(
+    db_path: Path, proceso: str, sistema_path: Path, tabla: pd.DataFrame, log_func
+):
+    """
+    Registra una corrida terminada de CAMPO (SISTEMA con Total) o de CAJA
+    (evidencias_x_fecha)
+
+    Un error del historial no hace fallar el proceso: los reportes ya se
+    escribieron, así que sólo se avisa en el log.
+    """
+    try:
+        huella = hash_archivo(sistema_path)
+        if proceso == "CAMPO":
+            from .comparativo import resumen_cuentas
+
+            periodo = periodo_de(sistema_path)
+            corrida = registrar_adeudos(
+                db_path, resumen_cuentas(tabla), periodo, sistema_path, huella
+            )
+        else:
+            corrida = registrar_pagos(db_path, tabla, sistema_path, huella)
+    except (sqlite3.Error, OSError) as e:
+        eventos.aviso(log_func, f"No se pudo actualizar el historial: {e}")
+        return None
+    if corrida is None:
+        log_func(f"Historial: {sistema_path.name} ya estaba registrado")
+    else:
+        log_func(f"Historial actualizado ({proceso}, corrida {corrida}): {db_path}")
+    return corrida
+
+
+# ====================================
+# CONSULTAS
+# ====================================
+
+
+def _consultar(db_path: Path, sql: str, parametros=()) -> pd.DataFrame:
+    with closing(conectar(db_path)) as conexion:
+        return pd.read_sql_query(sql, conexion, params=parametros)
+
+
+def _clave(valor) -> str:
+    return clave_texto(pd.Series([valor])).iloc[0]
+
+
+def historia_cuenta(db_path: Path, cuenta) -> dict:
+    """
+    Adeudos por periodo y pagos de una cuenta
+
+    Returns:
+        {"adeudos": una fila por periodo, "pagos": una fila por folio y fecha}
+    """
+    cuenta = _clave(cuenta)
+    adeudos = _consultar(
+        db_path,
+        "SELECT periodo, cp, tipo_consumo, tipo_conexion, agua, drenaje,"
+        " recargos, mejoras, iva, total FROM adeudos_vigentes"
+        " WHERE cuenta = ? ORDER BY periodo",
+        (cuenta,),
+    )
+    pagos = _consultar(
+        db_path,
+        "SELECT periodo, fecha, folio, cp, pago, rezago FROM pagos_vigentes"
+        " WHERE cuenta = ? ORDER BY fecha, folio",
+        (cuenta,),
+    )
+    return {"adeudos": adeudos, "pagos": pagos}
+
+
+def serie_cp(db_path: Path, cp) -> pd.DataFrame:
+    """
+    Serie mensual de un CP: cuentas con adeudo y su total, y lo cobrado en
+    caja (folios, pagos y rezago) en cada periodo
+    """
+    cp = _clave(cp)
+    adeudos = _consultar(
+        db_path,
+        "SELECT periodo, COUNT(DISTINCT cuenta) AS cuentas_adeudo,"
+        " SUM(total) AS adeudo FROM adeudos_vigentes"
+        " WHERE cp = ? GROUP BY periodo",
+        (cp,),
+    )
+    pagos = _consultar(
+        db_path,
+        "SELECT periodo, COUNT(*) AS folios, SUM(pago) AS pagado,"
+        " SUM(rezago) AS rezago_cobrado FROM pagos_vigentes"
+        " WHERE cp = ? GROUP BY periodo",
+        (cp,),
+    )
+    serie = adeudos.merge(pagos, on="periodo", how="outer")
+    return serie.sort_values("periodo", ignore_index=True)
+
+
+def compactar(db_path: Path, vacuum: bool = False) -> dict:
+    """
+    Borra las filas que reemplazó una corrida posterior
+
+    Sólo revisa las corridas que no se habían compactado, en orden: una
+    corrida de CAMPO reemplaza los adeudos del mismo periodo de corridas
+    anteriores y una de CAJA, los pagos con su mismo folio y fecha. Con
+    vacuum=True además reescribe el archivo para devolver el espacio al disco.
+
+    Returns:
+        {"corridas": revisadas, "adeudos": filas borradas, "pagos": filas borradas}
+    """
+    borradas = {"corridas": 0, "adeudos": 0, "pagos": 0}
+    with closing(conectar(db_path)) as conexion:
+        with conexion:
+            pendientes = conexion.execute(
+                "SELECT id, proceso, periodo FROM corridas"
+                " WHERE compactada = 0 ORDER BY id"
+            ).fetchall()
+            for corrida, proceso, periodo in pendientes:
+                if proceso == "CAMPO":
+                    cursor = conexion.execute(
+                        "DELETE FROM adeudos WHERE periodo = ? AND corrida < ?",
+                        (periodo, corrida),
+                    )
+                    borradas["adeudos"] += cursor.rowcount
+                else:
+                    cursor = conexion.execute(
+                        "DELETE FROM pagos WHERE corrida < ? AND EXISTS ("
+                        " SELECT 1 FROM pagos q WHERE q.corrida = ?"
+                        " AND q.folio = pagos.folio AND q.fecha = pagos.fecha)",
+                        (corrida, corrida),
+                    )
+                    borradas["pagos"] += cursor.rowcount
+                conexion.execute(
+                    "UPDATE corridas SET compactada = 1 WHERE id = ?", (corrida,)
+                )
+            borradas["corridas"] = len(pendientes)
+        conexion.execute("PRAGMA optimize")
+        if vacuum:
+            conexion.execute("VACUUM")
+    return borradas
+
+
+# ====================================
+# LÍNEA DE COMANDOS
+# ====================================
+
+
+def _registrar_sistema(db_path, proceso, sistema_path, periodo, log_func):
+    """Lee un SISTEMA viejo y lo agrega al historial (para cargar meses previos)"""
+    huella = hash_archivo(sistema_path)
+    if proceso == "CAMPO":
+        from .campo import _cargar_sistema
+        from .comparativo import resumen_cuentas
+
+        return registrar_adeudos(
+            db_path,
+            resumen_cuentas(_cargar_sistema(sistema_path, log_func)),
+            periodo or periodo_de(sistema_path),
+            sistema_path,
+            huella,
+        )
+    # CAJA normaliza fechapago al leer
+    from .caja import _agregados_caja, _cargar_sistema
+
+    df = _cargar_sistema(sistema_path, log_func)
+    evidencias = _agregados_caja(df, log_func)["evidencias_x_fecha"]
+    return registrar_pagos(db_path, evidencias, sistema_path, huella)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="app_iiwa.historial",
+        description="Consulta y mantiene el historial de cuentas",
+    )
+    parser.add_argument("base", type=Path, help="archivo SQLite del historial")
+    ordenes = parser.add_subparsers(dest="orden", required=True)
+    ordenes.add_parser("cuenta", help="historia de una cuenta").add_argument("cuenta")
+    ordenes.add_parser("cp", help="serie mensual de un CP").add_argument("cp")
+    registrar = ordenes.add_parser("registrar", help="agrega un SISTEMA anterior")
+    registrar.add_argument("proceso", choices=["CAMPO", "CAJA"])
+    registrar.add_argument("sistema", type=Path)
+    registrar.add_argument("--periodo", help="AAAA-MM (CAMPO; por defecto, su fecha)")
+    compacta = ordenes.add_parser("compactar", help="borra filas reemplazadas")
+    compacta.add_argument("--vacuum", action="store_true")
+    args = parser.parse_args(argv)
+
+    with pd.option_context("display.width", 160, "display.max_rows", 500):
+        if args.orden == "cuenta":
+            for nombre, tabla in historia_cuenta(args.base, args.cuenta).items():
+                print(f"== {nombre.upper()} ==")
+                print(tabla.to_string(index=False) if len(tabla) else "(sin filas)")
+        elif args.orden == "cp":
+            serie = serie_cp(args.base, args.cp)
+            print(serie.to_string(index=False) if len(serie) else "(sin filas)")
+        elif args.orden == "registrar":
+            corrida = _registrar_sistema(
+                args.base,
+                args.proceso,
+                args.sistema,
+                args.periodo,
+                eventos.consola(stream=sys.stdout),
+            )
+            print(f"Corrida {corrida}" if corrida else "Ya estaba registrado")
+        else:
+            print(compactar(args.base, vacuum=args.vacuum))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
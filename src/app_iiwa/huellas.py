@@ -0,0 +1,421 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Huellas y diferencias del contenido de los libros de salida
+
+Verifica que una optimización no cambie los números de los reportes
+(ReporteRezagoAgua, reporte_macro, CodigosPostales, REPORTE_COMPLETO...).
+Los libros se leen directo del XML de cada hoja con iterparse, sin openpyxl,
+y cada hoja se reduce a un hash de su contenido normalizado:
+
+- celdas y filas vacías al final se ignoran;
+- texto compartido o en línea es el mismo texto;
+- los números se redondean a DIGITOS cifras significativas y un flotante
+  entero equivale al entero (1.0 == 1);
+- estilos, anchos de columna y fórmulas no cuentan, sólo valores.
+
+Antes del hash se compara la firma de cada hoja (CRC32 y tamaño que el zip ya
+trae en su directorio, sin descomprimir): dos hojas con los mismos bytes no se
+leen. Sólo las hojas cuyo hash difiere se comparan celda por celda, con
+tolerancia relativa, así que comparar salidas grandes idénticas toma segundos. Las
+referencias pueden ser los libros dorados o un JSON de huellas
+(guardar_huellas), que basta para saber qué hoja cambió.
+
+Uso:
+    python -m app_iiwa.huellas DORADO ACTUAL        # carpetas, libros o JSON
+    python -m app_iiwa.huellas ACTUAL --guardar huellas.json
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import posixpath
+import sys
+import zipfile
+from pathlib import Path
+from xml.etree.ElementTree import iterparse
+
+NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_PKG = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# Cifras significativas con que se normalizan los números para el hash
+DIGITOS = 10
+TOLERANCIA_DEFAULT = 1e-9
+
+
+# ====================================
+# LECTURA RÁPIDA DE XLSX
+# ====================================
+
+
+def _columna(referencia: str) -> int:
+    """'C12' -> 2"""
+    col = 0
+    for ch in referencia:
+        if not ch.isalpha():
+            break
+        col = col * 26 + (ord(ch.upper()) - 64)
+    return col - 1
+
+
+def _letra(col: int) -> str:
+    letras = ""
+    col += 1
+    while col:
+        col, resto = divmod(col - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _texto(elemento) -> str:
+    """Texto de un <si> o <is>, incluyendo rich text (<r><t>)"""
+    return "".join(t.text or "" for t in elemento.iter(f"{NS}t"))
+
+
+def _hojas(libro: zipfile.ZipFile) -> list:
+    """[(nombre, ruta dentro del zip)] en el orden del libro"""
+    with libro.open("xl/_rels/workbook.xml.rels") as f:
+        rels = {
+            rel.get("Id"): rel.get("Target")
+            for _, rel in iterparse(f)
+            if rel.tag == f"{NS_PKG}Relationship"
+        }
+    hojas = []
+    with libro.open("xl/workbook.xml") as f:
+        for _, el in iterparse(f):
+            if el.tag == f"{NS}sheet":
+                destino = rels[el.get(f"{NS_REL}id")]
+                ruta = (
+                    destino.lstrip("/")
+                    if destino.startswith("/")
+                    else posixpath.normpath(posixpath.join("xl", destino))
+                )
+                hojas.append((el.get("name"), ruta))
+    return hojas
+
+
+def _textos_compartidos(libro: zipfile.ZipFile) -> list:
+    if "xl/sharedStrings.xml" not in libro.namelist():
+        return []
+    textos = []
+    with libro.open("xl/sharedStrings.xml") as f:
+        for _, el in iterparse(f):
+            if el.tag == f"{NS}si":
+                textos.append(_texto(el))
+                el.clear()
+    return textos
+
+
+def _valor(celda, compartidos: list):
+    tipo = celda.get("t", "n")
+    if tipo == "inlineStr":
+        en_linea = celda.find(f"{NS}is")
+        return None if en_linea is None else _texto(en_linea)
+    v = celda.find(f"{NS}v")
+    if v is None or v.text is None:
+        return None
+    if tipo == "s":
+        return compartidos[int(v.text)]
+    if tipo == "b":
+        return v.text == "1"
+    if tipo in ("str", "e"):
+        return v.text
+    return _numero(v.text)
+
+
+def _numero(texto: str):
+    try:
+        return int(texto)
+    except ValueError:
+        valor = float(texto)
+        return int(valor) if valor.is_integer() and abs(valor) < 2**53 else valor
+
+
+def iterar_filas(libro: zipfile.ZipFile, ruta: str, compartidos: list):
+    """(número de fila, [valores]) de una hoja, sin celdas vacías al final"""
+    with libro.open(ruta) as f:
+        siguiente = 1
+        for _, el in iterparse(f):
+            if el.tag != f"{NS}row":
+                continue
+            numero = int(el.get("r", siguiente))
+            siguiente = numero + 1
+            fila = []
+            for i, celda in enumerate(el.iter(f"{NS}c")):
+                ref = celda.get("r")
+                col = _columna(ref) if ref else i
+                if col >= len(fila):
+                    fila.extend([None] * (col - len(fila) + 1))
+                fila[col] = _valor(celda, compartidos)
+            while fila and fila[-1] is None:
+                fila.pop()
+            el.clear()
+            if fila:
+                yield numero, fila
+
+
+# ====================================
+# HUELLAS
+# ====================================
+
+
+def _normalizar(valor):
+    if isinstance(valor, float):
+        if math.isnan(valor) or math.isinf(valor):
+            return repr(valor)
+        redondeado = float(f"{valor:.{DIGITOS}g}")
+        return int(redondeado) if redondeado.is_integer() else redondeado
+    return valor
+
+
+def _firmas(libro: zipfile.ZipFile, hojas: list) -> dict:
+    """
+    {hoja: firma} con el CRC32 y tamaño del XML de la hoja y de sharedStrings
+
+    Sale del directorio del zip, así que no lee el contenido. Firmas iguales
+    implican el mismo contenido; distintas no implican nada (otro motor,
+    otro orden de textos compartidos).
+    """
+    nombres = set(libro.namelist())
+    compartidos = "0"
+    if "xl/sharedStrings.xml" in nombres:
+        info = libro.getinfo("xl/sharedStrings.xml")
+        compartidos = f"{info.CRC:08x}-{info.file_size}"
+    firmas = {}
+    for nombre, ruta in hojas:
+        info = libro.getinfo(ruta)
+        firmas[nombre] = f"{info.CRC:08x}-{info.file_size}/{compartidos}"
+    return firmas
+
+
+def _huella_hoja(libro: zipfile.ZipFile, ruta: str, compartidos: list) -> dict:
+    h = hashlib.sha256()
+    filas = columnas = 0
+    for numero, fila in iterar_filas(libro, ruta, compartidos):
+        normalizada = [numero] + [_normalizar(v) for v in fila]
+        h.update(json.dumps(normalizada, default=str).encode("utf-8"))
+        filas = numero
+        columnas = max(columnas, len(fila))
+    return {"filas": filas, "columnas": columnas, "hash": h.hexdigest()}
+
+
+def huellas_libro(path: Path, conocidas=None, solo=None) -> dict:
+    """
+    {hoja: {"filas", "columnas", "hash", "firma"}} de un libro xlsx
+
+    Args:
+        conocidas: huellas previas del mismo libro; las hojas con la misma
+            firma se copian de ahí sin leerlas
+        solo: nombres de hoja a calcular (None = todas)
+    """
+    conocidas = conocidas or {}
+    huellas = {}
+    with zipfile.ZipFile(path) as libro:
+        hojas = _hojas(libro)
+        firmas = _firmas(libro, hojas)
+        compartidos = None
+        for nombre, ruta in hojas:
+            if solo is not None and nombre not in solo:
+                continue
+            previa = conocidas.get(nombre)
+            if previa is not None and previa.get("firma") == firmas[nombre]:
+                huellas[nombre] = previa
+                continue
+            if compartidos is None:
+                compartidos = _textos_compartidos(libro)
+            huellas[nombre] = {
+                **_huella_hoja(libro, ruta, compartidos),
+                "firma": firmas[nombre],
+            }
+    return huellas
+
+
+def huellas_carpeta(carpeta: Path) -> dict:
+    """{libro: huellas_libro} de todos los .xlsx de una carpeta"""
+    return {
+        p.name: huellas_libro(p)
+        for p in sorted(Path(carpeta).glob("*.xlsx"))
+        if not p.name.startswith("~")
+    }
+
+
+def guardar_huellas(origen: Path, destino: Path):
+    """Guarda como JSON las huellas de una carpeta o un libro dorado"""
+    origen = Path(origen)
+    huellas = (
+        huellas_carpeta(origen)
+        if origen.is_dir()
+        else {origen.name: huellas_libro(origen)}
+    )
+    Path(destino).write_text(
+        json.dumps(huellas, indent=2, ensure_ascii=False) + "\n",
+        encoding="utf-8",
+    )
+    return huellas
+
+
+# ====================================
+# DIFERENCIAS
+# ====================================
+
+
+def _iguales(a, b, tolerancia: float) -> bool:
+    if a == b:
+        return True
+    numeros = (int, float)
+    if (
+        isinstance(a, numeros)
+        and isinstance(b, numeros)
+        and not isinstance(a, bool)
+        and not isinstance(b, bool)
+    ):
+        return math.isclose(a, b, rel_tol=tolerancia, abs_tol=tolerancia)
+    return False
+
+
+def diferencias_hoja(
+    dorado: Path, actual: Path, hoja: str, tolerancia=TOLERANCIA_DEFAULT, limite=20
+) -> list:
+    """Celdas distintas de una hoja: [(celda, esperado, obtenido)]"""
+    with zipfile.ZipFile(dorado) as libro_a, zipfile.ZipFile(actual) as libro_b:
+        ruta_a = dict(_hojas(libro_a))[hoja]
+        ruta_b = dict(_hojas(libro_b))[hoja]
+        filas_a = dict(iterar_filas(libro_a, ruta_a, _textos_compartidos(libro_a)))
+        filas_b = iterar_filas(libro_b, ruta_b, _textos_compartidos(libro_b))
+
+        difs = []
+        vistas = set()
+        for numero, fila_b in filas_b:
+            vistas.add(numero)
+            fila_a = filas_a.get(numero, [])
+            for col in range(max(len(fila_a), len(fila_b))):
+                a = fila_a[col] if col < len(fila_a) else None
+                b = fila_b[col] if col < len(fila_b) else None
+                if not _iguales(a, b, tolerancia):
+                    difs.append((f"{_letra(col)}{numero}", a, b))
+                    if len(difs) >= limite:
+                        return difs
+        for numero in sorted(set(filas_a) - vistas):
+            for col, a in enumerate(filas_a[numero]):
+                if a is not None:
+                    difs.append((f"{_letra(col)}{numero}", a, None))
+                    if len(difs) >= limite:
+                        return difs
+    return difs
+
+
+def comparar_libros(
+    dorado: Path, actual: Path, tolerancia=TOLERANCIA_DEFAULT, limite=20
+) -> list:
+    """
+    Diferencias entre dos libros; lista vacía si son equivalentes
+
+    Cada diferencia es un texto legible (hoja faltante o celda distinta).
+    """
+    with zipfile.ZipFile(dorado) as libro_a, zipfile.ZipFile(actual) as libro_b:
+        hojas_a, hojas_b = _hojas(libro_a), _hojas(libro_b)
+        nombre = Path(actual).name
+        if [h for h, _ in hojas_a] != [h for h, _ in hojas_b]:
+            return [
+                f"{nombre}: hojas {[h for h, _ in hojas_a]} != {[h for h, _ in hojas_b]}"
+            ]
+        firmas_a, firmas_b = _firmas(libro_a, hojas_a), _firmas(libro_b, hojas_b)
+    distintas = [hoja for hoja in firmas_a if firmas_a[hoja] != firmas_b[hoja]]
+    if not distintas:
+        return []
+
+    huellas_a = huellas_libro(dorado, solo=distintas)
+    huellas_b = huellas_libro(actual, solo=distintas)
+    difs = []
+    for hoja in distintas:
+        if huellas_a[hoja]["hash"] == huellas_b[hoja]["hash"]:
+            continue
+        for celda, a, b in diferencias_hoja(dorado, actual, hoja, tolerancia, limite):
+            difs.append(f"{nombre}:{hoja}!{celda}: {a!r} != {b!r}")
+    return difs
+
+
+def comparar_carpetas(
+    dorado: Path, actual: Path, tolerancia=TOLERANCIA_DEFAULT, limite=20
+) -> list:
+    """
+    Compara todos los .xlsx de dos carpetas
+
+    `dorado` puede ser una carpeta de libros o un JSON de guardar_huellas; con
+    JSON sólo se reportan las hojas cuyo hash cambió, sin detalle por celda.
+    """
+    dorado, actual = Path(dorado), Path(actual)
+    if dorado.suffix == ".json":
+        esperadas = json.loads(dorado.read_text(encoding="utf-8"))
+        libros = (
+            {p.name: p for p in actual.glob("*.xlsx") if not p.name.startswith("~")}
+            if actual.is_dir()
+            else {actual.name: actual}
+        )
+        obtenidas = {
+            nombre: huellas_libro(p, esperadas.get(nombre))
+            for nombre, p in sorted(libros.items())
+        }
+        return _comparar_huellas(esperadas, obtenidas)
+
+    nombres_a = sorted(p.name for p in dorado.glob("*.xlsx"))
+    nombres_b = sorted(p.name for p in actual.glob("*.xlsx"))
+    if nombres_a != nombres_b:
+        return [f"libros {nombres_a} != {nombres_b}"]
+    difs = []
+    for nombre in nombres_a:
+        difs.extend(
+            comparar_libros(dorado / nombre, actual / nombre, tolerancia, limite)
+        )
+    return difs
+
+
+def _comparar_huellas(esperadas: dict, obtenidas: dict) -> list:
+    if sorted(esperadas) != sorted(obtenidas):
+        return [f"libros {sorted(esperadas)} != {sorted(obtenidas)}"]
+    difs = []
+    for libro, hojas in esperadas.items():
+        if list(hojas) != list(obtenidas[libro]):
+            difs.append(f"{libro}: hojas {list(hojas)} != {list(obtenidas[libro])}")
+            continue
+        for hoja, huella in hojas.items():
+            obtenida = obtenidas[libro][hoja]
+            if huella["hash"] != obtenida["hash"]:
+                difs.append(
+                    f"{libro}:{hoja}: {huella['filas']}x{huella['columnas']} "
+                    f"!= {obtenida['filas']}x{obtenida['columnas']} (hash distinto)"
+                )
+    return difs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara libros de salida")
+    parser.add_argument("dorado", type=Path, help="carpeta, libro o JSON de huellas")
+    parser.add_argument("actual", type=Path, nargs="?")
+    parser.add_argument("--guardar", type=Path, help="escribe las huellas de dorado")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_DEFAULT)
+    parser.add_argument("--limite", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.guardar:
+        guardar_huellas(args.dorado, args.guardar)
+        print(f"Huellas guardadas en {args.guardar}")
+        return 0
+    if args.actual is None:
+        parser.error("falta la salida a comparar")
+
+    if args.dorado.is_dir() or args.dorado.suffix == ".json":
+        difs = comparar_carpetas(args.dorado, args.actual, args.tolerancia, args.limite)
+    else:
+        difs = comparar_libros(args.dorado, args.actual, args.tolerancia, args.limite)
+    for dif in difs:
+        print(dif)
+    print("IGUALES" if not difs else f"DIFERENTES ({len(difs)} diferencias)")
+    return 1 if difs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
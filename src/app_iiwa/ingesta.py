@@ -0,0 +1,627 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Lectura de archivos de entrada (SISTEMA, LISTA C.P., REGISTROS, FOLIOS)
+
+SISTEMA se abre en modo read_only y sus filas se acumulan en buffers numpy por
+columna (int64/float64 mientras los valores son numéricos), con las mismas
+reglas de tipos que pandas.read_excel.
+
+En un proceso que atiende varias corridas (trabajador.py) recordar_sistema()
+guarda el último SISTEMA leído y leer_sistema() lo reutiliza mientras el
+archivo no cambie.
+"""
+
+import hashlib
+import multiprocessing
+import posixpath
+import threading
+import zipfile
+from concurrent.futures import (
+    Future,
+    InvalidStateError,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from pathlib import Path
+from xml.etree import ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+# Valores que pandas.read_excel interpreta como nulos por defecto
+VALORES_NULOS = {
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+}
+
+# Fracción del presupuesto de memoria que puede ocupar un bloque de filas; el
+# resto queda para copias intermedias, agregados y el escritor de Excel
+FRACCION_BLOQUE = 0.25
+FILAS_SONDEO = 2_000
+# Filas que se transponen a la vez hacia los buffers por columna
+FILAS_LOTE = 4_096
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def nombres_columnas(encabezado) -> list:
+    """Nombres de columna con las mismas reglas que pandas.read_excel"""
+    nombres, vistos = [], {}
+    for i, valor in enumerate(encabezado or ()):
+        nombre = f"Unnamed: {i}" if valor is None else valor
+        if nombre in vistos:
+            vistos[nombre] += 1
+            nombre = f"{nombre}.{vistos[nombre]}"
+        else:
+            vistos[nombre] = 0
+        nombres.append(nombre)
+    return nombres
+
+
+def limpiar_valor(valor):
+    """Convierte los textos nulos de Excel en None"""
+    if isinstance(valor, str) and valor in VALORES_NULOS:
+        return None
+    return valor
+
+
+# ====================================
+# PREVALIDACIÓN DE ENCABEZADOS
+# ====================================
+
+
+def leer_encabezado(path: Path) -> list:
+    """
+    Nombres de columna de la primera hoja leyendo solo la primera fila
+
+    Se lee directamente el XML del xlsx, deteniéndose en la fila 1 y en el
+    último texto compartido que necesita el encabezado; si el archivo tiene
+    una estructura inesperada se usa openpyxl en modo read_only.
+    """
+    try:
+        return nombres_columnas(_encabezado_xml(path))
+    except (KeyError, IndexError, ValueError, ET.ParseError):
+        pass
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        filas = wb.worksheets[0].iter_rows(max_row=1, values_only=True)
+        return nombres_columnas(next(filas, None))
+    finally:
+        wb.close()
+
+
+def columnas_faltantes(columnas, requeridas, alternativas=None) -> list:
+    """
+    Columnas requeridas que no están en el encabezado
+
+    Args:
+        columnas: encabezado del archivo
+        requeridas: columnas obligatorias, en el orden en que se reportan
+        alternativas: columna -> columnas con las que puede construirse
+    """
+    presentes = set(columnas)
+    faltantes = [c for c in requeridas if c not in presentes]
+    for col, origen in (alternativas or {}).items():
+        if col not in presentes and not presentes.issuperset(origen):
+            faltantes.append(col)
+    return faltantes
+
+
+def _encabezado_xml(path: Path) -> list:
+    with zipfile.ZipFile(path) as zf:
+        hoja, textos = _rutas_primera_hoja(zf)
+        celdas = {}
+        with zf.open(hoja) as f:
+            for _, elem in ET.iterparse(f, events=("end",)):
+                if elem.tag == f"{_NS_MAIN}row":
+                    if elem.get("r", "1") == "1":
+                        celdas = _celdas_fila(elem)
+                    break
+
+        indices = [v for t, v in celdas.values() if t == "s"]
+        compartidos = _textos_compartidos(zf, textos, max(indices)) if indices else []
+
+    if not celdas:
+        return []
+    fila = [None] * (max(celdas) + 1)
+    for col, (tipo, valor) in celdas.items():
+        fila[col] = compartidos[valor] if tipo == "s" else valor
+    return fila
+
+
+def _rutas_primera_hoja(zf: zipfile.ZipFile):
+    """Ruta del XML de la primera hoja y de los textos compartidos"""
+    libro = ET.fromstring(zf.read("xl/workbook.xml"))
+    rid = libro.find(f"{_NS_MAIN}sheets/{_NS_MAIN}sheet").get(f"{_NS_REL}id")
+
+    rutas, textos = {}, "xl/sharedStrings.xml"
+    for rel in ET.fromstring(zf.read("xl/_rels/workbook.xml.rels")):
+        destino = rel.get("Target")
+        destino = (
+            destino.lstrip("/")
+            if destino.startswith("/")
+            else posixpath.normpath(posixpath.join("xl", destino))
+        )
+        rutas[rel.get("Id")] = destino
+        if rel.get("Type", "").endswith("/sharedStrings"):
+            textos = destino
+    return rutas[rid], textos
+
+
+def _indice_columna(referencia: str) -> int:
+    indice = 0
+    for letra in referencia:
+        if not letra.isalpha():
+            break
+        indice = indice * 26 + ord(letra.upper()) - 64
+    return indice - 1
+
+
+def _celdas_fila(fila) -> dict:
+    """Columna -> (tipo, valor) de una fila; los textos compartidos quedan como índice"""
+    celdas = {}
+    for i, c in enumerate(fila.iter(f"{_NS_MAIN}c")):
+        col = _indice_columna(c.get("r")) if c.get("r") else i
+        tipo = c.get("t", "n")
+        v = c.find(f"{_NS_MAIN}v")
+        if tipo == "inlineStr":
+            celdas[col] = ("str", "".join(t.text or "" for t in c.iter(f"{_NS_MAIN}t")))
+        elif v is None or v.text is None:
+            continue
+        elif tipo == "s":
+            celdas[col] = ("s", int(v.text))
+        elif tipo == "b":
+            celdas[col] = ("b", v.text == "1")
+        elif tipo == "n":
+            numero = float(v.text)
+            celdas[col] = ("n", int(numero) if numero.is_integer() else numero)
+        elif tipo == "e":
+            continue
+        else:
+            celdas[col] = ("str", v.text)
+    return celdas
+
+
+def _textos_compartidos(zf: zipfile.ZipFile, ruta: str, hasta: int) -> list:
+    """Lee la tabla de textos compartidos solo hasta el índice `hasta`"""
+    textos = []
+    with zf.open(ruta) as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag != f"{_NS_MAIN}si":
+                continue
+            # Texto simple o corridas con formato; se ignora la fonética (rPh)
+            partes = [elem.find(f"{_NS_MAIN}t")] + [
+                r.find(f"{_NS_MAIN}t") for r in elem.findall(f"{_NS_MAIN}r")
+            ]
+            textos.append("".join(t.text or "" for t in partes if t is not None))
+            elem.clear()
+            if len(textos) > hasta:
+                break
+    return textos
+
+
+# ====================================
+# LECTURA POR FILAS Y BUFFERS TIPADOS
+# ====================================
+
+
+def iterar_filas_excel(path: Path):
+    """
+    Itera las filas de la primera hoja en modo read_only
+
+    Returns:
+        (columnas, generador de tuplas del largo del encabezado)
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    ws = wb.worksheets[0]
+    filas = ws.iter_rows(values_only=True)
+    columnas = nombres_columnas(next(filas, None))
+    n = len(columnas)
+
+    def _generar():
+        vacias = 0
+        try:
+            for fila in filas:
+                # Como read_excel: las filas vacías intermedias se conservan
+                # y las finales se descartan
+                if all(v is None for v in fila):
+                    vacias += 1
+                    continue
+                for _ in range(vacias):
+                    yield (None,) * n
+                vacias = 0
+                fila = tuple(limpiar_valor(v) for v in fila[:n])
+                if len(fila) < n:
+                    fila += (None,) * (n - len(fila))
+                yield fila
+        finally:
+            wb.close()
+
+    return columnas, _generar()
+
+
+def iterar_bloques_excel(path: Path, presupuesto_mb=None, filas_por_bloque=None):
+    """
+    Lee un Excel grande en bloques de filas sin cargarlo completo
+
+    Args:
+        path: archivo .xlsx (se lee la primera hoja)
+        presupuesto_mb: memoria máxima aproximada; el tamaño de bloque se
+            ajusta midiendo el primer bloque
+        filas_por_bloque: tamaño fijo de bloque (ignora el presupuesto)
+
+    Yields:
+        DataFrames con índice global de fila (0, 1, 2, ...)
+    """
+    columnas, filas = iterar_filas_excel(path)
+    tam = filas_por_bloque or FILAS_SONDEO
+    inicio = 0
+    buffer = []
+    esquema = None
+
+    for fila in filas:
+        buffer.append(fila)
+        if len(buffer) < tam:
+            continue
+        bloque = _a_dataframe(buffer, columnas, inicio)
+        if esquema is None:
+            esquema = bloque.dtypes
+        else:
+            _aplicar_esquema(bloque, esquema)
+        if not filas_por_bloque and presupuesto_mb:
+            tam = filas_para_presupuesto(bloque, presupuesto_mb)
+        inicio += len(buffer)
+        buffer = []
+        yield bloque
+
+    if buffer or inicio == 0:
+        bloque = _a_dataframe(buffer, columnas, inicio)
+        if esquema is not None:
+            _aplicar_esquema(bloque, esquema)
+        yield bloque
+
+
+def _aplicar_esquema(bloque: pd.DataFrame, esquema: pd.Series):
+    """
+    Lleva un bloque a los dtypes del primer bloque cuando no se pierde nada
+
+    Una columna toda nula en el bloque (float NaN) toma el tipo del primero,
+    p. ej. NaT en fechas, y los enteros pasan a flotante si el primero lo era.
+    """
+    for i, dtype in enumerate(esquema):
+        columna = bloque.iloc[:, i]
+        if columna.dtype == dtype:
+            continue
+        entero_a_flotante = pd.api.types.is_integer_dtype(
+            columna.dtype
+        ) and pd.api.types.is_float_dtype(dtype)
+        if entero_a_flotante or columna.isna().all():
+            bloque.isetitem(i, columna.astype(dtype))
+
+
+def contar_filas_excel(path: Path):
+    """Filas de datos según la dimensión declarada de la hoja (None si no la hay)"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True)
+    try:
+        max_row = wb.worksheets[0].max_row
+    finally:
+        wb.close()
+    return max(max_row - 1, 0) if max_row else None
+
+
+def leer_excel(path: Path) -> pd.DataFrame:
+    """
+    Equivalente a pd.read_excel(path, engine="openpyxl") con menos memoria
+
+    Las filas se transponen por lotes a buffers numpy por columna en lugar de
+    materializar la hoja completa como objetos de Python.
+    """
+    columnas, filas = iterar_filas_excel(path)
+    buffers = [[] for _ in columnas]
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) == FILAS_LOTE:
+            _transponer(lote, buffers)
+            lote = []
+    if lote:
+        _transponer(lote, buffers)
+    return _a_dataframe_tipado(buffers, columnas, 0)
+
+
+def _transponer(lote, buffers):
+    for buffer, valores in zip(buffers, zip(*lote)):
+        buffer.append(_arreglo_tipado(valores))
+
+
+def _arreglo_tipado(valores) -> np.ndarray:
+    """int64, float64 (None -> NaN) u object según los tipos presentes"""
+    tipos = set(map(type, valores))
+    if tipos <= {int}:
+        try:
+            return np.array(valores, dtype=np.int64)
+        except OverflowError:
+            return np.array(valores, dtype=object)
+    if tipos <= {int, float, type(None)}:
+        return np.array(valores, dtype=np.float64)
+    return np.array(valores, dtype=object)
+
+
+def _finalizar_columna(partes) -> np.ndarray:
+    """Une los lotes de una columna y aplica la inferencia de read_excel"""
+    if not partes:
+        return np.empty(0, dtype=np.float64)
+    dtypes = {p.dtype for p in partes}
+    if dtypes <= {np.dtype(np.int64)}:
+        return np.concatenate(partes)
+    if dtypes <= {np.dtype(np.int64), np.dtype(np.float64)}:
+        arr = np.concatenate(partes).astype(np.float64)
+        # read_excel convierte cada flotante entero a int de Python; si todos
+        # lo son (sin nulos) la columna queda int64, uint64 u object según
+        # quepan los valores, y en otro caso float64
+        if not arr.size or not (arr == np.trunc(arr)).all():
+            return arr
+        if np.abs(arr).max() < 2**63:
+            return arr.astype(np.int64)
+        if arr.min() >= 0 and arr.max() < 2**64:
+            return arr.astype(np.uint64)
+        return np.array([int(v) for v in arr.tolist()], dtype=object)
+
+    arr = np.concatenate([p.astype(object) for p in partes])
+    # Igual que read_excel: textos numéricos y booleanos se convierten si toda
+    # la columna es convertible
+    tipos = set(map(type, arr))
+    if tipos & {str, bool} and tipos <= {str, bool, int, float, type(None)}:
+        try:
+            return pd.to_numeric(arr)
+        except (ValueError, TypeError):
+            pass
+    return arr
+
+
+def _a_dataframe_tipado(buffers, columnas, inicio) -> pd.DataFrame:
+    datos = {}
+    for i, partes in enumerate(buffers):
+        arr = _finalizar_columna(partes)
+        datos[i] = arr if arr.dtype != object else pd.Series(arr).infer_objects()
+    bloque = pd.DataFrame(datos)
+    bloque.columns = columnas
+    bloque.index = pd.RangeIndex(inicio, inicio + len(bloque))
+    return bloque
+
+
+def filas_para_presupuesto(muestra: pd.DataFrame, presupuesto_mb) -> int:
+    """Filas por bloque para que un bloque ocupe ~FRACCION_BLOQUE del presupuesto"""
+    if muestra.empty:
+        return FILAS_SONDEO
+    bytes_fila = max(muestra.memory_usage(deep=True).sum() / len(muestra), 1)
+    return max(int(presupuesto_mb * 1024 * 1024 * FRACCION_BLOQUE / bytes_fila), 100)
+
+
+def _a_dataframe(filas, columnas, inicio) -> pd.DataFrame:
+    buffers = [[] for _ in columnas]
+    if filas:
+        _transponer(filas, buffers)
+    return _a_dataframe_tipado(buffers, columnas, inicio)
+
+
+# ====================================
+# ÚLTIMO SISTEMA EN MEMORIA
+# ====================================
+
+BYTES_BLOQUE_HASH = 1 << 20
+
+
+def hash_archivo(path: Path) -> str:
+    """blake2b del contenido (leer el .xlsx completo cuesta mucho más)"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(BYTES_BLOQUE_HASH), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class UltimoSistema:
+    """
+    El último SISTEMA leído, para la siguiente corrida del mismo proceso
+
+    Se reutiliza si el archivo tiene el mismo tamaño y fecha de modificación,
+    o si la fecha cambió pero el contenido es el mismo (se compara el hash,
+    p. ej. al volver a copiar el archivo). Cada lectura entrega una copia
+    porque CAMPO y CAJA agregan columnas al DataFrame que reciben.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ruta = None
+        self._firma = None
+        self._hash = None
+        self._df = None
+        self.lecturas = 0
+        self.reutilizadas = 0
+
+    def leer(self, path: Path, log_func=None) -> pd.DataFrame:
+        path = Path(path).resolve()
+        st = path.stat()
+        firma = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if self._vigente(path, firma):
+                self.reutilizadas += 1
+                if log_func:
+                    log_func("  SISTEMA sin cambios: se usa la copia en memoria")
+                return self._df.copy()
+
+            # Soltar la copia anterior antes de leer la nueva
+            self.descartar()
+            df = leer_excel(path)
+            self._ruta, self._firma, self._hash = path, firma, hash_archivo(path)
+            self._df = df
+            self.lecturas += 1
+            return df.copy()
+
+    def _vigente(self, path: Path, firma: tuple) -> bool:
+        if self._df is None or path != self._ruta or firma[0] != self._firma[0]:
+            return False
+        if firma == self._firma:
+            return True
+        if hash_archivo(path) == self._hash:
+            self._firma = firma
+            return True
+        return False
+
+    def descartar(self):
+        self._ruta = self._firma = self._hash = self._df = None
+
+
+# Activo sólo en procesos que atienden varias corridas (recordar_sistema)
+_ULTIMO_SISTEMA = None
+
+
+def recordar_sistema(activo: bool = True) -> UltimoSistema:
+    """Activa (o desactiva) la copia en memoria del último SISTEMA leído"""
+    global _ULTIMO_SISTEMA
+    _ULTIMO_SISTEMA = UltimoSistema() if activo else None
+    return _ULTIMO_SISTEMA
+
+
+@contextmanager
+def sistema_compartido():
+    """
+    Dentro del bloque, leer_sistema lee cada SISTEMA una sola vez
+
+    Para correr CAMPO y CAJA sobre el mismo archivo (ambos.py); si la copia en
+    memoria ya estaba activa se usa esa y se deja activa al salir.
+    """
+    global _ULTIMO_SISTEMA
+    if _ULTIMO_SISTEMA is not None:
+        yield _ULTIMO_SISTEMA
+        return
+    _ULTIMO_SISTEMA = UltimoSistema()
+    try:
+        yield _ULTIMO_SISTEMA
+    finally:
+        _ULTIMO_SISTEMA = None
+
+
+def leer_sistema(path: Path, log_func=None) -> pd.DataFrame:
+    """leer_excel(path), reutilizando la última lectura si está activa"""
+    if _ULTIMO_SISTEMA is None:
+        return leer_excel(path)
+    return _ULTIMO_SISTEMA.leer(path, log_func)
+
+
+# ====================================
+# CARGA CONCURRENTE DE ENTRADAS
+# ====================================
+
+# Los .xlsx auxiliares más chicos que esto se leen en un hilo: arrancar un
+# proceso (importar pandas) cuesta más que leerlos
+BYTES_EXCEL_EN_PROCESO = 1_000_000
+
+
+class CargaConcurrente:
+    """
+    Lee los archivos auxiliares en segundo plano y expone futuros
+
+    SISTEMA se lee en el proceso que lo va a usar (enviar el DataFrame entre
+    procesos duplicaría la memoria); mientras tanto LISTA C.P., REGISTROS y
+    FOLIOS se cargan aquí. Los .xlsx grandes van a un pool de procesos con
+    contexto spawn (openpyxl no libera el GIL y spawn no hereda los hilos
+    activos) y los .csv a hilos.
+    """
+
+    def __init__(self, procesos: int = 1, hilos: int = 2):
+        self._n_procesos = procesos
+        self._procesos = None
+        self._hilos = ThreadPoolExecutor(max_workers=hilos)
+
+    def excel(self, path: Path) -> Future:
+        """Futuro con el DataFrame de la primera hoja (como pd.read_excel)"""
+        if Path(path).stat().st_size < BYTES_EXCEL_EN_PROCESO:
+            return self._hilos.submit(leer_excel, path)
+        try:
+            if self._procesos is None:
+                self._procesos = ProcessPoolExecutor(
+                    max_workers=self._n_procesos,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            origen = self._procesos.submit(leer_excel, path)
+        except (OSError, NotImplementedError, RuntimeError):
+            # Sin soporte de procesos (p. ej. entornos restringidos): hilos
+            return self._hilos.submit(leer_excel, path)
+
+        destino = Future()
+        origen.add_done_callback(lambda f: self._entregar(f, destino, path))
+        return destino
+
+    def _entregar(self, origen: Future, destino: Future, path: Path):
+        """
+        Pasa el resultado del pool al futuro entregado
+
+        Si el pool se rompió (un proceso murió) la lectura se repite en un hilo.
+        """
+        if origen.cancelled():
+            destino.cancel()
+            return
+        error = origen.exception()
+        if isinstance(error, BrokenProcessPool):
+            try:
+                respaldo = self._hilos.submit(leer_excel, path)
+            except RuntimeError:  # ya se llamó a cerrar()
+                destino.cancel()
+                return
+            respaldo.add_done_callback(lambda f: self._entregar(f, destino, path))
+            return
+        try:
+            if error is None:
+                destino.set_result(origen.result())
+            else:
+                destino.set_exception(error)
+        except InvalidStateError:  # cancelado mientras se leía
+            pass
+
+    def csv(self, path: Path, **kwargs) -> Future:
+        """Futuro con pd.read_csv(path, **kwargs)"""
+        return self._hilos.submit(pd.read_csv, path, **kwargs)
+
+    def cerrar(self):
+        """Libera los pools; las lecturas pendientes que nadie pidió se cancelan"""
+        if self._procesos is not None:
+            self._procesos.shutdown(wait=False, cancel_futures=True)
+        self._hilos.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
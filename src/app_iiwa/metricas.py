@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Métricas por etapa de cada corrida
+
+El pipeline mide cada etapa que calcula o recupera (medir): tiempo de reloj,
+tiempo de CPU del proceso, pico de RSS y filas de entrada y de salida. Si
+tracemalloc está activo (python -X tracemalloc o PYTHONTRACEMALLOC=1) también
+registra el pico de memoria asignada por la etapa; no se activa por defecto
+porque hace más lento el cómputo.
+
+Corrida junta las mediciones de una ejecución de CAMPO o CAJA, escribe
+run_metrics.json en la carpeta de reportes y deja una tabla resumen al final
+del log. El CPU no incluye los procesos del pool de workers.
+"""
+
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from .eventos import AVISO, Evento
+
+ARCHIVO_METRICAS = "run_metrics.json"
+MB = 1024 * 1024
+
+
+def pico_rss_mb():
+    """RSS máximo del proceso actual (None si la plataforma no lo expone)"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KiB y macOS bytes
+    return pico / MB if sys.platform == "darwin" else pico / 1024
+
+
+def contar_filas(valor):
+    """
+    Filas de los DataFrame/Series en `valor`, directo o dentro de dicts,
+    listas y tuplas (como los argumentos de una etapa); None si no contiene
+    tablas
+    """
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return len(valor)
+    if isinstance(valor, dict):
+        valor = list(valor.values())
+    if isinstance(valor, (list, tuple)):
+        filas = [f for f in map(contar_filas, valor) if f is not None]
+        return sum(filas) if filas else None
+    return None
+
+
+@contextmanager
+def medir():
+    """
+    Mide el bloque with; el dict que entrega se llena al salir
+
+    Claves: wall_s, cpu_s, rss_pico_mb, rss_delta_mb (cuánto subió el pico de
+    RSS del proceso durante el bloque) y, con tracemalloc activo,
+    tracemalloc_pico_mb.
+    """
+    medida = {}
+    rastrear = tracemalloc.is_tracing()
+    if rastrear:
+        asignada_inicial = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    rss_inicial = pico_rss_mb()
+    cpu_inicial = time.process_time()
+    inicio = time.perf_counter()
+    try:
+        yield medida
+    finally:
+        medida["wall_s"] = round(time.perf_counter() - inicio, 3)
+        medida["cpu_s"] = round(time.process_time() - cpu_inicial, 3)
+        rss = pico_rss_mb()
+        medida["rss_pico_mb"] = None if rss is None else round(rss, 1)
+        medida["rss_delta_mb"] = None if rss is None else round(rss - rss_inicial, 1)
+        if rastrear:
+            pico = tracemalloc.get_traced_memory()[1]
+            medida["tracemalloc_pico_mb"] = round((pico - asignada_inicial) / MB, 1)
+
+
+class Corrida:
+    """
+    Métricas de una ejecución de CAMPO o CAJA
+
+    registrar() es un observador de pipeline.observar; medir() cubre las
+    partes que no son etapas del pipeline (modo bajo memoria).
+    """
+
+    def __init__(self, proceso: str):
+        self.proceso = proceso
+        self.etapas = []
+        self._fecha = datetime.now().isoformat(timespec="seconds")
+        self._inicio = time.perf_counter()
+        self._cpu_inicial = time.process_time()
+
+    def registrar(self, pipeline, etapa, segundos, origen):
+        medida = pipeline.metricas.get(etapa, {"wall_s": round(segundos, 3)})
+        self.etapas.append(
+            {"pipeline": pipeline.nombre, "etapa": etapa, "origen": origen, **medida}
+        )
+
+    @contextmanager
+    def medir(self, etapa: str):
+        with medir() as medida:
+            yield medida
+        self.etapas.append(
+            {
+                "pipeline": self.proceso.lower(),
+                "etapa": etapa,
+                "origen": "calculada",
+                **medida,
+            }
+        )
+
+    def resumen(self) -> dict:
+        pico = pico_rss_mb()
+        return {
+            "proceso": self.proceso,
+            "fecha": self._fecha,
+            "maquina": f"{platform.system()} {platform.machine()} "
+            f"Python {platform.python_version()}",
+            "total": {
+                "wall_s": round(time.perf_counter() - self._inicio, 3),
+                "cpu_s": round(time.process_time() - self._cpu_inicial, 3),
+                "rss_pico_mb": None if pico is None else round(pico, 1),
+            },
+            "etapas": self.etapas,
+        }
+
+    def tabla(self, resumen: dict = None) -> list:
+        """Líneas de la tabla resumen para el log"""
+        resumen = resumen or self.resumen()
+
+        def num(valor, formato):
+            return "-" if valor is None else format(valor, formato)
+
+        lineas = [
+            f"  {'etapa':<12}{'origen':<11}{'seg':>8}{'cpu':>8}"
+            f"{'filas ent':>11}{'filas sal':>11}{'pico MB':>9}"
+        ]
+        for e in resumen["etapas"]:
+            lineas.append(
+                f"  {e['etapa']:<12}{e['origen']:<11}{num(e.get('wall_s'), '.2f'):>8}"
+                f"{num(e.get('cpu_s'), '.2f'):>8}"
+                f"{num(e.get('filas_entrada'), ','):>11}"
+                f"{num(e.get('filas_salida'), ','):>11}"
+                f"{num(e.get('rss_pico_mb'), '.0f'):>9}"
+            )
+        total = resumen["total"]
+        lineas.append(
+            f"  {'TOTAL':<23}{num(total['wall_s'], '.2f'):>8}"
+            f"{num(total['cpu_s'], '.2f'):>8}{'':>22}"
+            f"{num(total['rss_pico_mb'], '.0f'):>9}"
+        )
+        return lineas
+
+    def cerrar(self, carpeta: Path, log_func) -> Path:
+        """Escribe run_metrics.json en `carpeta` y la tabla resumen en el log"""
+        resumen = self.resumen()
+        destino = Path(carpeta) / ARCHIVO_METRICAS
+        try:
+            destino.write_text(
+                json.dumps(resumen, indent=2, ensure_ascii=False) + "\n",
+                encoding="utf-8",
+            )
+        except OSError as e:
+            log_func(
+                Evento(
+                    f"Advertencia: no se pudo escribir {ARCHIVO_METRICAS}: {e}",
+                    nivel=AVISO,
+                )
+            )
+        log_func(f"Métricas por etapa ({ARCHIVO_METRICAS}):")
+        for linea in self.tabla(resumen):
+            log_func(linea)
+        return destino
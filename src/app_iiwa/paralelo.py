@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Cómputo por código postal en paralelo con memoria compartida
+
+Las columnas numéricas y los códigos de cuenta/conexión se copian una sola vez
+a bloques de multiprocessing.shared_memory, ordenados por código postal. Cada
+proceso del pool recibe únicamente rangos de filas (cp, inicio, fin): no se
+serializan DataFrames entre procesos.
+
+Alcance: el pool cubre el cálculo por CP (consolidado y resumen por
+TipoConexion). La escritura de las hojas por CP con openpyxl permanece serial
+en el proceso principal, por lo que el tiempo total no escala linealmente con
+el número de núcleos cuando la serialización de los libros domina.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .cancelacion import Cancelado, revisar
+
+# Columnas de entrada en el orden de la matriz compartida
+_ENTRADA = [
+    "agua",
+    "actualizacionagua",
+    "recargosagua",
+    "drenaje",
+    "actualizaciondrenaje",
+    "recargosdrenaje",
+    "mejoras",
+    "iva",
+]
+# Columnas derivadas por CP: agua, drenaje, recargos y Total consolidados
+_SALIDA = ["agua", "drenaje", "recargos", "Total"]
+
+# Estado de cada proceso del pool (se llena en _init_worker)
+_W = {}
+
+
+def resolver_workers(workers) -> int:
+    """Normaliza el número de procesos: 0 o None usa todos los núcleos"""
+    if not workers or workers < 0:
+        return os.cpu_count() or 1
+    return int(workers)
+
+
+def particion_por_cp(codigo_postal: pd.Series, codigos_postales) -> dict:
+    """
+    Posiciones de fila de cada CP, conservando el orden original
+
+    Se hace un único argsort estable en lugar de filtrar el DataFrame completo
+    una vez por código postal.
+    """
+    codigos = pd.Index(codigos_postales)
+    pos = codigos.get_indexer(codigo_postal.to_numpy())
+    orden = np.argsort(pos, kind="stable")
+    limites = np.searchsorted(pos[orden], np.arange(len(codigos) + 1))
+    return {
+        cp: orden[limites[i] : limites[i + 1]] for i, cp in enumerate(codigos_postales)
+    }
+
+
+def _crear_bloque(arr: np.ndarray):
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    vista = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+    vista[...] = arr
+    return shm
+
+
+def _adjuntar_bloque(nombre: str):
+    """Abre un bloque existente; el proceso principal es quien lo libera"""
+    try:
+        return shared_memory.SharedMemory(name=nombre, track=False)
+    except TypeError:  # Python < 3.13: el pool comparte el resource_tracker
+        return shared_memory.SharedMemory(name=nombre)
+
+
+def _init_worker(specs):
+    """Adjunta los bloques compartidos una sola vez por proceso"""
+    for clave, (nombre, forma, dtype) in specs.items():
+        shm = _adjuntar_bloque(nombre)
+        _W[clave] = (shm, np.ndarray(forma, dtype=np.dtype(dtype), buffer=shm.buf))
+
+
+def _procesar_rangos(rangos, n_cuentas):
+    """Calcula detalle consolidado y resumen por TipoConexion de varios CP"""
+    entrada = [_W[f"entrada:{c}"][1] for c in _ENTRADA]
+    salida = [_W[f"salida:{c}"][1] for c in _SALIDA]
+    cuentas = _W["cuentas"][1]
+    conexion = _W["conexion"][1]
+    resumenes = {}
+    for cp, inicio, fin in rangos:
+        _consolidar(
+            [col[inicio:fin] for col in entrada], [col[inicio:fin] for col in salida]
+        )
+        resumenes[cp] = _resumen_conexion(
+            conexion[inicio:fin], cuentas[inicio:fin], n_cuentas
+        )
+    return resumenes
+
+
+def _consolidar(columnas, out):
+    """Mismo orden de operaciones que el cálculo de referencia en pandas"""
+    agua, act_agua, rec_agua, drenaje, act_dren, rec_dren, mejoras, iva = columnas
+    out[0][:] = agua + act_agua
+    out[1][:] = drenaje + act_dren
+    out[2][:] = rec_agua + rec_dren
+    out[3][:] = out[0] + out[1] + out[2] + mejoras + iva
+
+
+def _dtypes_salida(dtypes: dict) -> dict:
+    """dtype que pandas da a cada columna consolidada (int64 si no hay flotantes)"""
+    agua = np.result_type(dtypes["agua"], dtypes["actualizacionagua"])
+    drenaje = np.result_type(dtypes["drenaje"], dtypes["actualizaciondrenaje"])
+    recargos = np.result_type(dtypes["recargosagua"], dtypes["recargosdrenaje"])
+    total = np.result_type(agua, drenaje, recargos, dtypes["mejoras"], dtypes["iva"])
+    return {"agua": agua, "drenaje": drenaje, "recargos": recargos, "Total": total}
+
+
+def _resumen_conexion(conexion: np.ndarray, cuentas: np.ndarray, n_cuentas: int):
+    """Cuentas únicas (sin nulos) por código de TipoConexion presente en el CP"""
+    validas = conexion >= 0
+    con = conexion[validas]
+    presentes = np.unique(con)
+    pares = np.unique(con * (n_cuentas + 1) + (cuentas[validas] + 1))
+    con_par = pares // (n_cuentas + 1)
+    con_par = con_par[pares % (n_cuentas + 1) != 0]
+    conteo = np.bincount(np.searchsorted(presentes, con_par), minlength=len(presentes))
+    return presentes, conteo.astype(np.int64)
+
+
+def calcular_por_cp_paralelo(
+    df: pd.DataFrame, codigos_postales, workers=0, particion=None
+) -> dict:
+    """
+    Calcula df_cps y df_completos_cps repartiendo los CP en un pool de procesos
+
+    Args:
+        df: SISTEMA con la columna Total ya calculada
+        codigos_postales: CP ordenados (tablas["codigos_postales"])
+        workers: número de procesos (0 = todos los núcleos)
+        particion: resultado de particion_por_cp si ya se calculó
+
+    Returns:
+        dict con df_cps, df_completos_cps y filas_por_cp
+    """
+    workers = resolver_workers(workers)
+    if particion is None:
+        particion = particion_por_cp(df["CodigoPostal"], codigos_postales)
+
+    # Cada columna conserva su dtype: mezclar int64 y float64 no debe
+    # convertir a flotante las columnas consolidadas que pandas deja enteras
+    dtypes = {c: df[c].dtype for c in _ENTRADA}
+    if not all(np.issubdtype(d, np.number) for d in dtypes.values()):
+        raise TypeError("Las columnas de montos de SISTEMA deben ser numéricas")
+    dtypes_salida = _dtypes_salida(dtypes)
+
+    orden = (
+        np.concatenate([particion[cp] for cp in codigos_postales])
+        if codigos_postales
+        else np.empty(0, dtype=np.int64)
+    )
+    cod_cuentas, _ = pd.factorize(df["NumerodeCuenta"])
+    cod_conexion, uniq_conexion = pd.factorize(df["TipoConexion"], sort=True)
+    n_cuentas = int(cod_cuentas.max()) + 1 if len(cod_cuentas) else 0
+
+    rangos, inicio = [], 0
+    for cp in codigos_postales:
+        fin = inicio + len(particion[cp])
+        rangos.append((cp, inicio, fin))
+        inicio = fin
+
+    arreglos = {
+        f"entrada:{c}": df[c].to_numpy()[orden].astype(dtypes[c]) for c in _ENTRADA
+    }
+    arreglos.update(
+        {f"salida:{c}": np.zeros(len(orden), dtype=dtypes_salida[c]) for c in _SALIDA}
+    )
+    arreglos["cuentas"] = cod_cuentas[orden].astype(np.int64)
+    arreglos["conexion"] = cod_conexion[orden].astype(np.int64)
+
+    bloques, specs = {}, {}
+    try:
+        for clave, arr in arreglos.items():
+            bloques[clave] = _crear_bloque(arr)
+            specs[clave] = (bloques[clave].name, arr.shape, arr.dtype.str)
+    except Exception:
+        for shm in bloques.values():
+            shm.close()
+            shm.unlink()
+        raise
+
+    try:
+        # Lotes balanceados por número de filas, varios por worker
+        n_lotes = min(len(rangos), workers * 4) or 1
+        lotes = [[] for _ in range(n_lotes)]
+        cargas = np.zeros(n_lotes)
+        for r in sorted(rangos, key=lambda r: r[1] - r[2]):
+            i = int(np.argmin(cargas))
+            lotes[i].append(r)
+            cargas[i] += r[2] - r[1]
+
+        resumenes = {}
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(specs,)
+        ) as pool:
+            futuros = [
+                pool.submit(_procesar_rangos, lote, n_cuentas) for lote in lotes if lote
+            ]
+            try:
+                for futuro in futuros:
+                    revisar()
+                    resumenes.update(futuro.result())
+            except Cancelado:
+                # Los lotes que no empezaron no se esperan al cerrar el pool
+                for futuro in futuros:
+                    futuro.cancel()
+                raise
+
+        salida = {
+            c: np.ndarray(
+                (len(orden),),
+                dtype=dtypes_salida[c],
+                buffer=bloques[f"salida:{c}"].buf,
+            ).copy()
+            for c in _SALIDA
+        }
+    finally:
+        for shm in bloques.values():
+            shm.close()
+            shm.unlink()
+
+    # Regresar las columnas derivadas al orden original de filas
+    derivadas = {}
+    for c, valores in salida.items():
+        derivadas[c] = np.empty(len(df), dtype=valores.dtype)
+        derivadas[c][orden] = valores
+
+    detalle = df.drop(
+        columns=[
+            "actualizacionagua",
+            "actualizaciondrenaje",
+            "recargosagua",
+            "recargosdrenaje",
+        ]
+    )
+    for c in _SALIDA:
+        detalle[c] = derivadas[c]
+
+    df_cps, df_completos_cps = {}, {}
+    for cp in codigos_postales:
+        presentes, conteo = resumenes[cp]
+        df_cps[f"{cp}"] = pd.DataFrame(
+            {"NumerodeCuenta": conteo},
+            index=pd.Index(uniq_conexion.take(presentes), name="TipoConexion"),
+        )
+        df_completos_cps[f"{cp}"] = detalle.iloc[particion[cp]]
+
+    return {
+        "df_cps": df_cps,
+        "df_completos_cps": df_completos_cps,
+        "filas_por_cp": particion,
+    }
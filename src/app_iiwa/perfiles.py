@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Perfiles de ejecución por etapa (opcional)
+
+Cuando una corrida es lenta en la máquina del municipio, el perfil de cada
+etapa dice dónde se va el tiempo. Con un Perfilador el pipeline envuelve cada
+etapa calculada y deja en la carpeta de perfiles, por etapa:
+
+- perfil_<proceso>_<etapa>.pstats (modo "cprofile"): se abre con pstats o
+  snakeviz;
+- perfil_<proceso>_<etapa>.txt: las funciones más costosas ordenadas por
+  tiempo acumulado y por tiempo propio.
+
+El modo "muestreo" no usa cProfile: un hilo toma la pila del hilo que calcula
+cada pocos milisegundos. Estorba mucho menos en etapas con muchas llamadas
+pequeñas, a cambio de no contar llamadas ni dar tiempos exactos.
+
+Sólo se perfila el hilo que ejecuta la etapa; los procesos del pool por CP y
+las lecturas en segundo plano quedan fuera.
+"""
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+MODOS = ("cprofile", "muestreo")
+CARPETA_PERFILES = "perfiles"
+TOP_DEFAULT = 40
+INTERVALO_MUESTREO_S = 0.005
+
+
+class Perfilador:
+    """
+    Perfila etapas y escribe sus archivos en `carpeta`
+
+    Args:
+        carpeta: destino de .pstats y .txt (se crea al escribir el primero)
+        modo: "cprofile" o "muestreo"
+        top: funciones que se listan en el resumen de texto
+        log_func: función opcional para avisar qué archivos se escribieron
+    """
+
+    def __init__(self, carpeta: Path, modo="cprofile", top=TOP_DEFAULT, log_func=None):
+        if modo not in MODOS:
+            raise ValueError(f"Modo de perfil desconocido: {modo}")
+        self.carpeta = Path(carpeta)
+        self.modo = modo
+        self.top = top
+        self.log_func = log_func
+        self.archivos = []
+
+    @contextmanager
+    def etapa(self, proceso: str, nombre: str):
+        """Perfila el bloque with como la etapa `nombre` de `proceso`"""
+        base = f"perfil_{proceso}_{nombre}" if proceso else f"perfil_{nombre}"
+        if self.modo == "cprofile":
+            perfil = cProfile.Profile()
+            perfil.enable()
+            try:
+                yield
+            finally:
+                perfil.disable()
+                self._escribir_cprofile(base, perfil)
+        else:
+            muestreo = _Muestreo(threading.get_ident())
+            muestreo.start()
+            try:
+                yield
+            finally:
+                muestreo.detener()
+                self._escribir(base + ".txt", muestreo.resumen(self.top))
+
+    def _escribir_cprofile(self, base: str, perfil: cProfile.Profile):
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        perfil.dump_stats(str(self.carpeta / f"{base}.pstats"))
+        self.archivos.append(self.carpeta / f"{base}.pstats")
+
+        texto = io.StringIO()
+        for orden in ("cumulative", "tottime"):
+            texto.write(f"=== Top {self.top} por {orden} ===\n")
+            stats = pstats.Stats(perfil, stream=texto)
+            stats.strip_dirs().sort_stats(orden).print_stats(self.top)
+        self._escribir(f"{base}.txt", texto.getvalue())
+
+    def _escribir(self, archivo: str, texto: str):
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        (self.carpeta / archivo).write_text(texto, encoding="utf-8")
+        self.archivos.append(self.carpeta / archivo)
+        if self.log_func:
+            self.log_func(f"  Perfil guardado: {self.carpeta.name}/{archivo}")
+
+
+def perfilar_etapa(perfilador, proceso: str, nombre: str):
+    """perfilador.etapa(proceso, nombre), o un contexto vacío sin perfilador"""
+    return nullcontext() if perfilador is None else perfilador.etapa(proceso, nombre)
+
+
+class _Muestreo(threading.Thread):
+    """Cuenta en qué funciones está un hilo cada INTERVALO_MUESTREO_S"""
+
+    def __init__(self, hilo: int, intervalo=INTERVALO_MUESTREO_S):
+        super().__init__(daemon=True)
+        self.hilo = hilo
+        self.intervalo = intervalo
+        self.muestras = 0
+        self.propias = Counter()
+        self.acumuladas = Counter()
+        self._alto = threading.Event()
+        self._inicio = time.perf_counter()
+
+    def run(self):
+        while not self._alto.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo)
+            if frame is None:
+                continue
+            self.muestras += 1
+            self.propias[_funcion(frame)] += 1
+            vistas = set()
+            while frame is not None:
+                vistas.add(_funcion(frame))
+                frame = frame.f_back
+            self.acumuladas.update(vistas)
+
+    def detener(self):
+        self._alto.set()
+        self.join()
+
+    def resumen(self, top: int) -> str:
+        segundos = time.perf_counter() - self._inicio
+        lineas = [
+            f"{self.muestras} muestras en {segundos:.2f} s "
+            f"(cada {self.intervalo * 1000:.0f} ms)"
+        ]
+        for titulo, conteo in (
+            ("acumulado", self.acumuladas),
+            ("propio", self.propias),
+        ):
+            lineas.append("")
+            lineas.append(f"=== Top {top} por tiempo {titulo} ===")
+            for funcion, n in conteo.most_common(top):
+                lineas.append(f"{100 * n / max(self.muestras, 1):6.1f}%  {funcion}")
+        return "\n".join(lineas) + "\n"
+
+
+def _funcion(frame) -> str:
+    codigo = frame.f_code
+    return f"{Path(codigo.co_filename).name}:{codigo.co_firstlineno}({codigo.co_name})"
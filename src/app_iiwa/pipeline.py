@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Pipeline de etapas con memoización en disco
+
+CAMPO y CAJA se describen como un grafo de etapas con nombre (carga,
+agregados, enlace...). La clave de cada etapa es el hash de su nombre, sus
+parámetros, la huella de sus archivos de entrada y las claves de las etapas
+de las que depende. Si la clave ya está en la carpeta de caché, el resultado
+se carga de disco y las etapas anteriores ni siquiera se evalúan; así, cambiar
+month_label sólo vuelve a escribir los reportes y agregar REGISTROS.csv sólo
+recalcula el enlace y la consolidación.
+
+Las etapas con tablas=True se guardan como artefactos en columnas (ver
+artefactos.py) en lugar de un pickle; ultimo() los recupera sin calcular la
+clave, para regenerar reportes sin volver a abrir SISTEMA.
+
+observar() registra funciones que reciben la duración de cada etapa al
+terminar; así los benchmarks miden etapas sin cambiar la firma de los
+procesos. La medición completa (CPU, memoria, filas) queda en
+Pipeline.metricas. Con un perfiles.Perfilador cada etapa calculada se perfila
+por separado.
+
+Cada etapa guardada es también un punto de control: corrida() deja una marca
+en la caché mientras el proceso corre y la borra al terminar bien. Si el
+proceso falla, se cancela o se cierra la app, la marca queda y la siguiente
+corrida retoma desde la última etapa guardada, aun con reutilizar=False.
+Antes de calcular cada etapa se llama a cancelacion.revisar().
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from . import artefactos, cancelacion, eventos
+from .constantes import CARPETA_CACHE  # noqa: F401
+from .metricas import contar_filas, medir
+from .perfiles import perfilar_etapa
+
+# Cambiar al modificar el cálculo de una etapa invalida todas las cachés
+VERSION_CACHE = 2
+# Archivo que marca una corrida sin terminar en la caché de un pipeline
+MARCA_EN_CURSO = ".en_curso"
+
+# Funciones observador(pipeline, etapa, segundos, origen) activas, por hilo:
+# CAMPO y CAJA pueden correr a la vez en hilos distintos (ambos.py)
+_LOCAL = threading.local()
+
+
+def _observadores() -> list:
+    if not hasattr(_LOCAL, "observadores"):
+        _LOCAL.observadores = []
+    return _LOCAL.observadores
+
+
+@contextmanager
+def observar(observador):
+    """
+    Registra `observador` mientras dura el bloque with, para las etapas que
+    se evalúan en el hilo actual
+
+    origen es "calculada", "cache" (clave encontrada) o "guardada" (ultimo);
+    los segundos de una etapa calculada no incluyen los de sus dependencias.
+    """
+    _observadores().append(observador)
+    try:
+        yield observador
+    finally:
+        _observadores().remove(observador)
+
+
+def huella_archivo(path: Path) -> list:
+    """Ruta, tamaño y fecha de modificación (sin leer el contenido)"""
+    path = Path(path)
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return [str(path), None]
+    return [str(path.resolve()), st.st_size, st.st_mtime_ns]
+
+
+class Etapa:
+    """Nodo del pipeline: función de los resultados de sus dependencias"""
+
+    def __init__(
+        self, nombre, funcion, dependencias, archivos, parametros, memoizar, tablas
+    ):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.dependencias = list(dependencias)
+        self.archivos = list(archivos)
+        self.parametros = parametros or {}
+        self.memoizar = memoizar
+        self.tablas = tablas
+
+
+class Pipeline:
+    """
+    Grafo de etapas evaluado a demanda
+
+    Args:
+        cache_dir: carpeta de caché; None desactiva la memoización en disco
+        log_func: función opcional para reportar etapas recalculadas o
+            recuperadas
+        nombre: nombre del pipeline ("campo", "caja"); su caché va en la
+            subcarpeta cache_dir/nombre porque las etapas se llaman igual
+        perfilador: perfiles.Perfilador opcional para las etapas calculadas
+        reutilizar: con False las etapas se recalculan y se guardan, y lo
+            guardado sólo se usa para reanudar una corrida que no terminó
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = None,
+        log_func=None,
+        nombre: str = "",
+        perfilador=None,
+        reutilizar: bool = True,
+    ):
+        self.nombre = nombre
+        self.perfilador = perfilador
+        self.reutilizar = reutilizar
+        self.reanudada = False
+        self.cache_dir = Path(cache_dir) / nombre if cache_dir else None
+        self.log_func = log_func
+        self._etapas = {}
+        self._claves = {}
+        self._valores = {}
+        self.recalculadas = []
+        self.recuperadas = []
+        # {etapa: medición de metricas.medir con filas_entrada/filas_salida}
+        self.metricas = {}
+
+    def etapa(
+        self,
+        nombre: str,
+        funcion,
+        dependencias=(),
+        archivos=(),
+        parametros=None,
+        memoizar=True,
+        tablas=False,
+    ) -> str:
+        """
+        Registra una etapa; funcion recibe los resultados de `dependencias`
+
+        Con tablas=True el resultado (DataFrame o dict de DataFrames) se guarda
+        como artefactos en columnas en lugar de un pickle.
+
+        Returns:
+            el nombre de la etapa, para usarlo como dependencia
+        """
+        if nombre in self._etapas:
+            raise ValueError(f"Etapa duplicada: {nombre}")
+        faltantes = [d for d in dependencias if d not in self._etapas]
+        if faltantes:
+            raise ValueError(f"Dependencias desconocidas de {nombre}: {faltantes}")
+        self._etapas[nombre] = Etapa(
+            nombre, funcion, dependencias, archivos, parametros, memoizar, tablas
+        )
+        return nombre
+
+    def clave(self, nombre: str) -> str:
+        """Hash de la etapa y de todo lo que hay antes de ella"""
+        if nombre not in self._claves:
+            etapa = self._etapas[nombre]
+            contenido = {
+                "version": VERSION_CACHE,
+                "etapa": nombre,
+                "parametros": etapa.parametros,
+                "archivos": [huella_archivo(a) for a in etapa.archivos],
+                "dependencias": [self.clave(d) for d in etapa.dependencias],
+            }
+            texto = json.dumps(contenido, sort_keys=True, default=str)
+            self._claves[nombre] = hashlib.sha256(texto.encode("utf-8")).hexdigest()
+        return self._claves[nombre]
+
+    def resultado(self, nombre: str):
+        """Valor de la etapa: de memoria, de la caché en disco o recalculado"""
+        if nombre in self._valores:
+            return self._valores[nombre]
+
+        etapa = self._etapas[nombre]
+        ruta = self._ruta_cache(etapa)
+        if ruta is not None and (self.reutilizar or self.reanudada) and ruta.exists():
+            try:
+                with medir() as medida:
+                    valor = self._cargar(etapa, ruta)
+                self.recuperadas.append(nombre)
+                self._log(f"  ↺ Etapa {nombre}: recuperada de caché", etapa=nombre)
+                self._registrar(nombre, medida, None, valor, "cache")
+                self._valores[nombre] = valor
+                return valor
+            except (
+                OSError,
+                EOFError,
+                pickle.UnpicklingError,
+                AttributeError,
+                ValueError,
+            ):
+                pass  # Caché dañada o de otra versión: se recalcula
+
+        argumentos = [self.resultado(d) for d in etapa.dependencias]
+        cancelacion.revisar()
+        with medir() as medida, perfilar_etapa(self.perfilador, self.nombre, nombre):
+            valor = etapa.funcion(*argumentos)
+        self.recalculadas.append(nombre)
+        self._registrar(nombre, medida, argumentos, valor, "calculada")
+        if ruta is not None:
+            self._guardar(etapa, ruta, valor)
+        self._valores[nombre] = valor
+        return valor
+
+    @contextmanager
+    def corrida(self):
+        """
+        Marca la corrida en la caché mientras dura el bloque with
+
+        Si la marca de la corrida anterior sigue ahí (no terminó), esta corrida
+        la reanuda con las etapas que alcanzó a guardar. La marca sólo se
+        borra si el bloque termina sin excepción.
+        """
+        if self.cache_dir is None:
+            yield self
+            return
+        marca = self.cache_dir / MARCA_EN_CURSO
+        self.reanudada = marca.exists()
+        if self.reanudada:
+            self._log(
+                "  ↺ La corrida anterior no terminó: se reanuda desde la última "
+                "etapa guardada"
+            )
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        marca.touch()
+        yield self
+        marca.unlink(missing_ok=True)
+
+    def _ruta_cache(self, etapa: Etapa):
+        if self.cache_dir is None or not etapa.memoizar:
+            return None
+        ruta = self.cache_dir / f"{etapa.nombre}.{self.clave(etapa.nombre)[:20]}"
+        return ruta if etapa.tablas else ruta.with_name(ruta.name + ".pkl")
+
+    def ultimo(self, nombre: str):
+        """
+        Último resultado guardado de la etapa, sin verificar su clave
+
+        Sirve para regenerar reportes aunque SISTEMA ya no esté disponible.
+
+        Raises:
+            FileNotFoundError: si la etapa nunca se guardó en cache_dir
+        """
+        etapa = self._etapas[nombre]
+        guardados = []
+        if self.cache_dir is not None and self.cache_dir.exists():
+            guardados = [
+                ruta
+                for ruta in self.cache_dir.glob(f"{nombre}.*")
+                if ruta.suffix != ".tmp" and ruta.is_dir() == etapa.tablas
+            ]
+        if not guardados:
+            raise FileNotFoundError(
+                f"No hay resultados guardados de la etapa {nombre} en {self.cache_dir}"
+            )
+        ruta = max(guardados, key=lambda r: r.stat().st_mtime_ns)
+        with medir() as medida:
+            valor = self._cargar(etapa, ruta)
+        self.recuperadas.append(nombre)
+        self._log(
+            f"  ↺ Etapa {nombre}: último resultado guardado ({ruta.name})", etapa=nombre
+        )
+        self._registrar(nombre, medida, None, valor, "guardada")
+        self._valores[nombre] = valor
+        return valor
+
+    @staticmethod
+    def _cargar(etapa: Etapa, ruta: Path):
+        if etapa.tablas:
+            return artefactos.cargar(ruta)
+        with open(ruta, "rb") as f:
+            return pickle.load(f)
+
+    def _guardar(self, etapa: Etapa, ruta: Path, valor):
+        """Escribe la caché de forma atómica y borra versiones anteriores"""
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        tmp = ruta.with_name(ruta.name + ".tmp")
+        _borrar(tmp)
+        try:
+            if etapa.tablas:
+                artefactos.guardar(tmp, valor)
+            else:
+                with open(tmp, "wb") as f:
+                    pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+            _borrar(ruta)
+            os.replace(tmp, ruta)
+        except (OSError, pickle.PicklingError, TypeError, ValueError) as e:
+            _borrar(tmp)
+            self._log(
+                f"  Advertencia: no se pudo guardar la caché de {etapa.nombre}: {e}",
+                eventos.AVISO,
+                etapa.nombre,
+            )
+            return
+        for anterior in ruta.parent.glob(f"{etapa.nombre}.*"):
+            if anterior != ruta:
+                _borrar(anterior)
+
+    def _registrar(self, etapa: str, medida: dict, argumentos, valor, origen: str):
+        """Guarda la medición con las filas y avisa a los observadores"""
+        medida["filas_entrada"] = (
+            None if argumentos is None else contar_filas(argumentos)
+        )
+        medida["filas_salida"] = contar_filas(valor)
+        self.metricas[etapa] = medida
+        self._log(
+            f"  Etapa {etapa}: {origen} en {medida['wall_s']:.2f} s",
+            eventos.DETALLE,
+            etapa,
+            segundos=medida["wall_s"],
+            filas=medida["filas_salida"],
+        )
+        for observador in list(_observadores()):
+            observador(self, etapa, medida["wall_s"], origen)
+
+    def _log(self, mensaje: str, nivel=eventos.INFO, etapa=None, **contadores):
+        if self.log_func:
+            self.log_func(eventos.Evento(mensaje, nivel, etapa, **contadores))
+
+
+def _borrar(ruta: Path):
+    """Borra un pickle o una carpeta de artefactos de la caché"""
+    if ruta.is_dir():
+        shutil.rmtree(ruta, ignore_errors=True)
+    else:
+        ruta.unlink(missing_ok=True)
@@ -0,0 +1,476 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Servicio HTTP local para enviar trabajos al servidor que tiene los datos
+
+Sólo usa la biblioteca estándar (http.server). Los analistas envían desde su
+máquina un trabajo con los mismos campos de un lote de trabajos.py; el
+servicio lo corre en uno de sus procesos de cálculo persistentes
+(trabajador.Trabajador, con pandas importado y el último SISTEMA en memoria)
+y transmite el log como Server-Sent Events mientras corre.
+
+    POST /trabajos                     {"proceso": "CAMPO", "data_dir": ...}
+    GET  /trabajos                     estado de todos los trabajos
+    GET  /trabajos/<id>                estado, resultado y libros generados
+    GET  /trabajos/<id>/eventos        log en vivo (text/event-stream)
+    GET  /trabajos/<id>/archivos/<r>   descarga un libro de la salida
+
+Corren a la vez tantos trabajos como procesos de cálculo (--workers); los
+demás esperan en una cola de hasta --en-cola trabajos y, con la cola llena,
+el envío responde 503. Un trabajo cuya carpeta de salida ya usa otro trabajo
+en cola o corriendo se rechaza con 409.
+
+Las rutas relativas se resuelven desde --raiz y ninguna ruta puede salir de
+ella. El servicio escucha en 127.0.0.1 salvo que se indique --host; para
+abrirlo a la red conviene fijar --token, que los clientes envían como
+"Authorization: Bearer <token>".
+
+Salvo que el envío indique otro, cada trabajo alimenta el historial de
+cuentas <raiz>/historial_iiwa.sqlite (historial.py).
+
+Uso:
+    python -m app_iiwa.servicio --raiz D:/municipios --workers 2 --host 0.0.0.0
+"""
+
+import argparse
+import hmac
+import json
+import multiprocessing
+import queue
+import shutil
+import sys
+import threading
+import time
+import uuid
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from . import eventos
+from .constantes import ARCHIVO_HISTORIAL, CARPETA_CACHE
+from .eventos import como_evento, formato_archivo
+from .trabajador import Trabajador
+from .trabajos import COMPLETADO, CORRIENDO, FALLIDO, PENDIENTE, RUTAS, Trabajo
+
+PUERTO_DEFAULT = 8765
+WORKERS_DEFAULT = 2
+EN_COLA_DEFAULT = 20
+# Segundos sin eventos tras los que se manda un comentario al cliente SSE
+INTERVALO_LATIDO_S = 15
+# Tamaño máximo del JSON de un envío
+MAX_CUERPO = 64 * 1024
+TIPOS_ARCHIVO = {
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".json": "application/json",
+    ".log": "text/plain; charset=utf-8",
+}
+
+
+class Envio:
+    """Un trabajo recibido por el servicio, con su log en memoria"""
+
+    def __init__(self, trabajo: Trabajo):
+        self.id = uuid.uuid4().hex[:12]
+        self.trabajo = trabajo
+        self.recibido = time.time()
+        self.eventos = []
+        self._cambio = threading.Condition()
+
+    @property
+    def terminado(self) -> bool:
+        return self.trabajo.estado in (COMPLETADO, FALLIDO)
+
+    def registrar(self, mensaje):
+        """log_func de la corrida: guarda el evento y lo añade al log del trabajo"""
+        evento = como_evento(mensaje)
+        with self._cambio:
+            self.eventos.append(evento)
+            self._cambio.notify_all()
+        try:
+            with open(self.trabajo.log_path, "a", encoding="utf-8") as archivo:
+                archivo.write(formato_archivo(evento) + "\n")
+        except OSError:
+            pass
+
+    def cambiar(self, estado: str):
+        with self._cambio:
+            self.trabajo.estado = estado
+            self._cambio.notify_all()
+
+    def siguientes(self, desde: int, timeout: float):
+        """(eventos a partir de `desde`, terminado); espera hasta `timeout`"""
+        with self._cambio:
+            self._cambio.wait_for(
+                lambda: len(self.eventos) > desde or self.terminado, timeout
+            )
+            return self.eventos[desde:], self.terminado
+
+    def archivos(self) -> list:
+        """Libros, métricas y logs de la carpeta de salida (rutas relativas)"""
+        salida = self.trabajo.output_dir
+        if not salida.is_dir():
+            return []
+        return sorted(
+            ruta.relative_to(salida).as_posix()
+            for ruta in salida.rglob("*")
+            if ruta.is_file()
+            and ruta.suffix in TIPOS_ARCHIVO
+            and CARPETA_CACHE not in ruta.relative_to(salida).parts
+        )
+
+    def como_dict(self, posicion: int = None) -> dict:
+        datos = self.trabajo.como_dict(resultados=True)
+        datos.update(id=self.id, recibido=round(self.recibido, 3))
+        if posicion is not None:
+            datos["posicion"] = posicion
+        if self.terminado:
+            datos["archivos"] = self.archivos()
+        return datos
+
+
+def _evento_json(evento) -> dict:
+    return {
+        "mensaje": str(evento),
+        "nivel": evento.nivel,
+        "etapa": evento.etapa,
+        "contadores": evento.contadores,
+        "hora": round(evento.hora, 3),
+    }
+
+
+class Servicio:
+    """
+    Cola de envíos atendida por procesos de cálculo persistentes
+
+    Args:
+        raiz: carpeta desde la que se resuelven las rutas; ninguna puede
+            quedar fuera de ella
+        workers: procesos de cálculo (trabajos que corren a la vez)
+        en_cola: trabajos pendientes como máximo
+        crear_trabajador: fábrica de procesos de cálculo (pruebas)
+    """
+
+    def __init__(
+        self,
+        raiz: Path,
+        workers: int = WORKERS_DEFAULT,
+        en_cola: int = EN_COLA_DEFAULT,
+        log_func=None,
+        crear_trabajador=Trabajador,
+    ):
+        self.raiz = Path(raiz).resolve()
+        self.workers = max(1, int(workers))
+        self.log_func = log_func or (lambda mensaje: None)
+        self.crear_trabajador = crear_trabajador
+        self.en_cola = max(1, int(en_cola))
+        self.envios = {}
+        self._cola = queue.Queue()
+        self._candado = threading.Lock()
+        self._trabajadores = []
+
+    def iniciar(self):
+        """Arranca los procesos de cálculo y los hilos que los alimentan"""
+        for i in range(self.workers):
+            trabajador = self.crear_trabajador()
+            trabajador.iniciar()
+            self._trabajadores.append(trabajador)
+            threading.Thread(
+                target=self._atender,
+                args=(trabajador,),
+                name=f"servicio-iiwa-{i + 1}",
+                daemon=True,
+            ).start()
+
+    def cerrar(self):
+        for _ in self._trabajadores:
+            self._cola.put(None)
+        for trabajador in self._trabajadores:
+            trabajador.cerrar()
+
+    def _ruta(self, valor) -> Path:
+        ruta = (self.raiz / valor).resolve()
+        if not ruta.is_relative_to(self.raiz):
+            raise ValueError(f"Ruta fuera de {self.raiz}: {valor}")
+        return ruta
+
+    def enviar(self, datos: dict) -> Envio:
+        """
+        Encola un trabajo descrito como en un lote
+
+        Raises:
+            ValueError: proceso desconocido, faltan rutas o salen de la raíz
+            FileExistsError: otro trabajo en cola o corriendo usa esa salida
+            queue.Full: la cola está llena
+        """
+        if not isinstance(datos, dict):
+            raise ValueError("Se esperaba un objeto JSON")
+        datos = dict(datos)
+        datos.setdefault(
+            "sistema_path", Path(datos.get("data_dir", "")) / "SISTEMA.xlsx"
+        )
+        for clave in ("data_dir", "output_dir"):
+            if not datos.get(clave):
+                raise ValueError(f"Falta {clave}")
+        for clave in RUTAS:
+            if datos.get(clave):
+                datos[clave] = self._ruta(datos[clave])
+        try:
+            trabajo = Trabajo.desde_dict(datos)
+        except TypeError as e:
+            raise ValueError(str(e)) from None
+        trabajo.parametros.setdefault("cache_dir", trabajo.output_dir / CARPETA_CACHE)
+        trabajo.parametros.setdefault("historial", self.raiz / ARCHIVO_HISTORIAL)
+
+        with self._candado:
+            pendientes = [e for e in self.envios.values() if not e.terminado]
+            if sum(e.trabajo.estado == PENDIENTE for e in pendientes) >= self.en_cola:
+                raise queue.Full
+            for otro in pendientes:
+                if not otro.terminado and otro.trabajo.output_dir == trabajo.output_dir:
+                    raise FileExistsError(
+                        f"El trabajo {otro.id} ya usa {trabajo.output_dir}"
+                    )
+            envio = Envio(trabajo)
+            self.envios[envio.id] = envio
+            self._cola.put(envio)
+        eventos.info(
+            self.log_func, f"Recibido {envio.id}: {trabajo.proceso} {trabajo.nombre}"
+        )
+        return envio
+
+    def posicion(self, envio: Envio) -> int:
+        """Trabajos pendientes recibidos antes que `envio` (0 si ya corre)"""
+        if envio.trabajo.estado != PENDIENTE:
+            return 0
+        with self._candado:
+            return sum(
+                otro.trabajo.estado == PENDIENTE and otro.recibido < envio.recibido
+                for otro in self.envios.values()
+            )
+
+    def _atender(self, trabajador):
+        """Hilo de un proceso de cálculo: corre envíos hasta recibir None"""
+        while True:
+            envio = self._cola.get()
+            if envio is None:
+                return
+            trabajo = envio.trabajo
+            trabajo.output_dir.mkdir(parents=True, exist_ok=True)
+            envio.cambiar(CORRIENDO)
+            trabajo.intentos += 1
+            inicio = time.perf_counter()
+            try:
+                ok, resultado = trabajador.ejecutar(
+                    trabajo.proceso, envio.registrar, **trabajo.argumentos()
+                )
+            except Exception as e:
+                ok, resultado = False, f"{type(e).__name__}: {e}"
+            trabajo.segundos = time.perf_counter() - inicio
+            trabajo.resultado = str(resultado)
+            if not ok:
+                eventos.error(envio.registrar, trabajo.resultado)
+            envio.cambiar(COMPLETADO if ok else FALLIDO)
+            (eventos.exito if ok else eventos.error)(
+                self.log_func,
+                f"{envio.id}: {trabajo.proceso} {trabajo.nombre} {trabajo.estado} "
+                f"en {trabajo.segundos:.1f} s",
+            )
+
+
+# ====================================
+# HTTP
+# ====================================
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    server_version = "app-iiwa"
+
+    @property
+    def servicio(self) -> Servicio:
+        return self.server.servicio
+
+    def log_message(self, formato, *args):
+        eventos.detalle(
+            self.servicio.log_func, f"{self.address_string()} {formato % args}"
+        )
+
+    def _responder(self, estado: HTTPStatus, datos):
+        cuerpo = json.dumps(datos, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _error(self, estado: HTTPStatus, mensaje: str):
+        self._responder(estado, {"error": mensaje})
+
+    def _autorizado(self) -> bool:
+        token = self.server.token
+        if not token:
+            return True
+        recibido = self.headers.get("Authorization", "")
+        if hmac.compare_digest(recibido.encode(), f"Bearer {token}".encode()):
+            return True
+        self._error(HTTPStatus.UNAUTHORIZED, "Token inválido")
+        return False
+
+    def _partes(self) -> list:
+        return [unquote(p) for p in urlsplit(self.path).path.split("/") if p]
+
+    def do_POST(self):
+        if not self._autorizado():
+            return
+        if self._partes() != ["trabajos"]:
+            return self._error(HTTPStatus.NOT_FOUND, "Ruta desconocida")
+        largo = int(self.headers.get("Content-Length") or 0)
+        if largo > MAX_CUERPO:
+            return self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Envío muy grande")
+        try:
+            envio = self.servicio.enviar(json.loads(self.rfile.read(largo) or b"null"))
+        except (ValueError, UnicodeDecodeError) as e:
+            return self._error(HTTPStatus.BAD_REQUEST, str(e))
+        except FileExistsError as e:
+            return self._error(HTTPStatus.CONFLICT, str(e))
+        except queue.Full:
+            return self._error(HTTPStatus.SERVICE_UNAVAILABLE, "La cola está llena")
+        self._responder(
+            HTTPStatus.ACCEPTED, envio.como_dict(self.servicio.posicion(envio))
+        )
+
+    def do_GET(self):
+        if not self._autorizado():
+            return
+        partes = self._partes()
+        if partes == ["trabajos"]:
+            envios = list(self.servicio.envios.values())
+            return self._responder(
+                HTTPStatus.OK,
+                {"trabajos": [e.como_dict(self.servicio.posicion(e)) for e in envios]},
+            )
+        if len(partes) < 2 or partes[0] != "trabajos":
+            return self._error(HTTPStatus.NOT_FOUND, "Ruta desconocida")
+        envio = self.servicio.envios.get(partes[1])
+        if envio is None:
+            return self._error(
+                HTTPStatus.NOT_FOUND, f"No existe el trabajo {partes[1]}"
+            )
+        if len(partes) == 2:
+            return self._responder(
+                HTTPStatus.OK, envio.como_dict(self.servicio.posicion(envio))
+            )
+        if partes[2:] == ["eventos"]:
+            return self._eventos(envio)
+        if len(partes) > 3 and partes[2] == "archivos":
+            return self._archivo(envio, "/".join(partes[3:]))
+        self._error(HTTPStatus.NOT_FOUND, "Ruta desconocida")
+
+    def _eventos(self, envio: Envio):
+        """Log del trabajo como Server-Sent Events, desde Last-Event-ID"""
+        try:
+            desde = int(self.headers.get("Last-Event-ID", -1)) + 1
+        except ValueError:
+            desde = 0
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            while True:
+                nuevos, terminado = envio.siguientes(desde, INTERVALO_LATIDO_S)
+                for evento in nuevos:
+                    datos = json.dumps(
+                        _evento_json(evento), ensure_ascii=False, default=str
+                    )
+                    self.wfile.write(
+                        f"id: {desde}\nevent: log\ndata: {datos}\n\n".encode()
+                    )
+                    desde += 1
+                if terminado and not nuevos:
+                    datos = json.dumps(
+                        envio.como_dict(), ensure_ascii=False, default=str
+                    )
+                    self.wfile.write(f"event: fin\ndata: {datos}\n\n".encode())
+                    self.wfile.flush()
+                    return
+                if not nuevos:
+                    self.wfile.write(b": sigue\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente se desconectó; el trabajo sigue corriendo
+            return
+
+    def _archivo(self, envio: Envio, relativa: str):
+        salida = envio.trabajo.output_dir.resolve()
+        ruta = (salida / relativa).resolve()
+        if (
+            not ruta.is_relative_to(salida)
+            or relativa not in envio.archivos()
+            or not ruta.is_file()
+        ):
+            return self._error(HTTPStatus.NOT_FOUND, f"No existe el archivo {relativa}")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", TIPOS_ARCHIVO[ruta.suffix])
+        self.send_header("Content-Length", str(ruta.stat().st_size))
+        self.send_header("Content-Disposition", f'attachment; filename="{ruta.name}"')
+        self.end_headers()
+        with open(ruta, "rb") as archivo:
+            shutil.copyfileobj(archivo, self.wfile)
+
+
+def crear_servidor(
+    servicio: Servicio,
+    host: str = "127.0.0.1",
+    puerto: int = PUERTO_DEFAULT,
+    token=None,
+) -> ThreadingHTTPServer:
+    """Servidor HTTP del servicio (puerto 0 = uno libre)"""
+    servidor = ThreadingHTTPServer((host, puerto), _Manejador)
+    servidor.daemon_threads = True
+    servidor.servicio = servicio
+    servidor.token = token
+    return servidor
+
+
+# ====================================
+# LÍNEA DE COMANDOS
+# ====================================
+
+
+def main(argv=None):
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(
+        prog="app_iiwa.servicio", description="Servicio HTTP para enviar trabajos"
+    )
+    parser.add_argument("--raiz", type=Path, default=Path("."), help="carpeta de datos")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=PUERTO_DEFAULT)
+    parser.add_argument("--workers", type=int, default=WORKERS_DEFAULT)
+    parser.add_argument("--en-cola", type=int, default=EN_COLA_DEFAULT)
+    parser.add_argument("--token", help="token que deben enviar los clientes")
+    args = parser.parse_args(argv)
+
+    log_func = eventos.consola(stream=sys.stdout)
+    servicio = Servicio(
+        args.raiz, workers=args.workers, en_cola=args.en_cola, log_func=log_func
+    )
+    servicio.iniciar()
+    servidor = crear_servidor(servicio, args.host, args.puerto, args.token)
+    host, puerto = servidor.server_address[:2]
+    eventos.seccion(log_func, f"=== SERVICIO EN http://{host}:{puerto} ===")
+    log_func(f"  Raíz: {servicio.raiz}")
+    log_func(f"  {servicio.workers} procesos de cálculo, hasta {args.en_cola} en cola")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("Servicio detenido")
+    finally:
+        servidor.server_close()
+        servicio.cerrar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Generador determinista de datos sintéticos
+
+Produce SISTEMA (esquemas de CAMPO y de CAJA), LISTA C.P., REGISTROS y FOLIOS
+con la misma semilla siempre iguales, para pruebas y para la suite de
+benchmarks (benchmarks/bench_procesos.py). Los datos incluyen cuentas
+duplicadas, nulos y años mezclados como los padrones reales.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+def codigos_postales(n_cps: int) -> np.ndarray:
+    """Códigos postales sintéticos: 50000, 50007, 50014..."""
+    return np.arange(50000, 50000 + n_cps * 7, 7)
+
+
+def padron_campo(n_filas=2000, n_cps=25, seed=0, enteros=False) -> pd.DataFrame:
+    """SISTEMA de adeudos con las columnas que usa CAMPO"""
+    rng = np.random.default_rng(seed)
+    cps = rng.choice(codigos_postales(n_cps), n_filas)
+    cuentas = rng.integers(0, int(n_filas * 0.9), n_filas)  # ~10% duplicadas
+
+    def monto(escala):
+        if enteros:
+            return rng.integers(0, escala, n_filas)
+        valores = np.round(rng.gamma(2.0, escala / 4, n_filas), 2)
+        valores[rng.random(n_filas) < 0.01] = np.nan
+        return valores
+
+    tipo_conexion = rng.choice(["DOMESTICA", "COMERCIAL", "INDUSTRIAL"], n_filas)
+    tipo_conexion = tipo_conexion.astype(object)
+    tipo_conexion[rng.random(n_filas) < 0.02] = None
+
+    return pd.DataFrame(
+        {
+            "ClaveCatastral": [f"CC{i:07d}" for i in range(n_filas)],
+            "Propietario": [f"PROPIETARIO {i % 997}" for i in range(n_filas)],
+            "Domicilio": [f"CALLE {i % 131} nan" for i in range(n_filas)],
+            "CodigoPostal": cps,
+            "UltimoPago": rng.choice(["2023-01-15", "2024-06-30", None], n_filas),
+            "NumerodeCuenta": [f"{c}-0" for c in cuentas],
+            "TipoConsumo": rng.choice(["MEDIDO", "CUOTA FIJA"], n_filas),
+            "TipoConexion": tipo_conexion,
+            "Zona": rng.integers(1, 6, n_filas),
+            "bimInicial": rng.choice(["2019-1", "2021-3", "2023-6"], n_filas),
+            "bimfinal": rng.choice(["2024-6", "2025-1", "2025-3", None], n_filas),
+            "agua": monto(2000),
+            "actualizacionagua": monto(300),
+            "recargosagua": monto(500),
+            "drenaje": monto(800),
+            "actualizaciondrenaje": monto(100),
+            "recargosdrenaje": monto(200),
+            "mejoras": monto(150),
+            "iva": monto(250),
+        }
+    )
+
+
+def padron_caja(n_filas=800, n_cps=8, seed=1) -> pd.DataFrame:
+    """SISTEMA de pagos con las columnas que usa CAJA"""
+    rng = np.random.default_rng(seed)
+    n_cuentas = max(1, n_filas * 5 // 16)
+    cuentas = rng.integers(0, n_cuentas, n_filas)
+    return pd.DataFrame(
+        {
+            "NumerodeCuenta": [f"{c}-0" for c in cuentas],
+            "Propietario": [f"P {c}" for c in cuentas],
+            "Domicilio": [f"CALLE {c % 50}" for c in cuentas],
+            "Colonia": [f"COL {c % 9}" for c in cuentas],
+            "CodigoPostal": codigos_postales(n_cps)[cuentas % n_cps],
+            "AñoInicial": 2018 + cuentas % 5,
+            "BimestreInicial": 1 + cuentas % 6,
+            "AñoFinal": 2024,
+            "BimestreFinal": 6,
+            "fechapago": (
+                pd.Timestamp("2025-03-01")
+                + pd.to_timedelta(rng.integers(0, 12, n_filas), unit="D")
+            ).strftime("%Y-%m-%d"),
+            "FolioImpreso": [
+                f"F{f}" for f in rng.integers(0, max(1, n_filas // 2), n_filas)
+            ],
+            "conDescripcion": rng.choice(["AGUA", "MEJORAS AMBIENTALES"], n_filas),
+            "pagdAño": rng.choice([2023, 2024, 2025], n_filas),
+            "pagdCosto": np.round(rng.gamma(2, 100, n_filas), 2),
+            "pagdDescuento": np.round(rng.gamma(1, 5, n_filas), 2),
+            "pagIva": np.round(rng.gamma(1, 10, n_filas), 2),
+        }
+    )
+
+
+def lista_cp(n_cps: int) -> pd.DataFrame:
+    """LISTA C.P. con todos los códigos postales del padrón"""
+    cps = codigos_postales(n_cps)
+    return pd.DataFrame({"CP": cps, "COLONIA": [f"COLONIA {i}" for i in range(n_cps)]})
+
+
+def registros_y_folios(cuentas, seed=2):
+    """
+    REGISTROS (folio de notificación y coordenadas) y FOLIOS de las cuentas
+
+    La mitad de las cuentas tiene folio_notif; FOLIOS completa una parte de
+    las que no lo tienen.
+    """
+    rng = np.random.default_rng(seed)
+    cuentas = pd.unique(np.asarray(cuentas))
+    n = len(cuentas)
+    folio = np.array([f"N{i}" for i in range(n)], dtype=object)
+    folio[rng.random(n) < 0.5] = np.nan
+    registros = pd.DataFrame(
+        {
+            "folio_notif": folio,
+            "NumerodeCuenta": cuentas,
+            "latitud_not": np.round(19.0 + rng.random(n), 6),
+            "longitud_not": np.round(-99.0 - rng.random(n), 6),
+        }
+    )
+    con_folio = cuentas[rng.random(n) < 0.2]
+    folios = pd.DataFrame(
+        {
+            "NumerodeCuenta": con_folio,
+            "FOLIO IIWA": [f"IIWA{i}" for i in range(len(con_folio))],
+        }
+    )
+    return registros, folios
+
+
+def _motor_excel() -> str:
+    """xlsxwriter escribe mucho más rápido que openpyxl los padrones grandes"""
+    try:
+        import xlsxwriter  # noqa: F401
+
+        return "xlsxwriter"
+    except ImportError:
+        return "openpyxl"
+
+
+def generar_datos(
+    carpeta: Path, proceso: str, n_filas: int, n_cps: int, seed=0
+) -> Path:
+    """
+    Escribe en `carpeta` los archivos de entrada de un proceso
+
+    Args:
+        proceso: "CAMPO" (SISTEMA y LISTA C.P.) o "CAJA" (SISTEMA, REGISTROS y
+            FOLIOS)
+
+    Returns:
+        ruta de SISTEMA.xlsx
+    """
+    carpeta = Path(carpeta)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    sistema_path = carpeta / "SISTEMA.xlsx"
+    motor = _motor_excel()
+
+    if proceso == "CAMPO":
+        padron = padron_campo(n_filas, n_cps, seed)
+        lista_cp(n_cps).to_excel(carpeta / "LISTA C.P..xlsx", index=False, engine=motor)
+    elif proceso == "CAJA":
+        padron = padron_caja(n_filas, n_cps, seed)
+        registros, folios = registros_y_folios(padron["NumerodeCuenta"], seed + 1)
+        registros.to_csv(carpeta / "REGISTROS.csv", index=False, encoding="latin1")
+        folios.to_csv(carpeta / "FOLIOS.csv", index=False, encoding="latin1")
+    else:
+        raise ValueError(f"Proceso desconocido: {proceso}")
+
+    padron.to_excel(sistema_path, index=False, engine=motor)
+    return sistema_path
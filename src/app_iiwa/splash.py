@@ -3,18 +3,20 @@
 
 """
 Splash screen para App IIWA
-Muestra pantalla de carga mientras la aplicación principal se inicializa
+Muestra el avance real de la carga de módulos (arranque.Precarga) y se cierra
+en cuanto termina, no después de un tiempo fijo
 """
 
-import threading
-import time
 import tkinter as tk
 from tkinter import ttk
 
+from .arranque import Precarga
+
 
 class SplashScreen:
-    def __init__(self):
-        self.splash = tk.Tk()
+    def __init__(self, master=None):
+        # Con master se abre como ventana secundaria de la app ya creada
+        self.splash = tk.Toplevel(master) if master is not None else tk.Tk()
         self.splash.title("App IIWA")
 
         # Configurar ventana splash
@@ -76,9 +78,7 @@ class SplashScreen:
         progress_frame = tk.Frame(main_frame, bg="#1a1a1a")
         progress_frame.pack(fill="x", pady=(0, 20))
 
-        self.progress = ttk.Progressbar(
-            progress_frame, mode="indeterminate", length=300
-        )
+        self.progress = ttk.Progressbar(progress_frame, mode="determinate", length=300)
         self.progress.pack(pady=10)
 
         # Texto de estado
@@ -104,48 +104,59 @@ class SplashScreen:
     def show(self):
         """Muestra el splash screen"""
         self.splash.deiconify()
-        self.progress.start()
 
     def update_status(self, text):
         """Actualiza el texto de estado"""
         self.status_label.configure(text=text)
         self.splash.update()
 
+    def seguir(self, precarga: Precarga, al_terminar=None, intervalo_ms=50):
+        """
+        Actualiza barra y texto con el avance de `precarga`
+
+        Al terminar destruye el splash y llama a al_terminar().
+        """
+        self.progress.configure(maximum=precarga.total, value=precarga.hechos)
+        self.status_label.configure(text=precarga.estado())
+        if not precarga.terminada:
+            self.splash.after(
+                intervalo_ms, self.seguir, precarga, al_terminar, intervalo_ms
+            )
+            return
+        self.destroy()
+        if al_terminar:
+            al_terminar()
+
     def hide(self):
         """Oculta el splash screen"""
-        self.progress.stop()
         self.splash.withdraw()
 
     def destroy(self):
         """Destruye el splash screen"""
-        self.progress.stop()
         self.splash.destroy()
 
 
-def show_splash_screen(duration=3):
+def show_splash_screen(precarga: Precarga = None):
     """
-    Muestra splash screen por una duración específica
+    Muestra el splash mientras se importan los módulos de cálculo
 
     Args:
-        duration: Tiempo en segundos para mostrar el splash
-    """
-    splash = SplashScreen()
+        precarga: precarga ya iniciada; si es None se crea e inicia una
 
-    def hide_after_delay():
-        time.sleep(duration)
-        splash.destroy()
+    Returns:
+        la precarga, terminada
+    """
+    if precarga is None:
+        precarga = Precarga()
+        precarga.start()
 
-    # Mostrar splash
+    splash = SplashScreen()
     splash.show()
-
-    # Programar cierre
-    threading.Thread(target=hide_after_delay, daemon=True).start()
-
-    # Mantener splash visible
+    # seguir() destruye la ventana al terminar, lo que cierra el mainloop
+    splash.seguir(precarga)
     splash.splash.mainloop()
-
-    return splash
+    return precarga
 
 
 if __name__ == "__main__":
-    show_splash_screen(5)
+    show_splash_screen()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Proceso de cálculo persistente para la GUI
+
+Los operadores corren CAMPO y CAJA muchas veces al día. En lugar de calcular
+en un hilo de la GUI, la interfaz arranca al abrirse un proceso hijo que
+importa pandas, numpy, openpyxl y los módulos de cálculo una sola vez y se
+queda esperando corridas. Además guarda en memoria el último SISTEMA leído
+(ingesta.recordar_sistema): si el archivo no cambió, la siguiente corrida
+empieza a calcular sin volver a leerlo.
+
+El hijo se crea con contexto spawn (no hereda los hilos de tkinter) y no es
+daemon porque el cómputo por CP abre su propio pool de procesos; la GUI lo
+cierra con cerrar(). Los mensajes de log llegan a la GUI como eventos.Evento
+por una cola. Si el hijo muere, la corrida en curso termina con error y la
+siguiente lo vuelve a arrancar. cancelar() activa un multiprocessing.Event
+que el hijo consulta en los puntos de cancelación del cálculo
+(cancelacion.revisar).
+"""
+
+import atexit
+import importlib
+import multiprocessing
+import queue
+import threading
+import time
+
+from .arranque import MODULOS_PESADOS
+from .cancelacion import cancelable
+from .eventos import aviso, como_evento
+
+# Proceso -> (módulo, función run_proceso_*)
+PROCESOS = {
+    "CAMPO": ("app_iiwa.campo", "run_proceso_campo"),
+    "CAJA": ("app_iiwa.caja", "run_proceso_caja"),
+    "AMBOS": ("app_iiwa.ambos", "run_proceso_ambos"),
+}
+# Segundos entre revisiones de que el otro lado sigue vivo
+INTERVALO_REVISION_S = 0.5
+ESPERA_CIERRE_S = 5
+
+
+def funcion_proceso(proceso: str):
+    """run_proceso_campo, _caja o _ambos (se importan al pedirlos)"""
+    try:
+        modulo, funcion = PROCESOS[proceso]
+    except KeyError:
+        raise ValueError(f"Proceso desconocido: {proceso}") from None
+    return getattr(importlib.import_module(modulo), funcion)
+
+
+class Trabajador:
+    """
+    Proceso hijo que ejecuta CAMPO y CAJA sin volver a importar ni a leer
+
+    Expone el mismo avance que arranque.Precarga (actual, hechos, total,
+    error, segundos, terminada, esperar, estado) para que la GUI muestre la
+    carga de módulos del hijo. ejecutar() corre un proceso y bloquea hasta
+    que termina; se llama desde un hilo, una corrida a la vez.
+    """
+
+    def __init__(self, modulos=MODULOS_PESADOS):
+        self.modulos = tuple(modulos)
+        self.total = len(self.modulos)
+        self.corridas = 0
+        self._contexto = multiprocessing.get_context("spawn")
+        self._proceso = None
+        self._corrida = threading.Lock()
+        self._log_func = None
+        self._reiniciar_avance()
+        atexit.register(self.cerrar)
+
+    def _reiniciar_avance(self):
+        self.hechos = 0
+        self.actual = None
+        self.error = None
+        self.segundos = None
+        self._listo = threading.Event()
+
+    def iniciar(self):
+        """Arranca el proceso hijo; la carga de módulos sigue en segundo plano"""
+        self._reiniciar_avance()
+        self._pedidos = self._contexto.Queue()
+        respuestas = self._contexto.Queue()
+        self._resultados = queue.Queue()
+        self._cancelar = self._contexto.Event()
+        self._proceso = self._contexto.Process(
+            target=_servir,
+            args=(self._pedidos, respuestas, self.modulos, self._cancelar),
+            name="trabajador-iiwa",
+        )
+        self._proceso.start()
+        threading.Thread(
+            target=self._escuchar,
+            args=(self._proceso, respuestas, self._resultados),
+            name="trabajador-iiwa-log",
+            daemon=True,
+        ).start()
+
+    @property
+    def vivo(self) -> bool:
+        return self._proceso is not None and self._proceso.is_alive()
+
+    def ejecutar(self, proceso: str, log_func, **parametros):
+        """
+        Corre `proceso` ("CAMPO", "CAJA" o "AMBOS") en el hijo con `parametros`
+
+        Returns:
+            (ok, resultado) como run_proceso_campo / run_proceso_caja
+        """
+        with self._corrida:
+            if not self.vivo:
+                if self._proceso is not None:
+                    aviso(log_func, "Reiniciando el proceso de cálculo...")
+                self.iniciar()
+            self._log_func = log_func
+            self._cancelar.clear()
+            try:
+                self._pedidos.put((proceso, parametros))
+                ok, resultado = self._resultados.get()
+            finally:
+                self._log_func = None
+            self.corridas += 1
+            return ok, resultado
+
+    def cancelar(self):
+        """Pide al hijo que detenga la corrida en curso en el próximo punto"""
+        if self._proceso is not None:
+            self._cancelar.set()
+
+    def _escuchar(self, proceso, respuestas, resultados):
+        """Reparte los mensajes del hijo hasta que termina"""
+        while True:
+            try:
+                mensaje = respuestas.get(timeout=INTERVALO_REVISION_S)
+            except queue.Empty:
+                if proceso.is_alive():
+                    continue
+                break
+            tipo = mensaje[0]
+            if tipo == "avance":
+                _, self.hechos, self.actual = mensaje
+            elif tipo == "listo":
+                _, self.hechos, self.segundos, self.error = mensaje
+                self.actual = None
+                self._listo.set()
+            elif tipo == "log":
+                log_func = self._log_func
+                if log_func:
+                    log_func(mensaje[1])
+            elif tipo == "fin":
+                resultados.put(mensaje[1:])
+
+        motivo = f"El proceso de cálculo terminó (código {proceso.exitcode})"
+        if not self._listo.is_set():
+            self.error = motivo
+            self._listo.set()
+        # Si había una corrida esperando, termina con error
+        resultados.put((False, motivo))
+
+    def cerrar(self, timeout=ESPERA_CIERRE_S):
+        """Pide al hijo que termine; si sigue calculando, lo detiene"""
+        proceso = self._proceso
+        if proceso is None or not proceso.is_alive():
+            return
+        try:
+            self._pedidos.put(None)
+        except (OSError, ValueError):
+            pass
+        proceso.join(timeout)
+        if proceso.is_alive():
+            proceso.terminate()
+            proceso.join(timeout)
+
+    # Misma interfaz que arranque.Precarga
+
+    @property
+    def terminada(self) -> bool:
+        return self._listo.is_set()
+
+    def esperar(self, timeout=None) -> bool:
+        """True si el hijo terminó de cargar los módulos antes de `timeout`"""
+        return self._listo.wait(timeout)
+
+    def estado(self) -> str:
+        """Texto de avance para mostrar al usuario"""
+        if self.error:
+            return f"Proceso de cálculo no disponible: {self.error}"
+        if self.terminada:
+            return f"Proceso de cálculo listo ({self.segundos:.1f} s)"
+        actual = self.actual or "módulos"
+        return f"Cargando {actual}... ({self.hechos}/{self.total})"
+
+
+# ====================================
+# PROCESO HIJO
+# ====================================
+
+
+def _servir(pedidos, respuestas, modulos, cancelar):
+    """Carga los módulos y atiende corridas hasta recibir None"""
+    inicio = time.perf_counter()
+    hechos, error = 0, None
+    try:
+        for texto, modulo in modulos:
+            respuestas.put(("avance", hechos, texto))
+            importlib.import_module(modulo)
+            hechos += 1
+        from .ingesta import recordar_sistema
+
+        recordar_sistema()
+    except Exception as e:  # cada corrida volverá a intentar el import
+        error = f"{type(e).__name__}: {e}"
+    respuestas.put(("listo", hechos, time.perf_counter() - inicio, error))
+
+    def log_func(mensaje):
+        respuestas.put(("log", como_evento(mensaje)))
+
+    padre = multiprocessing.parent_process()
+    while True:
+        try:
+            pedido = pedidos.get(timeout=INTERVALO_REVISION_S)
+        except queue.Empty:
+            # La GUI se cerró sin avisar
+            if padre is not None and not padre.is_alive():
+                return
+            continue
+        if pedido is None:
+            return
+        proceso, parametros = pedido
+        try:
+            with cancelable(cancelar):
+                ok, resultado = funcion_proceso(proceso)(
+                    log_func=log_func, **parametros
+                )
+        except Exception as e:
+            ok, resultado = False, f"{type(e).__name__}: {e}"
+        respuestas.put(("fin", ok, resultado))
@@ -0,0 +1,456 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Cola de trabajos para correr muchos municipios en lote
+
+Cada Trabajo nombra un proceso (CAMPO, CAJA o AMBOS), su SISTEMA, su carpeta
+de datos y su carpeta de salida, más las opciones de run_proceso_* (mismos
+nombres de argumento). Un lote es un JSON con la lista de trabajos:
+
+    {"trabajos": [
+        {"proceso": "CAMPO", "nombre": "Tecámac",
+         "sistema_path": "tecamac/SISTEMA.xlsx", "data_dir": "tecamac",
+         "output_dir": "salidas/tecamac", "month_label": "ENERO"}
+    ]}
+
+Las rutas relativas se resuelven desde la carpeta del JSON.
+
+El Planificador corre hasta `workers` trabajos a la vez, cada uno en un
+proceso nuevo (un trabajo que revienta no arrastra a los demás y su pico de
+memoria es sólo suyo). Antes de arrancar un trabajo estima su memoria por el
+tamaño de SISTEMA y sólo lo admite si cabe junto a los que ya corren; la
+estimación se ajusta con los picos que se van observando. Un trabajo que
+falla se vuelve a encolar hasta `reintentos` veces. Cada trabajo deja su log
+en <output_dir>/trabajo_<proceso>.log y sus métricas en el run_metrics.json
+del proceso; el lote completo se resume en un JSON de resultados.
+
+Uso sin interfaz:
+    python -m app_iiwa.trabajos lote.json --workers 2 --memoria-mb 6000
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from . import eventos
+from .constantes import PRESUPUESTO_DEFAULT_MB
+from .eventos import como_evento, formato_archivo
+from .trabajador import PROCESOS, funcion_proceso
+from .utils import memoria_disponible_mb
+
+# Argumentos de run_proceso_* que son rutas
+RUTAS = ("sistema_path", "data_dir", "output_dir", "cache_dir", "historial")
+
+PENDIENTE = "pendiente"
+CORRIENDO = "corriendo"
+COMPLETADO = "completado"
+FALLIDO = "fallido"
+
+REINTENTOS_DEFAULT = 1
+# Fracción de la memoria disponible al iniciar que se reparte entre trabajos
+FRACCION_MEMORIA = 0.8
+# Estimación inicial de memoria de un trabajo: intérprete con pandas más
+# MB_POR_MB_SISTEMA por cada MB del .xlsx (un SISTEMA de 6.6 MB con 60 mil
+# filas llegó a 1.26 GB de pico en CAMPO, por los libros por CP)
+MB_BASE_TRABAJO = 200
+MB_POR_MB_SISTEMA = 200
+MARGEN_ESTIMACION = 1.2
+
+
+class Trabajo:
+    """
+    Una corrida de la cola
+
+    Args:
+        proceso: "CAMPO", "CAJA" o "AMBOS"
+        nombre: para el log (por defecto, el nombre de la carpeta de datos)
+        parametros: resto de argumentos de run_proceso_* (month_label,
+            bajo_memoria, cache_dir...)
+    """
+
+    def __init__(
+        self, proceso, sistema_path, data_dir, output_dir, nombre=None, **parametros
+    ):
+        self.proceso = str(proceso).upper()
+        if self.proceso not in PROCESOS:
+            raise ValueError(f"Proceso desconocido: {proceso}")
+        self.sistema_path = Path(sistema_path)
+        self.data_dir = Path(data_dir)
+        self.output_dir = Path(output_dir)
+        self.nombre = nombre or self.data_dir.resolve().name
+        self.parametros = parametros
+        self.estado = PENDIENTE
+        self.intentos = 0
+        self.segundos = None
+        self.resultado = None
+        self.pico_mb = None
+
+    @property
+    def log_path(self) -> Path:
+        return self.output_dir / f"trabajo_{self.proceso.lower()}.log"
+
+    def argumentos(self) -> dict:
+        """Argumentos de run_proceso_* (sin log_func)"""
+        return dict(
+            sistema_path=self.sistema_path,
+            data_dir=self.data_dir,
+            output_dir=self.output_dir,
+            **self.parametros,
+        )
+
+    def mb_sistema(self) -> float:
+        try:
+            return self.sistema_path.stat().st_size / 1024**2
+        except OSError:
+            return 0.0
+
+    def memoria_estimada_mb(self, mb_por_mb_sistema=MB_POR_MB_SISTEMA) -> float:
+        """Pico de memoria esperado del proceso del trabajo"""
+        if self.parametros.get("bajo_memoria"):
+            presupuesto = self.parametros.get("presupuesto_mb", PRESUPUESTO_DEFAULT_MB)
+            return MB_BASE_TRABAJO + 2 * presupuesto
+        # AMBOS tiene las dos copias de SISTEMA a la vez
+        copias = 2 if self.proceso == "AMBOS" else 1
+        return MB_BASE_TRABAJO + copias * self.mb_sistema() * mb_por_mb_sistema
+
+    def como_dict(self, resultados: bool = False) -> dict:
+        datos = {"proceso": self.proceso, "nombre": self.nombre}
+        for clave, valor in self.argumentos().items():
+            datos[clave] = str(valor) if clave in RUTAS and valor else valor
+        if resultados:
+            datos.update(
+                estado=self.estado,
+                intentos=self.intentos,
+                segundos=None if self.segundos is None else round(self.segundos, 1),
+                pico_mb=None if self.pico_mb is None else round(self.pico_mb, 1),
+                resultado=None if self.resultado is None else str(self.resultado),
+                log=str(self.log_path),
+            )
+        return datos
+
+    @classmethod
+    def desde_dict(cls, datos: dict, base: Path = None) -> "Trabajo":
+        """Trabajo de un dict de lote; las rutas relativas parten de `base`"""
+        datos = dict(datos)
+        for clave in ("estado", "intentos", "segundos", "pico_mb", "resultado", "log"):
+            datos.pop(clave, None)
+        for clave in RUTAS:
+            if datos.get(clave) and base is not None:
+                datos[clave] = Path(base) / datos[clave]
+        return cls(**datos)
+
+    def __repr__(self):
+        return f"Trabajo({self.proceso} {self.nombre}: {self.estado})"
+
+
+def cargar_lote(path: Path) -> list:
+    """Trabajos de un JSON de lote (lista o {"trabajos": [...]})"""
+    path = Path(path).resolve()
+    datos = json.loads(path.read_text(encoding="utf-8"))
+    if isinstance(datos, dict):
+        datos = datos.get("trabajos", [])
+    return [Trabajo.desde_dict(d, path.parent) for d in datos]
+
+
+def guardar_lote(trabajos, path: Path, resultados: bool = False) -> Path:
+    """Escribe el lote (o, con resultados=True, el resumen de la corrida)"""
+    path = Path(path)
+    datos = {"trabajos": [t.como_dict(resultados) for t in trabajos]}
+    path.write_text(
+        json.dumps(datos, indent=2, ensure_ascii=False) + "\n", encoding="utf-8"
+    )
+    return path
+
+
+# ====================================
+# PLANIFICADOR
+# ====================================
+
+
+class Planificador:
+    """
+    Corre una lista de trabajos con admisión por memoria y reintentos
+
+    Args:
+        workers: trabajos que corren a la vez como máximo
+        memoria_mb: memoria que se reparte entre los trabajos; None usa
+            FRACCION_MEMORIA de la disponible al iniciar (sin límite si la
+            plataforma no la expone)
+        reintentos: veces que se vuelve a encolar un trabajo que falla
+        log_func: recibe el avance del lote (el detalle va al log de cada
+            trabajo)
+        al_cambiar: función opcional llamada con el Trabajo cada vez que
+            cambia de estado (la GUI refresca la lista)
+    """
+
+    def __init__(
+        self,
+        trabajos,
+        workers: int = 1,
+        memoria_mb: float = None,
+        reintentos: int = REINTENTOS_DEFAULT,
+        log_func=None,
+        al_cambiar=None,
+    ):
+        self.trabajos = list(trabajos)
+        salidas = [(t.output_dir.resolve(), t.proceso) for t in self.trabajos]
+        if len(set(salidas)) != len(salidas):
+            raise ValueError(
+                "Dos trabajos del mismo proceso escriben en la misma carpeta de salida"
+            )
+        self.workers = max(1, int(workers))
+        if memoria_mb is None:
+            disponible = memoria_disponible_mb()
+            memoria_mb = disponible * FRACCION_MEMORIA if disponible else None
+        self.memoria_mb = memoria_mb
+        self.reintentos = max(0, int(reintentos))
+        self.log_func = log_func or (lambda mensaje: None)
+        self.al_cambiar = al_cambiar
+        self.mb_por_mb_sistema = MB_POR_MB_SISTEMA
+        self._calibrado = False
+        self._detenido = False
+
+    def detener(self):
+        """No admite más trabajos; los que ya corren terminan"""
+        self._detenido = True
+
+    def ejecutar(self) -> bool:
+        """Corre los trabajos no completados; True si todos terminaron bien"""
+        pendientes = deque(t for t in self.trabajos if t.estado != COMPLETADO)
+        for trabajo in pendientes:
+            trabajo.estado = PENDIENTE
+        total = len(pendientes)
+        limite = (
+            "sin límite de memoria"
+            if self.memoria_mb is None
+            else f"hasta {self.memoria_mb:,.0f} MB"
+        )
+        eventos.seccion(
+            self.log_func,
+            f"=== COLA DE TRABAJOS: {total} trabajos, {self.workers} a la vez, {limite} ===",
+        )
+        inicio = time.perf_counter()
+        corriendo = {}
+        # Pool actual y los futuros que le pertenecen
+        pool, del_pool = None, set()
+        try:
+            while pendientes or corriendo:
+                while len(corriendo) < self.workers and not self._detenido:
+                    trabajo = self._admitir(pendientes, corriendo)
+                    if trabajo is None:
+                        break
+                    if pool is None:
+                        pool, del_pool = _pool(self.workers), set()
+                    del_pool.add(self._arrancar(trabajo, pool, corriendo))
+                if not corriendo:
+                    break  # detenido con trabajos pendientes
+
+                hechos, _ = wait(corriendo, return_when=FIRST_COMPLETED)
+                for futuro in hechos:
+                    trabajo = corriendo.pop(futuro)
+                    try:
+                        ok, resultado, segundos, pico = futuro.result()
+                    except BrokenProcessPool:
+                        # Un proceso murió (p. ej. sin memoria): el pool queda
+                        # inservible para todos los que corrían en él
+                        if futuro in del_pool:
+                            pool.shutdown(wait=False)
+                            pool, del_pool = None, set()
+                        ok, resultado, segundos, pico = (
+                            False,
+                            "El proceso del trabajo terminó inesperadamente",
+                            None,
+                            None,
+                        )
+                    except Exception as e:
+                        ok, resultado, segundos, pico = (
+                            False,
+                            f"{type(e).__name__}: {e}",
+                            None,
+                            None,
+                        )
+                    self._terminar(trabajo, ok, resultado, segundos, pico, pendientes)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+        completados = sum(t.estado == COMPLETADO for t in self.trabajos)
+        nivel = eventos.exito if completados == len(self.trabajos) else eventos.aviso
+        nivel(
+            self.log_func,
+            f"Cola terminada en {time.perf_counter() - inicio:.1f} s: "
+            f"{completados}/{len(self.trabajos)} trabajos completados",
+        )
+        for trabajo in self.trabajos:
+            if trabajo.estado != COMPLETADO:
+                self.log_func(
+                    f"  {trabajo.nombre} ({trabajo.proceso}): {trabajo.estado}"
+                )
+        return completados == len(self.trabajos)
+
+    def _admitir(self, pendientes: deque, corriendo: dict):
+        """Primer pendiente que cabe en la memoria libre (o None)"""
+        en_uso = sum(self._estimacion(t) for t in corriendo.values())
+        for trabajo in pendientes:
+            estimada = self._estimacion(trabajo)
+            if not corriendo:
+                if self.memoria_mb is not None and estimada > self.memoria_mb:
+                    eventos.aviso(
+                        self.log_func,
+                        f"{trabajo.nombre}: se estiman {estimada:,.0f} MB, más que "
+                        f"el límite; corre solo (considera el modo bajo memoria)",
+                    )
+            elif self.memoria_mb is not None and en_uso + estimada > self.memoria_mb:
+                continue
+            pendientes.remove(trabajo)
+            return trabajo
+        return None
+
+    def _estimacion(self, trabajo: Trabajo) -> float:
+        return trabajo.memoria_estimada_mb(self.mb_por_mb_sistema)
+
+    def _arrancar(self, trabajo: Trabajo, pool, corriendo: dict):
+        trabajo.intentos += 1
+        trabajo.estado = CORRIENDO
+        futuro = pool.submit(
+            _correr_trabajo,
+            trabajo.proceso,
+            trabajo.argumentos(),
+            str(trabajo.log_path),
+            trabajo.intentos,
+        )
+        corriendo[futuro] = trabajo
+        intento = f", intento {trabajo.intentos}" if trabajo.intentos > 1 else ""
+        self.log_func(
+            f"▶ {trabajo.nombre} ({trabajo.proceso}{intento}): iniciado, "
+            f"~{self._estimacion(trabajo):,.0f} MB estimados"
+        )
+        self._avisar(trabajo)
+        return futuro
+
+    def _terminar(self, trabajo, ok, resultado, segundos, pico, pendientes):
+        trabajo.resultado = resultado
+        trabajo.segundos = segundos
+        trabajo.pico_mb = pico
+        if ok:
+            trabajo.estado = COMPLETADO
+            self._calibrar(trabajo)
+            eventos.exito(
+                self.log_func,
+                f"✔ {trabajo.nombre} ({trabajo.proceso}): completado en "
+                f"{segundos:.1f} s -> {resultado}",
+            )
+        elif trabajo.intentos <= self.reintentos:
+            trabajo.estado = PENDIENTE
+            pendientes.append(trabajo)
+            eventos.aviso(
+                self.log_func,
+                f"{trabajo.nombre} ({trabajo.proceso}): falló ({resultado}); "
+                f"se reintentará",
+            )
+        else:
+            trabajo.estado = FALLIDO
+            eventos.error(
+                self.log_func,
+                f"✖ {trabajo.nombre} ({trabajo.proceso}): {resultado} "
+                f"(log: {trabajo.log_path})",
+            )
+        self._avisar(trabajo)
+
+    def _calibrar(self, trabajo: Trabajo):
+        """Ajusta MB por MB de SISTEMA con el pico observado del trabajo"""
+        mb = trabajo.mb_sistema()
+        if trabajo.pico_mb is None or mb <= 0 or trabajo.parametros.get("bajo_memoria"):
+            return
+        copias = 2 if trabajo.proceso == "AMBOS" else 1
+        observado = (
+            max(trabajo.pico_mb - MB_BASE_TRABAJO, 0)
+            / (mb * copias)
+            * MARGEN_ESTIMACION
+        )
+        # La primera observación reemplaza al valor inicial; luego, el mayor
+        if self._calibrado:
+            self.mb_por_mb_sistema = max(self.mb_por_mb_sistema, observado)
+        else:
+            self.mb_por_mb_sistema = observado
+            self._calibrado = True
+
+    def _avisar(self, trabajo: Trabajo):
+        if self.al_cambiar:
+            self.al_cambiar(trabajo)
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    # Un proceso nuevo por trabajo: aísla fallas y el pico de RSS es suyo
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        max_tasks_per_child=1,
+    )
+
+
+def _correr_trabajo(proceso: str, argumentos: dict, log_path: str, intento: int):
+    """En el proceso del trabajo: (ok, resultado, segundos, pico de RSS en MB)"""
+    from .metricas import pico_rss_mb
+
+    log_path = Path(log_path)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    inicio = time.perf_counter()
+    with open(log_path, "a", encoding="utf-8") as archivo:
+
+        def log_func(mensaje):
+            archivo.write(formato_archivo(como_evento(mensaje)) + "\n")
+
+        eventos.seccion(log_func, f"=== TRABAJO {proceso}: intento {intento} ===")
+        try:
+            ok, resultado = funcion_proceso(proceso)(log_func=log_func, **argumentos)
+        except Exception as e:
+            ok, resultado = False, f"{type(e).__name__}: {e}"
+        if not ok:
+            eventos.error(log_func, str(resultado))
+    return ok, str(resultado), time.perf_counter() - inicio, pico_rss_mb()
+
+
+# ====================================
+# LÍNEA DE COMANDOS
+# ====================================
+
+
+def main(argv=None):
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(
+        prog="app_iiwa.trabajos", description="Corre un lote de trabajos"
+    )
+    parser.add_argument("lote", type=Path, help="JSON con la lista de trabajos")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--memoria-mb", type=float, help="memoria para los trabajos")
+    parser.add_argument("--reintentos", type=int, default=REINTENTOS_DEFAULT)
+    parser.add_argument(
+        "--resultados", type=Path, help="JSON de resultados (junto al lote)"
+    )
+    args = parser.parse_args(argv)
+
+    trabajos = cargar_lote(args.lote)
+    planificador = Planificador(
+        trabajos,
+        workers=args.workers,
+        memoria_mb=args.memoria_mb,
+        reintentos=args.reintentos,
+        log_func=eventos.consola(stream=sys.stdout),
+    )
+    ok = planificador.ejecutar()
+    destino = args.resultados or args.lote.with_suffix(".resultados.json")
+    guardar_lote(trabajos, destino, resultados=True)
+    print(f"Resultados en {destino}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Utilidades comunes de App IIWA (rutas y carpetas del sistema)
+"""
+
+import os
+import platform
+import re
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+from .constantes import ARCHIVO_HISTORIAL
+
+# Archivos de historial del log que se conservan en get_log_dir()
+LOGS_CONSERVADOS = 20
+
+# ====================================
+# UTILIDADES COMUNES
+# ====================================
+
+
+def get_desktop_dir() -> Path:
+    """Obtiene la ruta del escritorio independiente del SO"""
+    system = platform.system()
+    home = Path.home()
+
+    if system == "Windows":
+        try:
+            from ctypes import create_unicode_buffer, windll, wintypes
+
+            CSIDL_DESKTOPDIRECTORY = 0x10
+            SHGFP_TYPE_CURRENT = 0
+            buf = create_unicode_buffer(wintypes.MAX_PATH)
+            windll.shell32.SHGetFolderPathW(
+                None, CSIDL_DESKTOPDIRECTORY, None, SHGFP_TYPE_CURRENT, buf
+            )
+            p = Path(buf.value)
+            if p.exists():
+                return p
+        except Exception:
+            pass
+        return home / "Desktop"
+
+    if system == "Darwin":
+        return home / "Desktop"
+
+    # Linux / Unix
+    try:
+        out = subprocess.run(
+            ["xdg-user-dir", "DESKTOP"], capture_output=True, text=True, check=True
+        )
+        p = Path(out.stdout.strip())
+        if str(p) and p.exists():
+            return p
+    except Exception:
+        pass
+
+    cfg = home / ".config" / "user-dirs.dirs"
+    if cfg.exists():
+        try:
+            txt = cfg.read_text(encoding="utf-8", errors="ignore")
+            m = re.search(r'XDG_DESKTOP_DIR="?(.+?)\"?$', txt, re.M)
+            if m:
+                path = m.group(1).replace("$HOME", str(home))
+                p = Path(path)
+                if p.exists():
+                    return p
+        except Exception:
+            pass
+
+    return home / "Desktop"
+
+
+def get_log_dir() -> Path:
+    """Carpeta con el historial completo del log de cada sesión"""
+    return Path.home() / ".app_iiwa" / "logs"
+
+
+def get_historial_path() -> Path:
+    """Base del historial de cuentas que alimentan las corridas de la GUI"""
+    return Path.home() / ".app_iiwa" / ARCHIVO_HISTORIAL
+
+
+def session_log_path(log_dir: Path = None, keep: int = LOGS_CONSERVADOS) -> Path:
+    """
+    Ruta del archivo de log de una sesión nueva
+
+    Borra los más viejos para que queden a lo más `keep` contando el nuevo.
+    """
+    log_dir = Path(log_dir) if log_dir else get_log_dir()
+    log_dir.mkdir(parents=True, exist_ok=True)
+    previos = sorted(log_dir.glob("app_iiwa_*.log"))
+    for viejo in previos[: max(0, len(previos) - keep + 1)]:
+        try:
+            viejo.unlink()
+        except OSError:
+            pass
+    return log_dir / f"app_iiwa_{datetime.now():%Y%m%d_%H%M%S}.log"
+
+
+def memoria_disponible_mb():
+    """Memoria física disponible en MB (None si no se puede saber)"""
+    if platform.system() == "Windows":
+        try:
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [
+                    ("dwLength", ctypes.c_ulong),
+                    ("dwMemoryLoad", ctypes.c_ulong),
+                    ("ullTotalPhys", ctypes.c_ulonglong),
+                    ("ullAvailPhys", ctypes.c_ulonglong),
+                    ("ullTotalPageFile", ctypes.c_ulonglong),
+                    ("ullAvailPageFile", ctypes.c_ulonglong),
+                    ("ullTotalVirtual", ctypes.c_ulonglong),
+                    ("ullAvailVirtual", ctypes.c_ulonglong),
+                    ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+                ]
+
+            estado = MEMORYSTATUSEX()
+            estado.dwLength = ctypes.sizeof(estado)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(estado)):
+                return estado.ullAvailPhys / 1024**2
+        except Exception:
+            pass
+        return None
+
+    try:
+        with open("/proc/meminfo", encoding="ascii") as f:
+            for linea in f:
+                if linea.startswith("MemAvailable:"):
+                    return int(linea.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def ensure_dirs(*dirs):
+    """Crea directorios si no existen"""
+    for dir_path in dirs:
+        Path(dir_path).mkdir(parents=True, exist_ok=True)
+
+
+def open_folder(path):
+    """Abre una carpeta en el explorador del sistema"""
+    system = platform.system()
+    try:
+        if system == "Darwin":
+            os.system(f'open "{path}"')
+        elif system == "Windows":
+            os.system(f'explorer "{path}"')
+        else:
+            os.system(f'xdg-open "{path}"')
+    except Exception as e:
+        print(f"Error abriendo carpeta: {e}")
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Modo vigilancia: procesa automáticamente los SISTEMA que llegan a una carpeta
+
+Las exportaciones del sistema de cobro llegan a una carpeta compartida a
+cualquier hora. Vigilante revisa los archivos de entrada de cada trabajo
+(SISTEMA y LISTA C.P. para CAMPO; SISTEMA, REGISTROS y FOLIOS para CAJA) y,
+cuando uno aparece o cambia y ya se asentó, corre el proceso.
+
+Un archivo está asentado cuando su tamaño y fecha de modificación no cambian
+durante `espera_s` segundos, se puede abrir y, si es .xlsx, ya tiene el
+directorio final del zip (un libro a medio copiar no lo tiene).
+
+La revisión es por sondeo: un os.stat por archivo vigilado cada `intervalo_s`
+segundos, así que en reposo el CPU es prácticamente cero y funciona igual en
+carpetas de red, donde las notificaciones del sistema de archivos no son
+confiables.
+
+Las corridas son en este mismo proceso, con la copia en memoria del último
+SISTEMA (ingesta.recordar_sistema) y la caché de etapas en
+<output_dir>/.cache_iiwa: si sólo cambió REGISTROS.csv, SISTEMA no se vuelve a
+leer ni a agregar. Las huellas de lo ya procesado quedan en
+<output_dir>/.vigilancia.json, así que reiniciar la vigilancia no repite
+corridas.
+
+Uso:
+    python -m app_iiwa.vigilancia --proceso CAMPO --datos carpeta --salida reportes
+    python -m app_iiwa.vigilancia lote.json --intervalo 5 --espera 30
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+from . import eventos
+from .constantes import CARPETA_CACHE
+from .trabajos import Trabajo, _correr_trabajo, cargar_lote
+
+INTERVALO_DEFAULT_S = 5
+ESPERA_DEFAULT_S = 30
+ARCHIVO_ESTADO = ".vigilancia.json"
+
+# Archivos de la carpeta de datos que usa cada proceso: (requeridos, opcionales)
+ENTRADAS = {
+    "CAMPO": (("LISTA C.P..xlsx",), ()),
+    "CAJA": ((), ("REGISTROS.csv", "FOLIOS.csv")),
+    "AMBOS": (("LISTA C.P..xlsx",), ("REGISTROS.csv", "FOLIOS.csv")),
+}
+
+
+def _firma(path: Path):
+    """(tamaño, mtime_ns) o None si no existe"""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _legible(path: Path) -> bool:
+    """Se puede abrir y, si es .xlsx, el zip está completo"""
+    try:
+        if path.suffix.lower() == ".xlsx":
+            return zipfile.is_zipfile(path)
+        with open(path, "rb"):
+            return True
+    except OSError:
+        return False
+
+
+class Vigilante:
+    """
+    Vigila las entradas de una lista de trabajos y los corre al cambiar
+
+    Args:
+        trabajos: trabajos.Trabajo a vigilar (sin cache_dir se usa
+            <output_dir>/.cache_iiwa)
+        intervalo_s: segundos entre revisiones
+        espera_s: segundos que un archivo debe quedar sin cambios
+        log_func: avance de la vigilancia; el detalle de cada corrida va al
+            log del trabajo (<output_dir>/trabajo_<proceso>.log)
+    """
+
+    def __init__(
+        self,
+        trabajos,
+        intervalo_s: float = INTERVALO_DEFAULT_S,
+        espera_s: float = ESPERA_DEFAULT_S,
+        log_func=None,
+    ):
+        self.trabajos = list(trabajos)
+        for trabajo in self.trabajos:
+            trabajo.parametros.setdefault(
+                "cache_dir", trabajo.output_dir / CARPETA_CACHE
+            )
+        self.intervalo_s = intervalo_s
+        self.espera_s = espera_s
+        self.log_func = log_func or (lambda mensaje: None)
+        self.corridas = 0
+        # {ruta: (firma, desde cuándo no cambia)}
+        self._vistos = {}
+        self._detener = threading.Event()
+
+    def archivos(self, trabajo: Trabajo):
+        """(requeridos, opcionales) que se vigilan para `trabajo`"""
+        requeridos, opcionales = ENTRADAS[trabajo.proceso]
+        return (
+            [trabajo.sistema_path, *(trabajo.data_dir / n for n in requeridos)],
+            [trabajo.data_dir / n for n in opcionales],
+        )
+
+    def revisar(self, ahora: float = None) -> list:
+        """
+        Una pasada: corre los trabajos cuyas entradas cambiaron y se asentaron
+
+        Returns:
+            trabajos que se corrieron en esta pasada
+        """
+        ahora = time.monotonic() if ahora is None else ahora
+        corridos = []
+        for trabajo in self.trabajos:
+            firmas = self._firmas_asentadas(trabajo, ahora)
+            if firmas is None or firmas == self._procesadas(trabajo):
+                continue
+            self._correr(trabajo, firmas)
+            corridos.append(trabajo)
+        return corridos
+
+    def _firmas_asentadas(self, trabajo: Trabajo, ahora: float):
+        """Firmas de las entradas si todas están asentadas; si no, None"""
+        requeridos, opcionales = self.archivos(trabajo)
+        firmas = {}
+        asentadas = True
+        for path in requeridos + opcionales:
+            firma = _firma(path)
+            anterior = self._vistos.get(path)
+            if anterior is None or anterior[0] != firma:
+                self._vistos[path] = (firma, ahora)
+                anterior = self._vistos[path]
+            if firma is None:
+                if path in requeridos:
+                    asentadas = False
+            elif ahora - anterior[1] < self.espera_s or not _legible(path):
+                asentadas = False
+            firmas[str(path)] = firma
+        return firmas if asentadas else None
+
+    def _correr(self, trabajo: Trabajo, firmas: dict):
+        cambios = [
+            Path(path).name
+            for path, firma in firmas.items()
+            if self._procesadas(trabajo).get(path) != firma
+        ]
+        eventos.seccion(
+            self.log_func,
+            f"{trabajo.nombre} ({trabajo.proceso}): cambió {', '.join(cambios)}",
+        )
+        trabajo.intentos += 1
+        ok, resultado, segundos, _ = _correr_trabajo(
+            trabajo.proceso,
+            trabajo.argumentos(),
+            str(trabajo.log_path),
+            trabajo.intentos,
+        )
+        self.corridas += 1
+        trabajo.resultado, trabajo.segundos = resultado, segundos
+        if ok:
+            eventos.exito(
+                self.log_func,
+                f"{trabajo.nombre} ({trabajo.proceso}): completado en "
+                f"{segundos:.1f} s -> {resultado}",
+            )
+        else:
+            # No se reintenta con los mismos archivos: se espera otro cambio
+            eventos.error(
+                self.log_func,
+                f"{trabajo.nombre} ({trabajo.proceso}): {resultado} "
+                f"(log: {trabajo.log_path})",
+            )
+        self._guardar_procesadas(trabajo, firmas)
+
+    # Huellas de lo ya procesado, en la carpeta de salida de cada trabajo
+
+    @staticmethod
+    def _ruta_estado(trabajo: Trabajo) -> Path:
+        return trabajo.output_dir / ARCHIVO_ESTADO
+
+    def _leer_estado(self, trabajo: Trabajo) -> dict:
+        try:
+            return json.loads(self._ruta_estado(trabajo).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _procesadas(self, trabajo: Trabajo) -> dict:
+        return self._leer_estado(trabajo).get(trabajo.proceso, {})
+
+    def _guardar_procesadas(self, trabajo: Trabajo, firmas: dict):
+        estado = self._leer_estado(trabajo)
+        estado[trabajo.proceso] = firmas
+        try:
+            trabajo.output_dir.mkdir(parents=True, exist_ok=True)
+            self._ruta_estado(trabajo).write_text(
+                json.dumps(estado, indent=2, ensure_ascii=False) + "\n",
+                encoding="utf-8",
+            )
+        except OSError as e:
+            eventos.aviso(self.log_func, f"No se pudo guardar {ARCHIVO_ESTADO}: {e}")
+
+    def vigilar(self):
+        """Revisa cada intervalo_s hasta que se llame a detener()"""
+        from .ingesta import recordar_sistema
+
+        recordar_sistema()
+        carpetas = sorted({str(t.data_dir) for t in self.trabajos})
+        eventos.seccion(
+            self.log_func,
+            f"=== VIGILANDO {len(carpetas)} carpetas cada {self.intervalo_s:g} s "
+            f"(espera {self.espera_s:g} s) ===",
+        )
+        for carpeta in carpetas:
+            self.log_func(f"  {carpeta}")
+        while not self._detener.is_set():
+            self.revisar()
+            self._detener.wait(self.intervalo_s)
+
+    def detener(self):
+        self._detener.set()
+
+
+# ====================================
+# LÍNEA DE COMANDOS
+# ====================================
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="app_iiwa.vigilancia",
+        description="Procesa automáticamente los archivos nuevos de SISTEMA",
+    )
+    parser.add_argument("lote", type=Path, nargs="?", help="JSON de trabajos")
+    parser.add_argument("--proceso", choices=sorted(ENTRADAS), default="CAMPO")
+    parser.add_argument("--datos", type=Path, help="carpeta de datos a vigilar")
+    parser.add_argument("--salida", type=Path, help="carpeta de reportes")
+    parser.add_argument("--sistema", type=Path, help="por defecto datos/SISTEMA.xlsx")
+    parser.add_argument("--intervalo", type=float, default=INTERVALO_DEFAULT_S)
+    parser.add_argument("--espera", type=float, default=ESPERA_DEFAULT_S)
+    args = parser.parse_args(argv)
+
+    if args.lote:
+        trabajos = cargar_lote(args.lote)
+    elif args.datos and args.salida:
+        trabajos = [
+            Trabajo(
+                args.proceso,
+                args.sistema or args.datos / "SISTEMA.xlsx",
+                args.datos,
+                args.salida,
+            )
+        ]
+    else:
+        parser.error("indica un lote o --datos y --salida")
+
+    vigilante = Vigilante(
+        trabajos,
+        intervalo_s=args.intervalo,
+        espera_s=args.espera,
+        log_func=eventos.consola(stream=sys.stdout),
+    )
+    try:
+        vigilante.vigilar()
+    except KeyboardInterrupt:
+        print("Vigilancia detenida")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests del proceso AMBOS (CAMPO y CAJA a la vez)
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa import sintetico  # noqa: E402
+from app_iiwa.ambos import run_proceso_ambos  # noqa: E402
+from app_iiwa.caja import run_proceso_caja  # noqa: E402
+from app_iiwa.campo import run_proceso_campo  # noqa: E402
+
+from .test_bajo_memoria import _comparar_salidas  # noqa: E402
+
+
+def _sistema_comun(n=400) -> pd.DataFrame:
+    """SISTEMA con las columnas de CAMPO y las de CAJA"""
+    caja = sintetico.padron_caja(n, 4)
+    campo = sintetico.padron_campo(n, 4).drop(
+        columns=list(caja.columns), errors="ignore"
+    )
+    return pd.concat([caja, campo], axis=1)
+
+
+def test_ambos_equivale_a_correrlos_por_separado(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    _sistema_comun().to_excel(data_dir / "SISTEMA.xlsx", index=False)
+    sintetico.lista_cp(4).to_excel(data_dir / "LISTA C.P..xlsx", index=False)
+    sistema = data_dir / "SISTEMA.xlsx"
+
+    for funcion in (run_proceso_campo, run_proceso_caja):
+        ok, salida = funcion(sistema, data_dir, tmp_path / "separado", lambda m: None)
+        assert ok, salida
+
+    mensajes = []
+    ok, resumen = run_proceso_ambos(
+        sistema, data_dir, tmp_path / "ambos", mensajes.append
+    )
+    assert ok, resumen
+    assert resumen.splitlines() == [
+        f"CAMPO: {tmp_path / 'ambos' / 'campo_output'}",
+        f"CAJA: {tmp_path / 'ambos' / 'caja_output'}",
+    ]
+    for carpeta in ("campo_output", "caja_output"):
+        _comparar_salidas(tmp_path / "separado" / carpeta, tmp_path / "ambos" / carpeta)
+
+    # SISTEMA se leyó una vez; los mensajes llevan el proceso que los emitió
+    assert sum("copia en memoria" in m for m in mensajes) == 1
+    assert sum(m.startswith("[CAMPO] Leyendo:") for m in mensajes) == 1
+    assert sum(m.startswith("[CAJA] Leyendo:") for m in mensajes) == 1
+    assert mensajes[-1].startswith("  Total:")
+
+    # Las métricas de cada proceso sólo tienen sus propias etapas
+    for carpeta, pipeline in (("campo_output", "campo"), ("caja_output", "caja")):
+        metricas = json.loads(
+            (tmp_path / "ambos" / carpeta / "run_metrics.json").read_text()
+        )
+        assert {e["pipeline"] for e in metricas["etapas"]} == {pipeline}
+
+
+def test_ambos_sigue_si_uno_falla(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    sintetico.padron_caja(200, 4).to_excel(data_dir / "SISTEMA.xlsx", index=False)
+
+    mensajes = []
+    ok, resumen = run_proceso_ambos(
+        data_dir / "SISTEMA.xlsx", data_dir, tmp_path / "salida", mensajes.append
+    )
+    assert not ok
+    campo, caja = resumen.splitlines()
+    assert campo.startswith("CAMPO: Falta LISTA C.P..xlsx")
+    assert caja == f"CAJA: {tmp_path / 'salida' / 'caja_output'}"
+    assert any(m.startswith("  CAMPO: falló") for m in mensajes)
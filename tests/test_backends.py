@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests de equivalencia entre backends de cómputo de CAMPO
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa import sintetico  # noqa: E402
+from app_iiwa.backends import base_macro, calcular_tablas_campo  # noqa: E402
+from app_iiwa.campo import mayores_adeudos  # noqa: E402
+from app_iiwa.paralelo import particion_por_cp  # noqa: E402
+
+
+def padron_sintetico(n_filas=2000, n_cps=25, seed=0, enteros=False):
+    """Padrón SISTEMA determinista con duplicados, nulos y años mezclados"""
+    return sintetico.padron_campo(n_filas, n_cps, seed, enteros)
+
+
+def _comparar_tablas(esperado, obtenido):
+    for clave in ["df", "cp", "duplicados", "t_consumo", "t_conexion", "veinte_25"]:
+        pd.testing.assert_frame_equal(esperado[clave], obtenido[clave], obj=clave)
+    pd.testing.assert_frame_equal(
+        esperado["reporte_macro_base"], obtenido["reporte_macro_base"]
+    )
+    assert esperado["codigos_postales"] == obtenido["codigos_postales"]
+    for nombre in ["df_cps", "df_completos_cps"]:
+        assert list(esperado[nombre]) == list(obtenido[nombre])
+        for cp in esperado[nombre]:
+            pd.testing.assert_frame_equal(
+                esperado[nombre][cp], obtenido[nombre][cp], obj=f"{nombre}[{cp}]"
+            )
+
+
+@pytest.mark.parametrize(
+    "n_filas,n_cps,enteros", [(500, 5, True), (3000, 40, False), (20000, 120, False)]
+)
+def test_polars_equivale_a_pandas(n_filas, n_cps, enteros):
+    """El backend polars produce exactamente las mismas tablas que pandas"""
+    pytest.importorskip("polars")
+    pytest.importorskip("pyarrow")
+
+    df = padron_sintetico(n_filas, n_cps, enteros=enteros)
+    esperado = calcular_tablas_campo(df.copy(), backend="pandas")
+    avisos = []
+    obtenido = calcular_tablas_campo(
+        df.copy(), backend="polars", log_func=avisos.append
+    )
+    assert avisos == []  # sin recaer en pandas
+    _comparar_tablas(esperado, obtenido)
+
+
+def test_backend_desconocido():
+    """Un backend inválido se rechaza explícitamente"""
+    with pytest.raises(ValueError):
+        calcular_tablas_campo(padron_sintetico(10, 2), backend="spark")
+
+
+@pytest.mark.parametrize("montos", ["flotantes", "enteros", "mixtos"])
+@pytest.mark.parametrize("backend", ["pandas", "polars"])
+def test_por_cp_paralelo_equivale_a_serial(backend, montos):
+    """El cómputo por CP en memoria compartida coincide con el serial"""
+    if backend == "polars":
+        pytest.importorskip("polars")
+        pytest.importorskip("pyarrow")
+
+    df = padron_sintetico(5000, 30, enteros=montos != "flotantes")
+    if montos == "mixtos":
+        # agua y drenaje quedan enteros; recargos y Total pasan a flotante
+        df["recargosagua"] = df["recargosagua"] + 0.5
+        df["iva"] = df["iva"].astype(float)
+    esperado = calcular_tablas_campo(df.copy(), backend="pandas")
+    avisos = []
+    obtenido = calcular_tablas_campo(
+        df.copy(), backend=backend, log_func=avisos.append, workers=2
+    )
+    assert avisos == []
+    _comparar_tablas(esperado, obtenido)
+
+
+def test_particion_por_cp_conserva_orden():
+    """La partición equivale a filtrar por CP conservando el orden de filas"""
+    df = padron_sintetico(1000, 8)
+    cps = sorted(df["CodigoPostal"].unique().tolist())
+    particion = particion_por_cp(df["CodigoPostal"], cps)
+    for cp in cps:
+        pd.testing.assert_frame_equal(
+            df.iloc[particion[cp]], df.loc[df["CodigoPostal"] == cp]
+        )
+
+
+@pytest.mark.parametrize("n", [10, 10_000])
+def test_mayores_adeudos_equivale_a_ordenar(n):
+    """argpartition en el segmento de cada CP da las cuentas de ordenarlo completo"""
+    base = base_macro(padron_sintetico(2000, 5)).dropna(subset=["NumerodeCuenta"])
+    cps = sorted(base["CodigoPostal"].unique().tolist())
+    particion = particion_por_cp(base["CodigoPostal"], cps)
+
+    for cp in cps:
+        segmento = base.iloc[particion[cp]]
+        obtenido = mayores_adeudos(segmento, n)
+        esperado = (
+            segmento["total"].fillna(0).groupby(segmento["NumerodeCuenta"]).sum()
+        ).nlargest(n)
+        assert obtenido["Prioridad"].tolist() == list(range(1, len(esperado) + 1))
+        assert np.allclose(obtenido["total"], esperado.to_numpy())
+        assert set(obtenido["NumerodeCuenta"]) == set(esperado.index)
+        assert obtenido["filas"].sum() <= len(segmento)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Tests del modo de bajo consumo de memoria (procesamiento por bloques)
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa import huellas, ingesta, sintetico  # noqa: E402
+from app_iiwa.bajo_memoria import ConteoUnico  # noqa: E402
+from app_iiwa.caja import run_proceso_caja  # noqa: E402
+from app_iiwa.campo import run_proceso_campo  # noqa: E402
+
+from .test_backends import padron_sintetico  # noqa: E402
+
+
+def _valores_libro(path: Path) -> dict:
+    """Valores de todas las hojas de un libro, sin celdas vacías al final"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True)
+    hojas = {}
+    for ws in wb.worksheets:
+        filas = []
+        for fila in ws.iter_rows(values_only=True):
+            fila = list(fila)
+            while fila and fila[-1] is None:
+                fila.pop()
+            filas.append(fila)
+        while filas and not filas[-1]:
+            filas.pop()
+        hojas[ws.title] = filas
+    wb.close()
+    return hojas
+
+
+def _comparar_salidas(esperado: Path, obtenido: Path):
+    # Las sumas por bloques pueden diferir en el último dígito
+    assert huellas.comparar_carpetas(esperado, obtenido, tolerancia=1e-9) == []
+
+
+@pytest.fixture
+def bloques_chicos(monkeypatch):
+    """Fuerza bloques de pocas filas para recorrer varios bloques"""
+    monkeypatch.setattr(ingesta, "FILAS_SONDEO", 150)
+
+
+def test_bloques_equivalen_a_read_excel(tmp_path):
+    """Leer por bloques reconstruye el mismo DataFrame que read_excel"""
+    ruta = tmp_path / "SISTEMA.xlsx"
+    padron_sintetico(700, 6).to_excel(ruta, index=False)
+
+    bloques = list(ingesta.iterar_bloques_excel(ruta, filas_por_bloque=97))
+    assert len(bloques) == 8
+    pd.testing.assert_frame_equal(
+        pd.concat(bloques), pd.read_excel(ruta, engine="openpyxl"), check_dtype=False
+    )
+
+
+def test_conteo_unico_por_bloques():
+    """Los conteos acumulados por bloques coinciden con groupby().nunique()"""
+    df = padron_sintetico(3000, 10)
+    conteo = ConteoUnico(umbral=500)
+    for inicio in range(0, len(df), 400):
+        bloque = df.iloc[inicio : inicio + 400]
+        conteo.agregar(
+            [bloque["CodigoPostal"], bloque["TipoConexion"]], bloque["NumerodeCuenta"]
+        )
+
+    esperado = df.groupby(["CodigoPostal", "TipoConexion"])["NumerodeCuenta"].nunique()
+    assert conteo.conteos() == {(int(cp), t): n for (cp, t), n in esperado.items()}
+
+
+def test_conteo_unico_en_cubetas_de_disco(tmp_path):
+    """Repartir los hashes en cubetas en disco no cambia los conteos"""
+    df = padron_sintetico(3000, 10)
+    en_memoria = ConteoUnico(umbral=500)
+    en_disco = ConteoUnico(umbral=500, directorio=tmp_path, n_cubetas=7)
+    for inicio in range(0, len(df), 400):
+        bloque = df.iloc[inicio : inicio + 400]
+        for conteo in (en_memoria, en_disco):
+            conteo.agregar(bloque["TipoConexion"], bloque["NumerodeCuenta"])
+
+    assert en_disco.conteos() == en_memoria.conteos()
+    assert len(list(tmp_path.glob(".cubetas_*/cubeta_*.bin"))) == 7
+
+
+def test_campo_bajo_memoria_equivale(tmp_path, bloques_chicos):
+    """CAMPO por bloques genera los mismos reportes que en memoria"""
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    padron_sintetico(900, 6).to_excel(data_dir / "SISTEMA.xlsx", index=False)
+    pd.DataFrame({"CP": [50000, 50007], "COLONIA": ["A", "B"]}).to_excel(
+        data_dir / "LISTA C.P..xlsx", index=False
+    )
+
+    resultados = {}
+    for modo, bajo_memoria in [("normal", False), ("bloques", True)]:
+        ok, salida = run_proceso_campo(
+            data_dir / "SISTEMA.xlsx",
+            data_dir,
+            tmp_path / modo,
+            lambda m: None,
+            bajo_memoria=bajo_memoria,
+            presupuesto_mb=1,
+        )
+        assert ok, salida
+        resultados[modo] = salida
+
+    _comparar_salidas(resultados["normal"], resultados["bloques"])
+
+
+def padron_caja_sintetico(n=800, seed=1) -> pd.DataFrame:
+    """SISTEMA de pagos con las columnas que usa CAJA"""
+    return sintetico.padron_caja(n, 8, seed)
+
+
+def test_caja_bajo_memoria_equivale(tmp_path, bloques_chicos):
+    """CAJA por bloques genera el mismo reporte que en memoria"""
+    df = padron_caja_sintetico()
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    df.to_excel(data_dir / "SISTEMA.xlsx", index=False)
+
+    resultados = {}
+    for modo, bajo_memoria in [("normal", False), ("bloques", True)]:
+        ok, salida = run_proceso_caja(
+            data_dir / "SISTEMA.xlsx",
+            data_dir,
+            tmp_path / modo,
+            lambda m: None,
+            bajo_memoria=bajo_memoria,
+            presupuesto_mb=1,
+        )
+        assert ok, salida
+        resultados[modo] = salida
+
+    _comparar_salidas(resultados["normal"], resultados["bloques"])
+
+
+def test_campo_bajo_memoria_nulos_en_algunos_bloques(tmp_path, bloques_chicos):
+    """Derivada con nulos sólo en un bloque arma las mismas cuentas que en memoria"""
+    df = padron_sintetico(900, 6)
+    cuenta = df.pop("NumerodeCuenta").str.split("-", expand=True)
+    df["Principal"] = cuenta[0].astype(int)
+    df["Derivada"] = cuenta[1].astype(float)
+    df.loc[700:720, "Derivada"] = np.nan  # sólo en el último bloque
+
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    df.to_excel(data_dir / "SISTEMA.xlsx", index=False)
+    pd.DataFrame({"CP": [50000]}).to_excel(data_dir / "LISTA C.P..xlsx", index=False)
+
+    resultados = {}
+    for modo, bajo_memoria in [("normal", False), ("bloques", True)]:
+        ok, salida = run_proceso_campo(
+            data_dir / "SISTEMA.xlsx",
+            data_dir,
+            tmp_path / modo,
+            lambda m: None,
+            bajo_memoria=bajo_memoria,
+            presupuesto_mb=1,
+        )
+        assert ok, salida
+        resultados[modo] = salida
+
+    _comparar_salidas(resultados["normal"], resultados["bloques"])
+    hoja = _valores_libro(resultados["bloques"] / "ReporteRezagoAgua.xlsx")["SISTEMA"]
+    i = hoja[0].index("NumerodeCuenta")
+    numeros = [fila[i] for fila in hoja[1:] if len(fila) > i and fila[i]]
+    assert numeros and not any(n.endswith(".0") for n in numeros)
@@ -54,6 +54,28 @@ def test_version_info():
         pytest.skip("No se pudo importar app_iiwa para verificar versión")
 
 
+def test_gui_no_importa_pandas_al_iniciar():
+    """La ventana se arma sin pandas; la precarga lo importa en segundo plano"""
+    import subprocess
+
+    codigo = (
+        "import sys; import app_iiwa.app; "
+        "assert 'pandas' not in sys.modules and 'numpy' not in sys.modules; "
+        "from app_iiwa.arranque import Precarga; p = Precarga(); p.start(); "
+        "assert p.esperar(120) and p.error is None and p.hechos == p.total; "
+        "assert 'app_iiwa.campo' in sys.modules; print(p.estado())"
+    )
+    src = str(Path(__file__).parent.parent / "src")
+    salida = subprocess.run(
+        [sys.executable, "-c", codigo],
+        capture_output=True,
+        text=True,
+        env={**__import__("os").environ, "PYTHONPATH": src},
+    )
+    assert salida.returncode == 0, salida.stderr
+    assert salida.stdout.startswith("Módulos de cálculo listos")
+
+
 if __name__ == "__main__":
     import pytest
 
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tests de la cancelación cooperativa y de los puntos de control
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa import sintetico  # noqa: E402
+from app_iiwa.campo import run_proceso_campo  # noqa: E402
+from app_iiwa.cancelacion import Cancelado, cancelable, revisar  # noqa: E402
+from app_iiwa.pipeline import MARCA_EN_CURSO, Pipeline, observar  # noqa: E402
+
+
+def _armar(cache_dir, llamadas: list, falla=False):
+    pipeline = Pipeline(cache_dir, reutilizar=False)
+
+    def segunda(x):
+        llamadas.append("segunda")
+        if falla:
+            raise RuntimeError("falla")
+        return x + 1
+
+    pipeline.etapa("primera", lambda: llamadas.append("primera") or 1)
+    pipeline.etapa("segunda", segunda, ["primera"])
+    return pipeline
+
+
+def test_reanuda_solo_corridas_interrumpidas(tmp_path):
+    llamadas = []
+    pipeline = _armar(tmp_path, llamadas, falla=True)
+    with pytest.raises(RuntimeError):
+        with pipeline.corrida():
+            pipeline.resultado("segunda")
+    assert (tmp_path / MARCA_EN_CURSO).exists()
+
+    # La corrida anterior no terminó: "primera" se toma del punto de control
+    llamadas.clear()
+    pipeline = _armar(tmp_path, llamadas)
+    with pipeline.corrida():
+        assert pipeline.resultado("segunda") == 2
+    assert pipeline.reanudada and llamadas == ["segunda"]
+    assert not (tmp_path / MARCA_EN_CURSO).exists()
+
+    # Terminó bien: con reutilizar=False se recalcula todo
+    llamadas.clear()
+    pipeline = _armar(tmp_path, llamadas)
+    with pipeline.corrida():
+        pipeline.resultado("segunda")
+    assert llamadas == ["primera", "segunda"]
+
+
+def test_revisar_sigue_la_senal_del_hilo():
+    senal = threading.Event()
+    revisar()  # sin señal no hace nada
+    with cancelable(senal):
+        revisar()
+        senal.set()
+        with pytest.raises(Cancelado):
+            revisar()
+        # Otro hilo no ve la señal de éste
+        otro = threading.Thread(target=revisar)
+        otro.start()
+        otro.join()
+    revisar()
+
+
+def test_campo_cancelado_se_reanuda(tmp_path):
+    data_dir = tmp_path / "data"
+    sistema = sintetico.generar_datos(data_dir, "CAMPO", 400, 4)
+    salida = tmp_path / "salida"
+    cache_dir = salida / ".cache_iiwa"
+    senal = threading.Event()
+
+    def correr(log_func):
+        senal.clear()
+        with cancelable(senal):
+            return run_proceso_campo(
+                sistema,
+                data_dir,
+                salida,
+                log_func,
+                cache_dir=cache_dir,
+                reutilizar=False,
+            )
+
+    # Se cancela entre etapas: la carga queda guardada, los agregados no
+    def cancelar_despues_de_carga(pipeline, etapa, segundos, origen):
+        if etapa == "carga":
+            senal.set()
+
+    mensajes = []
+    with observar(cancelar_despues_de_carga):
+        ok, resultado = correr(mensajes.append)
+    assert not ok and resultado == "Proceso cancelado por el usuario"
+    assert not any("Etapa agregados" in m for m in mensajes)
+
+    # Se reanuda desde la carga y se cancela en el primer CP de los reportes
+    mensajes = []
+
+    def cancelar_en_primer_cp(mensaje):
+        mensajes.append(mensaje)
+        if "registros" in mensaje:
+            senal.set()
+
+    ok, resultado = correr(cancelar_en_primer_cp)
+    assert not ok
+    assert any("se reanuda" in m for m in mensajes)
+    assert any("Etapa carga: recuperada" in m for m in mensajes)
+    assert any("Etapa agregados: calculada" in m for m in mensajes)
+    assert sum("registros" in m for m in mensajes) == 1
+    assert not (salida / "campo_output").exists()
+
+    mensajes = []
+    ok, resultado = correr(mensajes.append)
+    assert ok, resultado
+    assert any("Etapa agregados: recuperada" in m for m in mensajes)
+    assert not any(m.startswith("Leyendo:") for m in mensajes)
+    assert (resultado / "reporte_macro.xlsx").exists()
+    assert (resultado / "Prioridad.xlsx").exists()
+    assert not (cache_dir / "campo" / MARCA_EN_CURSO).exists()
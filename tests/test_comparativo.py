@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests del comparativo mes contra mes
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa import sintetico  # noqa: E402
+from app_iiwa.comparativo import (  # noqa: E402
+    comparar_cuentas,
+    resumen_cuentas,
+    run_proceso_comparativo,
+)
+
+
+def _meses():
+    """Enero sintético y febrero con altas, bajas, pagos y aumentos"""
+    enero = sintetico.padron_campo(300, 4, seed=3).fillna({"agua": 0.0})
+    febrero = enero.copy()
+    cuentas = febrero["NumerodeCuenta"].drop_duplicates().tolist()
+    baja, liquidada, aumento = cuentas[:3]
+    febrero = febrero[febrero["NumerodeCuenta"] != baja].copy()
+    montos = ["agua", "actualizacionagua", "recargosagua", "drenaje"]
+    montos += ["actualizaciondrenaje", "recargosdrenaje", "mejoras", "iva"]
+    febrero.loc[febrero["NumerodeCuenta"] == liquidada, montos] = 0.0
+    febrero.loc[febrero["NumerodeCuenta"] == aumento, "agua"] += 100.0
+    nueva = febrero.iloc[[0]].assign(NumerodeCuenta="999999-0")
+    return (
+        enero,
+        pd.concat([febrero, nueva], ignore_index=True),
+        (baja, liquidada, aumento),
+    )
+
+
+def test_comparar_cuentas_por_hash():
+    enero, febrero, (baja, liquidada, aumento) = _meses()
+    movimientos = comparar_cuentas(resumen_cuentas(enero), resumen_cuentas(febrero))
+
+    assert movimientos["nuevas"]["NumerodeCuenta"].tolist() == ["999999-0"]
+    assert movimientos["bajas"]["NumerodeCuenta"].tolist() == [baja]
+    cambios = movimientos["cambios"].set_index("NumerodeCuenta")
+    assert set(cambios.index) == {liquidada, aumento}
+    assert cambios.loc[liquidada, "Movimiento"] == "LIQUIDADA"
+    assert cambios.loc[aumento, "Movimiento"] == "AUMENTÓ"
+    filas = (enero["NumerodeCuenta"] == aumento).sum()
+    assert np.isclose(cambios.loc[aumento, "diferencia"], 100.0 * filas)
+
+    # Contra sí mismo no hay movimientos
+    mismo = comparar_cuentas(resumen_cuentas(enero), resumen_cuentas(enero))
+    assert all(len(tabla) == 0 for tabla in mismo.values())
+
+
+def test_comparativo_usa_la_cache_de_cada_mes(tmp_path):
+    enero, febrero, _ = _meses()
+    for nombre, df in (("enero", enero), ("febrero", febrero), ("marzo", febrero)):
+        (tmp_path / nombre).mkdir()
+        df.to_excel(tmp_path / nombre / "SISTEMA.xlsx", index=False)
+
+    cache_dir = tmp_path / "salida" / ".cache_iiwa"
+    ok, salida = run_proceso_comparativo(
+        tmp_path / "enero" / "SISTEMA.xlsx",
+        tmp_path / "febrero" / "SISTEMA.xlsx",
+        tmp_path / "salida",
+        lambda m: None,
+        cache_dir=cache_dir,
+    )
+    assert ok, salida
+    libro = pd.ExcelFile(salida / "Comparativo.xlsx")
+    assert libro.sheet_names == ["RESUMEN", "NUEVAS", "BAJAS", "CAMBIOS"]
+    resumen = pd.read_excel(libro, "RESUMEN", index_col=0)
+    assert resumen.loc["Total", ["Nuevas", "Bajas", "Con cambio"]].tolist() == [1, 1, 2]
+    hojas = pd.ExcelFile(salida / "ComparativoPorCP.xlsx").sheet_names
+    assert hojas and all(h.startswith("CP ") for h in hojas)
+
+    # Febrero contra marzo: febrero sale de la caché; marzo se lee
+    mensajes = []
+    ok, salida = run_proceso_comparativo(
+        tmp_path / "febrero" / "SISTEMA.xlsx",
+        tmp_path / "marzo" / "SISTEMA.xlsx",
+        tmp_path / "salida",
+        mensajes.append,
+        cache_dir=cache_dir,
+    )
+    assert ok, salida
+    leidos = [m for m in mensajes if m.startswith("Leyendo:")]
+    assert len(leidos) == 1 and "marzo" in leidos[0]
+    assert sum("recuperada de caché" in m for m in mensajes) == 1
+    assert pd.read_excel(salida / "ComparativoPorCP.xlsx").columns[0] == "Movimiento"
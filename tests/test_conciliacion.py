@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests de la conciliación CAMPO × CAJA
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa import sintetico  # noqa: E402
+from app_iiwa.conciliacion import (  # noqa: E402
+    FUERA_DE_PADRON,
+    REZAGO,
+    conciliar,
+    pagos_caja,
+    recuperacion,
+    run_proceso_conciliacion,
+)
+
+
+def test_conciliar_factoriza_cuentas():
+    cuentas = pd.DataFrame(
+        {
+            "NumerodeCuenta": ["1-0", "2-0", "3-0"],
+            "CodigoPostal": [50000, 50000, 50007],
+            "TipoConsumo": ["MEDIDO", "MEDIDO", "CUOTA FIJA"],
+            "TipoConexion": ["DOMESTICA"] * 3,
+            "total": [100.0, 50.0, 30.0],
+        }
+    )
+    pagos = pd.DataFrame(
+        {
+            "NumerodeCuenta": ["2-0", "9-0", "2-0", None, "1-0"],
+            "CodigoPostal": ["50000", "50014", "50000", "50000", "50000"],
+            "pago": [20.0, 40.0, 30.0, 5.0, 100.0],
+            REZAGO: [10.0, 0.0, 0.0, 0.0, 60.0],
+        }
+    )
+    tablas = conciliar(cuentas, pagos)
+
+    por_cuenta = tablas["por_cuenta"].set_index("NumerodeCuenta")
+    assert por_cuenta["cobrado"].to_dict() == {"1-0": 100.0, "2-0": 50.0, "3-0": 0.0}
+    assert por_cuenta["folios"].tolist() == [1, 2, 0]
+    assert por_cuenta.loc["1-0", "rezago_cobrado"] == 60.0
+    fuera = tablas["fuera"]
+    assert fuera["NumerodeCuenta"].tolist() == ["9-0"]
+    assert fuera["CodigoPostal"].tolist() == ["50014"]
+    assert tablas["sin_cuenta"] == 1
+
+    todas = pd.concat([tablas["por_cuenta"], tablas["fuera"]])
+    tipos = recuperacion(todas, ["TipoConsumo", "TipoConexion"]).set_index(
+        "TipoConsumo"
+    )
+    assert tipos.loc["MEDIDO", "tasa_recuperacion"] == round(150 / 300, 4)
+    assert tipos.loc["CUOTA FIJA", "tasa_recuperacion"] == 0.0
+    assert tipos.loc[FUERA_DE_PADRON, "tasa_recuperacion"] == 1.0
+    assert tipos.loc["Total", "cuentas"] == 4
+    assert tipos.loc["Total", "cuentas_con_pago"] == 3
+    por_cp = recuperacion(todas, ["CodigoPostal"])
+    assert por_cp["CodigoPostal"].tolist() == ["50000", "50007", "50014", "Total"]
+
+
+def test_conciliacion_depura_cortes_traslapados(tmp_path):
+    padron = sintetico.generar_datos(tmp_path / "campo", "CAMPO", 400, 4)
+    primer = sintetico.padron_caja(300, 4, seed=1)
+    # El segundo corte repite el primero y agrega pagos del mismo padrón
+    segundo = pd.concat([primer, sintetico.padron_caja(200, 4, seed=2)])
+    cortes = []
+    for nombre, datos in (("ene", primer), ("feb", segundo)):
+        path = tmp_path / f"CAJA_{nombre}.xlsx"
+        datos.to_excel(path, index=False)
+        cortes.append(path)
+
+    mensajes = []
+    ok, salida = run_proceso_conciliacion(
+        padron, cortes, tmp_path / "salida", mensajes.append, tmp_path / "cache"
+    )
+    assert ok, salida
+
+    esperado = pagos_caja(segundo)["pago"].sum()
+    libro = pd.read_excel(salida / "Conciliacion.xlsx", sheet_name=None)
+    assert set(libro) == {"RECUPERACION", "POR CP", "POR CUENTA", "FUERA DE PADRON"}
+    total = libro["RECUPERACION"].iloc[-1]
+    assert np.isclose(total["cobrado"], esperado)
+    assert np.isclose(libro["POR CP"].iloc[-1]["cobrado"], esperado)
+    assert total["cuentas"] == len(libro["POR CUENTA"]) + len(libro["FUERA DE PADRON"])
+
+    # Los tres archivos salen de la caché en la segunda corrida
+    mensajes = []
+    ok, _ = run_proceso_conciliacion(
+        padron, cortes, tmp_path / "salida", mensajes.append, tmp_path / "cache"
+    )
+    assert ok
+    assert sum("recuperada de caché" in m for m in mensajes) == 3
+    assert not any(m.startswith("Leyendo:") for m in mensajes)
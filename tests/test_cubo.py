@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests del cubo de adeudos de CAMPO
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa import cubo, sintetico  # noqa: E402
+from app_iiwa.backends import base_macro  # noqa: E402
+from app_iiwa.campo import run_proceso_campo  # noqa: E402
+
+
+def test_cortes_del_cubo_igual_que_pivotear_sistema(monkeypatch):
+    df = sintetico.padron_campo(3000, 6, seed=4)
+    datos = cubo.construir_cubo(df)
+    base = base_macro(df).assign(
+        año=df["bimfinal"].str[:4].fillna(cubo.SIN_DATO),
+        Zona=df["Zona"].astype(str),
+    )
+
+    corte = cubo.consultar(datos, ["Zona", "año"])
+    esperado = base.groupby(["Zona", "año"])
+    assert corte["cuentas"].tolist() == esperado["NumerodeCuenta"].nunique().tolist()
+    assert np.allclose(corte["total"], esperado["total"].sum())
+    assert corte["filas"].sum() == len(df)
+
+    # Filtros con valores numéricos o de texto
+    filtrado = cubo.consultar(datos, ["TipoConsumo"], {"Zona": [1, "2"], "año": 2025})
+    en_filtro = base[base["Zona"].isin(["1", "2"]) & (base["año"] == "2025")]
+    assert (
+        filtrado["cuentas"].tolist()
+        == en_filtro.groupby("TipoConsumo")["NumerodeCuenta"].nunique().tolist()
+    )
+
+    # Sin mapa de bits se cuenta ordenando: mismo resultado
+    total = cubo.consultar(datos)
+    assert total["cuentas"].iloc[0] == df["NumerodeCuenta"].nunique()
+    monkeypatch.setattr(cubo, "MAX_CELDAS_MAPA", 0)
+    assert cubo.consultar(datos, ["Zona", "año"]).equals(corte)
+
+    with pytest.raises(ValueError, match="Dimensión desconocida"):
+        cubo.consultar(datos, ["Colonia"])
+
+
+def test_campo_deja_el_cubo(tmp_path, capsys):
+    data_dir = tmp_path / "data"
+    sistema = sintetico.generar_datos(data_dir, "CAMPO", 300, 3)
+    ok, salida = run_proceso_campo(sistema, data_dir, tmp_path / "salida", print)
+    assert ok, salida
+
+    carpeta = salida / cubo.CARPETA_CUBO
+    assert cubo.consultar(cubo.cargar_cubo(carpeta))["filas"].iloc[0] == 300
+    capsys.readouterr()
+    assert cubo.main([str(carpeta), "--por", "CodigoPostal"]) == 0
+    assert "50007" in capsys.readouterr().out
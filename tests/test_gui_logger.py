@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Tests del log de la GUI (sin pantalla: Text simulado)
+"""
+
+import io
+import sys
+from pathlib import Path
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa import eventos  # noqa: E402
+from app_iiwa.app import GuiLogger  # noqa: E402
+from app_iiwa.utils import session_log_path  # noqa: E402
+
+
+class TextoSimulado:
+    """Lo mínimo de tk.Text que usa GuiLogger, contando las operaciones"""
+
+    def __init__(self):
+        self.contenido = ""
+        self.estado = "disabled"
+        self.inserts = 0
+        self.tags = []
+        self.esperas = []
+
+    def __getitem__(self, clave):
+        assert clave == "state"
+        return self.estado
+
+    def configure(self, state):
+        self.estado = state
+
+    def insert(self, indice, *partes):
+        assert self.estado == "normal"
+        self.inserts += 1
+        self.contenido += "".join(partes[::2])
+        self.tags.extend(partes[1::2])
+
+    def index(self, indice):
+        assert indice == "end-1c"
+        lineas = self.contenido.split("\n")
+        return f"{len(lineas)}.{len(lineas[-1])}"
+
+    def delete(self, inicio, fin):
+        if fin == "end":
+            self.contenido = ""
+            return
+        assert inicio == "1.0" and fin.endswith(".0")
+        quitar = int(fin.split(".")[0]) - 1
+        self.contenido = "\n".join(self.contenido.split("\n")[quitar:])
+
+    def see(self, indice):
+        pass
+
+    def after(self, ms, funcion):
+        self.esperas.append(ms)
+
+
+def test_lote_por_ciclo_y_limite_de_lineas(tmp_path):
+    texto = TextoSimulado()
+    archivo = tmp_path / "sesion.log"
+    logger = GuiLogger(texto, interval_ms=50, max_lineas=100, archivo=archivo)
+
+    for i in range(1000):
+        logger.log(f"  📊 CP {i}: listo")
+    logger._pump()
+
+    # Un solo insert para los 1000 mensajes y sólo las últimas 100 líneas
+    assert texto.inserts == 1
+    lineas = texto.contenido.splitlines()
+    assert len(lineas) == 100 and lineas[-1].endswith("CP 999: listo")
+    assert texto.estado == "disabled"
+
+    logger.log("otra")
+    logger._pump()
+    assert len(texto.contenido.splitlines()) == 100
+    assert texto.contenido.splitlines()[0].endswith("CP 901: listo")
+
+    # Historial completo en archivo
+    logger.log("pendiente al cerrar")
+    logger.cerrar()
+    historial = archivo.read_text(encoding="utf-8").splitlines()
+    assert len(historial) == 1002 and historial[-1].endswith("pendiente al cerrar")
+    assert " INFO    " in historial[0]
+
+
+def test_estilo_y_filtro_por_nivel(tmp_path):
+    texto = TextoSimulado()
+    archivo = tmp_path / "sesion.log"
+    logger = GuiLogger(texto, archivo=archivo)
+
+    mensajes = []
+
+    def log_func(m):
+        logger.log(m)
+        mensajes.append(m)
+
+    # Antes se decidía por palabras: "error" en un mensaje normal lo pintaba
+    log_func("Columna sin errores")
+    eventos.seccion(log_func, "=== INICIANDO PROCESO CAMPO ===")
+    eventos.detalle(log_func, "  📊 CP 50000: 3 registros", "emitir", registros=3)
+    eventos.aviso(log_func, "Advertencia: algo")
+    eventos.error(log_func, "Falló", "carga")
+    eventos.exito(log_func, "PROCESO CAMPO COMPLETADO")
+    logger.log("Bienvenido", tag="title")
+    logger._pump()
+
+    # Los log_func que esperan texto siguen recibiendo str
+    assert all(isinstance(m, str) for m in mensajes)
+    assert mensajes[2] == "  📊 CP 50000: 3 registros"
+    # DETALLE se oculta por defecto
+    assert texto.tags == ["normal", "large", "warning", "error", "success", "title"]
+    assert "CP 50000" not in texto.contenido
+
+    logger.filtrar(eventos.DETALLE)
+    assert "CP 50000" in texto.contenido and len(texto.tags) == 6 + 7
+    logger.filtrar(eventos.ERROR)
+    assert texto.contenido.splitlines()[0].endswith("] Falló")
+
+    logger.cerrar()
+    historial = archivo.read_text(encoding="utf-8")
+    assert "DETALLE [emitir]   📊 CP 50000: 3 registros registros=3" in historial
+    assert "ERROR   [carga] Falló" in historial
+
+
+def test_consola():
+    salida = io.StringIO()
+    log_func = eventos.consola(stream=salida)
+    eventos.detalle(log_func, "oculto")
+    eventos.info(log_func, "visible")
+    eventos.aviso(log_func, "cuidado")
+    log_func("texto plano")
+    assert salida.getvalue().splitlines() == [
+        "visible",
+        "AVISO: cuidado",
+        "texto plano",
+    ]
+
+
+def test_espera_crece_sin_mensajes():
+    texto = TextoSimulado()
+    logger = GuiLogger(texto, interval_ms=50, interval_max_ms=300)
+    for _ in range(4):
+        logger._pump()
+    assert texto.esperas == [100, 200, 300, 300, 300]
+    logger.log("hola")
+    logger._pump()
+    assert texto.esperas[-1] == 50
+
+
+def test_historial_por_sesion(tmp_path):
+    for i in range(5):
+        (tmp_path / f"app_iiwa_2025010{i}_000000.log").write_text("x")
+    nuevo = session_log_path(tmp_path, keep=3)
+    assert nuevo.parent == tmp_path and nuevo.name.startswith("app_iiwa_")
+    assert sorted(p.name for p in tmp_path.glob("*.log")) == [
+        "app_iiwa_20250103_000000.log",
+        "app_iiwa_20250104_000000.log",
+    ]
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests del historial de cuentas
+"""
+
+import sys
+from contextlib import closing
+from pathlib import Path
+
+import pandas as pd
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa import sintetico  # noqa: E402
+from app_iiwa.campo import run_proceso_campo  # noqa: E402
+from app_iiwa.historial import (  # noqa: E402
+    compactar,
+    conectar,
+    historia_cuenta,
+    registrar_adeudos,
+    registrar_pagos,
+    serie_cp,
+)
+
+
+def _adeudos(total_cuenta_1):
+    return pd.DataFrame(
+        {
+            "NumerodeCuenta": [1.0, "2"],
+            "CodigoPostal": [50000, 50000.0],
+            "TipoConsumo": ["DOMESTICO", "COMERCIAL"],
+            "TipoConexion": ["AGUA", "AGUA Y DRENAJE"],
+            "agua": [total_cuenta_1, 50.0],
+            "drenaje": [0.0, 10.0],
+            "recargos": [0.0, 0.0],
+            "mejoras": [0.0, 0.0],
+            "iva": [0.0, None],
+            "total": [total_cuenta_1, 60.0],
+        }
+    )
+
+
+def _pagos(fechas, pagos):
+    return pd.DataFrame(
+        {
+            "NumerodeCuenta": ["1"] * len(fechas),
+            "CodigoPostal": ["50000"] * len(fechas),
+            "fechapago": fechas,
+            "FolioImpreso": [f"F{i}" for i in range(len(fechas))],
+            "pago": pagos,
+            "REZAGO IIWA 2024-6 y anteriores (pagdCosto)": pagos,
+        }
+    )
+
+
+def test_consultas_usan_la_ultima_corrida_y_compactar_borra_el_resto(tmp_path):
+    db = tmp_path / "historial.sqlite"
+    assert registrar_adeudos(db, _adeudos(100.0), "2025-01", "ene", "h1")
+    assert registrar_adeudos(db, _adeudos(80.0), "2025-02", "feb", "h2")
+    # El mismo SISTEMA no se registra dos veces
+    assert registrar_adeudos(db, _adeudos(80.0), "2025-02", "feb", "h2") is None
+    # Febrero se volvió a exportar: reemplaza al anterior
+    assert registrar_adeudos(db, _adeudos(70.0), "2025-02", "feb2", "h3")
+
+    # Cortes de caja que se traslapan: el segundo trae otra vez el folio F0
+    registrar_pagos(db, _pagos(["2025-01-20", "2025-02-03"], [10.0, 5.0]), "c1", "p1")
+    registrar_pagos(db, _pagos(["2025-01-20"], [12.0]), "c2", "p2")
+
+    historia = historia_cuenta(db, "1")
+    assert historia["adeudos"]["periodo"].tolist() == ["2025-01", "2025-02"]
+    assert historia["adeudos"]["total"].tolist() == [100.0, 70.0]
+    assert historia["pagos"].set_index("folio")["pago"].to_dict() == {
+        "F0": 12.0,
+        "F1": 5.0,
+    }
+
+    serie = serie_cp(db, 50000).set_index("periodo")
+    assert serie.loc["2025-02", "adeudo"] == 130.0
+    assert serie.loc["2025-02", "cuentas_adeudo"] == 2
+    assert serie.loc["2025-01", "pagado"] == 12.0
+
+    assert compactar(db) == {"corridas": 5, "adeudos": 2, "pagos": 1}
+    assert compactar(db) == {"corridas": 0, "adeudos": 0, "pagos": 0}
+    with closing(conectar(db)) as conexion:
+        assert conexion.execute("SELECT COUNT(*) FROM adeudos").fetchone() == (4,)
+    assert historia_cuenta(db, 1)["adeudos"]["total"].tolist() == [100.0, 70.0]
+
+
+def test_campo_alimenta_el_historial(tmp_path):
+    data_dir = tmp_path / "data"
+    sistema = sintetico.generar_datos(data_dir, "CAMPO", 300, 3)
+    db = tmp_path / "historial.sqlite"
+
+    mensajes = []
+    ok, resultado = run_proceso_campo(
+        sistema, data_dir, tmp_path / "salida", mensajes.append, historial=db
+    )
+    assert ok, resultado
+    assert any(m.startswith("Historial actualizado") for m in mensajes)
+
+    df = pd.read_excel(sistema)
+    cuenta = df["NumerodeCuenta"].iloc[0]
+    adeudos = historia_cuenta(db, cuenta)["adeudos"]
+    assert len(adeudos) == 1 and adeudos["cp"].iloc[0] == str(
+        df["CodigoPostal"].iloc[0]
+    )
+    assert len(serie_cp(db, df["CodigoPostal"].iloc[0])) == 1
+
+    mensajes = []
+    ok, _ = run_proceso_campo(
+        sistema, data_dir, tmp_path / "salida", mensajes.append, historial=db
+    )
+    assert ok and any("ya estaba registrado" in m for m in mensajes)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests de huellas y diferencias de libros de salida
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa import huellas  # noqa: E402
+
+
+def _reporte():
+    return {
+        "SISTEMA": pd.DataFrame(
+            {
+                "cuenta": ["1-0", "2-0", None, "4-0"],
+                "monto": [1.0, 2.5, np.nan, 1e6 / 3],
+                "zona": [1, 2, 3, 4],
+                "fecha": pd.to_datetime(["2025-01-01", "2025-02-01", None, None]),
+            }
+        ),
+        "C.P.": pd.DataFrame({"NumerodeCuenta": [3, 1]}, index=[50000, 50007]),
+    }
+
+
+def _escribir(path: Path, hojas: dict, engine: str):
+    with pd.ExcelWriter(path, engine=engine) as writer:
+        for nombre, df in hojas.items():
+            df.to_excel(writer, sheet_name=nombre, index=nombre != "SISTEMA")
+
+
+def test_misma_huella_con_otro_motor(tmp_path):
+    """openpyxl (texto en línea) y xlsxwriter (texto compartido) dan el mismo hash"""
+    _escribir(tmp_path / "a.xlsx", _reporte(), "openpyxl")
+    _escribir(tmp_path / "b.xlsx", _reporte(), "xlsxwriter")
+    a = huellas.huellas_libro(tmp_path / "a.xlsx")
+    assert list(a) == ["SISTEMA", "C.P."]
+    assert a["SISTEMA"]["filas"] == 5 and a["SISTEMA"]["columnas"] == 4
+    b = huellas.huellas_libro(tmp_path / "b.xlsx")
+    for hoja in a:
+        # La firma (bytes del XML) cambia con el motor; el contenido no
+        assert a[hoja]["firma"] != b[hoja]["firma"]
+        assert a[hoja]["hash"] == b[hoja]["hash"]
+
+
+def test_diferencias_por_celda(tmp_path):
+    dorado, actual = tmp_path / "dorado", tmp_path / "actual"
+    dorado.mkdir()
+    actual.mkdir()
+    _escribir(dorado / "R.xlsx", _reporte(), "openpyxl")
+
+    # Ruido en el último dígito: hash distinto o no, sin diferencias
+    hojas = _reporte()
+    hojas["SISTEMA"].loc[3, "monto"] += 1e-10
+    _escribir(actual / "R.xlsx", hojas, "openpyxl")
+    assert huellas.comparar_carpetas(dorado, actual) == []
+
+    hojas["SISTEMA"].loc[1, "monto"] = 2.75
+    hojas["C.P."].loc[50007, "NumerodeCuenta"] = 2
+    _escribir(actual / "R.xlsx", hojas, "openpyxl")
+    assert huellas.comparar_carpetas(dorado, actual) == [
+        "R.xlsx:SISTEMA!B3: 2.5 != 2.75",
+        "R.xlsx:C.P.!B3: 1 != 2",
+    ]
+
+    # Con huellas en JSON sólo se sabe qué hoja cambió
+    huellas.guardar_huellas(dorado, tmp_path / "h.json")
+    assert list(json.loads((tmp_path / "h.json").read_text())["R.xlsx"]) == [
+        "SISTEMA",
+        "C.P.",
+    ]
+    difs = huellas.comparar_carpetas(tmp_path / "h.json", actual)
+    assert [d.split(":")[1] for d in difs] == ["SISTEMA", "C.P."]
+    assert huellas.main([str(tmp_path / "h.json"), str(dorado)]) == 0
+
+    # Mismos bytes: se decide por la firma sin leer las hojas
+    copia = tmp_path / "copia"
+    copia.mkdir()
+    (copia / "R.xlsx").write_bytes((dorado / "R.xlsx").read_bytes())
+    assert huellas.comparar_carpetas(dorado, copia) == []
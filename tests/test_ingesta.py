@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Tests de lectura de SISTEMA (buffers tipados y prevalidación de encabezados)
+"""
+
+import datetime as dt
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa import ingesta  # noqa: E402
+from app_iiwa.campo import run_proceso_campo  # noqa: E402
+from app_iiwa.ingesta import (  # noqa: E402
+    CargaConcurrente,
+    columnas_faltantes,
+    iterar_bloques_excel,
+    leer_encabezado,
+    leer_excel,
+)
+
+from .test_backends import padron_sintetico  # noqa: E402
+
+
+def _libro_tipos_mezclados(ruta: Path):
+    """Libro con los casos de inferencia de tipos de read_excel"""
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(
+        ["texto", "entero", "flotante", None, "fecha", "bool", "cp", "cp", "grande"]
+    )
+    ws.append(["x", 1, 1.5, 7, dt.datetime(2024, 1, 2), True, "50000", 2.0, 1e20])
+    ws.append(["NA", None, 2, 8, dt.datetime(2024, 1, 3), False, "50007", 3.0, 2.0])
+    ws.append([None, None, None, None, None, None, None, None, 5.0])
+    ws.append(["", 3, None, 9, None, True, None, 4.0, 2.0**60])
+    ws.append(["y", 4, 0.5, 10, None, False, "50014", 5.0, 3.0])
+    wb.save(ruta)
+
+
+def test_leer_excel_equivale_a_read_excel(tmp_path):
+    """Los buffers tipados producen el mismo DataFrame (y dtypes) que read_excel"""
+    mezclado = tmp_path / "mezclado.xlsx"
+    _libro_tipos_mezclados(mezclado)
+    padron = tmp_path / "SISTEMA.xlsx"
+    padron_sintetico(1500, 8).to_excel(padron, index=False)
+
+    for ruta in [mezclado, padron]:
+        pd.testing.assert_frame_equal(
+            leer_excel(ruta), pd.read_excel(ruta, engine="openpyxl")
+        )
+
+
+def test_bloques_conservan_tipos_del_primero(tmp_path):
+    """Un bloque con la columna de fechas toda nula sigue siendo datetime (NaT)"""
+    ruta = tmp_path / "mezclado.xlsx"
+    _libro_tipos_mezclados(ruta)
+    bloques = list(iterar_bloques_excel(ruta, filas_por_bloque=3))
+    assert [len(b) for b in bloques] == [3, 2]
+    assert bloques[1]["fecha"].isna().all()
+    assert bloques[1]["fecha"].dtype == bloques[0]["fecha"].dtype
+    assert bloques[1]["entero"].dtype == np.float64
+
+
+def test_encabezado_sin_leer_datos(tmp_path):
+    """El encabezado coincide con las columnas que asigna read_excel"""
+    ruta = tmp_path / "mezclado.xlsx"
+    _libro_tipos_mezclados(ruta)
+    assert leer_encabezado(ruta) == list(pd.read_excel(ruta).columns)
+
+    faltantes = columnas_faltantes(
+        ["agua", "Principal"],
+        ["agua", "iva"],
+        {"NumerodeCuenta": ["Principal", "Derivada"], "agua": ["x"]},
+    )
+    assert faltantes == ["iva", "NumerodeCuenta"]
+
+
+def test_campo_rechaza_sistema_incompleto(tmp_path):
+    """Un SISTEMA sin columnas de montos se rechaza antes de procesarlo"""
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    padron_sintetico(200, 3).drop(columns=["agua", "iva"]).to_excel(
+        data_dir / "SISTEMA.xlsx", index=False
+    )
+    pd.DataFrame({"CP": [50000]}).to_excel(data_dir / "LISTA C.P..xlsx", index=False)
+
+    mensajes = []
+    ok, msg = run_proceso_campo(
+        data_dir / "SISTEMA.xlsx", data_dir, tmp_path / "salida", mensajes.append
+    )
+    assert not ok
+    assert msg == "Columna faltante en SISTEMA.xlsx: agua, iva"
+    assert not any(m.startswith("Leyendo") for m in mensajes)
+
+
+def test_carga_concurrente_futuros(tmp_path, monkeypatch):
+    """Los futuros entregan lo mismo que read_excel/read_csv, también en procesos"""
+    monkeypatch.setattr(ingesta, "BYTES_EXCEL_EN_PROCESO", 0)
+    xlsx = tmp_path / "mezclado.xlsx"
+    _libro_tipos_mezclados(xlsx)
+    csv = tmp_path / "FOLIOS.csv"
+    pd.DataFrame({"NumerodeCuenta": ["1-0", "2-0"], "Folio": [7, 8]}).to_csv(
+        csv, index=False, encoding="latin1"
+    )
+
+    with CargaConcurrente() as carga:
+        excel = carga.excel(xlsx)
+        folios = carga.csv(csv, encoding="latin1")
+        pd.testing.assert_frame_equal(excel.result(), pd.read_excel(xlsx))
+        pd.testing.assert_frame_equal(folios.result(), pd.read_csv(csv))
+
+
+def test_carga_concurrente_pool_roto(tmp_path, monkeypatch):
+    """Si el pool de procesos se rompe, la lectura se repite en un hilo"""
+    monkeypatch.setattr(ingesta, "BYTES_EXCEL_EN_PROCESO", 0)
+    xlsx = tmp_path / "mezclado.xlsx"
+    _libro_tipos_mezclados(xlsx)
+
+    with CargaConcurrente() as carga:
+        # Un initializer que falla deja el pool en BrokenProcessPool
+        carga._procesos = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=int,
+            initargs=("x",),
+        )
+        excel = carga.excel(xlsx)
+        pd.testing.assert_frame_equal(excel.result(timeout=60), pd.read_excel(xlsx))
+
+
+def test_cerrar_cancela_lecturas_pendientes(tmp_path):
+    """cerrar() cancela las lecturas que todavía no empiezan"""
+    csv = tmp_path / "REGISTROS.csv"
+    pd.DataFrame({"a": [1]}).to_csv(csv, index=False)
+
+    carga = CargaConcurrente(hilos=1)
+    liberar = threading.Event()
+    ocupado = carga._hilos.submit(liberar.wait)  # ocupa el único hilo
+    pendiente = carga.csv(csv)
+    carga.cerrar()
+    liberar.set()
+
+    assert pendiente.cancelled()
+    assert ocupado.result() is True
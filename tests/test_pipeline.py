@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Tests del pipeline de etapas con memoización en disco
+"""
+
+import json
+import pstats
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa import artefactos  # noqa: E402
+from app_iiwa.caja import run_proceso_caja  # noqa: E402
+from app_iiwa.campo import run_proceso_campo  # noqa: E402
+from app_iiwa.pipeline import Pipeline, observar  # noqa: E402
+
+from .test_backends import padron_sintetico  # noqa: E402
+from .test_bajo_memoria import _comparar_salidas, padron_caja_sintetico  # noqa: E402
+
+
+def _armar(cache_dir, entrada: Path, llamadas: list, factor=2):
+    pipeline = Pipeline(cache_dir)
+
+    def leer():
+        llamadas.append("leer")
+        return int(entrada.read_text())
+
+    def escalar(x):
+        llamadas.append("escalar")
+        return x * factor
+
+    pipeline.etapa("leer", leer, archivos=[entrada])
+    pipeline.etapa("escalar", escalar, ["leer"], parametros={"factor": factor})
+    return pipeline
+
+
+def test_pipeline_memoiza_e_invalida(tmp_path):
+    entrada = tmp_path / "entrada.txt"
+    entrada.write_text("21")
+    llamadas = []
+
+    assert _armar(tmp_path / "cache", entrada, llamadas).resultado("escalar") == 42
+    assert llamadas == ["leer", "escalar"]
+
+    # Misma entrada: ni siquiera se evalúa la etapa anterior
+    llamadas.clear()
+    pipeline = _armar(tmp_path / "cache", entrada, llamadas)
+    assert pipeline.resultado("escalar") == 42
+    assert llamadas == [] and pipeline.recuperadas == ["escalar"]
+
+    # Otro parámetro: sólo se recalcula la etapa que lo usa
+    llamadas.clear()
+    assert _armar(tmp_path / "cache", entrada, llamadas, 3).resultado("escalar") == 63
+    assert llamadas == ["escalar"]
+
+    # Archivo modificado: se recalcula todo
+    llamadas.clear()
+    entrada.write_text("100")
+    assert _armar(tmp_path / "cache", entrada, llamadas).resultado("escalar") == 200
+    assert llamadas == ["leer", "escalar"]
+
+    # Sin carpeta de caché no se memoiza
+    llamadas.clear()
+    assert _armar(None, entrada, llamadas).resultado("escalar") == 200
+    assert llamadas == ["leer", "escalar"]
+
+
+def test_observar_etapas(tmp_path):
+    entrada = tmp_path / "entrada.txt"
+    entrada.write_text("1")
+    eventos = []
+    with observar(lambda p, etapa, s, origen: eventos.append((etapa, origen))):
+        _armar(tmp_path / "cache", entrada, []).resultado("escalar")
+        _armar(tmp_path / "cache", entrada, []).resultado("escalar")
+    _armar(None, entrada, []).resultado("escalar")
+    assert eventos == [
+        ("leer", "calculada"),
+        ("escalar", "calculada"),
+        ("escalar", "cache"),
+    ]
+
+
+def test_pipeline_valida_dependencias():
+    pipeline = Pipeline()
+    pipeline.etapa("a", lambda: 1)
+    with pytest.raises(ValueError):
+        pipeline.etapa("a", lambda: 2)
+    with pytest.raises(ValueError):
+        pipeline.etapa("b", lambda x: x, ["c"])
+
+
+def test_artefactos_conservan_tipos(tmp_path):
+    pytest.importorskip("pyarrow")
+    numeros = pd.DataFrame(
+        {"cp": np.arange(3), "monto": [1.5, 2.0, np.nan], "texto": ["a", "b", "c"]},
+        index=pd.Index([10, 20, 30], name="clave"),
+    )
+    # object con enteros y flotantes: Parquet lo convertiría a float64
+    mezclado = pd.DataFrame({"x": pd.Series([1, 2.0, None], dtype=object)})
+    valor = {"numeros": numeros, "mezclado": mezclado, "lista": [1, 2]}
+
+    artefactos.guardar(tmp_path / "a", valor)
+    assert artefactos.formatos(tmp_path / "a") == {
+        "numeros": "parquet",
+        "mezclado": "pickle",
+        "lista": "pickle",
+    }
+    leido = artefactos.cargar(tmp_path / "a")
+    pd.testing.assert_frame_equal(leido["numeros"], numeros)
+    pd.testing.assert_frame_equal(leido["mezclado"], mezclado)
+    assert [type(v) for v in leido["mezclado"]["x"]] == [int, float, type(None)]
+    assert leido["lista"] == [1, 2]
+
+
+def test_campo_reutiliza_agregados(tmp_path):
+    """Cambiar month_label sólo vuelve a escribir los reportes"""
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    padron_sintetico(400, 4).to_excel(data_dir / "SISTEMA.xlsx", index=False)
+    pd.DataFrame({"CP": [50000]}).to_excel(data_dir / "LISTA C.P..xlsx", index=False)
+
+    resultados = {}
+    for modo, cache_dir in [("sin_cache", None), ("cache", tmp_path / "cache")]:
+        ok, salida = run_proceso_campo(
+            data_dir / "SISTEMA.xlsx",
+            data_dir,
+            tmp_path / modo,
+            lambda m: None,
+            month_label="ENERO",
+            cache_dir=cache_dir,
+        )
+        assert ok, salida
+        resultados[modo] = salida
+    _comparar_salidas(resultados["sin_cache"], resultados["cache"])
+
+    mensajes = []
+    ok, salida = run_proceso_campo(
+        data_dir / "SISTEMA.xlsx",
+        data_dir,
+        tmp_path / "cache",
+        mensajes.append,
+        month_label="FEBRERO",
+        cache_dir=tmp_path / "cache",
+    )
+    assert ok, salida
+    assert any("Etapa agregados: recuperada" in m for m in mensajes)
+    assert not any(m.startswith("Leyendo:") for m in mensajes)
+
+    hojas = pd.ExcelFile(salida / "ReporteRezagoAgua.xlsx").sheet_names
+    assert hojas[0] == "FEBRERO"
+
+
+def test_caja_agregar_registros_solo_recalcula_enlace(tmp_path):
+    """Agregar REGISTROS/FOLIOS no vuelve a leer SISTEMA ni a agregar"""
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    df = padron_caja_sintetico(300)
+    df.to_excel(data_dir / "SISTEMA.xlsx", index=False)
+    cache_dir = tmp_path / "cache"
+
+    ok, salida = run_proceso_caja(
+        data_dir / "SISTEMA.xlsx",
+        data_dir,
+        tmp_path / "out",
+        lambda m: None,
+        cache_dir=cache_dir,
+    )
+    assert ok, salida
+    assert (
+        "E. folio Geolocalización"
+        not in pd.ExcelFile(salida / "REPORTE_COMPLETO.xlsx").sheet_names
+    )
+
+    cuentas = df["NumerodeCuenta"].drop_duplicates()
+    pd.DataFrame(
+        {
+            "folio_notif": [f"N{i}" if i % 2 else np.nan for i in range(len(cuentas))],
+            "NumerodeCuenta": cuentas.to_numpy(),
+            "latitud_not": 19.0,
+            "longitud_not": -99.0,
+        }
+    ).to_csv(data_dir / "REGISTROS.csv", index=False, encoding="latin1")
+    pd.DataFrame(
+        {"NumerodeCuenta": cuentas.to_numpy()[:5], "FOLIO IIWA": ["X"] * 5}
+    ).to_csv(data_dir / "FOLIOS.csv", index=False, encoding="latin1")
+
+    mensajes = []
+    ok, salida = run_proceso_caja(
+        data_dir / "SISTEMA.xlsx",
+        data_dir,
+        tmp_path / "out",
+        mensajes.append,
+        cache_dir=cache_dir,
+    )
+    assert ok, salida
+    recuperadas = [m.split()[2] for m in mensajes if "recuperada de caché" in m]
+    assert recuperadas == ["carga:", "agregados:"]
+    assert any(m.startswith("[5/7]") for m in mensajes)
+
+    metricas = json.loads((salida / "run_metrics.json").read_text(encoding="utf-8"))
+    etapas = {e["etapa"]: e for e in metricas["etapas"]}
+    assert [e["origen"] for e in metricas["etapas"]] == [
+        "cache",
+        "cache",
+        "calculada",
+        "calculada",
+    ]
+    assert etapas["carga"]["filas_salida"] == len(df)
+    assert etapas["enlace"]["filas_entrada"] > 0
+    assert etapas["emitir"]["filas_entrada"] >= len(df)
+    for e in metricas["etapas"]:
+        assert e["wall_s"] >= 0 and e["cpu_s"] >= 0
+    assert metricas["total"]["wall_s"] >= etapas["emitir"]["wall_s"]
+    assert "Métricas por etapa (run_metrics.json):" in mensajes
+    assert mensajes[-1].lstrip().startswith("TOTAL")
+
+    # Mismo reporte que sin caché
+    ok, esperado = run_proceso_caja(
+        data_dir / "SISTEMA.xlsx", data_dir, tmp_path / "sin_cache", lambda m: None
+    )
+    assert ok, esperado
+    _comparar_salidas(esperado, salida)
+
+
+def test_solo_reportes_sin_sistema(tmp_path):
+    """Los reportes se regeneran de los artefactos aunque SISTEMA ya no exista"""
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    cache_dir = tmp_path / "cache"
+    pd.DataFrame({"CP": [50000]}).to_excel(data_dir / "LISTA C.P..xlsx", index=False)
+    campo_sistema = data_dir / "SISTEMA_CAMPO.xlsx"
+    caja_sistema = data_dir / "SISTEMA_CAJA.xlsx"
+    padron_sintetico(300, 4).to_excel(campo_sistema, index=False)
+    padron_caja_sintetico(200).to_excel(caja_sistema, index=False)
+
+    ok, esperado_campo = run_proceso_campo(
+        campo_sistema, data_dir, tmp_path / "esperado", lambda m: None, "MAYO"
+    )
+    assert ok, esperado_campo
+    ok, esperado_caja = run_proceso_caja(
+        caja_sistema, data_dir, tmp_path / "esperado", lambda m: None
+    )
+    assert ok, esperado_caja
+    for proceso, sistema in [
+        (run_proceso_campo, campo_sistema),
+        (run_proceso_caja, caja_sistema),
+    ]:
+        ok, salida = proceso(
+            sistema, data_dir, tmp_path / "previo", lambda m: None, cache_dir=cache_dir
+        )
+        assert ok, salida
+        sistema.unlink()
+
+    mensajes = []
+    ok, campo = run_proceso_campo(
+        campo_sistema,
+        data_dir,
+        tmp_path / "render",
+        mensajes.append,
+        month_label="MAYO",
+        cache_dir=cache_dir,
+        solo_reportes=True,
+    )
+    assert ok, campo
+    ok, caja = run_proceso_caja(
+        caja_sistema,
+        data_dir,
+        tmp_path / "render",
+        mensajes.append,
+        cache_dir=cache_dir,
+        solo_reportes=True,
+    )
+    assert ok, caja
+    assert not any(m.startswith("Leyendo:") for m in mensajes)
+    _comparar_salidas(esperado_campo, campo)
+    _comparar_salidas(esperado_caja, caja)
+
+    ok, mensaje = run_proceso_campo(
+        campo_sistema, data_dir, tmp_path / "x", lambda m: None, solo_reportes=True
+    )
+    assert not ok and "caché" in mensaje
+
+
+@pytest.mark.parametrize("modo", ["cprofile", "muestreo"])
+def test_perfil_por_etapa(tmp_path, modo):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    padron_caja_sintetico(200).to_excel(data_dir / "SISTEMA.xlsx", index=False)
+
+    ok, salida = run_proceso_caja(
+        data_dir / "SISTEMA.xlsx",
+        data_dir,
+        tmp_path / "out",
+        lambda m: None,
+        perfilar=modo,
+    )
+    assert ok, salida
+    perfiles = salida / "perfiles"
+    for etapa in ("carga", "agregados", "enlace", "emitir"):
+        resumen = (perfiles / f"perfil_caja_{etapa}.txt").read_text(encoding="utf-8")
+        assert "=== Top" in resumen
+    if modo == "cprofile":
+        stats = pstats.Stats(str(perfiles / "perfil_caja_carga.pstats"))
+        assert any(f[2] == "_cargar_sistema" for f in stats.stats)
+    else:
+        assert not list(perfiles.glob("*.pstats"))
+
+    ok, mensaje = run_proceso_caja(
+        data_dir / "SISTEMA.xlsx", data_dir, tmp_path / "x", print, perfilar="otro"
+    )
+    assert not ok and "perfil" in mensaje
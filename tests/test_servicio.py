@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests del servicio HTTP de trabajos
+"""
+
+import json
+import queue
+import sys
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa import sintetico  # noqa: E402
+from app_iiwa.servicio import Servicio, crear_servidor  # noqa: E402
+
+
+def _pedir(url, datos=None, token="secreto"):
+    cuerpo = None if datos is None else json.dumps(datos).encode()
+    pedido = urllib.request.Request(url, data=cuerpo)
+    pedido.add_header("Authorization", f"Bearer {token}")
+    return urllib.request.urlopen(pedido, timeout=120)
+
+
+def _sse(respuesta):
+    """[(evento, datos)] de un text/event-stream completo"""
+    mensajes = []
+    for bloque in respuesta.read().decode("utf-8").split("\n\n"):
+        campos = dict(
+            linea.split(": ", 1) for linea in bloque.splitlines() if ": " in linea
+        )
+        if "event" in campos:
+            mensajes.append((campos["event"], json.loads(campos["data"])))
+    return mensajes
+
+
+def test_envio_valida_rutas_y_limita_la_cola(tmp_path):
+    servicio = Servicio(tmp_path, en_cola=1)
+    with pytest.raises(ValueError, match="Ruta fuera"):
+        servicio.enviar({"proceso": "CAMPO", "data_dir": "../otro", "output_dir": "s"})
+    with pytest.raises(ValueError, match="Falta output_dir"):
+        servicio.enviar({"proceso": "CAMPO", "data_dir": "d"})
+    with pytest.raises(ValueError, match="Proceso desconocido"):
+        servicio.enviar({"proceso": "OTRO", "data_dir": "d", "output_dir": "s"})
+
+    envio = servicio.enviar({"proceso": "caja", "data_dir": "d", "output_dir": "s"})
+    assert envio.trabajo.sistema_path == tmp_path / "d" / "SISTEMA.xlsx"
+    assert envio.trabajo.parametros["cache_dir"] == tmp_path / "s" / ".cache_iiwa"
+    with pytest.raises(queue.Full):
+        servicio.enviar({"proceso": "CAMPO", "data_dir": "d", "output_dir": "otra"})
+    servicio.en_cola = 2
+    with pytest.raises(FileExistsError):
+        servicio.enviar({"proceso": "CAMPO", "data_dir": "d", "output_dir": "s"})
+
+
+def test_servicio_corre_y_transmite_el_log(tmp_path):
+    sintetico.generar_datos(tmp_path / "norte", "CAMPO", 300, 3)
+    servicio = Servicio(tmp_path, workers=1)
+    servicio.iniciar()
+    servidor = crear_servidor(servicio, puerto=0, token="secreto")
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{servidor.server_address[1]}/trabajos"
+    try:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            _pedir(url, token="otro")
+        assert error.value.code == 401
+
+        with _pedir(
+            url, {"proceso": "CAMPO", "data_dir": "norte", "output_dir": "s"}
+        ) as r:
+            assert r.status == 202
+            envio = json.load(r)
+        assert envio["estado"] in ("pendiente", "corriendo")
+
+        with _pedir(f"{url}/{envio['id']}/eventos") as r:
+            assert r.headers["Content-Type"].startswith("text/event-stream")
+            mensajes = _sse(r)
+        tipo, fin = mensajes[-1]
+        assert tipo == "fin" and fin["estado"] == "completado", fin
+        assert any("Leyendo:" in datos["mensaje"] for _, datos in mensajes)
+        assert "campo_output/reporte_macro.xlsx" in fin["archivos"]
+
+        macro = "campo_output/reporte_macro.xlsx"
+        with _pedir(f"{url}/{envio['id']}/archivos/{macro}") as r:
+            assert r.read() == (tmp_path / "s" / macro).read_bytes()
+
+        for ruta in (
+            f"{url}/{envio['id']}/archivos/..%2F..%2Fnorte%2FSISTEMA.xlsx",
+            f"{url}/{envio['id']}/archivos/.cache_iiwa/campo",
+            f"{url}/no-existe",
+        ):
+            with pytest.raises(urllib.error.HTTPError) as error:
+                _pedir(ruta)
+            assert error.value.code == 404
+
+        with _pedir(url) as r:
+            (listado,) = json.load(r)["trabajos"]
+        assert listado["id"] == envio["id"] and listado["estado"] == "completado"
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+        servicio.cerrar()
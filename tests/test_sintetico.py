@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests del generador de datos sintéticos
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa import sintetico  # noqa: E402
+from app_iiwa.caja import run_proceso_caja  # noqa: E402
+from app_iiwa.ingesta import leer_excel  # noqa: E402
+
+
+def test_generador_determinista():
+    pd.testing.assert_frame_equal(
+        sintetico.padron_campo(500, 12, seed=3), sintetico.padron_campo(500, 12, seed=3)
+    )
+    campo = sintetico.padron_campo(500, 12)
+    assert campo["CodigoPostal"].nunique() == 12
+    assert campo["NumerodeCuenta"].duplicated().any()
+
+    caja = sintetico.padron_caja(500, 12)
+    assert set(caja["CodigoPostal"]) <= set(sintetico.lista_cp(12)["CP"])
+    registros, folios = sintetico.registros_y_folios(caja["NumerodeCuenta"])
+    assert registros["NumerodeCuenta"].is_unique
+    assert set(folios["NumerodeCuenta"]) <= set(registros["NumerodeCuenta"])
+
+
+@pytest.mark.parametrize("proceso", ["CAMPO", "CAJA"])
+def test_generar_datos(tmp_path, proceso):
+    sistema = sintetico.generar_datos(tmp_path, proceso, 300, 5)
+    df = leer_excel(sistema)
+    assert len(df) == 300
+    if proceso == "CAMPO":
+        assert (tmp_path / "LISTA C.P..xlsx").exists()
+    else:
+        ok, salida = run_proceso_caja(
+            sistema, tmp_path, tmp_path / "out", lambda m: None
+        )
+        assert ok, salida
+        hojas = pd.ExcelFile(salida / "REPORTE_COMPLETO.xlsx").sheet_names
+        assert "E. folio Geolocalización" in hojas
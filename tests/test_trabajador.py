@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests del proceso de cálculo persistente y del SISTEMA en memoria
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa.eventos import Evento  # noqa: E402
+from app_iiwa.ingesta import UltimoSistema  # noqa: E402
+from app_iiwa.trabajador import Trabajador  # noqa: E402
+
+from .test_backends import padron_sintetico  # noqa: E402
+from .test_bajo_memoria import _comparar_salidas  # noqa: E402
+
+
+def test_ultimo_sistema_se_invalida_por_fecha_y_contenido(tmp_path):
+    ruta = tmp_path / "SISTEMA.xlsx"
+    padron_sintetico(200, 3).to_excel(ruta, index=False)
+    memoria = UltimoSistema()
+
+    df = memoria.leer(ruta)
+    # Cada lectura es una copia: agregar columnas no toca la guardada
+    df["Total"] = 1
+    assert "Total" not in memoria.leer(ruta)
+    assert (memoria.lecturas, memoria.reutilizadas) == (1, 1)
+
+    # Otra fecha con el mismo contenido: se compara el hash
+    st = ruta.stat()
+    os.utime(ruta, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    memoria.leer(ruta)
+    assert (memoria.lecturas, memoria.reutilizadas) == (1, 2)
+
+    padron_sintetico(200, 3, seed=5).to_excel(ruta, index=False)
+    pd.testing.assert_frame_equal(
+        memoria.leer(ruta), pd.read_excel(ruta, engine="openpyxl")
+    )
+    assert memoria.lecturas == 2
+
+
+def test_trabajador_reutiliza_sistema_y_se_reinicia(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    padron_sintetico(400, 4).to_excel(data_dir / "SISTEMA.xlsx", index=False)
+    pd.DataFrame({"CP": [50000]}).to_excel(data_dir / "LISTA C.P..xlsx", index=False)
+
+    trabajador = Trabajador()
+    trabajador.iniciar()
+    try:
+        assert trabajador.esperar(120) and trabajador.error is None
+        assert trabajador.hechos == trabajador.total
+
+        salidas, mensajes = [], []
+        for corrida in range(2):
+            mensajes.append([])
+            ok, salida = trabajador.ejecutar(
+                "CAMPO",
+                mensajes[-1].append,
+                sistema_path=data_dir / "SISTEMA.xlsx",
+                data_dir=data_dir,
+                output_dir=tmp_path / f"salida{corrida}",
+            )
+            assert ok, salida
+            salidas.append(salida)
+        _comparar_salidas(*salidas)
+        assert all(isinstance(m, Evento) for m in mensajes[0])
+        assert not any("copia en memoria" in m for m in mensajes[0])
+        assert any("copia en memoria" in m for m in mensajes[1])
+
+        # Si el proceso muere, la siguiente corrida lo vuelve a arrancar
+        trabajador._proceso.kill()
+        trabajador._proceso.join()
+        avisos = []
+        ok, resultado = trabajador.ejecutar(
+            "CAJA",
+            avisos.append,
+            sistema_path=tmp_path / "no_existe.xlsx",
+            data_dir=data_dir,
+            output_dir=tmp_path / "caja",
+        )
+        assert not ok and "no_existe.xlsx" in resultado
+        assert avisos[0] == "Reiniciando el proceso de cálculo..."
+        assert trabajador.corridas == 3
+    finally:
+        trabajador.cerrar()
+    assert not trabajador.vivo
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tests de la cola de trabajos en lote
+"""
+
+import json
+import sys
+from collections import deque
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa.trabajos import (  # noqa: E402
+    COMPLETADO,
+    CORRIENDO,
+    FALLIDO,
+    Planificador,
+    Trabajo,
+    cargar_lote,
+    guardar_lote,
+)
+
+from .test_backends import padron_sintetico  # noqa: E402
+from .test_bajo_memoria import padron_caja_sintetico  # noqa: E402
+
+
+def test_lote_con_rutas_relativas(tmp_path):
+    (tmp_path / "lote.json").write_text(
+        json.dumps(
+            {
+                "trabajos": [
+                    {
+                        "proceso": "campo",
+                        "sistema_path": "norte/SISTEMA.xlsx",
+                        "data_dir": "norte",
+                        "output_dir": "salidas/norte",
+                        "month_label": "ENERO",
+                    }
+                ]
+            }
+        )
+    )
+    (trabajo,) = cargar_lote(tmp_path / "lote.json")
+    assert trabajo.proceso == "CAMPO" and trabajo.nombre == "norte"
+    assert trabajo.sistema_path == tmp_path / "norte" / "SISTEMA.xlsx"
+    assert trabajo.argumentos()["month_label"] == "ENERO"
+
+    guardar_lote([trabajo], tmp_path / "copia.json")
+    (copia,) = cargar_lote(tmp_path / "copia.json")
+    assert copia.argumentos() == trabajo.argumentos()
+
+    with pytest.raises(ValueError):
+        Trabajo("OTRO", "s.xlsx", "d", "o")
+    with pytest.raises(ValueError):
+        Planificador([trabajo, copia])
+
+
+def test_admision_por_memoria(monkeypatch):
+    monkeypatch.setattr(Trabajo, "mb_sistema", lambda self: self.parametros["mb"])
+    grande, chico1, chico2 = (
+        Trabajo("CAMPO", "s", nombre, nombre, mb=mb)
+        for nombre, mb in [("grande", 10), ("chico1", 1), ("chico2", 1)]
+    )
+    avisos = []
+    planificador = Planificador(
+        [grande, chico1, chico2], workers=3, memoria_mb=1500, log_func=avisos.append
+    )
+    pendientes = deque([grande, chico1, chico2])
+    # 200 + 10 * 200 MB no cabe en 1500, pero corre solo si no hay nada más
+    assert planificador._admitir(pendientes, {}) is grande
+    assert "corre solo" in avisos[0]
+    # Con el grande corriendo no cabe nadie más
+    assert planificador._admitir(pendientes, {"f": grande}) is None
+    # Dos chicos (400 MB cada uno) sí caben juntos
+    assert planificador._admitir(pendientes, {}) is chico1
+    assert planificador._admitir(pendientes, {"f": chico1}) is chico2
+
+
+def test_planificador_corre_reintenta_y_deja_logs(tmp_path):
+    campo_dir = tmp_path / "campo"
+    caja_dir = tmp_path / "caja"
+    campo_dir.mkdir()
+    caja_dir.mkdir()
+    padron_sintetico(300, 3).to_excel(campo_dir / "SISTEMA.xlsx", index=False)
+    pd.DataFrame({"CP": [50000]}).to_excel(campo_dir / "LISTA C.P..xlsx", index=False)
+    padron_caja_sintetico(300).to_excel(caja_dir / "SISTEMA.xlsx", index=False)
+
+    lote = [
+        Trabajo("CAMPO", campo_dir / "SISTEMA.xlsx", campo_dir, tmp_path / "s1"),
+        Trabajo("CAJA", caja_dir / "SISTEMA.xlsx", caja_dir, tmp_path / "s2"),
+        Trabajo("CAJA", tmp_path / "falta.xlsx", caja_dir, tmp_path / "s3"),
+    ]
+    cambios, mensajes = [], []
+    planificador = Planificador(
+        lote,
+        workers=2,
+        reintentos=1,
+        log_func=mensajes.append,
+        al_cambiar=lambda t: cambios.append((t.nombre, t.estado)),
+    )
+    assert not planificador.ejecutar()
+
+    campo, caja, falla = lote
+    assert [t.estado for t in lote] == [COMPLETADO, COMPLETADO, FALLIDO]
+    assert (campo.intentos, falla.intentos) == (1, 2)
+    assert campo.resultado == str(tmp_path / "s1" / "campo_output")
+    assert campo.pico_mb > 0 and planificador._calibrado
+    assert sum(estado == CORRIENDO for _, estado in cambios) == 4
+
+    # Cada trabajo con su log y sus métricas
+    assert (tmp_path / "s1" / "campo_output" / "run_metrics.json").exists()
+    assert (tmp_path / "s2" / "caja_output" / "run_metrics.json").exists()
+    log_falla = (tmp_path / "s3" / "trabajo_caja.log").read_text(encoding="utf-8")
+    assert "intento 2" in log_falla and "falta.xlsx" in log_falla
+    assert "2/3 trabajos completados" in mensajes[-2]
+
+    guardar_lote(lote, tmp_path / "resultados.json", resultados=True)
+    resultados = json.loads((tmp_path / "resultados.json").read_text())["trabajos"]
+    assert [r["estado"] for r in resultados] == ["completado", "completado", "fallido"]
+
+    # Volver a ejecutar sólo corre lo que no se completó
+    assert not Planificador(lote, reintentos=0).ejecutar()
+    assert (campo.intentos, falla.intentos) == (1, 3)
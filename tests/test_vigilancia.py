@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests del modo vigilancia (procesar SISTEMA al llegar)
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar el directorio src al path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from app_iiwa import sintetico  # noqa: E402
+from app_iiwa.trabajos import Trabajo  # noqa: E402
+from app_iiwa.vigilancia import ARCHIVO_ESTADO, Vigilante  # noqa: E402
+
+
+def test_corre_cuando_las_entradas_se_asientan(tmp_path):
+    data_dir = tmp_path / "data"
+    sistema = sintetico.generar_datos(data_dir, "CAJA", 300, 4)
+    trabajo = Trabajo("CAJA", sistema, data_dir, tmp_path / "salida")
+    mensajes = []
+    vigilante = Vigilante([trabajo], espera_s=10, log_func=mensajes.append)
+
+    # Recién vistos: todavía no se asientan
+    assert vigilante.revisar(ahora=0) == []
+    assert vigilante.revisar(ahora=5) == []
+    assert vigilante.revisar(ahora=10) == [trabajo]
+    assert "cambió SISTEMA.xlsx, REGISTROS.csv, FOLIOS.csv" in mensajes[0]
+    assert (tmp_path / "salida" / "caja_output" / "run_metrics.json").exists()
+    assert (tmp_path / "salida" / ".cache_iiwa" / "caja").is_dir()
+
+    # Sin cambios no se vuelve a correr
+    assert vigilante.revisar(ahora=20) == []
+
+    # Cambia REGISTROS: se espera a que se asiente y se reutiliza la caché
+    registros = data_dir / "REGISTROS.csv"
+    with open(registros, "a", encoding="latin1") as f:
+        f.write("\n")
+    assert vigilante.revisar(ahora=21) == []
+    assert vigilante.revisar(ahora=31) == [trabajo]
+    assert "cambió REGISTROS.csv" in mensajes[-2]
+    log = trabajo.log_path.read_text(encoding="utf-8")
+    assert "recuperada de caché" in log.split("intento 2")[-1]
+
+    # Otra vigilancia (reinicio) lee las huellas y no repite la corrida
+    assert (tmp_path / "salida" / ARCHIVO_ESTADO).exists()
+    otra = Vigilante(
+        [Trabajo("CAJA", sistema, data_dir, tmp_path / "salida")], espera_s=0
+    )
+    assert otra.revisar(ahora=0) == []
+
+
+def test_no_corre_con_archivos_incompletos(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    sistema = data_dir / "SISTEMA.xlsx"
+    trabajo = Trabajo("CAMPO", sistema, data_dir, tmp_path / "salida")
+    vigilante = Vigilante([trabajo], espera_s=0)
+
+    # Libro a medio copiar (sin directorio del zip)
+    sistema.write_bytes(b"PK\x03\x04" + b"\x00" * 100)
+    sintetico.lista_cp(3).to_excel(data_dir / "LISTA C.P..xlsx", index=False)
+    assert vigilante.revisar(ahora=0) == []
+
+    # Falta LISTA C.P.: CAMPO no puede correr
+    sintetico.padron_caja(200, 3).to_excel(sistema, index=False)
+    (data_dir / "LISTA C.P..xlsx").unlink()
+    assert vigilante.revisar(ahora=1) == []
+
+    # SISTEMA sin las columnas de CAMPO: falla y no se reintenta sin cambios
+    sintetico.lista_cp(3).to_excel(data_dir / "LISTA C.P..xlsx", index=False)
+    assert vigilante.revisar(ahora=2) == [trabajo]
+    assert trabajo.resultado != str(tmp_path / "salida" / "campo_output")
+    assert vigilante.revisar(ahora=3) == []
+
+    sintetico.padron_campo(200, 3).to_excel(sistema, index=False)
+    assert vigilante.revisar(ahora=4) == [trabajo]
+    assert trabajo.resultado == str(tmp_path / "salida" / "campo_output")